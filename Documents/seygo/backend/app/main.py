@@ -52,6 +52,14 @@ async def lifespan(app: FastAPI):
     else:
         logger.info('Semantic search disabled (SEMANTIC_ENABLED != true). Using keyword search.')
 
+    # Load the prepared road graph (if one exists) before the first route request
+    if os.getenv('ROUTE_ROAD_GRAPH_MODE', 'fallback').strip().lower() != 'off':
+        import asyncio
+
+        from .services.road_graph import get_road_graph
+
+        await asyncio.to_thread(get_road_graph)
+
     yield  # server runs here
 
 
@@ -96,4 +104,21 @@ async def health_check():
             info['mode'] = 'semantic'
         except Exception:
             pass
-    return {'status': 'ok', 'semantic_index': info}
+    from .services.outbound_guard import outbound_guard
+    from .services.place_graph import place_graph_info
+    from .services.road_graph import road_graph_info
+    from .services.route_cache import route_cache
+    from .services.travel_time_cache import travel_time_cache
+    from .services.trip_session import trip_sessions
+    from .services.weather_cache import weather_cache
+    return {
+        'status': 'ok',
+        'semantic_index': info,
+        'weather_cache': weather_cache.stats(),
+        'travel_time_cache': travel_time_cache.stats(),
+        'road_graph': road_graph_info(),
+        'place_graph': place_graph_info(),
+        'route_cache': route_cache.stats(),
+        'trip_sessions': trip_sessions.stats(),
+        'outbound': outbound_guard.stats(),
+    }
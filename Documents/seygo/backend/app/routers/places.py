@@ -25,9 +25,12 @@ from ..services.google_photo_resolver import (
     update_place_photo_cache,
 )
 from ..services.google_places import GooglePlacesService
+from ..services.outbound_guard import CircuitOpenError
+from ..services.place_graph import get_place_graph
 from ..services.place_taxonomy import PLACE_TAXONOMY, infer_taxonomy
 from ..services.ml_recommender import MLRecommender
-from ..services.recommender import PlaceFeature, PlaceRecommender, _haversine_km
+from ..services.geo import distance_vector_km
+from ..services.recommender import PlaceFeature, PlaceRecommender
 
 router = APIRouter(prefix='/places', tags=['places'])
 recommender = PlaceRecommender()
@@ -549,13 +552,15 @@ async def search_places(
         if latitude is not None and longitude is not None:
             normalized = [
                 row for row in normalized
-                if row.get('latitude') is not None
-                and row.get('longitude') is not None
-                and _haversine_km(
-                    float(latitude), float(longitude),
-                    float(row['latitude']), float(row['longitude'])
-                ) <= radius_km
+                if row.get('latitude') is not None and row.get('longitude') is not None
             ]
+            within = distance_vector_km(
+                float(latitude),
+                float(longitude),
+                [float(row['latitude']) for row in normalized],
+                [float(row['longitude']) for row in normalized],
+            ) <= radius_km
+            normalized = [row for row, keep in zip(normalized, within) if keep]
 
         return {'count': len(normalized[:limit]), 'places': normalized[:limit]}
 
@@ -565,11 +570,67 @@ async def search_places(
             detail='Place search failed. Please try again.',
         ) from exc
 
+
+@router.get('/{place_id}/reachable')
+async def get_reachable_places(
+    place_id: str,
+    max_minutes: float = Query(30.0, gt=0, le=240),
+    limit: int = Query(30, ge=1, le=100),
+):
+    """Catalogue places reachable by road within ``max_minutes`` of a place,
+    nearest first.  Travel times come from the precomputed place graph, so
+    no Google call is made."""
+    graph = get_place_graph()
+    if graph is None:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail='Travel-time graph is not available.',
+        )
+    node = graph.node_of_place_id(place_id)
+    if node < 0:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail='Place not in travel-time graph.')
+
+    nodes, times = graph.reachable(node, max_minutes * 60.0)
+    minutes_by_id: dict[str, float] = {}
+    for n, t in zip(nodes.tolist(), times.tolist()):
+        for pid in graph.place_ids[n]:
+            minutes_by_id.setdefault(pid, round(t / 60.0, 1))
+        if len(minutes_by_id) >= limit:
+            break
+    if not minutes_by_id:
+        return {'place_id': place_id, 'max_minutes': max_minutes, 'count': 0, 'places': []}
+
+    try:
+        supabase = get_supabase_client()
+        ids = [int(pid) if pid.isdigit() else pid for pid in minutes_by_id]
+        rows = supabase.table(PLACES_TABLE).select('*').in_('id', ids).execute().data or []
+    except Exception as exc:
+        logger.exception('reachable places lookup failed for %s', place_id)
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail='Failed to fetch reachable places. Please try again.',
+        ) from exc
+
+    places = []
+    for row in rows:
+        normalized = _normalize_place_row(supabase, row)
+        normalized['travel_minutes'] = minutes_by_id.get(str(row.get('id')))
+        places.append(normalized)
+    places.sort(key=lambda p: p['travel_minutes'] if p['travel_minutes'] is not None else float('inf'))
+    places = places[:limit]
+    return {'place_id': place_id, 'max_minutes': max_minutes, 'count': len(places), 'places': places}
+
 @router.post('/google/search')
 @limiter.limit('20/minute')
 async def google_places_search(request: Request, payload: GooglePlacesSearchRequest):
     try:
         return google_places_service.search_places(payload)
+    except CircuitOpenError as exc:
+        logger.warning('Google Places search skipped: %s', exc)
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail='Google Places search is temporarily unavailable. Please try again shortly.',
+        ) from exc
     except httpx.HTTPStatusError as exc:
         logger.warning('Google Places search HTTP error: %s', exc.response.status_code)
         raise HTTPException(
@@ -589,6 +650,12 @@ async def google_places_search(request: Request, payload: GooglePlacesSearchRequ
 async def google_place_details(request: Request, place_id: str):
     try:
         return google_places_service.place_details(place_id)
+    except CircuitOpenError as exc:
+        logger.warning('Google Place details skipped: %s', exc)
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail='Google Place details are temporarily unavailable. Please try again shortly.',
+        ) from exc
     except httpx.HTTPStatusError as exc:
         logger.warning('Google Place details HTTP error: %s', exc.response.status_code)
         raise HTTPException(
@@ -1,13 +1,15 @@
 import logging
-import math
 import os
 from urllib.parse import quote_plus
 
+import numpy as np
 from fastapi import APIRouter, Depends, HTTPException, Query, status
 from pydantic import BaseModel, Field
 from supabase import create_client
 
 from ..dependencies import get_current_user
+from ..services.geo import haversine_np
+from ..services.place_graph import get_place_graph
 from .places import PLACES_TABLE, _first_non_empty, _normalize_place_row
 
 
@@ -598,29 +600,37 @@ def _playlist_stop_cover_image(name: str, category: str, description: str | None
     return f'https://source.unsplash.com/featured/1200x800/?{query}'
 
 
-def _haversine_km(lat1: float, lng1: float, lat2: float, lng2: float) -> float:
-    r = 6371.0
-    d_lat = math.radians(lat2 - lat1)
-    d_lng = math.radians(lng2 - lng1)
-    a = math.sin(d_lat / 2) ** 2 + math.cos(math.radians(lat1)) * math.cos(math.radians(lat2)) * math.sin(d_lng / 2) ** 2
-    return r * 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
+def _coord_or_nan(value) -> float:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return float('nan')
 
 
 def _fill_leg_distances(stops: list[dict]) -> None:
-    """Compute haversine distance from the previous stop and write it into each stop dict."""
-    for i, stop in enumerate(stops):
-        if i == 0:
-            stop['distance_km'] = 0.0
-            continue
-        prev = stops[i - 1]
-        try:
-            lat1 = float(prev['latitude'])
-            lng1 = float(prev['longitude'])
-            lat2 = float(stop['latitude'])
-            lng2 = float(stop['longitude'])
-            stop['distance_km'] = round(_haversine_km(lat1, lng1, lat2, lng2), 2)
-        except (TypeError, ValueError):
-            stop['distance_km'] = 0.0
+    """Write the distance from the previous stop into each stop dict.
+
+    Road distance from the precomputed place graph where it has the leg,
+    haversine otherwise.
+    """
+    if not stops:
+        return
+    lats = np.array([_coord_or_nan(s.get('latitude')) for s in stops])
+    lngs = np.array([_coord_or_nan(s.get('longitude')) for s in stops])
+    legs = np.zeros(len(stops))
+    legs[1:] = haversine_np(lats[:-1], lngs[:-1], lats[1:], lngs[1:])
+    graph = get_place_graph()
+    if graph is not None and len(stops) > 1:
+        nodes = np.full(len(stops), -1, dtype=np.int64)
+        finite = np.isfinite(lats) & np.isfinite(lngs)
+        nodes[finite] = graph.nodes_of(lats[finite], lngs[finite])
+        _, road_m = graph.legs(nodes[:-1], nodes[1:])
+        road = np.isfinite(road_m)
+        legs[1:][road] = road_m[road] / 1000.0
+    # Legs touching a stop without coordinates count as 0 km
+    legs = np.nan_to_num(np.round(legs, 2), nan=0.0)
+    for stop, leg in zip(stops, legs.tolist()):
+        stop['distance_km'] = leg
 
 
 def _sum_stop_distance(stops: list[dict]) -> float:
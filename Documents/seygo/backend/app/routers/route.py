@@ -8,18 +8,47 @@ Endpoint
 POST /route/optimize
     Accepts origin + list of destination places.
     Returns the optimized visit order, actual road polyline, total distance
-    and duration, and live weather at every stop.
+    and duration, and live weather at every stop.  ``polyline_format`` picks
+    the polyline shape: decoded points (default), the encoded string,
+    Douglas–Peucker simplified points, or flat parallel arrays.
+    ``mode='multi_day'`` splits long playlists into days that fit a daily
+    driving + visit budget and returns a per-day plan in ``days``.
+
+POST /route/optimize/stream
+    Same request; streams NDJSON progress events (one JSON object per
+    line) so the app can draw a preliminary order within ~100 ms, then the
+    road-time order, route totals, polyline chunks and per-stop weather.
+
+POST /route/orienteering
+    Start point, time budget and scored candidate places; returns the
+    best-scoring subset that fits the budget, in visit order.
+
+POST   /route/session
+    Same request; starts a live trip session (see trip_session.py) and
+    returns its id with the optimized tour.
+POST   /route/session/{session_id}/update
+    Position fix and/or stop events (visited, skipped, add_stops).  The tour
+    is repaired incrementally and only changed legs are re-routed.
+GET    /route/session/{session_id}
+    Current state of the session.
+DELETE /route/session/{session_id}
+    End the session.
 """
 
 from __future__ import annotations
 
-from typing import Any, Optional
+import json
+from typing import Any, Literal, Optional
 
 from fastapi import APIRouter, HTTPException, Request, status
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel, Field
 
 from ..main import limiter
-from ..services.route_optimizer import optimize_route
+from ..services.day_planner import plan_trip_days_async
+from ..services.orienteering import plan_orienteering_async
+from ..services.route_optimizer import optimize_route_async, optimize_route_stream
+from ..services.trip_session import TripSession, trip_sessions
 
 router = APIRouter(prefix='/route', tags=['route'])
 
@@ -44,15 +73,134 @@ class RouteOptimizeRequest(BaseModel):
         description='Ordered list of place dicts (must include latitude, longitude).',
         min_length=1,
     )
+    polyline_format: Literal['points', 'encoded', 'simplified', 'flat'] = Field(
+        'points',
+        description=(
+            "'points': list of {latitude, longitude}; 'encoded': Google encoded "
+            "polyline string; 'simplified': Douglas–Peucker reduced points; "
+            "'flat': {'latitude': [...], 'longitude': [...]} arrays."
+        ),
+    )
+    simplify_tolerance_m: Optional[float] = Field(
+        None,
+        gt=0,
+        description="Douglas–Peucker tolerance in metres for 'simplified'.",
+    )
+    zoom: Optional[float] = Field(
+        None,
+        ge=0,
+        le=22,
+        description="Map zoom level for 'simplified' (~1 px tolerance) when no tolerance is given.",
+    )
+    mode: Literal['single', 'multi_day'] = Field(
+        'single',
+        description=(
+            "'single': one route through every destination; 'multi_day': "
+            "cluster the destinations into days and route each day (see days)."
+        ),
+    )
+    day_budget_minutes: Optional[float] = Field(
+        None,
+        gt=0,
+        description="Driving + visit_duration_minutes per day for 'multi_day' (default 480).",
+    )
+    max_days: Optional[int] = Field(
+        None,
+        ge=1,
+        le=60,
+        description="Upper bound on the number of days for 'multi_day'.",
+    )
 
 
 class RouteOptimizeResponse(BaseModel):
     optimized_stops: list[dict[str, Any]]
     polyline_points: list[dict[str, float]]
+    polyline_encoded: Optional[str] = None
+    polyline_flat: Optional[dict[str, list[float]]] = None
     total_distance_km: float
     total_duration_min: float
     weather_info: list[dict[str, Any]]
     optimization_method: str
+    route_improvement: Optional[dict[str, Any]] = None
+    stage_timings_ms: dict[str, float] = Field(default_factory=dict)
+    cache: Optional[dict[str, Any]] = None
+    days: Optional[list[dict[str, Any]]] = None
+
+
+class OrienteeringRequest(BaseModel):
+    start: dict[str, Any] = Field(
+        ...,
+        description='Start location with at least latitude and longitude keys.',
+        examples=[{'latitude': 7.2906, 'longitude': 80.6337}],
+    )
+    budget_minutes: float = Field(
+        ...,
+        gt=0,
+        le=24 * 60,
+        description='Time window: driving + visit_duration_minutes of the chosen stops.',
+    )
+    candidates: list[dict[str, Any]] = Field(
+        ...,
+        description=(
+            'Place dicts (must include latitude, longitude; score from a '
+            'recommender, else rating, is maximised).'
+        ),
+        min_length=1,
+        max_length=500,
+    )
+    return_to_start: bool = Field(
+        False,
+        description='Count the drive back to the start against the budget.',
+    )
+
+
+class OrienteeringResponse(BaseModel):
+    stops: list[dict[str, Any]]
+    total_score: float
+    total_minutes: float
+    travel_minutes: float
+    visit_minutes: float
+    budget_minutes: float
+    return_to_start: bool
+    candidates: dict[str, int]
+    travel_source: str
+    search: dict[str, Any]
+    stage_timings_ms: dict[str, float] = Field(default_factory=dict)
+
+
+class TripSessionUpdateRequest(BaseModel):
+    position: Optional[_LatLng] = Field(
+        None,
+        description="Traveller's current position.",
+    )
+    visited: list[int] = Field(
+        default_factory=list,
+        description='stop_index values of stops reached since the last update, in order.',
+    )
+    skipped: list[int] = Field(
+        default_factory=list,
+        description='stop_index values of stops dropped from the trip.',
+    )
+    add_stops: list[dict[str, Any]] = Field(
+        default_factory=list,
+        description='Place dicts (must include latitude, longitude) to add to the trip.',
+    )
+
+
+class TripSessionResponse(BaseModel):
+    session_id: str
+    remaining_stops: list[dict[str, Any]]
+    visited_stops: list[dict[str, Any]]
+    skipped_stops: list[dict[str, Any]]
+    position: Optional[_LatLng] = None
+    polyline_points: list[dict[str, float]]
+    polyline_encoded: Optional[str] = None
+    polyline_flat: Optional[dict[str, list[float]]] = None
+    total_distance_km: float
+    total_duration_min: float
+    weather_info: list[dict[str, Any]]
+    route_sources: list[str]
+    last_update: dict[str, Any] = Field(default_factory=dict)
 
 
 # ---------------------------------------------------------------------------
@@ -79,6 +227,31 @@ def _validate_coords(lat: Any, lng: Any, label: str) -> None:
         )
 
 
+def _validate_request(body: RouteOptimizeRequest) -> None:
+    if 'latitude' not in body.origin or 'longitude' not in body.origin:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail='origin must contain latitude and longitude.',
+        )
+    _validate_coords(body.origin['latitude'], body.origin['longitude'], 'origin')
+
+    for i, dest in enumerate(body.destinations):
+        if 'latitude' not in dest or 'longitude' not in dest:
+            raise HTTPException(
+                status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                detail=f'destinations[{i}] must contain latitude and longitude.',
+            )
+        _validate_coords(dest['latitude'], dest['longitude'], f'destinations[{i}]')
+
+
+def _require_single_mode(body: RouteOptimizeRequest) -> None:
+    if body.mode != 'single':
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail="mode 'multi_day' is only supported by /route/optimize.",
+        )
+
+
 @router.post(
     '/optimize',
     response_model=RouteOptimizeResponse,
@@ -88,34 +261,230 @@ def _validate_coords(lat: Any, lng: Any, label: str) -> None:
         'visit order using road travel times (Google Distance Matrix API + '
         'weather-aware scoring), plus the road polyline from Google Directions '
         'API.  Falls back gracefully to straight-line haversine ordering when '
-        'the Google APIs are unavailable.'
+        'the Google APIs are unavailable.  With `mode=multi_day` the stops are '
+        'first clustered into days within `day_budget_minutes` and each day is '
+        'routed separately.'
     ),
 )
 @limiter.limit('10/minute')
 async def optimize_route_endpoint(request: Request, body: RouteOptimizeRequest):
-    if 'latitude' not in body.origin or 'longitude' not in body.origin:
+    _validate_request(body)
+
+    try:
+        if body.mode == 'multi_day':
+            return await plan_trip_days_async(
+                origin=body.origin,
+                destinations=body.destinations,
+                day_budget_minutes=body.day_budget_minutes,
+                max_days=body.max_days,
+                polyline_format=body.polyline_format,
+                polyline_tolerance_m=body.simplify_tolerance_m,
+                polyline_zoom=body.zoom,
+            )
+        result = await optimize_route_async(
+            origin=body.origin,
+            destinations=body.destinations,
+            polyline_format=body.polyline_format,
+            polyline_tolerance_m=body.simplify_tolerance_m,
+            polyline_zoom=body.zoom,
+        )
+        return result
+    except Exception as exc:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail='Route optimization failed. Please try again.',
+        ) from exc
+
+
+@router.post(
+    '/optimize/stream',
+    summary='Optimize route, streaming progress as NDJSON',
+    description=(
+        'Same input as /route/optimize.  Responds with application/x-ndjson: '
+        'an `order` event (stage `preliminary`, from cached legs / straight-line '
+        'estimates), an `order` event (stage `final`, road travel times), a '
+        '`route` event with totals, `polyline` chunk events, a `weather` event '
+        'and a closing `done` event.  Failures mid-stream end with an `error` event.'
+    ),
+)
+@limiter.limit('10/minute')
+async def optimize_route_stream_endpoint(request: Request, body: RouteOptimizeRequest):
+    _validate_request(body)
+    _require_single_mode(body)
+
+    async def _ndjson():
+        try:
+            async for event in optimize_route_stream(
+                origin=body.origin,
+                destinations=body.destinations,
+                polyline_format=body.polyline_format,
+                polyline_tolerance_m=body.simplify_tolerance_m,
+                polyline_zoom=body.zoom,
+            ):
+                yield json.dumps(event, default=str) + '\n'
+        except Exception:
+            yield json.dumps({
+                'event': 'error',
+                'detail': 'Route optimization failed. Please try again.',
+            }) + '\n'
+
+    return StreamingResponse(_ndjson(), media_type='application/x-ndjson')
+
+
+@router.post(
+    '/orienteering',
+    response_model=OrienteeringResponse,
+    summary='Best places to visit within a time budget',
+    description=(
+        'Given a start point, a time budget and candidate places with scores, '
+        'picks and orders the subset with the highest total score whose '
+        'driving plus visit_duration_minutes fits the budget (orienteering '
+        'problem: greedy insertion + 2-opt / swap local search).'
+    ),
+)
+@limiter.limit('30/minute')
+async def orienteering_endpoint(request: Request, body: OrienteeringRequest):
+    if 'latitude' not in body.start or 'longitude' not in body.start:
         raise HTTPException(
             status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
-            detail='origin must contain latitude and longitude.',
+            detail='start must contain latitude and longitude.',
         )
-    _validate_coords(body.origin['latitude'], body.origin['longitude'], 'origin')
-
-    for i, dest in enumerate(body.destinations):
-        if 'latitude' not in dest or 'longitude' not in dest:
+    _validate_coords(body.start['latitude'], body.start['longitude'], 'start')
+    for i, cand in enumerate(body.candidates):
+        if 'latitude' not in cand or 'longitude' not in cand:
             raise HTTPException(
                 status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
-                detail=f'destinations[{i}] must contain latitude and longitude.',
+                detail=f'candidates[{i}] must contain latitude and longitude.',
             )
-        _validate_coords(dest['latitude'], dest['longitude'], f'destinations[{i}]')
+        _validate_coords(cand['latitude'], cand['longitude'], f'candidates[{i}]')
 
     try:
-        result = optimize_route(
-            origin=body.origin,
-            destinations=body.destinations,
+        return await plan_orienteering_async(
+            start=body.start,
+            candidates=body.candidates,
+            budget_minutes=body.budget_minutes,
+            return_to_start=body.return_to_start,
         )
-        return result
+    except Exception as exc:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail='Trip planning failed. Please try again.',
+        ) from exc
+
+
+# ---------------------------------------------------------------------------
+# Live trip sessions
+# ---------------------------------------------------------------------------
+
+def _get_session(session_id: str) -> TripSession:
+    session = trip_sessions.get(session_id)
+    if session is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail='Trip session not found or expired.',
+        )
+    return session
+
+
+@router.post(
+    '/session',
+    response_model=TripSessionResponse,
+    status_code=status.HTTP_201_CREATED,
+    summary='Start a live trip session',
+    description=(
+        'Same input as /route/optimize.  Optimizes the tour and keeps the '
+        'travel matrix, weather and leg geometry server-side so that later '
+        'updates only repair what changed.'
+    ),
+)
+@limiter.limit('10/minute')
+async def create_trip_session_endpoint(request: Request, body: RouteOptimizeRequest):
+    _validate_request(body)
+    _require_single_mode(body)
+
+    session = TripSession(
+        body.origin,
+        polyline_format=body.polyline_format,
+        polyline_tolerance_m=body.simplify_tolerance_m,
+        polyline_zoom=body.zoom,
+    )
+    try:
+        async with session.lock:
+            result = await session.start(body.destinations)
     except Exception as exc:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail='Route optimization failed. Please try again.',
         ) from exc
+    trip_sessions.add(session)
+    return result
+
+
+@router.post(
+    '/session/{session_id}/update',
+    response_model=TripSessionResponse,
+    summary='Update a live trip session',
+    description=(
+        'Applies visited / skipped stops, new stops and a position fix, '
+        'repairs the remaining tour with local search and re-routes only the '
+        'legs that changed.  A position on the current leg needs no road call.'
+    ),
+)
+@limiter.limit('120/minute')
+async def update_trip_session_endpoint(request: Request, session_id: str, body: TripSessionUpdateRequest):
+    session = _get_session(session_id)
+    if body.position is not None:
+        _validate_coords(body.position.latitude, body.position.longitude, 'position')
+    for i, stop in enumerate(body.add_stops):
+        if 'latitude' not in stop or 'longitude' not in stop:
+            raise HTTPException(
+                status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                detail=f'add_stops[{i}] must contain latitude and longitude.',
+            )
+        _validate_coords(stop['latitude'], stop['longitude'], f'add_stops[{i}]')
+
+    try:
+        async with session.lock:
+            return await session.update(
+                position=(
+                    (body.position.latitude, body.position.longitude)
+                    if body.position is not None else None
+                ),
+                visited=body.visited,
+                skipped=body.skipped,
+                add_stops=body.add_stops,
+            )
+    except ValueError as exc:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=str(exc),
+        ) from exc
+    except Exception as exc:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail='Trip update failed. Please try again.',
+        ) from exc
+
+
+@router.get(
+    '/session/{session_id}',
+    response_model=TripSessionResponse,
+    summary='Current state of a live trip session',
+)
+async def get_trip_session_endpoint(session_id: str):
+    session = _get_session(session_id)
+    async with session.lock:
+        return session.snapshot()
+
+
+@router.delete(
+    '/session/{session_id}',
+    status_code=status.HTTP_204_NO_CONTENT,
+    summary='End a live trip session',
+)
+async def delete_trip_session_endpoint(session_id: str):
+    if not trip_sessions.remove(session_id):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail='Trip session not found or expired.',
+        )
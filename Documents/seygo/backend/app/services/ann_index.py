@@ -0,0 +1,192 @@
+"""
+ann_index.py
+============
+Approximate nearest-neighbour search over the L2-normalised semantic vectors
+(semantic_recommender.py).
+
+  • ExactIndex   brute-force dot product + argpartition; used below
+                 SEMANTIC_ANN_MIN_SIZE vectors (default 20 000), where a full
+                 scan is already only a few milliseconds
+  • IVFIndex     inverted file: spherical k-means (trained on a sample) splits
+                 the vectors into nlist cells (SEMANTIC_ANN_NLIST, default
+                 ≈ 4·√N); a query ranks the centroids and scans only the
+                 vectors of the best ``nprobe`` cells
+  • Knob         ``nprobe`` (SEMANTIC_ANN_NPROBE, default 16, or per call)
+                 trades recall for latency; nprobe ≥ nlist is exact
+  • Persistence  built with the semantic index and saved next to
+                 semantic_vectors.npy; a saved index whose vector count or
+                 dimension no longer matches is rebuilt
+
+Indexes hold only the partitioning; the vectors are passed to ``search`` so
+the recommender keeps a single copy of them.
+"""
+
+from __future__ import annotations
+
+import logging
+import math
+import os
+import time
+from pathlib import Path
+from typing import Any, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+_ANN_MIN_SIZE = int(os.getenv('SEMANTIC_ANN_MIN_SIZE', '20000'))
+_ANN_NLIST = int(os.getenv('SEMANTIC_ANN_NLIST', '0'))          # 0 = ≈ 4·√N
+_ANN_NPROBE = int(os.getenv('SEMANTIC_ANN_NPROBE', '16'))
+_KMEANS_ITERATIONS = 10
+# Training sample per cell; k-means on every vector adds little
+_TRAIN_PER_LIST = 32
+# Rows per block when assigning vectors to cells (bounds peak memory)
+_ASSIGN_BLOCK = 8192
+_SEED = 0
+
+
+def _top_k(sims: np.ndarray, k: int) -> np.ndarray:
+    """Indices of the k largest values, best first."""
+    if k >= len(sims):
+        return np.argsort(-sims, kind='stable')
+    part = np.argpartition(-sims, k - 1)[:k]
+    return part[np.argsort(-sims[part], kind='stable')]
+
+
+class ExactIndex:
+    """Full scan; the fallback for small catalogues."""
+
+    kind = 'exact'
+
+    def search(
+        self,
+        vectors: np.ndarray,
+        query: np.ndarray,
+        k: int,
+        nprobe: Optional[int] = None,
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """(row indices, similarities) of the k most similar vectors."""
+        sims = vectors @ query
+        rows = _top_k(sims, k)
+        return rows, sims[rows]
+
+    def info(self) -> dict[str, Any]:
+        return {'kind': self.kind}
+
+
+class IVFIndex:
+    """Inverted-file index: centroids plus vector ids grouped by cell."""
+
+    kind = 'ivf'
+
+    def __init__(self, centroids: np.ndarray, offsets: np.ndarray, ids: np.ndarray) -> None:
+        self.centroids = centroids          # (nlist, dim) float32, L2-normed
+        self.offsets = offsets              # (nlist + 1,) start of each cell in ids
+        self.ids = ids                      # (N,) vector rows, grouped by cell
+
+    @property
+    def nlist(self) -> int:
+        return len(self.centroids)
+
+    @property
+    def size(self) -> int:
+        return len(self.ids)
+
+    @classmethod
+    def build(cls, vectors: np.ndarray, nlist: Optional[int] = None) -> 'IVFIndex':
+        n = len(vectors)
+        nlist = max(1, min(n, nlist or _ANN_NLIST or int(4 * math.sqrt(n))))
+        rng = np.random.default_rng(_SEED)
+        sample = vectors[rng.choice(n, size=min(n, nlist * _TRAIN_PER_LIST), replace=False)]
+
+        centroids = sample[rng.choice(len(sample), size=nlist, replace=False)].astype(np.float32)
+        for _ in range(_KMEANS_ITERATIONS):
+            assign = _assign(sample, centroids)
+            order = np.argsort(assign, kind='stable')
+            counts = np.bincount(assign, minlength=nlist)
+            filled = np.flatnonzero(counts)
+            sums = np.zeros_like(centroids)
+            sums[filled] = np.add.reduceat(sample[order], np.concatenate(([0], np.cumsum(counts[filled])[:-1])))
+            empty = counts == 0
+            # Re-seed empty cells with random training vectors
+            sums[empty] = sample[rng.choice(len(sample), size=int(empty.sum()))]
+            norms = np.linalg.norm(sums, axis=1, keepdims=True)
+            centroids = (sums / np.maximum(norms, 1e-12)).astype(np.float32)
+
+        assign = _assign(vectors, centroids)
+        ids = np.argsort(assign, kind='stable').astype(np.int64)
+        offsets = np.searchsorted(assign[ids], np.arange(nlist + 1)).astype(np.int64)
+        return cls(centroids, offsets, ids)
+
+    def search(
+        self,
+        vectors: np.ndarray,
+        query: np.ndarray,
+        k: int,
+        nprobe: Optional[int] = None,
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """(row indices, similarities) of the k most similar vectors among the
+        cells of the ``nprobe`` nearest centroids."""
+        nprobe = max(1, min(self.nlist, nprobe or _ANN_NPROBE))
+        if nprobe >= self.nlist:
+            return ExactIndex().search(vectors, query, k)
+        cells = _top_k(self.centroids @ query, nprobe)
+        rows = np.concatenate([self.ids[self.offsets[c]:self.offsets[c + 1]] for c in cells])
+        sims = vectors[rows] @ query
+        best = _top_k(sims, k)
+        return rows[best], sims[best]
+
+    def save(self, path: Path) -> None:
+        tmp = path.with_name(path.name + '.tmp.npz')
+        np.savez(tmp, centroids=self.centroids, offsets=self.offsets, ids=self.ids)
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path: Path) -> 'IVFIndex':
+        with np.load(path) as data:
+            return cls(data['centroids'], data['offsets'], data['ids'])
+
+    def info(self) -> dict[str, Any]:
+        return {'kind': self.kind, 'nlist': self.nlist, 'nprobe': min(self.nlist, _ANN_NPROBE)}
+
+
+def _assign(vectors: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+    """Nearest centroid (max dot product) per vector, in row blocks."""
+    out = np.empty(len(vectors), dtype=np.int64)
+    for start in range(0, len(vectors), _ASSIGN_BLOCK):
+        block = np.asarray(vectors[start:start + _ASSIGN_BLOCK], dtype=np.float32)
+        out[start:start + len(block)] = (block @ centroids.T).argmax(axis=1)
+    return out
+
+
+def build_ann_index(vectors: np.ndarray, min_size: Optional[int] = None):
+    """IVFIndex for large vector sets, ExactIndex below ``min_size``."""
+    if len(vectors) < (_ANN_MIN_SIZE if min_size is None else min_size):
+        return ExactIndex()
+    start = time.perf_counter()
+    index = IVFIndex.build(vectors)
+    logger.info(
+        'IVF index built: %d vectors, %d cells in %.1fs',
+        index.size, index.nlist, time.perf_counter() - start,
+    )
+    return index
+
+
+def load_ann_index(path: Path, vectors: np.ndarray, min_size: Optional[int] = None):
+    """The saved index at ``path`` if it still matches ``vectors``, otherwise
+    a freshly built one (saved back when it is an IVFIndex)."""
+    if len(vectors) >= (_ANN_MIN_SIZE if min_size is None else min_size) and path.exists():
+        try:
+            index = IVFIndex.load(path)
+            if index.size == len(vectors) and index.centroids.shape[1] == vectors.shape[1]:
+                return index
+            logger.info('Saved IVF index is stale (%d vs %d vectors); rebuilding.', index.size, len(vectors))
+        except Exception as exc:
+            logger.warning('Failed to load IVF index: %s', exc)
+    index = build_ann_index(vectors, min_size)
+    if isinstance(index, IVFIndex):
+        try:
+            index.save(path)
+        except Exception as exc:
+            logger.warning('Could not save IVF index: %s', exc)
+    return index
@@ -0,0 +1,298 @@
+"""
+day_planner.py
+==============
+Multi-day itineraries for long playlists (``mode='multi_day'`` on
+/route/optimize).
+
+A 40–100 stop island tour is too big for one day and too big for one TSP,
+so the stops are split into days first and each day is routed on its own:
+
+  • Partition  vectorised k-means on equirectangular km coordinates
+               (k-means++ seeding, fixed seed); k is the fewest days (searched
+               from the days the visit time alone needs, doubling then
+               bisecting) for which every day fits ``day_budget_minutes``
+               (default ROUTE_DAY_BUDGET_MIN, 480) of estimated driving +
+               ``visit_duration_minutes``, capped at ``max_days``
+  • Chain      days are ordered by a nearest-neighbour walk over the cluster
+               centroids from the origin; each day ends at its stop nearest
+               the next day's centroid and the next day starts there
+  • Solve      every day is a normal ``optimize_route_async`` call (weather,
+               matrix, exact / heuristic order, Directions) with its last stop
+               fixed, run concurrently (at most ROUTE_PLAN_DAY_CONCURRENCY);
+               day d departs at ROUTE_PLAN_DAY_START_HOUR Sri Lanka time on day d
+
+Per-day work is bounded by the day budget, so total cost grows roughly
+linearly with the number of stops instead of quadratically.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import math
+import os
+import time
+from datetime import datetime, timedelta
+from typing import Any, Optional
+
+import numpy as np
+
+from .route_optimizer import (
+    _FALLBACK_SPEED_KMH,
+    _SPARSE_DETOUR_FACTOR,
+    _visit_minutes,
+    optimize_route_async,
+)
+from .travel_time_cache import _SRI_LANKA_TZ
+
+_DAY_BUDGET_MIN = float(os.getenv('ROUTE_DAY_BUDGET_MIN', '480'))
+_DAY_CONCURRENCY = int(os.getenv('ROUTE_PLAN_DAY_CONCURRENCY', '4'))
+# Sri Lanka hour each day after the first starts driving
+_DAY_START_HOUR = int(os.getenv('ROUTE_PLAN_DAY_START_HOUR', '8'))
+_KMEANS_ITERATIONS = 25
+_KMEANS_SEED = 0
+
+
+# ---------------------------------------------------------------------------
+# Partitioning
+# ---------------------------------------------------------------------------
+
+def _project_km(lats: np.ndarray, lngs: np.ndarray, lat0: float, lng0: float) -> np.ndarray:
+    """Equirectangular (x, y) km around (lat0, lng0); fine at island scale."""
+    x = (lngs - lng0) * 111.320 * math.cos(math.radians(lat0))
+    y = (lats - lat0) * 110.574
+    return np.column_stack([x, y])
+
+
+def _kmeans(xy: np.ndarray, k: int, seed: int = _KMEANS_SEED) -> np.ndarray:
+    """Cluster labels for ``xy`` (N, 2) into ``k`` groups, none empty."""
+    n = len(xy)
+    if k >= n:
+        return np.arange(n)
+    rng = np.random.default_rng(seed)
+    centres = np.empty((k, 2))
+    centres[0] = xy[rng.integers(n)]
+    d2 = ((xy - centres[0]) ** 2).sum(axis=1)
+    for c in range(1, k):
+        total = d2.sum()
+        pick = rng.choice(n, p=d2 / total) if total > 0 else rng.integers(n)
+        centres[c] = xy[pick]
+        d2 = np.minimum(d2, ((xy - centres[c]) ** 2).sum(axis=1))
+
+    labels = np.full(n, -1)
+    for _ in range(_KMEANS_ITERATIONS):
+        dist = ((xy[:, None, :] - centres[None, :, :]) ** 2).sum(axis=2)
+        new_labels = dist.argmin(axis=1)
+        counts = np.bincount(new_labels, minlength=k)
+        # Re-seed empty clusters with the points furthest from their centre,
+        # only taking points from clusters that keep at least one member
+        # (duplicate coordinates make ties, and so empty clusters, common)
+        spread = dist[np.arange(n), new_labels]
+        while counts.min() == 0:
+            far = int(np.where(counts[new_labels] > 1, spread, -1.0).argmax())
+            counts[new_labels[far]] -= 1
+            new_labels[far] = int(counts.argmin())
+            counts[new_labels[far]] += 1
+            spread[far] = -1.0
+        if np.array_equal(new_labels, labels):
+            break
+        labels = new_labels
+        for axis in range(2):
+            centres[:, axis] = np.bincount(labels, weights=xy[:, axis], minlength=k) / counts
+    return labels
+
+
+def _nearest_neighbour_walk(xy: np.ndarray, start: np.ndarray) -> tuple[list[int], float]:
+    """Greedy visit order over ``xy`` from ``start`` and its length (km)."""
+    remaining = np.ones(len(xy), dtype=bool)
+    order: list[int] = []
+    here = start
+    length = 0.0
+    for _ in range(len(xy)):
+        dist = np.hypot(*(xy - here).T)
+        dist[~remaining] = np.inf
+        nxt = int(dist.argmin())
+        length += float(dist[nxt])
+        order.append(nxt)
+        remaining[nxt] = False
+        here = xy[nxt]
+    return order, length
+
+
+def _chain_days(
+    xy: np.ndarray,
+    origin_xy: np.ndarray,
+    labels: np.ndarray,
+    visit_min: np.ndarray,
+) -> list[dict[str, Any]]:
+    """Order clusters into days, pick the hand-over stops and estimate each
+    day's driving + visit minutes."""
+    k = int(labels.max()) + 1
+    members = [m for m in (np.flatnonzero(labels == c) for c in range(k)) if len(m)]
+    centroids = np.array([xy[m].mean(axis=0) for m in members])
+    cluster_order, _ = _nearest_neighbour_walk(centroids, origin_xy)
+
+    days: list[dict[str, Any]] = []
+    start: Optional[int] = None
+    for pos, c in enumerate(cluster_order):
+        stops = members[c]
+        end: Optional[int] = None
+        if pos + 1 < len(cluster_order):
+            nxt = centroids[cluster_order[pos + 1]]
+            end = int(stops[np.hypot(*(xy[stops] - nxt).T).argmin()])
+        start_xy = origin_xy if start is None else xy[start]
+        _, km = _nearest_neighbour_walk(xy[stops], start_xy)
+        drive = km * _SPARSE_DETOUR_FACTOR / _FALLBACK_SPEED_KMH * 60.0
+        days.append({
+            'stops': stops.tolist(),
+            'start': start,
+            'end': end,
+            'estimated_minutes': float(drive + visit_min[stops].sum()),
+        })
+        start = end
+    return days
+
+
+def _partition_days(
+    origin: dict[str, Any],
+    destinations: list[dict[str, Any]],
+    day_budget_minutes: float,
+    max_days: Optional[int] = None,
+) -> list[dict[str, Any]]:
+    """Split destinations into chained days that fit the daily budget.
+
+    Returns per day {'stops': destination indices, 'start': index of the
+    previous day's last stop (None = origin), 'end': index of this day's
+    last stop (None on the final day), 'estimated_minutes'}.
+    """
+    lats = np.array([float(d['latitude']) for d in destinations])
+    lngs = np.array([float(d['longitude']) for d in destinations])
+    lat0, lng0 = float(origin['latitude']), float(origin['longitude'])
+    xy = _project_km(lats, lngs, lat0, lng0)
+    origin_xy = np.zeros(2)
+    visit_min = np.array([_visit_minutes(d) for d in destinations])
+
+    def _plan(k: int) -> tuple[list[dict[str, Any]], bool]:
+        days = _chain_days(xy, origin_xy, _kmeans(xy, k), visit_min)
+        return days, max(d['estimated_minutes'] for d in days) <= day_budget_minutes
+
+    # Smallest k that fits: doubling probe, then bisection (O(log k) k-means runs)
+    n = len(destinations)
+    k_max = n if max_days is None else max(1, min(max_days, n))
+    lo = min(k_max, max(1, math.ceil(visit_min.sum() / day_budget_minutes)))
+    days, fits = _plan(lo)
+    if fits or lo == k_max:
+        return days
+    hi = lo
+    while not fits and hi < k_max:
+        lo, hi = hi, min(k_max, hi * 2)
+        days, fits = _plan(hi)
+    if not fits:
+        return days
+    while hi - lo > 1:
+        mid = (lo + hi) // 2
+        mid_days, mid_fits = _plan(mid)
+        if mid_fits:
+            hi, days = mid, mid_days
+        else:
+            lo = mid
+    return days
+
+
+# ---------------------------------------------------------------------------
+# Public API
+# ---------------------------------------------------------------------------
+
+def _day_departure(day: int, now: float) -> float:
+    """Departure time of ``day`` (0-based): now, then the configured start
+    hour on each following day, in Sri Lanka time whatever the server's
+    timezone."""
+    if day == 0:
+        return now
+    first = datetime.fromtimestamp(now, tz=_SRI_LANKA_TZ)
+    return (first + timedelta(days=day)).replace(
+        hour=_DAY_START_HOUR, minute=0, second=0, microsecond=0
+    ).timestamp()
+
+
+async def plan_trip_days_async(
+    origin: dict[str, Any],
+    destinations: list[dict[str, Any]],
+    day_budget_minutes: Optional[float] = None,
+    max_days: Optional[int] = None,
+    polyline_format: str = 'points',
+    polyline_tolerance_m: Optional[float] = None,
+    polyline_zoom: Optional[float] = None,
+) -> dict[str, Any]:
+    """Partition ``destinations`` into days and route every day concurrently.
+
+    Returns the /route/optimize response shape with the stops of all days in
+    ``optimized_stops`` and summed totals; polylines, weather and solver
+    stats are per day in ``days`` (top-level polyline fields are empty):
+
+      'days': [{'day', 'start', 'optimized_stops', polyline fields,
+                'total_distance_km', 'total_duration_min', 'visit_minutes',
+                'day_minutes', 'estimated_minutes', 'over_budget',
+                'weather_info', 'optimization_method', 'route_improvement',
+                'stage_timings_ms'}, ...]
+    """
+    budget = float(day_budget_minutes or _DAY_BUDGET_MIN)
+    started = time.perf_counter()
+    now = time.time()
+
+    partition = await asyncio.to_thread(_partition_days, origin, destinations, budget, max_days)
+    partition_ms = round((time.perf_counter() - started) * 1000.0, 1)
+
+    semaphore = asyncio.Semaphore(max(1, _DAY_CONCURRENCY))
+
+    async def _route_day(d: int, day: dict[str, Any]) -> dict[str, Any]:
+        stops = [destinations[i] for i in day['stops']]
+        start = origin if day['start'] is None else destinations[day['start']]
+        end_at = day['stops'].index(day['end']) if day['end'] is not None else None
+        async with semaphore:
+            return await optimize_route_async(
+                start,
+                stops,
+                polyline_format=polyline_format,
+                polyline_tolerance_m=polyline_tolerance_m,
+                polyline_zoom=polyline_zoom,
+                end_at=end_at,
+                depart_ts=_day_departure(d, now),
+            )
+
+    days_start = time.perf_counter()
+    routed = await asyncio.gather(*(_route_day(d, day) for d, day in enumerate(partition)))
+    days_ms = round((time.perf_counter() - days_start) * 1000.0, 1)
+
+    days: list[dict[str, Any]] = []
+    for d, (day, result) in enumerate(zip(partition, routed)):
+        visit = sum(_visit_minutes(s) for s in result['optimized_stops'])
+        day_minutes = result['total_duration_min'] + visit
+        start = origin if day['start'] is None else destinations[day['start']]
+        days.append({
+            'day': d + 1,
+            'start': start,
+            **{k: v for k, v in result.items() if k != 'cache'},
+            'visit_minutes': round(visit, 1),
+            'day_minutes': round(day_minutes, 1),
+            'estimated_minutes': round(day['estimated_minutes'], 1),
+            'over_budget': day_minutes > budget,
+        })
+
+    return {
+        'optimized_stops': [s for day in days for s in day['optimized_stops']],
+        'polyline_points': [],
+        'polyline_encoded': None,
+        'polyline_flat': None,
+        'total_distance_km': round(sum(day['total_distance_km'] for day in days), 2),
+        'total_duration_min': round(sum(day['total_duration_min'] for day in days), 1),
+        'weather_info': [w for day in days for w in day['weather_info']],
+        'optimization_method': f'multi_day+{len(days)}_days',
+        'route_improvement': None,
+        'stage_timings_ms': {
+            'partition': partition_ms,
+            'days': days_ms,
+            'total': round((time.perf_counter() - started) * 1000.0, 1),
+        },
+        'cache': None,
+        'days': days,
+    }
@@ -0,0 +1,82 @@
+"""
+geo.py
+======
+Shared great-circle distance kernel.
+
+  • haversine_km        scalar, for one-off pairs
+  • haversine_np        NumPy broadcasting version of the same formula
+  • distance_vector_km  one point → many points, shape (N,)
+  • distance_matrix_km  many → many, shape (N, M) (or (N, N) when b is omitted)
+  • unit_vectors        3-D unit vectors, for KD-tree nearest-neighbour queries
+
+The array functions replace per-pair Python loops in the recommenders, the
+route optimizer and the playlist leg distances with a single vectorised call.
+Coordinates are degrees; NaN coordinates yield NaN distances.
+"""
+
+from __future__ import annotations
+
+import math
+from typing import Optional
+
+import numpy as np
+
+EARTH_RADIUS_KM = 6371.0
+
+
+def haversine_km(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    """Great-circle distance in km between two points."""
+    p1, p2 = math.radians(lat1), math.radians(lat2)
+    dp = math.radians(lat2 - lat1)
+    dl = math.radians(lon2 - lon1)
+    a = math.sin(dp / 2) ** 2 + math.cos(p1) * math.cos(p2) * math.sin(dl / 2) ** 2
+    return EARTH_RADIUS_KM * 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
+
+
+def haversine_np(lat1, lon1, lat2, lon2) -> np.ndarray:
+    """Great-circle distance in km with NumPy broadcasting over all arguments."""
+    lat1 = np.radians(np.asarray(lat1, dtype=np.float64))
+    lon1 = np.radians(np.asarray(lon1, dtype=np.float64))
+    lat2 = np.radians(np.asarray(lat2, dtype=np.float64))
+    lon2 = np.radians(np.asarray(lon2, dtype=np.float64))
+    a = (
+        np.sin((lat2 - lat1) / 2) ** 2
+        + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    )
+    a = np.clip(a, 0.0, 1.0)
+    return EARTH_RADIUS_KM * 2 * np.arctan2(np.sqrt(a), np.sqrt(1 - a))
+
+
+def distance_vector_km(lat: float, lon: float, lats, lons) -> np.ndarray:
+    """Distance from one point to each of many points, shape (N,)."""
+    return haversine_np(lat, lon, lats, lons)
+
+
+def distance_matrix_km(
+    lats_a,
+    lons_a,
+    lats_b: Optional[np.ndarray] = None,
+    lons_b: Optional[np.ndarray] = None,
+) -> np.ndarray:
+    """Pairwise distances between point sets a and b, shape (len(a), len(b)).
+
+    With b omitted, returns the symmetric all-pairs matrix of a.
+    """
+    lats_a = np.asarray(lats_a, dtype=np.float64)
+    lons_a = np.asarray(lons_a, dtype=np.float64)
+    if lats_b is None or lons_b is None:
+        lats_b, lons_b = lats_a, lons_a
+    lats_b = np.asarray(lats_b, dtype=np.float64)
+    lons_b = np.asarray(lons_b, dtype=np.float64)
+    return haversine_np(lats_a[:, None], lons_a[:, None], lats_b[None, :], lons_b[None, :])
+
+
+def unit_vectors(lats, lons) -> np.ndarray:
+    """Points on the unit sphere, shape (N, 3); chord order == great-circle order."""
+    lat_r = np.radians(np.asarray(lats, dtype=np.float64))
+    lon_r = np.radians(np.asarray(lons, dtype=np.float64))
+    return np.column_stack((
+        np.cos(lat_r) * np.cos(lon_r),
+        np.cos(lat_r) * np.sin(lon_r),
+        np.sin(lat_r),
+    ))
@@ -6,6 +6,8 @@ from typing import Any
 
 import httpx
 
+from .outbound_guard import outbound_guard
+
 logger = logging.getLogger(__name__)
 
 GOOGLE_IMAGE_HEADERS = {
@@ -112,8 +114,10 @@ def _resolve_via_google_places_api(google_url: str, api_key: str, timeout_second
             if search_input.startswith('ChIJ'):
                 place_id = search_input
             else:
-                find_resp = client.get(
+                find_resp = outbound_guard.get(
                     'https://maps.googleapis.com/maps/api/place/findplacefromtext/json',
+                    client=client,
+                    timeout=timeout_seconds,
                     params={
                         'input': search_input,
                         'inputtype': 'textquery',
@@ -132,8 +136,10 @@ def _resolve_via_google_places_api(google_url: str, api_key: str, timeout_second
                 return None
 
             # Step 2: Get photo_reference from Place Details
-            details_resp = client.get(
+            details_resp = outbound_guard.get(
                 'https://maps.googleapis.com/maps/api/place/details/json',
+                client=client,
+                timeout=timeout_seconds,
                 params={
                     'place_id': place_id,
                     'fields': 'photos',
@@ -197,7 +203,7 @@ def resolve_photo_url_from_google_url(
             follow_redirects=True,
             headers=GOOGLE_IMAGE_HEADERS,
         ) as client:
-            response = client.get(normalized_url)
+            response = outbound_guard.get(normalized_url, client=client, timeout=timeout_seconds)
             response.raise_for_status()
 
             content_type = response.headers.get('content-type', '').lower()
@@ -3,6 +3,7 @@ import os
 import httpx
 
 from ..schemas.google_places import GooglePlacesSearchRequest
+from .outbound_guard import outbound_guard
 from .place_taxonomy import infer_taxonomy
 
 
@@ -51,8 +52,10 @@ class GooglePlacesService:
             }
 
         with httpx.Client(timeout=15.0) as client:
-            response = client.post(
+            response = outbound_guard.post(
                 f'{self.base_url}/places:searchText',
+                client=client,
+                timeout=15.0,
                 headers=headers,
                 json=payload,
             )
@@ -102,8 +105,10 @@ class GooglePlacesService:
             ),
         }
         with httpx.Client(timeout=15.0) as client:
-            response = client.get(
+            response = outbound_guard.get(
                 f'{self.base_url}/places/{place_id}',
+                client=client,
+                timeout=15.0,
                 headers=headers,
             )
             response.raise_for_status()
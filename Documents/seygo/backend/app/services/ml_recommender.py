@@ -43,6 +43,8 @@ from sklearn.feature_extraction.text import TfidfVectorizer
 from sklearn.metrics.pairwise import cosine_similarity
 from sklearn.preprocessing import MinMaxScaler
 
+from .geo import distance_vector_km
+
 logger = logging.getLogger(__name__)
 
 # ---------------------------------------------------------------------------
@@ -155,15 +157,6 @@ class _ModelArtifacts:
 # Helpers
 # ---------------------------------------------------------------------------
 
-def _haversine_km(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
-    r = 6371.0
-    phi1, phi2 = math.radians(lat1), math.radians(lat2)
-    dphi = math.radians(lat2 - lat1)
-    dlam = math.radians(lon2 - lon1)
-    a = math.sin(dphi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlam / 2) ** 2
-    return r * 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
-
-
 def _safe_float(value, default: float = 0.0) -> float:
     if isinstance(value, (int, float)):
         return float(value)
@@ -595,10 +588,13 @@ class MLRecommender:
         candidates = list(places)
 
         if radius_km is not None and latitude is not None and longitude is not None:
-            candidates = [
-                p for p in candidates
-                if _haversine_km(latitude, longitude, p.latitude, p.longitude) <= radius_km
-            ]
+            within = distance_vector_km(
+                latitude,
+                longitude,
+                [p.latitude for p in candidates],
+                [p.longitude for p in candidates],
+            ) <= radius_km
+            candidates = [p for p, keep in zip(candidates, within) if keep]
 
         if preferred_categories:
             norm = {c.lower().strip() for c in preferred_categories}
@@ -677,10 +673,14 @@ class MLRecommender:
         dist_scores = np.zeros(n, dtype=float)
         dist_km_values: list[Optional[float]] = [None] * n
         if latitude is not None and longitude is not None:
-            for ci, p in enumerate(candidates):
-                d = _haversine_km(latitude, longitude, p.latitude, p.longitude)
-                dist_km_values[ci] = round(d, 2)
-                dist_scores[ci] = math.exp(-0.5 * (d / _DISTANCE_SIGMA_KM) ** 2)
+            d = distance_vector_km(
+                latitude,
+                longitude,
+                [p.latitude for p in candidates],
+                [p.longitude for p in candidates],
+            )
+            dist_km_values = np.round(d, 2).tolist()
+            dist_scores = np.exp(-0.5 * (d / _DISTANCE_SIGMA_KM) ** 2)
 
         # ------------------------------------------------------------------
         # 6. Dynamic weight adjustment
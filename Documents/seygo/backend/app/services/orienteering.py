@@ -0,0 +1,358 @@
+"""
+orienteering.py
+===============
+"What can I see in 6 hours from Kandy?" — pick and order the best subset of
+candidate places that fits a time window (the orienteering problem).
+
+Each candidate carries a ``score`` (recommender score; falls back to
+``rating``) and optionally ``visit_duration_minutes``.  The route may be
+open (ends at the last stop) or return to the start.
+
+  • Prefilter  candidates that cannot be reached (and left) within the budget
+               even at ORIENTEERING_PREFILTER_SPEED_KMH straight-line are
+               dropped before anything is priced
+  • Matrix     the offline road graph when one is loaded; otherwise leg
+               cache + place graph + at most ORIENTEERING_MAX_MATRIX_BLOCKS
+               (default 4, one concurrent wave) Distance Matrix requests
+               over the sparse candidate pairs, detour-scaled haversine for
+               everything else — a few hundred candidates must not cost a
+               few hundred Google round trips
+  • Construct  vectorised cheapest-ratio insertion: every unvisited candidate ×
+               every route position per step, best score / added minutes
+  • Improve    until no move helps or ORIENTEERING_SEARCH_BUDGET_MS (default
+               150 ms) runs out: 2-opt / Or-opt to shorten the route, re-insert
+               into the freed time, then swap a visited stop for a
+               higher-scoring unvisited one that still fits
+"""
+
+from __future__ import annotations
+
+import asyncio
+import os
+import time
+from typing import Any, Optional
+
+import httpx
+import numpy as np
+
+from . import route_optimizer as ro
+from .geo import distance_vector_km
+from .place_graph import PlaceGraph, get_place_graph
+from .road_graph import RoadGraph, get_road_graph
+
+_SEARCH_BUDGET_MS = float(os.getenv('ORIENTEERING_SEARCH_BUDGET_MS', '150'))
+_PREFILTER_SPEED_KMH = float(os.getenv('ORIENTEERING_PREFILTER_SPEED_KMH', '80'))
+_MAX_MATRIX_BLOCKS = int(os.getenv('ORIENTEERING_MAX_MATRIX_BLOCKS', '4'))
+# Slack for float noise when comparing route minutes with the budget
+_BUDGET_EPS = 1e-6
+
+
+def _candidate_value(place: dict[str, Any]) -> float:
+    raw = place.get('score')
+    if raw is None:
+        raw = place.get('rating')
+    try:
+        return max(float(raw or 0.0), 0.0)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+# ---------------------------------------------------------------------------
+# Solver (pure NumPy; node 0 is the start)
+# ---------------------------------------------------------------------------
+
+def _route_minutes(travel: np.ndarray, visit: np.ndarray, path: list[int], closed: bool) -> float:
+    p = np.asarray(path)
+    minutes = travel[p[:-1], p[1:]].sum() + visit[p[1:]].sum()
+    if closed and len(p) > 1:
+        minutes += travel[p[-1], 0]
+    return float(minutes)
+
+
+def _insertion_deltas(
+    travel: np.ndarray,
+    visit: np.ndarray,
+    path: list[int],
+    cands: np.ndarray,
+    closed: bool,
+) -> np.ndarray:
+    """Added minutes for inserting each candidate after each path position,
+    shape (len(path), len(cands))."""
+    after = np.asarray(path)
+    before = path[1:] + ([0] if closed else [])
+    delta = travel[np.ix_(after, cands)] + visit[cands][None, :]
+    if before:
+        m = len(before)
+        delta[:m] += travel[np.ix_(cands, before)].T - travel[after[:m], before][:, None]
+    return delta
+
+
+def _insert_greedy(
+    travel: np.ndarray,
+    visit: np.ndarray,
+    value: np.ndarray,
+    path: list[int],
+    used: np.ndarray,
+    budget: float,
+    closed: bool,
+) -> int:
+    """Insert candidates by best value per added minute while they fit;
+    mutates ``path`` / ``used`` and returns the number inserted."""
+    minutes = _route_minutes(travel, visit, path, closed)
+    inserted = 0
+    while True:
+        cands = np.flatnonzero(~used & (value > 0))
+        if not len(cands):
+            return inserted
+        delta = _insertion_deltas(travel, visit, path, cands, closed)
+        delta[minutes + delta > budget + _BUDGET_EPS] = np.inf
+        pos = delta.argmin(axis=0)
+        added = delta[pos, np.arange(len(cands))]
+        ratio = np.where(np.isfinite(added), value[cands] / np.maximum(added, 1e-3), -np.inf)
+        j = int(ratio.argmax())
+        if not np.isfinite(ratio[j]):
+            return inserted
+        path.insert(int(pos[j]) + 1, int(cands[j]))
+        used[cands[j]] = True
+        minutes += float(added[j])
+        inserted += 1
+
+
+def _tighten(travel: np.ndarray, path: list[int], closed: bool, budget_ms: float) -> tuple[list[int], int]:
+    """Shorten the route with route_optimizer's 2-opt / Or-opt.  A closed
+    route gets a copy of the start as a forced final stop."""
+    nodes = list(path)
+    if len(nodes) < 4:
+        return path, 0
+    sub = travel[np.ix_(nodes, nodes)]
+    if closed:
+        m = len(nodes)
+        ext = np.zeros((m + 1, m + 1))
+        ext[:m, :m] = sub
+        ext[:m, m] = travel[nodes, 0]
+        ext[m, :m] = ro._FIXED_END_PENALTY
+        sub = ext
+    order, stats = ro._improve_order(sub, list(range(sub.shape[0] - 1)), budget_ms)
+    return [nodes[0]] + [nodes[i + 1] for i in order if i + 1 < len(nodes)], stats['moves']
+
+
+def _best_swap(
+    travel: np.ndarray,
+    visit: np.ndarray,
+    value: np.ndarray,
+    path: list[int],
+    used: np.ndarray,
+    budget: float,
+    closed: bool,
+) -> Optional[tuple[int, int, int]]:
+    """(position to remove, unvisited candidate, node to insert after) that
+    raises the total score most while fitting the budget, or None."""
+    cands = np.flatnonzero(~used & (value > 0))
+    if len(path) < 2 or not len(cands):
+        return None
+    minutes = _route_minutes(travel, visit, path, closed)
+    arr = np.asarray(path)
+    ks = np.arange(1, len(path))
+    prev, node = arr[ks - 1], arr[ks]
+    saving = travel[prev, node] + visit[node]
+    nxt_idx = ks + 1
+    has_next = nxt_idx < len(path)
+    nxt = np.where(has_next, arr[np.minimum(nxt_idx, len(path) - 1)], 0)
+    if closed:
+        has_next[:] = True
+    saving = saving + np.where(has_next, travel[node, nxt] - travel[prev, nxt], 0.0)
+
+    # Best three insertion rows per candidate; rows next to the removed stop are invalid
+    delta = _insertion_deltas(travel, visit, path, cands, closed)
+    top = min(3, delta.shape[0])
+    rows = np.argsort(delta, axis=0)[:top]                              # (top, C)
+    vals = np.take_along_axis(delta, rows, axis=0)
+    bad = (rows[None] == (ks - 1)[:, None, None]) | (rows[None] == ks[:, None, None])
+    masked = np.where(bad, np.inf, vals[None])                          # (K, top, C)
+    pick = masked.argmin(axis=1)                                        # (K, C)
+    best_val = np.take_along_axis(masked, pick[:, None, :], axis=1)[:, 0, :]
+    best_row = rows[pick, np.arange(len(cands))[None, :]]
+
+    fits = minutes - saving[:, None] + best_val <= budget + _BUDGET_EPS
+    gain = np.where(fits, value[cands][None, :] - value[node][:, None], -np.inf)
+    k, c = np.unravel_index(int(gain.argmax()), gain.shape)
+    if gain[k, c] <= _BUDGET_EPS:
+        return None
+    return int(ks[k]), int(cands[c]), int(arr[best_row[k, c]])
+
+
+def _solve_orienteering(
+    travel: np.ndarray,
+    visit: np.ndarray,
+    value: np.ndarray,
+    budget: float,
+    closed: bool = False,
+    budget_ms: Optional[float] = None,
+) -> tuple[list[int], dict[str, Any]]:
+    """Best-scoring route from node 0 within ``budget`` minutes of travel +
+    visits.  Returns (visited nodes in order, excluding 0, stats)."""
+    if budget_ms is None:
+        budget_ms = _SEARCH_BUDGET_MS
+    start = time.perf_counter()
+    deadline = start + budget_ms / 1000.0
+    path = [0]
+    used = np.zeros(len(value), dtype=bool)
+    used[0] = True
+    _insert_greedy(travel, visit, value, path, used, budget, closed)
+    constructed = float(value[path].sum())
+
+    rounds = moves = swaps = 0
+    while time.perf_counter() < deadline:
+        rounds += 1
+        remaining_ms = max(1.0, (deadline - time.perf_counter()) * 1000.0)
+        path, tightened = _tighten(travel, path, closed, remaining_ms / 2)
+        moves += tightened
+        improved = _insert_greedy(travel, visit, value, path, used, budget, closed) > 0
+        swap = _best_swap(travel, visit, value, path, used, budget, closed)
+        if swap is not None:
+            k, cand, after = swap
+            used[path.pop(k)] = False
+            path.insert(path.index(after) + 1, cand)
+            used[cand] = True
+            swaps += 1
+            improved = True
+        if not improved:
+            break
+
+    return path[1:], {
+        'constructed_score': round(constructed, 3),
+        'final_score': round(float(value[path].sum()), 3),
+        'rounds': rounds,
+        'moves': moves,
+        'swaps': swaps,
+        'elapsed_ms': round((time.perf_counter() - start) * 1000.0, 2),
+    }
+
+
+# ---------------------------------------------------------------------------
+# Public API
+# ---------------------------------------------------------------------------
+
+def _reachable(
+    start: dict[str, Any],
+    candidates: list[dict[str, Any]],
+    budget_minutes: float,
+    closed: bool,
+) -> list[int]:
+    """Indices of candidates that could fit the budget on their own."""
+    km = distance_vector_km(
+        float(start['latitude']), float(start['longitude']),
+        [float(c['latitude']) for c in candidates],
+        [float(c['longitude']) for c in candidates],
+    )
+    minutes = km / _PREFILTER_SPEED_KMH * 60.0 * (2.0 if closed else 1.0)
+    minutes += np.array([ro._visit_minutes(c) for c in candidates])
+    values = np.array([_candidate_value(c) for c in candidates])
+    return np.flatnonzero((minutes <= budget_minutes) & (values > 0)).tolist()
+
+
+async def _price_candidates(
+    locations: list[dict[str, Any]],
+    api_key: str,
+) -> tuple[list[list[dict]], str]:
+    """(travel matrix, source) for start + reachable candidates; the matrix
+    is [] when nothing could be priced (the caller then uses haversine)."""
+    if ro._ROAD_GRAPH_MODE in ('primary', 'fallback'):
+        road: Optional[RoadGraph] = await asyncio.to_thread(get_road_graph)
+        if road is not None:
+            matrix = await asyncio.to_thread(ro._road_graph_matrix, road, locations)
+            if matrix:
+                return matrix, 'road_graph'
+    places: Optional[PlaceGraph] = await asyncio.to_thread(get_place_graph)
+    if not (api_key or places is not None):
+        return [], 'haversine_estimate'
+    neighbours = None
+    if len(locations) - 1 > ro._SPARSE_MIN_STOPS:
+        neighbours = ro._candidate_neighbours(ro._haversine_matrix_km(locations), ro._SPARSE_K)
+    async with httpx.AsyncClient(follow_redirects=True, timeout=20.0) as client:
+        matrix = await ro._build_distance_matrix(
+            locations, api_key, client, time.time(), neighbours, places, max_blocks=_MAX_MATRIX_BLOCKS,
+        )
+    return matrix, ('travel_matrix' if matrix else 'haversine_estimate')
+
+
+def _travel_minutes(locations: list[dict[str, Any]], matrix: list[list[dict]]) -> np.ndarray:
+    if matrix:
+        return np.array(
+            [[cell['duration_sec'] for cell in row] for row in matrix], dtype=np.float64
+        ) / 60.0
+    km = ro._haversine_matrix_km(locations)
+    return km * ro._SPARSE_DETOUR_FACTOR / ro._FALLBACK_SPEED_KMH * 60.0
+
+
+async def plan_orienteering_async(
+    start: dict[str, Any],
+    candidates: list[dict[str, Any]],
+    budget_minutes: float,
+    return_to_start: bool = False,
+) -> dict[str, Any]:
+    """Choose and order candidates to maximise total score within
+    ``budget_minutes`` of driving + ``visit_duration_minutes``.
+
+    Returns
+    -------
+    {
+      'stops':               chosen candidate dicts in visit order, each with
+                             'arrival_min' (minutes after departure),
+      'total_score':         float,
+      'total_minutes':       travel + visit minutes (incl. return leg),
+      'travel_minutes':      float,
+      'visit_minutes':       float,
+      'budget_minutes':      float,
+      'return_to_start':     bool,
+      'candidates':          {'total', 'reachable'},
+      'travel_source':       'road_graph' | 'travel_matrix' | 'haversine_estimate',
+      'search':              solver stats,
+      'stage_timings_ms':    {'matrix', 'solve', 'total'},
+    }
+    """
+    started = time.perf_counter()
+    timings: dict[str, float] = {}
+    api_key = os.getenv('GOOGLE_MAPS_API_KEY', '').strip()
+    reachable = _reachable(start, candidates, budget_minutes, return_to_start)
+    locations = [start] + [candidates[i] for i in reachable]
+
+    matrix: list[list[dict]] = []
+    source = 'haversine_estimate'
+    if reachable:
+        matrix, source = await _price_candidates(locations, api_key)
+    timings['matrix'] = round((time.perf_counter() - started) * 1000.0, 1)
+
+    travel = _travel_minutes(locations, matrix)
+    visit = np.array([0.0] + [ro._visit_minutes(c) for c in locations[1:]])
+    value = np.array([0.0] + [_candidate_value(c) for c in locations[1:]])
+    solve_start = time.perf_counter()
+    order, search = await asyncio.to_thread(
+        _solve_orienteering, travel, visit, value, float(budget_minutes), return_to_start
+    )
+    timings['solve'] = round((time.perf_counter() - solve_start) * 1000.0, 1)
+
+    path = [0] + order
+    stops: list[dict[str, Any]] = []
+    elapsed = 0.0
+    for a, b in zip(path, path[1:]):
+        elapsed += float(travel[a, b])
+        stops.append({**locations[b], 'arrival_min': round(elapsed, 1)})
+        elapsed += float(visit[b])
+    visit_total = float(visit[path].sum())
+    total = _route_minutes(travel, visit, path, return_to_start) if order else 0.0
+    timings['total'] = round((time.perf_counter() - started) * 1000.0, 1)
+
+    return {
+        'stops': stops,
+        'total_score': round(float(value[path].sum()), 3),
+        'total_minutes': round(total, 1),
+        'travel_minutes': round(total - visit_total, 1),
+        'visit_minutes': round(visit_total, 1),
+        'budget_minutes': float(budget_minutes),
+        'return_to_start': return_to_start,
+        'candidates': {'total': len(candidates), 'reachable': len(reachable)},
+        'travel_source': source,
+        'search': search,
+        'stage_timings_ms': timings,
+    }
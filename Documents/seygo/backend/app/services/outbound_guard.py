@@ -0,0 +1,303 @@
+"""
+outbound_guard.py
+=================
+Per-host circuit breakers and adaptive timeouts for outbound HTTP calls
+(Google Maps / Places, Open-Meteo, Nominatim, photo pages).
+
+When an upstream is degraded every call used to wait out its full 8–15 s
+timeout before the caller's fallback ran.  All outbound requests now go
+through ``outbound_guard``, which keeps one breaker per host:
+
+  • closed     calls pass; OUTBOUND_BREAKER_FAILURES (default 5) consecutive
+               failures (transport error, timeout, HTTP 429 / 5xx) trip it
+  • open       calls fail immediately with CircuitOpenError for
+               OUTBOUND_BREAKER_OPEN_S (default 30 s)
+  • half-open  one probe call is let through with the caller's full
+               timeout; success closes the breaker, failure re-opens it
+
+  • Timeout    latencies are kept per host + path (Distance Matrix and
+               Directions share a host but not a latency profile); once
+               OUTBOUND_MIN_SAMPLES (default 20) are known for a path, its
+               per-call timeout becomes OUTBOUND_TIMEOUT_FACTOR ×
+               p(OUTBOUND_TIMEOUT_PERCENTILE) of the last
+               OUTBOUND_LATENCY_WINDOW calls, clamped to
+               [OUTBOUND_TIMEOUT_MIN_S, the caller's timeout].  A call that
+               times out is recorded at the timeout it was given, so a slow
+               upstream widens the timeout instead of being invisible to it
+  • Metrics    state, trips, failures and per-path latency percentiles via
+               ``stats()``
+
+CircuitOpenError subclasses ``httpx.TransportError`` so every existing
+``except httpx.HTTPError`` / ``except Exception`` fallback handles it unchanged.
+"""
+
+from __future__ import annotations
+
+import math
+import os
+import threading
+import time
+from collections import deque
+from typing import Any, Optional
+
+import httpx
+
+_FAILURE_THRESHOLD = int(os.getenv('OUTBOUND_BREAKER_FAILURES', '5'))
+_OPEN_S = float(os.getenv('OUTBOUND_BREAKER_OPEN_S', '30'))
+_LATENCY_WINDOW = int(os.getenv('OUTBOUND_LATENCY_WINDOW', '200'))
+_MIN_SAMPLES = int(os.getenv('OUTBOUND_MIN_SAMPLES', '20'))
+_TIMEOUT_PERCENTILE = float(os.getenv('OUTBOUND_TIMEOUT_PERCENTILE', '99'))
+_TIMEOUT_FACTOR = float(os.getenv('OUTBOUND_TIMEOUT_FACTOR', '3'))
+_TIMEOUT_MIN_S = float(os.getenv('OUTBOUND_TIMEOUT_MIN_S', '1.0'))
+# Used when a caller passes no timeout of its own
+_DEFAULT_TIMEOUT_S = 10.0
+
+CLOSED, OPEN, HALF_OPEN = 'closed', 'open', 'half_open'
+
+
+class CircuitOpenError(httpx.TransportError):
+    """Raised without any network I/O while a host's breaker is open."""
+
+
+def _is_failure_status(status_code: int) -> bool:
+    return status_code == 429 or status_code >= 500
+
+
+class HostCircuit:
+    """Breaker state and recent latencies for one upstream host."""
+
+    def __init__(
+        self,
+        host: str,
+        failure_threshold: int = _FAILURE_THRESHOLD,
+        open_s: float = _OPEN_S,
+        latency_window: int = _LATENCY_WINDOW,
+        min_samples: int = _MIN_SAMPLES,
+    ) -> None:
+        self.host = host
+        self._failure_threshold = max(1, failure_threshold)
+        self._open_s = open_s
+        self._min_samples = min_samples
+        self._latency_window = latency_window
+        self._latencies: dict[str, deque[float]] = {}
+        self._lock = threading.Lock()
+        self.state = CLOSED
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self.consecutive_failures = 0
+        self.trips = 0
+        self.failures = 0
+        self.successes = 0
+        self.short_circuits = 0
+
+    # -- breaker --------------------------------------------------------------
+
+    def acquire(self) -> bool:
+        """Admit a call or raise CircuitOpenError; True when the call is the
+        half-open probe."""
+        with self._lock:
+            if self.state == OPEN and time.monotonic() - self._opened_at >= self._open_s:
+                self.state = HALF_OPEN
+                self._probe_in_flight = False
+            if self.state == CLOSED:
+                return False
+            if self.state == HALF_OPEN and not self._probe_in_flight:
+                self._probe_in_flight = True
+                return True
+            self.short_circuits += 1
+        raise CircuitOpenError(f'circuit open for {self.host}')
+
+    def release(self) -> None:
+        """End an admitted call that neither succeeded nor failed upstream."""
+        with self._lock:
+            self._probe_in_flight = False
+
+    def _record_latency(self, path: str, latency_s: float) -> None:
+        samples = self._latencies.get(path)
+        if samples is None:
+            samples = self._latencies[path] = deque(maxlen=self._latency_window)
+        samples.append(latency_s)
+
+    def record_success(self, latency_s: float, path: str = '') -> None:
+        with self._lock:
+            self._record_latency(path, latency_s)
+            self.successes += 1
+            self.consecutive_failures = 0
+            self._probe_in_flight = False
+            self.state = CLOSED
+
+    def record_timeout(self, timeout_s: float, path: str = '') -> None:
+        """A call that ran into its ``timeout_s``: a failure and a latency
+        sample of at least that long."""
+        with self._lock:
+            self._record_latency(path, timeout_s)
+        self.record_failure()
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.failures += 1
+            self.consecutive_failures += 1
+            self._probe_in_flight = False
+            if self.state == HALF_OPEN or (
+                self.state == CLOSED and self.consecutive_failures >= self._failure_threshold
+            ):
+                self.state = OPEN
+                self._opened_at = time.monotonic()
+                self.trips += 1
+
+    # -- timeouts -------------------------------------------------------------
+
+    @staticmethod
+    def _percentile(samples: deque[float], q: float) -> Optional[float]:
+        if not samples:
+            return None
+        ordered = sorted(samples)
+        return ordered[min(len(ordered) - 1, math.ceil(q / 100 * len(ordered)) - 1)]
+
+    def timeout(self, ceiling_s: float, path: str = '') -> float:
+        """Per-call timeout for ``path``: adaptive once enough latencies are known."""
+        with self._lock:
+            samples = self._latencies.get(path, ())
+            if len(samples) < self._min_samples:
+                return ceiling_s
+            p = self._percentile(samples, _TIMEOUT_PERCENTILE)
+        return min(ceiling_s, max(_TIMEOUT_MIN_S, _TIMEOUT_FACTOR * p))
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            paths = {}
+            for path, samples in self._latencies.items():
+                p50 = self._percentile(samples, 50)
+                p95 = self._percentile(samples, 95)
+                paths[path or '/'] = {
+                    'latency_samples': len(samples),
+                    'p50_ms': round(p50 * 1000, 1) if p50 is not None else None,
+                    'p95_ms': round(p95 * 1000, 1) if p95 is not None else None,
+                }
+            return {
+                'state': self.state,
+                'trips': self.trips,
+                'failures': self.failures,
+                'successes': self.successes,
+                'short_circuits': self.short_circuits,
+                'consecutive_failures': self.consecutive_failures,
+                'paths': paths,
+            }
+
+
+class OutboundGuard:
+    """Registry of HostCircuits plus guarded sync and async request helpers.
+
+    ``client`` may be an ``httpx.Client`` (sync helpers), an
+    ``httpx.AsyncClient`` (async helpers) or omitted for a one-off
+    ``httpx.request``.  ``timeout`` is the caller's ceiling in seconds.
+    ``circuit_options`` are passed to every HostCircuit it creates.
+    """
+
+    def __init__(self, **circuit_options: Any) -> None:
+        self._circuit_options = circuit_options
+        self._circuits: dict[str, HostCircuit] = {}
+        self._lock = threading.Lock()
+
+    def circuit(self, url: str) -> HostCircuit:
+        host = httpx.URL(url).host or url
+        with self._lock:
+            circuit = self._circuits.get(host)
+            if circuit is None:
+                circuit = self._circuits[host] = HostCircuit(host, **self._circuit_options)
+            return circuit
+
+    @staticmethod
+    def _settle(circuit: HostCircuit, path: str, response: httpx.Response, start: float) -> httpx.Response:
+        if _is_failure_status(response.status_code):
+            circuit.record_failure()
+        else:
+            circuit.record_success(time.perf_counter() - start, path)
+        return response
+
+    @staticmethod
+    def _call_timeout(circuit: HostCircuit, path: str, ceiling_s: float, probe: bool) -> float:
+        # The half-open probe decides whether the host is back, so it gets
+        # the caller's full timeout rather than one shrunk by past latencies
+        return ceiling_s if probe else circuit.timeout(ceiling_s, path)
+
+    def request(
+        self,
+        method: str,
+        url: str,
+        *,
+        client: Optional[httpx.Client] = None,
+        timeout: float = _DEFAULT_TIMEOUT_S,
+        **kwargs: Any,
+    ) -> httpx.Response:
+        circuit = self.circuit(url)
+        path = httpx.URL(url).path
+        call_timeout = self._call_timeout(circuit, path, timeout, circuit.acquire())
+        start = time.perf_counter()
+        try:
+            sender = client.request if client is not None else httpx.request
+            response = sender(method, url, timeout=call_timeout, **kwargs)
+        except httpx.TimeoutException:
+            circuit.record_timeout(call_timeout, path)
+            raise
+        except httpx.TransportError:
+            circuit.record_failure()
+            raise
+        except BaseException:
+            circuit.release()
+            raise
+        return self._settle(circuit, path, response, start)
+
+    async def request_async(
+        self,
+        client: httpx.AsyncClient,
+        method: str,
+        url: str,
+        *,
+        timeout: float = _DEFAULT_TIMEOUT_S,
+        **kwargs: Any,
+    ) -> httpx.Response:
+        circuit = self.circuit(url)
+        path = httpx.URL(url).path
+        call_timeout = self._call_timeout(circuit, path, timeout, circuit.acquire())
+        start = time.perf_counter()
+        try:
+            response = await client.request(method, url, timeout=call_timeout, **kwargs)
+        except httpx.TimeoutException:
+            circuit.record_timeout(call_timeout, path)
+            raise
+        except httpx.TransportError:
+            circuit.record_failure()
+            raise
+        except BaseException:
+            circuit.release()
+            raise
+        return self._settle(circuit, path, response, start)
+
+    def get(self, url: str, **kwargs: Any) -> httpx.Response:
+        return self.request('GET', url, **kwargs)
+
+    def post(self, url: str, **kwargs: Any) -> httpx.Response:
+        return self.request('POST', url, **kwargs)
+
+    async def get_async(self, client: httpx.AsyncClient, url: str, **kwargs: Any) -> httpx.Response:
+        return await self.request_async(client, 'GET', url, **kwargs)
+
+    def reset(self) -> None:
+        with self._lock:
+            self._circuits.clear()
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            circuits = list(self._circuits.values())
+        hosts = {c.host: c.stats() for c in circuits}
+        return {
+            'open': sorted(h for h, s in hosts.items() if s['state'] != CLOSED),
+            'trips': sum(s['trips'] for s in hosts.values()),
+            'short_circuits': sum(s['short_circuits'] for s in hosts.values()),
+            'hosts': hosts,
+        }
+
+
+# Module-level singleton shared by all services
+outbound_guard = OutboundGuard()
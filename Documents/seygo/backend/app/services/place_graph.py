@@ -0,0 +1,362 @@
+"""
+place_graph.py
+==============
+Precomputed sparse travel-time graph over the place catalogue.
+
+Every place is linked to its PLACE_GRAPH_K (default 16) nearest neighbours
+(symmetrised) with a road travel time and distance from the offline road
+graph (road_graph.py).  Route optimization, playlist leg distances and the
+"reachable nearby" endpoint read these legs locally instead of calling the
+Google Distance Matrix API per request.
+
+  • Nodes      unique place coordinates rounded to 4 decimals (~11 m), the
+               same rounding as travel_time_cache.place_key, so lookups work
+               whatever id field a caller's place dict carries
+  • Storage    CSR arrays as separate .npy files in PLACE_GRAPH_PATH
+               (default ml_models/place_graph/), memory-mapped on load:
+                 coords.npy      (N, 2) float64  latitude, longitude
+                 indptr.npy      (N+1,) int64    row offsets
+                 indices.npy     (E,)   int32    neighbour node, sorted per row
+                 duration_s.npy  (E,)   float32  free-flow road time
+                 distance_m.npy  (E,)   float32  road distance
+                 meta.json                       k, build time, road-graph stamp,
+                                                 place ids per node
+  • Refresh    build_place_graph.py; rows whose node and neighbour set are
+               unchanged since the previous build are copied, only rows
+               touched by added / moved / removed places are re-priced.
+               Rows are only reused when the road graph is the one they were
+               priced on (its content stamp in meta.json); after a road-graph
+               rebuild every row is re-priced.
+               A running server picks up a rebuilt graph on its next lookup.
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import os
+import shutil
+import threading
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Optional
+
+import numpy as np
+from scipy.sparse import csr_matrix
+from scipy.sparse.csgraph import dijkstra
+from scipy.spatial import cKDTree
+
+from .geo import unit_vectors
+from .road_graph import RoadGraph
+from .weather_cache import geohash_encode
+
+logger = logging.getLogger(__name__)
+
+_BACKEND_DIR = Path(__file__).resolve().parent.parent.parent
+
+_GRAPH_PATH = Path(os.getenv('PLACE_GRAPH_PATH', str(_BACKEND_DIR / 'ml_models' / 'place_graph')))
+_K = int(os.getenv('PLACE_GRAPH_K', '16'))
+
+# Sources priced per road-graph many-to-many call; rows are grouped spatially
+# (geohash order) so each chunk's neighbour targets overlap
+_PRICE_CHUNK = 64
+
+_GRAPH_FORMAT_VERSION = 1
+_ARRAYS = ('coords', 'indptr', 'indices', 'duration_s', 'distance_m')
+
+
+def coord_key(lat: float, lng: float) -> str:
+    return f'{lat:.4f},{lng:.4f}'
+
+
+class PlaceGraph:
+    """CSR travel-time graph between catalogue places.
+
+    Times are seconds, distances metres.  Build with :func:`build_place_graph`,
+    persist with :meth:`save` / :meth:`load`.
+    """
+
+    def __init__(
+        self,
+        coords: np.ndarray,
+        indptr: np.ndarray,
+        indices: np.ndarray,
+        duration_s: np.ndarray,
+        distance_m: np.ndarray,
+        meta: Optional[dict[str, Any]] = None,
+    ) -> None:
+        self.coords = coords
+        self.indptr = indptr
+        self.indices = indices
+        self.duration_s = duration_s
+        self.distance_m = distance_m
+        self.meta = meta or {}
+        n = len(coords)
+        self._index = {coord_key(lat, lng): i for i, (lat, lng) in enumerate(coords.tolist())}
+        self.place_ids: list[list[str]] = self.meta.get('place_ids') or [[] for _ in range(n)]
+        self._by_place_id = {pid: i for i, ids in enumerate(self.place_ids) for pid in ids}
+        # Row-major edge keys are globally sorted (rows ascending, columns
+        # sorted within a row), so a batch of (i, j) lookups is one searchsorted
+        rows = np.repeat(np.arange(n, dtype=np.int64), np.diff(indptr))
+        self._edge_keys = rows * n + np.asarray(indices, dtype=np.int64)
+        self._csr = csr_matrix((duration_s, indices, indptr), shape=(n, n))
+
+    @property
+    def node_count(self) -> int:
+        return len(self.coords)
+
+    @property
+    def edge_count(self) -> int:
+        return len(self.indices)
+
+    # ------------------------------------------------------------------
+    # Persistence
+    # ------------------------------------------------------------------
+
+    def save(self, path: Path) -> None:
+        """Write to ``path`` (a directory), swapping it in atomically."""
+        path = Path(path)
+        tmp = path.with_name(path.name + '.tmp')
+        shutil.rmtree(tmp, ignore_errors=True)
+        tmp.mkdir(parents=True)
+        for name in _ARRAYS:
+            np.save(tmp / f'{name}.npy', np.ascontiguousarray(getattr(self, name)))
+        meta = {**self.meta, 'version': _GRAPH_FORMAT_VERSION, 'place_ids': self.place_ids}
+        (tmp / 'meta.json').write_text(json.dumps(meta), encoding='utf-8')
+        old = path.with_name(path.name + '.old')
+        shutil.rmtree(old, ignore_errors=True)
+        if path.exists():
+            path.rename(old)
+        tmp.rename(path)
+        shutil.rmtree(old, ignore_errors=True)
+
+    @classmethod
+    def load(cls, path: Path) -> 'PlaceGraph':
+        path = Path(path)
+        meta = json.loads((path / 'meta.json').read_text(encoding='utf-8'))
+        if meta.get('version') != _GRAPH_FORMAT_VERSION:
+            raise ValueError(f'Unsupported place graph version in {path}')
+        arrays = {name: np.load(path / f'{name}.npy', mmap_mode='r') for name in _ARRAYS}
+        return cls(meta=meta, **arrays)
+
+    # ------------------------------------------------------------------
+    # Queries
+    # ------------------------------------------------------------------
+
+    def nodes_of(self, lats, lngs) -> np.ndarray:
+        """Node index per coordinate, -1 for coordinates not in the catalogue."""
+        return np.array(
+            [self._index.get(coord_key(float(lat), float(lng)), -1) for lat, lng in zip(lats, lngs)],
+            dtype=np.int64,
+        )
+
+    def node_of_place_id(self, place_id: Any) -> int:
+        return self._by_place_id.get(str(place_id), -1)
+
+    def legs(self, src, dst) -> tuple[np.ndarray, np.ndarray]:
+        """(duration_s, distance_m) for node pairs src[k] → dst[k].
+
+        NaN where either node is -1 or the pair is not a stored edge;
+        0 where src == dst.
+        """
+        src = np.asarray(src, dtype=np.int64)
+        dst = np.asarray(dst, dtype=np.int64)
+        duration = np.full(len(src), np.nan)
+        distance = np.full(len(src), np.nan)
+        valid = (src >= 0) & (dst >= 0)
+        if self.edge_count:
+            keys = src * self.node_count + dst
+            pos = np.searchsorted(self._edge_keys, keys)
+            pos = np.minimum(pos, self.edge_count - 1)
+            hit = valid & (self._edge_keys[pos] == keys)
+            duration[hit] = self.duration_s[pos[hit]]
+            distance[hit] = self.distance_m[pos[hit]]
+        same = valid & (src == dst)
+        duration[same] = 0.0
+        distance[same] = 0.0
+        return duration, distance
+
+    def reachable(self, node: int, max_duration_s: float) -> tuple[np.ndarray, np.ndarray]:
+        """Nodes reachable from ``node`` within ``max_duration_s`` over the
+        neighbour graph, nearest first: (nodes, duration_s), source excluded."""
+        times = dijkstra(self._csr, directed=True, indices=node, limit=max_duration_s)
+        found = np.flatnonzero(np.isfinite(times))
+        found = found[found != node]
+        order = np.argsort(times[found], kind='stable')
+        return found[order], times[found][order]
+
+
+# ---------------------------------------------------------------------------
+# Builder
+# ---------------------------------------------------------------------------
+
+def build_place_graph(
+    lats,
+    lngs,
+    place_ids,
+    road: RoadGraph,
+    k: int = _K,
+    previous: Optional[PlaceGraph] = None,
+    road_stamp: Optional[str] = None,
+) -> tuple[PlaceGraph, dict[str, Any]]:
+    """Build the neighbour graph for the given places, re-using unchanged
+    rows of ``previous``.  Places without finite coordinates are skipped.
+
+    ``road_stamp`` identifies ``road`` (``RoadGraph.file_stamp``); rows of
+    ``previous`` are only reused when it was built with the same stamp.
+
+    Returns (graph, stats) with stats {nodes, edges, rows_reused, rows_priced,
+    elapsed_s}.
+    """
+    started = time.perf_counter()
+    index: dict[str, int] = {}
+    node_coords: list[tuple[float, float]] = []
+    node_ids: list[list[str]] = []
+    for lat, lng, pid in zip(lats, lngs, place_ids):
+        try:
+            lat, lng = float(lat), float(lng)
+        except (TypeError, ValueError):
+            continue
+        if not (np.isfinite(lat) and np.isfinite(lng)):
+            continue
+        key = coord_key(lat, lng)
+        node = index.setdefault(key, len(node_coords))
+        if node == len(node_coords):
+            node_coords.append((round(lat, 4), round(lng, 4)))
+            node_ids.append([])
+        if pid not in (None, ''):
+            node_ids[node].append(str(pid))
+    n = len(node_coords)
+    coords = np.array(node_coords, dtype=np.float64).reshape(n, 2)
+    keys = [coord_key(lat, lng) for lat, lng in node_coords]
+
+    # Symmetrised k-nearest-neighbour sets
+    neighbours: list[set[int]] = [set() for _ in range(n)]
+    if n > 1:
+        kk = min(k, n - 1)
+        _, nn = cKDTree(unit_vectors(coords[:, 0], coords[:, 1])).query(
+            unit_vectors(coords[:, 0], coords[:, 1]), k=kk + 1
+        )
+        for i, row in enumerate(nn.tolist()):
+            for j in row:
+                if j != i:
+                    neighbours[i].add(j)
+                    neighbours[j].add(i)
+    columns = [sorted(cols) for cols in neighbours]
+
+    row_duration: list[Optional[np.ndarray]] = [None] * n
+    row_distance: list[Optional[np.ndarray]] = [None] * n
+    if previous is not None and (road_stamp is None or previous.meta.get('road_graph_stamp') != road_stamp):
+        logger.info('Road graph differs from (or is not stamped like) the previous build; re-pricing every row')
+        previous = None
+    if previous is not None:
+        for i in range(n):
+            old = previous._index.get(keys[i])
+            if old is None:
+                continue
+            lo, hi = int(previous.indptr[old]), int(previous.indptr[old + 1])
+            old_keys = [
+                coord_key(*previous.coords[j].tolist()) for j in previous.indices[lo:hi].tolist()
+            ]
+            if set(old_keys) != {keys[j] for j in columns[i]}:
+                continue
+            position = {key: lo + p for p, key in enumerate(old_keys)}
+            take = np.array([position[keys[j]] for j in columns[i]], dtype=np.int64)
+            row_duration[i] = np.asarray(previous.duration_s[take], dtype=np.float64)
+            row_distance[i] = np.asarray(previous.distance_m[take], dtype=np.float64)
+
+    dirty = [i for i in range(n) if row_duration[i] is None and columns[i]]
+    dirty.sort(key=lambda i: geohash_encode(coords[i, 0], coords[i, 1], precision=6))
+    for start in range(0, len(dirty), _PRICE_CHUNK):
+        chunk = dirty[start:start + _PRICE_CHUNK]
+        targets = sorted(set().union(*(neighbours[i] for i in chunk)))
+        target_pos = {j: p for p, j in enumerate(targets)}
+        times, lengths = road.pair_matrix(
+            coords[chunk, 0], coords[chunk, 1], coords[targets, 0], coords[targets, 1]
+        )
+        for r, i in enumerate(chunk):
+            cols = [target_pos[j] for j in columns[i]]
+            row_duration[i] = times[r, cols]
+            row_distance[i] = lengths[r, cols]
+
+    # Assemble CSR, dropping pairs the road graph could not route
+    indptr = np.zeros(n + 1, dtype=np.int64)
+    idx_parts: list[np.ndarray] = []
+    dur_parts: list[np.ndarray] = []
+    dist_parts: list[np.ndarray] = []
+    for i in range(n):
+        cols = np.array(columns[i], dtype=np.int32)
+        if len(cols):
+            ok = np.isfinite(row_duration[i])
+            idx_parts.append(cols[ok])
+            dur_parts.append(row_duration[i][ok])
+            dist_parts.append(row_distance[i][ok])
+            indptr[i + 1] = indptr[i] + int(ok.sum())
+        else:
+            indptr[i + 1] = indptr[i]
+
+    def _cat(parts: list[np.ndarray], dtype) -> np.ndarray:
+        return np.concatenate(parts).astype(dtype) if parts else np.empty(0, dtype=dtype)
+
+    meta = {
+        'k': k,
+        'built_at': datetime.now(timezone.utc).isoformat(),
+        'road_graph_stamp': road_stamp,
+        'place_ids': node_ids,
+    }
+    graph = PlaceGraph(
+        coords, indptr, _cat(idx_parts, np.int32), _cat(dur_parts, np.float32), _cat(dist_parts, np.float32), meta
+    )
+    stats = {
+        'nodes': n,
+        'edges': graph.edge_count,
+        'rows_reused': sum(1 for i in range(n) if columns[i]) - len(dirty),
+        'rows_priced': len(dirty),
+        'elapsed_s': round(time.perf_counter() - started, 2),
+    }
+    return graph, stats
+
+
+# ---------------------------------------------------------------------------
+# Module-level instance
+# ---------------------------------------------------------------------------
+
+_graph: Optional[PlaceGraph] = None
+_graph_mtime: Optional[float] = None
+_graph_lock = threading.Lock()
+
+
+def get_place_graph() -> Optional[PlaceGraph]:
+    """Shared PlaceGraph, or None when none has been built.
+
+    Reloaded whenever build_place_graph.py has replaced the files since the
+    last load; a failed load keeps the previous graph.
+    """
+    global _graph, _graph_mtime
+    try:
+        mtime = (_GRAPH_PATH / 'meta.json').stat().st_mtime
+    except OSError:
+        return _graph
+    if mtime == _graph_mtime:
+        return _graph
+    with _graph_lock:
+        if mtime != _graph_mtime:
+            try:
+                _graph = PlaceGraph.load(_GRAPH_PATH)
+                logger.info('Place graph loaded: %d places, %d legs', _graph.node_count, _graph.edge_count)
+            except Exception as exc:
+                logger.warning('Place graph unavailable: %s', exc)
+            _graph_mtime = mtime
+    return _graph
+
+
+def place_graph_info() -> dict[str, Any]:
+    """Status for /health; never triggers a load."""
+    return {
+        'loaded': _graph is not None,
+        'nodes': _graph.node_count if _graph is not None else 0,
+        'edges': _graph.edge_count if _graph is not None else 0,
+        'built_at': _graph.meta.get('built_at') if _graph is not None else None,
+        'path': str(_GRAPH_PATH),
+    }
@@ -0,0 +1,207 @@
+"""
+polyline.py
+===========
+Google encoded-polyline helpers for the route optimizer.
+
+  • decode_arrays     vectorised decoder → (latitudes, longitudes) NumPy arrays
+  • decode_polyline   same, as a list of {latitude, longitude} dicts
+  • encode_polyline   arrays → encoded string (used for the haversine fallback)
+  • simplify_mask     Douglas–Peucker keep-mask for a tolerance in metres
+  • format_polyline   build the response fields for a requested polyline_format
+
+Output formats (``polyline_format`` on /route/optimize)
+-------------------------------------------------------
+  points      full list of {latitude, longitude} dicts (default, unchanged)
+  encoded     Google's encoded string passed through untouched
+  simplified  Douglas–Peucker to a tolerance in metres, or to ~1 screen pixel
+              at a map zoom level, returned as {latitude, longitude} dicts
+  flat        parallel float arrays {'latitude': [...], 'longitude': [...]}
+"""
+
+from __future__ import annotations
+
+import math
+import os
+from typing import Any, Optional
+
+import numpy as np
+
+POLYLINE_FORMATS = ('points', 'encoded', 'simplified', 'flat')
+
+# Default Douglas–Peucker tolerance when neither tolerance nor zoom is given
+_DEFAULT_TOLERANCE_M = float(os.getenv('ROUTE_POLYLINE_TOLERANCE_M', '10'))
+
+# Web-Mercator ground resolution at the equator, zoom 0 (metres / pixel)
+_METRES_PER_PIXEL_Z0 = 156543.03392
+_METRES_PER_DEG_LAT = 110_540.0
+_METRES_PER_DEG_LNG = 111_320.0
+
+
+# ---------------------------------------------------------------------------
+# Decode / encode
+# ---------------------------------------------------------------------------
+
+def decode_arrays(encoded: str) -> tuple[np.ndarray, np.ndarray]:
+    """Decode an encoded polyline into (latitudes, longitudes) float arrays.
+
+    Every character carries 5 value bits; a character below 0x20 (after the
+    -63 offset) ends a value.  Values are rebuilt with one ``reduceat`` over
+    the shifted chunks, zig-zag decoded and prefix-summed, so no per-character
+    Python loop runs.
+    """
+    if not encoded:
+        empty = np.empty(0, dtype=np.float64)
+        return empty, empty
+    chunks = np.frombuffer(encoded.encode('ascii'), dtype=np.uint8).astype(np.int64) - 63
+    ends = np.flatnonzero(chunks < 0x20)
+    # Ignore a truncated trailing value and an unpaired trailing latitude
+    n_values = len(ends) - (len(ends) % 2)
+    if n_values == 0:
+        empty = np.empty(0, dtype=np.float64)
+        return empty, empty
+    ends = ends[:n_values]
+    chunks = chunks[:ends[-1] + 1]
+    starts = np.empty(n_values, dtype=np.int64)
+    starts[0] = 0
+    starts[1:] = ends[:-1] + 1
+    # Position of each chunk inside its value → bit shift of 5 * position
+    value_id = np.repeat(np.arange(n_values), ends - starts + 1)
+    shifts = 5 * (np.arange(len(chunks)) - starts[value_id])
+    values = np.add.reduceat((chunks & 0x1F) << shifts, starts)
+    deltas = (values >> 1) ^ -(values & 1)
+    lats = np.cumsum(deltas[0::2]) / 1e5
+    lngs = np.cumsum(deltas[1::2]) / 1e5
+    return lats, lngs
+
+
+def decode_polyline(encoded: str) -> list[dict[str, float]]:
+    """Decode a Google Maps encoded polyline string into a list of
+    {latitude, longitude} dicts.
+    """
+    lats, lngs = decode_arrays(encoded)
+    return _to_points(lats, lngs)
+
+
+def encode_polyline(lats, lngs) -> str:
+    """Encode coordinate arrays with Google's polyline algorithm (1e-5 precision)."""
+    lat_e5 = np.round(np.asarray(lats, dtype=np.float64) * 1e5).astype(np.int64)
+    lng_e5 = np.round(np.asarray(lngs, dtype=np.float64) * 1e5).astype(np.int64)
+    deltas = np.empty(2 * len(lat_e5), dtype=np.int64)
+    deltas[0::2] = np.diff(lat_e5, prepend=0)
+    deltas[1::2] = np.diff(lng_e5, prepend=0)
+    out: list[str] = []
+    for v in ((deltas << 1) ^ (deltas >> 63)).tolist():
+        while v >= 0x20:
+            out.append(chr((0x20 | (v & 0x1F)) + 63))
+            v >>= 5
+        out.append(chr(v + 63))
+    return ''.join(out)
+
+
+def _to_points(lats: np.ndarray, lngs: np.ndarray) -> list[dict[str, float]]:
+    return [
+        {'latitude': lat, 'longitude': lng}
+        for lat, lng in zip(lats.tolist(), lngs.tolist())
+    ]
+
+
+# ---------------------------------------------------------------------------
+# Simplification
+# ---------------------------------------------------------------------------
+
+def zoom_tolerance_m(zoom: float, latitude: float) -> float:
+    """Ground size (metres) of one screen pixel at ``zoom`` and ``latitude``."""
+    return _METRES_PER_PIXEL_Z0 * math.cos(math.radians(latitude)) / (2 ** zoom)
+
+
+def simplify_mask(lats: np.ndarray, lngs: np.ndarray, tolerance_m: float) -> np.ndarray:
+    """Douglas–Peucker keep-mask: True for the points that survive.
+
+    Coordinates are projected to a local equirectangular plane (metres),
+    which is accurate to well under a metre over Sri Lanka's extent.  Each
+    split evaluates the whole span in one vectorised point-to-segment
+    distance; an explicit stack replaces recursion.
+    """
+    n = len(lats)
+    keep = np.zeros(n, dtype=bool)
+    if n <= 2:
+        keep[:] = True
+        return keep
+    lat0 = math.radians(float(np.mean(lats)))
+    xs = np.asarray(lngs, dtype=np.float64) * _METRES_PER_DEG_LNG * math.cos(lat0)
+    ys = np.asarray(lats, dtype=np.float64) * _METRES_PER_DEG_LAT
+    keep[0] = keep[-1] = True
+    stack = [(0, n - 1)]
+    while stack:
+        first, last = stack.pop()
+        if last - first < 2:
+            continue
+        ax, ay = xs[first], ys[first]
+        dx, dy = xs[last] - ax, ys[last] - ay
+        px = xs[first + 1:last] - ax
+        py = ys[first + 1:last] - ay
+        seg_len2 = dx * dx + dy * dy
+        if seg_len2 > 0.0:
+            t = np.clip((px * dx + py * dy) / seg_len2, 0.0, 1.0)
+            px = px - t * dx
+            py = py - t * dy
+        d2 = px * px + py * py
+        idx = int(np.argmax(d2))
+        if d2[idx] > tolerance_m * tolerance_m:
+            split = first + 1 + idx
+            keep[split] = True
+            stack.append((first, split))
+            stack.append((split, last))
+    return keep
+
+
+# ---------------------------------------------------------------------------
+# Response formatting
+# ---------------------------------------------------------------------------
+
+def format_polyline(
+    polyline_format: str,
+    encoded: Optional[str] = None,
+    lats: Optional[np.ndarray] = None,
+    lngs: Optional[np.ndarray] = None,
+    tolerance_m: Optional[float] = None,
+    zoom: Optional[float] = None,
+) -> dict[str, Any]:
+    """Build the polyline response fields for ``polyline_format``.
+
+    The route is given either as Google's ``encoded`` string or as coordinate
+    arrays; the other representation is only computed when the format needs it.
+
+    Returns {'polyline_points', 'polyline_encoded', 'polyline_flat'}; fields
+    not used by the format are [] / None.
+    """
+    if polyline_format not in POLYLINE_FORMATS:
+        raise ValueError(f'Unknown polyline_format: {polyline_format!r}')
+    result: dict[str, Any] = {
+        'polyline_points': [],
+        'polyline_encoded': None,
+        'polyline_flat': None,
+    }
+
+    if polyline_format == 'encoded':
+        if encoded is None:
+            encoded = encode_polyline(lats if lats is not None else [], lngs if lngs is not None else [])
+        result['polyline_encoded'] = encoded
+        return result
+
+    if lats is None or lngs is None:
+        lats, lngs = decode_arrays(encoded or '')
+
+    if polyline_format == 'flat':
+        result['polyline_flat'] = {'latitude': lats.tolist(), 'longitude': lngs.tolist()}
+    elif polyline_format == 'simplified':
+        if tolerance_m is None:
+            if zoom is not None and len(lats):
+                tolerance_m = zoom_tolerance_m(zoom, float(np.mean(lats)))
+            else:
+                tolerance_m = _DEFAULT_TOLERANCE_M
+        keep = simplify_mask(lats, lngs, tolerance_m)
+        result['polyline_points'] = _to_points(lats[keep], lngs[keep])
+    else:
+        result['polyline_points'] = _to_points(lats, lngs)
+    return result
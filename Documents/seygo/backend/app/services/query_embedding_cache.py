@@ -0,0 +1,181 @@
+"""
+query_embedding_cache.py
+========================
+Cache of semantic-search query embeddings (semantic_recommender.py).
+
+Encoding a query with the sentence-transformer costs tens of milliseconds of
+CPU, and the /search query log is highly repetitive ("beach galle",
+"temples in kandy"), so each normalised query text is encoded once.
+
+  • Key      embedding model name + normalised query (NFKC, lowercased,
+             whitespace collapsed); a model swap never reuses old vectors
+  • Value    float32 embedding, read-only
+  • Memory   LRU + TTL: SEMANTIC_QUERY_CACHE_MAX_ENTRIES (default 4096),
+             SEMANTIC_QUERY_CACHE_TTL_S (default 7 days)
+  • Disk     optional SQLite tier that survives restarts and is shared by
+             workers: SEMANTIC_QUERY_CACHE_PATH (unset = memory only); disk
+             hits are promoted to memory
+  • Metrics  memory / disk hits, misses, evictions, hit rate via ``stats()``
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+_CACHE_MAX_ENTRIES = int(os.getenv('SEMANTIC_QUERY_CACHE_MAX_ENTRIES', '4096'))
+_CACHE_TTL_S = float(os.getenv('SEMANTIC_QUERY_CACHE_TTL_S', str(7 * 24 * 3600)))
+_CACHE_PATH = os.getenv('SEMANTIC_QUERY_CACHE_PATH', '').strip()
+
+_WHITESPACE = re.compile(r'\s+')
+
+
+def normalise_query(text: str) -> str:
+    """Canonical form of a query: NFKC, lowercased, single spaces."""
+    return _WHITESPACE.sub(' ', unicodedata.normalize('NFKC', text).lower()).strip()
+
+
+class QueryEmbeddingCache:
+    """Thread-safe LRU + TTL map of (model, normalised query) → embedding,
+    optionally backed by SQLite."""
+
+    def __init__(
+        self,
+        max_entries: int = _CACHE_MAX_ENTRIES,
+        ttl_s: float = _CACHE_TTL_S,
+        path: Optional[Path] = Path(_CACHE_PATH) if _CACHE_PATH else None,
+    ) -> None:
+        self._max_entries = max_entries
+        self._ttl_s = ttl_s
+        self._path = Path(path) if path else None
+        self._entries: OrderedDict[tuple[str, str], tuple[float, np.ndarray]] = OrderedDict()
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    # ------------------------------------------------------------------
+    # Public
+    # ------------------------------------------------------------------
+
+    def get(self, model: str, query: str) -> Optional[np.ndarray]:
+        """Cached embedding of the normalised ``query``, or None."""
+        key = (model, query)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and time.monotonic() - entry[0] <= self._ttl_s:
+                self._entries.move_to_end(key)
+                self.memory_hits += 1
+                return entry[1]
+            if entry is not None:
+                del self._entries[key]
+            vec = self._disk_get(key)
+            if vec is None:
+                self.misses += 1
+                return None
+            self.disk_hits += 1
+            self._remember(key, vec)
+            return vec
+
+    def put(self, model: str, query: str, vector: np.ndarray) -> np.ndarray:
+        """Store the embedding of the normalised ``query``; returns the
+        read-only float32 copy that is cached."""
+        key = (model, query)
+        vec = np.array(vector, dtype=np.float32).reshape(-1)
+        vec.flags.writeable = False
+        with self._lock:
+            self._remember(key, vec)
+            self._disk_put(key, vec)
+        return vec
+
+    def clear(self) -> None:
+        """Drop the memory tier and reset the counters (the disk tier stays)."""
+        with self._lock:
+            self._entries.clear()
+            self.memory_hits = self.disk_hits = self.misses = self.evictions = 0
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            hits = self.memory_hits + self.disk_hits
+            lookups = hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'max_entries': self._max_entries,
+                'ttl_s': self._ttl_s,
+                'path': str(self._path) if self._path else None,
+                'memory_hits': self.memory_hits,
+                'disk_hits': self.disk_hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': round(hits / lookups, 4) if lookups else 0.0,
+            }
+
+    # ------------------------------------------------------------------
+    # Internals (caller holds the lock)
+    # ------------------------------------------------------------------
+
+    def _remember(self, key: tuple[str, str], vec: np.ndarray) -> None:
+        self._entries[key] = (time.monotonic(), vec)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self._max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def _disk_get(self, key: tuple[str, str]) -> Optional[np.ndarray]:
+        if self._path is None:
+            return None
+        try:
+            row = self._connect().execute(
+                'SELECT vector FROM embeddings WHERE model = ? AND query = ? AND created_at >= ?',
+                (key[0], key[1], time.time() - self._ttl_s),
+            ).fetchone()
+        except Exception as exc:
+            logger.warning('Query embedding cache read failed: %s', exc)
+            return None
+        if row is None:
+            return None
+        return np.frombuffer(row[0], dtype=np.float32)      # read-only view
+
+    def _disk_put(self, key: tuple[str, str], vec: np.ndarray) -> None:
+        if self._path is None:
+            return
+        try:
+            conn = self._connect()
+            conn.execute(
+                'INSERT OR REPLACE INTO embeddings (model, query, vector, created_at) VALUES (?, ?, ?, ?)',
+                (key[0], key[1], vec.tobytes(), time.time()),
+            )
+            conn.commit()
+        except Exception as exc:
+            logger.warning('Query embedding cache write failed: %s', exc)
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self._path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(str(self._path), check_same_thread=False)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS embeddings ('
+                ' model TEXT NOT NULL,'
+                ' query TEXT NOT NULL,'
+                ' vector BLOB NOT NULL,'
+                ' created_at REAL NOT NULL,'
+                ' PRIMARY KEY (model, query))'
+            )
+            conn.commit()
+            self._conn = conn
+        return self._conn
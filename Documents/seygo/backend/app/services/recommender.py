@@ -8,6 +8,7 @@ from sklearn.feature_extraction.text import TfidfVectorizer
 from sklearn.metrics.pairwise import cosine_similarity
 
 from ..schemas.recommendation import ScoredPlace
+from .geo import distance_vector_km, haversine_km
 from .place_taxonomy import normalize_category_name
 
 W_CONTENT = float(os.getenv('W_CONTENT', '0.35'))
@@ -32,13 +33,13 @@ class PlaceFeature:
     taxonomy_group: str = 'Nature & Outdoor'
 
 
-def _haversine_km(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
-    r = 6371.0
-    phi1, phi2 = math.radians(lat1), math.radians(lat2)
-    dphi = math.radians(lat2 - lat1)
-    dlam = math.radians(lon2 - lon1)
-    a = math.sin(dphi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlam / 2) ** 2
-    return r * 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
+def _distances_km(places: list[PlaceFeature], lat: float, lon: float) -> np.ndarray:
+    return distance_vector_km(
+        lat,
+        lon,
+        [p.latitude for p in places],
+        [p.longitude for p in places],
+    )
 
 
 def _normalize(values: np.ndarray) -> np.ndarray:
@@ -108,7 +109,7 @@ class PlaceRecommender:
             place = candidates[i]
             dist_km = None
             if latitude is not None and longitude is not None:
-                dist_km = _haversine_km(latitude, longitude, place.latitude, place.longitude)
+                dist_km = haversine_km(latitude, longitude, place.latitude, place.longitude)
 
             results.append(
                 ScoredPlace(
@@ -143,7 +144,8 @@ class PlaceRecommender:
     ) -> list[PlaceFeature]:
         if lat is None or lon is None:
             return places
-        return [p for p in places if _haversine_km(lat, lon, p.latitude, p.longitude) <= radius_km]
+        within = _distances_km(places, lat, lon) <= radius_km
+        return [p for p, keep in zip(places, within) if keep]
 
     def _filter_by_category(
         self,
@@ -231,5 +233,5 @@ class PlaceRecommender:
     ) -> np.ndarray:
         if lat is None or lon is None:
             return np.zeros(len(places))
-        scores = np.array([1.0 / (1.0 + _haversine_km(lat, lon, p.latitude, p.longitude)) for p in places])
+        scores = 1.0 / (1.0 + _distances_km(places, lat, lon))
         return _normalize(scores)
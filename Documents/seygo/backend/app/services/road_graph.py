@@ -0,0 +1,675 @@
+"""
+road_graph.py
+=============
+Offline road routing engine: a drivable road graph built from an
+OpenStreetMap extract, sped up with contraction hierarchies (CH).
+
+Used by the route optimizer as a travel-time / geometry source that needs
+no Google call — as a fallback when Google is unavailable (default), or as
+the primary source (ROUTE_ROAD_GRAPH_MODE=primary).
+
+  • Source     OSM XML extract (.osm, .osm.gz, .osm.bz2) at ROUTE_ROAD_GRAPH_OSM
+  • Prepared   contracted graph as .npz at ROUTE_ROAD_GRAPH_PATH (default
+               ml_models/road_graph.npz), built offline with
+               build_road_graph.py.  The API only loads it: contraction is
+               pure Python and far too slow to run on a request path; a
+               missing .npz, or one older than the OSM file, is logged
+  • Edges      highway=* ways, per-class speeds (or maxspeed), oneway aware;
+               only the largest strongly connected component is kept
+  • Snapping   stops snap to the nearest graph node (KD-tree); the access leg
+               is costed at _ACCESS_SPEED_KMH and stops further than
+               ROUTE_ROAD_GRAPH_MAX_SNAP_KM are treated as unreachable
+
+Contraction hierarchies
+-----------------------
+Nodes are contracted one at a time in edge-difference order; a shortcut
+u→w is added when the only shortest u→w path ran through the contracted
+node (checked with a bounded witness search).  Afterwards every query is a
+pair of small *upward* Dijkstra searches, which is what makes many-to-many
+matrices (bucket algorithm) and point-to-point paths take milliseconds.
+Shortcuts remember their middle node so paths unpack to real road geometry.
+"""
+
+from __future__ import annotations
+
+import bz2
+import gzip
+import hashlib
+import heapq
+import logging
+import math
+import os
+import re
+import threading
+import xml.etree.ElementTree as ET
+from pathlib import Path
+from typing import Any, Iterable, Optional
+
+import networkx as nx
+import numpy as np
+from scipy.spatial import cKDTree
+
+from .geo import EARTH_RADIUS_KM, haversine_km, haversine_np, unit_vectors
+
+logger = logging.getLogger(__name__)
+
+_BACKEND_DIR = Path(__file__).resolve().parent.parent.parent
+
+_GRAPH_PATH = Path(os.getenv('ROUTE_ROAD_GRAPH_PATH', str(_BACKEND_DIR / 'ml_models' / 'road_graph.npz')))
+_OSM_PATH = os.getenv('ROUTE_ROAD_GRAPH_OSM', '').strip()
+_MAX_SNAP_KM = float(os.getenv('ROUTE_ROAD_GRAPH_MAX_SNAP_KM', '5'))
+
+# Speed for the straight-line leg between a stop and its snapped road node
+_ACCESS_SPEED_KMH = 20.0
+
+# Free-flow speeds (km/h) per OSM highway class; classes not listed are not drivable
+_HIGHWAY_SPEEDS_KMH: dict[str, float] = {
+    'motorway': 90.0,
+    'motorway_link': 50.0,
+    'trunk': 60.0,
+    'trunk_link': 40.0,
+    'primary': 50.0,
+    'primary_link': 35.0,
+    'secondary': 45.0,
+    'secondary_link': 30.0,
+    'tertiary': 40.0,
+    'tertiary_link': 30.0,
+    'unclassified': 30.0,
+    'residential': 25.0,
+    'living_street': 10.0,
+    'service': 15.0,
+    'road': 25.0,
+}
+
+# Witness search limits: bigger = fewer shortcuts, slower preprocessing
+_WITNESS_SETTLE_LIMIT = 50
+
+_GRAPH_FORMAT_VERSION = 1
+
+
+# ---------------------------------------------------------------------------
+# OSM extract → networkx DiGraph
+# ---------------------------------------------------------------------------
+
+def _open_osm(path: Path):
+    if path.suffix == '.gz':
+        return gzip.open(path, 'rb')
+    if path.suffix == '.bz2':
+        return bz2.open(path, 'rb')
+    return open(path, 'rb')
+
+
+def _parse_maxspeed(value: Optional[str]) -> Optional[float]:
+    if not value:
+        return None
+    match = re.match(r'\s*(\d+(?:\.\d+)?)\s*(mph)?', value)
+    if not match:
+        return None
+    speed = float(match.group(1))
+    return speed * 1.609 if match.group(2) else speed
+
+
+def _oneway(tags: dict[str, str]) -> int:
+    """1 = forward only, -1 = reverse only, 0 = both directions."""
+    value = tags.get('oneway', '').lower()
+    if value in ('yes', '1', 'true'):
+        return 1
+    if value == '-1':
+        return -1
+    if value == 'no':
+        return 0
+    # Motorways and roundabouts are implicitly one-way
+    if tags.get('highway') == 'motorway' or tags.get('junction') == 'roundabout':
+        return 1
+    return 0
+
+
+def load_osm_graph(path: Path) -> nx.DiGraph:
+    """Parse an OSM XML extract into a DiGraph of drivable roads.
+
+    Two streaming passes keep memory bounded: the first collects highway
+    ways, the second only the coordinates of nodes those ways use.  Edge
+    attributes: ``time_s`` (travel time) and ``length_m``.
+    """
+    path = Path(path)
+    ways: list[tuple[list[int], float, int]] = []
+    with _open_osm(path) as fh:
+        for _, elem in ET.iterparse(fh, events=('end',)):
+            if elem.tag == 'way':
+                tags = {t.get('k'): t.get('v') for t in elem.iter('tag')}
+                base = _HIGHWAY_SPEEDS_KMH.get(tags.get('highway', ''))
+                if base is not None:
+                    refs = [int(nd.get('ref')) for nd in elem.iter('nd')]
+                    if len(refs) >= 2:
+                        speed = _parse_maxspeed(tags.get('maxspeed')) or base
+                        ways.append((refs, speed, _oneway(tags)))
+                elem.clear()
+            elif elem.tag == 'node':
+                elem.clear()
+
+    wanted = {ref for refs, _, _ in ways for ref in refs}
+    coords: dict[int, tuple[float, float]] = {}
+    with _open_osm(path) as fh:
+        for _, elem in ET.iterparse(fh, events=('end',)):
+            if elem.tag == 'node':
+                node_id = int(elem.get('id'))
+                if node_id in wanted:
+                    coords[node_id] = (float(elem.get('lat')), float(elem.get('lon')))
+            elem.clear()
+
+    graph = nx.DiGraph()
+    for node_id, (lat, lon) in coords.items():
+        graph.add_node(node_id, lat=lat, lon=lon)
+    for refs, speed, oneway in ways:
+        refs = [r for r in refs if r in coords]
+        for a, b in zip(refs[:-1], refs[1:]):
+            if a == b:
+                continue
+            length_m = haversine_km(*coords[a], *coords[b]) * 1000.0
+            time_s = length_m / (speed / 3.6)
+            if oneway >= 0:
+                _add_edge(graph, a, b, time_s, length_m)
+            if oneway <= 0:
+                _add_edge(graph, b, a, time_s, length_m)
+    logger.info(
+        'OSM road graph: %d ways, %d nodes, %d edges',
+        len(ways), graph.number_of_nodes(), graph.number_of_edges(),
+    )
+    return graph
+
+
+def _add_edge(graph: nx.DiGraph, a: int, b: int, time_s: float, length_m: float) -> None:
+    current = graph.get_edge_data(a, b)
+    if current is None or time_s < current['time_s']:
+        graph.add_edge(a, b, time_s=time_s, length_m=length_m)
+
+
+# ---------------------------------------------------------------------------
+# Contraction
+# ---------------------------------------------------------------------------
+
+def _witness_costs(
+    out_adj: list[dict[int, tuple[float, float, int]]],
+    contracted: list[bool],
+    source: int,
+    skip: int,
+    max_cost: float,
+    targets: set[int],
+) -> dict[int, float]:
+    """Bounded Dijkstra from ``source`` over uncontracted nodes, avoiding ``skip``."""
+    dist = {source: 0.0}
+    heap = [(0.0, source)]
+    settled = 0
+    remaining = set(targets)
+    while heap and remaining and settled < _WITNESS_SETTLE_LIMIT:
+        d, u = heapq.heappop(heap)
+        if d > max_cost:
+            break
+        if d > dist.get(u, math.inf):
+            continue   # stale heap entry
+        settled += 1
+        remaining.discard(u)
+        for w, (cost, _, _) in out_adj[u].items():
+            if w == skip or contracted[w]:
+                continue
+            nd = d + cost
+            if nd < dist.get(w, math.inf):
+                dist[w] = nd
+                heapq.heappush(heap, (nd, w))
+    return dist
+
+
+def _shortcuts_for(
+    v: int,
+    out_adj: list[dict[int, tuple[float, float, int]]],
+    in_adj: list[dict[int, tuple[float, float, int]]],
+    contracted: list[bool],
+) -> list[tuple[int, int, float, float]]:
+    """Shortcuts (u, w, cost, length) needed if ``v`` were contracted now."""
+    preds = [(u, e) for u, e in in_adj[v].items() if not contracted[u]]
+    succs = [(w, e) for w, e in out_adj[v].items() if not contracted[w]]
+    if not preds or not succs:
+        return []
+    max_out = max(e[0] for _, e in succs)
+    shortcuts = []
+    for u, (c_uv, l_uv, _) in preds:
+        targets = {w for w, _ in succs if w != u}
+        if not targets:
+            continue
+        witness = _witness_costs(out_adj, contracted, u, v, c_uv + max_out, targets)
+        for w, (c_vw, l_vw, _) in succs:
+            if w == u:
+                continue
+            via = c_uv + c_vw
+            if witness.get(w, math.inf) > via:
+                shortcuts.append((u, w, via, l_uv + l_vw))
+    return shortcuts
+
+
+def _contract(
+    n: int,
+    edges: Iterable[tuple[int, int, float, float]],
+) -> tuple[np.ndarray, list[dict[int, tuple[float, float, int]]], list[dict[int, tuple[float, float, int]]]]:
+    """Contract all nodes.  Returns (rank, upward_out, upward_in) where
+    upward_out[v] holds v→w edges to higher-ranked w and upward_in[v] holds
+    u→v edges from higher-ranked u, each as {other: (cost, length, mid)}.
+    """
+    out_adj: list[dict[int, tuple[float, float, int]]] = [{} for _ in range(n)]
+    in_adj: list[dict[int, tuple[float, float, int]]] = [{} for _ in range(n)]
+    for u, w, cost, length in edges:
+        if u == w:
+            continue
+        if w not in out_adj[u] or cost < out_adj[u][w][0]:
+            out_adj[u][w] = (cost, length, -1)
+            in_adj[w][u] = (cost, length, -1)
+
+    contracted = [False] * n
+    deleted_neighbours = [0] * n
+    rank = np.full(n, -1, dtype=np.int64)
+    up_out: list[dict[int, tuple[float, float, int]]] = [{} for _ in range(n)]
+    up_in: list[dict[int, tuple[float, float, int]]] = [{} for _ in range(n)]
+
+    def _priority(v: int) -> tuple[int, list[tuple[int, int, float, float]]]:
+        shortcuts = _shortcuts_for(v, out_adj, in_adj, contracted)
+        degree = len(out_adj[v]) + len(in_adj[v])
+        return len(shortcuts) - degree + deleted_neighbours[v], shortcuts
+
+    heap = [(_priority(v)[0], v) for v in range(n)]
+    heapq.heapify(heap)
+    next_rank = 0
+    while heap:
+        _, v = heapq.heappop(heap)
+        if contracted[v]:
+            continue
+        # Lazy update: re-evaluate and requeue if no longer the minimum
+        prio, shortcuts = _priority(v)
+        if heap and prio > heap[0][0]:
+            heapq.heappush(heap, (prio, v))
+            continue
+
+        for u, w, cost, length in shortcuts:
+            if w not in out_adj[u] or cost < out_adj[u][w][0]:
+                out_adj[u][w] = (cost, length, v)
+                in_adj[w][u] = (cost, length, v)
+
+        up_out[v] = dict(out_adj[v])
+        up_in[v] = dict(in_adj[v])
+        for w in out_adj[v]:
+            del in_adj[w][v]
+            deleted_neighbours[w] += 1
+        for u in in_adj[v]:
+            del out_adj[u][v]
+            deleted_neighbours[u] += 1
+        out_adj[v] = {}
+        in_adj[v] = {}
+        contracted[v] = True
+        rank[v] = next_rank
+        next_rank += 1
+    return rank, up_out, up_in
+
+
+def _to_csr(adj: list[dict[int, tuple[float, float, int]]]) -> dict[str, np.ndarray]:
+    indptr = np.zeros(len(adj) + 1, dtype=np.int64)
+    indptr[1:] = np.cumsum([len(a) for a in adj])
+    to = np.empty(indptr[-1], dtype=np.int64)
+    cost = np.empty(indptr[-1], dtype=np.float64)
+    length = np.empty(indptr[-1], dtype=np.float64)
+    mid = np.empty(indptr[-1], dtype=np.int64)
+    k = 0
+    for a in adj:
+        for other, (c, ln, m) in a.items():
+            to[k], cost[k], length[k], mid[k] = other, c, ln, m
+            k += 1
+    return {'indptr': indptr, 'to': to, 'cost': cost, 'length': length, 'mid': mid}
+
+
+# ---------------------------------------------------------------------------
+# Road graph
+# ---------------------------------------------------------------------------
+
+class RoadGraph:
+    """Contracted road graph answering travel-time matrices and paths.
+
+    Times are seconds, lengths metres.  Build with :meth:`from_networkx` /
+    :meth:`from_osm`, persist with :meth:`save` / :meth:`load`.
+    """
+
+    def __init__(
+        self,
+        lats: np.ndarray,
+        lons: np.ndarray,
+        up: dict[str, np.ndarray],
+        down: dict[str, np.ndarray],
+    ) -> None:
+        self.lats = np.asarray(lats, dtype=np.float64)
+        self.lons = np.asarray(lons, dtype=np.float64)
+        self._up = up        # v → higher-ranked w   (forward search)
+        self._down = down    # v ← higher-ranked u   (backward search, reversed)
+        self._tree = cKDTree(unit_vectors(self.lats, self.lons))
+        self._up_lists = self._adjacency_lists(up)
+        self._down_lists = self._adjacency_lists(down)
+
+    @property
+    def node_count(self) -> int:
+        return len(self.lats)
+
+    # ------------------------------------------------------------------
+    # Construction / persistence
+    # ------------------------------------------------------------------
+
+    @classmethod
+    def from_networkx(cls, graph: nx.DiGraph, weight: str = 'time_s') -> 'RoadGraph':
+        """Contract a DiGraph with ``lat`` / ``lon`` node attributes and
+        ``time_s`` / ``length_m`` edge attributes (largest SCC only)."""
+        if graph.number_of_nodes() == 0:
+            raise ValueError('Road graph is empty')
+        component = max(nx.strongly_connected_components(graph), key=len)
+        nodes = sorted(component)
+        index = {node: i for i, node in enumerate(nodes)}
+        lats = np.array([graph.nodes[v]['lat'] for v in nodes], dtype=np.float64)
+        lons = np.array([graph.nodes[v]['lon'] for v in nodes], dtype=np.float64)
+        edges = [
+            (index[u], index[w], float(data[weight]), float(data.get('length_m', 0.0)))
+            for u, w, data in graph.edges(data=True)
+            if u in index and w in index
+        ]
+        _, up_out, up_in = _contract(len(nodes), edges)
+        logger.info(
+            'Road graph contracted: %d nodes, %d original edges, %d upward edges',
+            len(nodes), len(edges), sum(len(a) for a in up_out) + sum(len(a) for a in up_in),
+        )
+        return cls(lats, lons, _to_csr(up_out), _to_csr(up_in))
+
+    @classmethod
+    def from_osm(cls, path: Path) -> 'RoadGraph':
+        return cls.from_networkx(load_osm_graph(path))
+
+    def save(self, path: Path) -> None:
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        arrays = {'version': np.array(_GRAPH_FORMAT_VERSION), 'lats': self.lats, 'lons': self.lons}
+        for prefix, csr in (('up', self._up), ('down', self._down)):
+            for key, arr in csr.items():
+                arrays[f'{prefix}_{key}'] = arr
+        with open(path, 'wb') as fh:
+            np.savez_compressed(fh, **arrays)
+
+    @staticmethod
+    def file_stamp(path: Path) -> str:
+        """Content hash of a saved graph; changes whenever the graph is rebuilt
+        with different roads or speeds, unlike a copy-sensitive mtime."""
+        digest = hashlib.sha256()
+        with open(path, 'rb') as fh:
+            for block in iter(lambda: fh.read(1 << 20), b''):
+                digest.update(block)
+        return digest.hexdigest()[:16]
+
+    @classmethod
+    def load(cls, path: Path) -> 'RoadGraph':
+        with np.load(path) as data:
+            if int(data['version']) != _GRAPH_FORMAT_VERSION:
+                raise ValueError(f'Unsupported road graph version in {path}')
+            keys = ('indptr', 'to', 'cost', 'length', 'mid')
+            up = {k: data[f'up_{k}'] for k in keys}
+            down = {k: data[f'down_{k}'] for k in keys}
+            return cls(data['lats'], data['lons'], up, down)
+
+    # ------------------------------------------------------------------
+    # Queries
+    # ------------------------------------------------------------------
+
+    def snap(self, lats, lons) -> tuple[np.ndarray, np.ndarray]:
+        """Nearest node index and straight-line distance (km) per point."""
+        points = unit_vectors(np.asarray(lats, dtype=np.float64), np.asarray(lons, dtype=np.float64))
+        chord, idx = self._tree.query(points)
+        dist_km = 2 * EARTH_RADIUS_KM * np.arcsin(np.clip(chord / 2, 0.0, 1.0))
+        return idx.astype(np.int64), dist_km
+
+    def node_matrix(self, sources: list[int], targets: list[int]) -> tuple[np.ndarray, np.ndarray]:
+        """Many-to-many (time_s, length_m) between graph nodes (bucket CH).
+
+        One backward upward search per target fills buckets at the nodes it
+        settles; one forward upward search per source scans those buckets.
+        """
+        buckets: dict[int, list[tuple[int, float, float]]] = {}
+        for t_idx, t in enumerate(targets):
+            for node, (cost, length) in self._upward_search(t, self._down_lists).items():
+                buckets.setdefault(node, []).append((t_idx, cost, length))
+
+        times = np.full((len(sources), len(targets)), np.inf)
+        lengths = np.full((len(sources), len(targets)), np.inf)
+        for s_idx, s in enumerate(sources):
+            row_t = times[s_idx]
+            row_l = lengths[s_idx]
+            for node, (cost, length) in self._upward_search(s, self._up_lists).items():
+                for t_idx, t_cost, t_length in buckets.get(node, ()):
+                    total = cost + t_cost
+                    if total < row_t[t_idx]:
+                        row_t[t_idx] = total
+                        row_l[t_idx] = length + t_length
+        return times, lengths
+
+    def node_path(self, source: int, target: int) -> Optional[list[int]]:
+        """Shortest path source → target as a list of node indices."""
+        found = self._shortest_path(source, target)
+        return found[0] if found is not None else None
+
+    def _shortest_path(self, source: int, target: int) -> Optional[tuple[list[int], float]]:
+        """(node path, travel time) via one forward + one backward upward search."""
+        if source == target:
+            return [source], 0.0
+        fwd = self._upward_search(source, self._up_lists, parents=True)
+        bwd = self._upward_search(target, self._down_lists, parents=True)
+        best, meet = math.inf, -1
+        for node, (cost, _, _) in fwd.items():
+            other = bwd.get(node)
+            if other is not None and cost + other[0] < best:
+                best, meet = cost + other[0], node
+        if meet < 0:
+            return None
+
+        # Walk parents to the meeting node, then unpack every (shortcut) edge
+        up_edges: list[tuple[int, int, int]] = []
+        node = meet
+        while node != source:
+            _, _, (prev, mid) = fwd[node]
+            up_edges.append((prev, node, mid))
+            node = prev
+        up_edges.reverse()
+        down_edges: list[tuple[int, int, int]] = []
+        node = meet
+        while node != target:
+            _, _, (nxt, mid) = bwd[node]
+            down_edges.append((node, nxt, mid))
+            node = nxt
+
+        path = [source]
+        for u, w, mid in up_edges + down_edges:
+            path.extend(self._unpack(u, w, mid))
+        return path, best
+
+    def pair_matrix(self, src_lats, src_lons, dst_lats, dst_lons) -> tuple[np.ndarray, np.ndarray]:
+        """(time_s, length_m) from every source to every target coordinate,
+        access legs included; inf where a pair is unreachable or a point
+        lies further than ROUTE_ROAD_GRAPH_MAX_SNAP_KM from the network."""
+        src, src_km = self.snap(src_lats, src_lons)
+        dst, dst_km = self.snap(dst_lats, dst_lons)
+        times, lengths = self.node_matrix(src.tolist(), dst.tolist())
+        times += (src_km / _ACCESS_SPEED_KMH * 3600.0)[:, None] + (dst_km / _ACCESS_SPEED_KMH * 3600.0)[None, :]
+        lengths += (src_km * 1000.0)[:, None] + (dst_km * 1000.0)[None, :]
+        off_network = (src_km > _MAX_SNAP_KM)[:, None] | (dst_km > _MAX_SNAP_KM)[None, :]
+        times[off_network] = np.inf
+        lengths[off_network] = np.inf
+        return times, lengths
+
+    def matrix(self, lats, lons) -> list[list[Optional[dict[str, Any]]]]:
+        """Travel matrix between coordinates in route_optimizer's cell format
+        ({duration_sec, distance_m}); None where a pair is unreachable."""
+        times, lengths = self.pair_matrix(lats, lons, lats, lons)
+        n = len(times)
+        result: list[list[Optional[dict[str, Any]]]] = [[None] * n for _ in range(n)]
+        for i in range(n):
+            for j in range(n):
+                if i == j:
+                    result[i][j] = {'duration_sec': 0, 'distance_m': 0}
+                elif np.isfinite(times[i, j]):
+                    result[i][j] = {'duration_sec': int(times[i, j]), 'distance_m': int(lengths[i, j])}
+        return result
+
+    def route(self, lats, lons) -> Optional[dict[str, Any]]:
+        """Road geometry and totals visiting the coordinates in order.
+
+        Returns {'lats', 'lngs', 'distance_km', 'duration_min'} or None when
+        a stop is off the network or a leg is unreachable.
+        """
+        lats = np.asarray(lats, dtype=np.float64)
+        lons = np.asarray(lons, dtype=np.float64)
+        nodes, snap_km = self.snap(lats, lons)
+        if (snap_km > _MAX_SNAP_KM).any():
+            return None
+        path_lats: list[float] = [float(lats[0])]
+        path_lons: list[float] = [float(lons[0])]
+        duration_s = 0.0
+        for k in range(len(nodes) - 1):
+            found = self._shortest_path(int(nodes[k]), int(nodes[k + 1]))
+            if found is None:
+                return None
+            leg, leg_s = found
+            path_lats.extend(self.lats[leg].tolist())
+            path_lons.extend(self.lons[leg].tolist())
+            path_lats.append(float(lats[k + 1]))
+            path_lons.append(float(lons[k + 1]))
+            duration_s += leg_s
+        out_lats = np.array(path_lats)
+        out_lons = np.array(path_lons)
+        distance_km = float(haversine_np(out_lats[:-1], out_lons[:-1], out_lats[1:], out_lons[1:]).sum())
+        duration_s += float(snap_km.sum() + snap_km[1:-1].sum()) / _ACCESS_SPEED_KMH * 3600.0
+        return {
+            'lats': out_lats,
+            'lngs': out_lons,
+            'distance_km': distance_km,
+            'duration_min': duration_s / 60.0,
+        }
+
+    # ------------------------------------------------------------------
+    # Internals
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def _adjacency_lists(csr: dict[str, np.ndarray]) -> list[list[tuple[int, float, float, int]]]:
+        """Python adjacency lists for the search loops (faster than indexing
+        NumPy scalars one at a time)."""
+        indptr = csr['indptr'].tolist()
+        to = csr['to'].tolist()
+        cost = csr['cost'].tolist()
+        length = csr['length'].tolist()
+        mid = csr['mid'].tolist()
+        return [
+            list(zip(to[a:b], cost[a:b], length[a:b], mid[a:b]))
+            for a, b in zip(indptr[:-1], indptr[1:])
+        ]
+
+    @staticmethod
+    def _upward_search(
+        start: int,
+        adj: list[list[tuple[int, float, float, int]]],
+        parents: bool = False,
+    ) -> dict[int, Any]:
+        """Full Dijkstra in the upward graph.  Returns node → (cost, length)
+        or, with ``parents``, node → (cost, length, (parent, mid))."""
+        best: dict[int, float] = {start: 0.0}
+        settled: dict[int, Any] = {}
+        info: dict[int, tuple[float, tuple[int, int]]] = {start: (0.0, (-1, -1))}
+        heap = [(0.0, start)]
+        while heap:
+            d, u = heapq.heappop(heap)
+            if u in settled:
+                continue
+            length, parent = info[u]
+            settled[u] = (d, length, parent) if parents else (d, length)
+            for w, cost, edge_len, mid in adj[u]:
+                nd = d + cost
+                if nd < best.get(w, math.inf):
+                    best[w] = nd
+                    info[w] = (length + edge_len, (u, mid))
+                    heapq.heappush(heap, (nd, w))
+        return settled
+
+    def _find_edge(self, u: int, w: int) -> int:
+        """Mid node of the stored edge u → w (upward from u or downward into w)."""
+        for other, _, _, mid in self._up_lists[u]:
+            if other == w:
+                return mid
+        for other, _, _, mid in self._down_lists[w]:
+            if other == u:
+                return mid
+        raise KeyError((u, w))
+
+    def _unpack(self, u: int, w: int, mid: int) -> list[int]:
+        """Original nodes after ``u`` along edge u → w (shortcuts expanded)."""
+        out: list[int] = []
+        stack = [(u, w, mid)]
+        while stack:
+            a, b, m = stack.pop()
+            if m < 0:
+                out.append(b)
+                continue
+            # a → m was stored at m (in from higher-ranked a); m → b likewise
+            stack.append((m, b, self._find_edge(m, b)))
+            stack.append((a, m, self._find_edge(a, m)))
+        return out
+
+
+# ---------------------------------------------------------------------------
+# Module-level instance
+# ---------------------------------------------------------------------------
+
+_graph: Optional[RoadGraph] = None
+_graph_loaded = False
+_graph_lock = threading.Lock()
+
+
+def get_road_graph() -> Optional[RoadGraph]:
+    """Shared RoadGraph, loaded on first use; None when none is prepared.
+
+    Only loads the .npz written by build_road_graph.py — never builds one,
+    since contraction would block every routing thread.  A missing file, or
+    one older than ROUTE_ROAD_GRAPH_OSM (still used), is logged.  Failures
+    are logged once and leave the engine disabled.
+    """
+    global _graph, _graph_loaded
+    if _graph_loaded:
+        return _graph
+    with _graph_lock:
+        if _graph_loaded:
+            return _graph
+        osm = Path(_OSM_PATH) if _OSM_PATH else None
+        try:
+            if not _GRAPH_PATH.exists():
+                if osm is not None:
+                    logger.warning(
+                        'Road graph %s missing; build it with: python build_road_graph.py %s',
+                        _GRAPH_PATH, osm,
+                    )
+            else:
+                if osm is not None and osm.exists() and _GRAPH_PATH.stat().st_mtime < osm.stat().st_mtime:
+                    logger.warning(
+                        'Road graph %s is older than %s; loading it anyway, rebuild with build_road_graph.py',
+                        _GRAPH_PATH, osm,
+                    )
+                _graph = RoadGraph.load(_GRAPH_PATH)
+                logger.info('Road graph ready: %d nodes', _graph.node_count)
+        except Exception as exc:
+            logger.warning('Road graph unavailable: %s', exc)
+            _graph = None
+        _graph_loaded = True
+    return _graph
+
+
+def road_graph_info() -> dict[str, Any]:
+    """Status for /health; never triggers a load."""
+    return {
+        'loaded': _graph is not None,
+        'nodes': _graph.node_count if _graph is not None else 0,
+        'path': str(_GRAPH_PATH),
+    }
@@ -0,0 +1,137 @@
+"""
+route_cache.py
+==============
+In-process cache of complete /route/optimize results.
+
+Users re-optimize the same playlist repeatedly (re-opening the trip screen,
+rotating the phone, sharing), so a repeat returns the stored order,
+polyline, distance and duration without any solver or Google call.  Only
+the weather block is refreshed, on its own shorter TTL.
+
+  • Key        canonical fingerprint: origin rounded to 4 decimals (~11 m),
+               destination place keys sorted (input order does not matter),
+               departure-time bucket and the polyline output options
+  • Expiry     ROUTE_RESULT_CACHE_TTL_S (default 30 min) per route;
+               weather refreshed after ROUTE_RESULT_WEATHER_TTL_S (default 5 min)
+  • Bound      ROUTE_RESULT_CACHE_MAX_ENTRIES (default 512), LRU eviction
+  • Metrics    hits / misses / evictions / weather refreshes via ``stats()``
+"""
+
+from __future__ import annotations
+
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Optional
+
+from .travel_time_cache import place_key
+
+_CACHE_TTL_S = float(os.getenv('ROUTE_RESULT_CACHE_TTL_S', '1800'))
+_WEATHER_TTL_S = float(os.getenv('ROUTE_RESULT_WEATHER_TTL_S', '300'))
+_CACHE_MAX_ENTRIES = int(os.getenv('ROUTE_RESULT_CACHE_MAX_ENTRIES', '512'))
+# Departures within the same bucket share a cached route (traffic barely moves)
+_DEPARTURE_BUCKET_S = int(os.getenv('ROUTE_RESULT_DEPARTURE_BUCKET_S', '900'))
+
+
+def route_fingerprint(
+    origin: dict[str, Any],
+    destinations: list[dict[str, Any]],
+    depart_ts: float,
+    options: tuple[Any, ...] = (),
+) -> str:
+    """Canonical cache key for a route request."""
+    parts = [
+        f"{float(origin['latitude']):.4f},{float(origin['longitude']):.4f}",
+        '|'.join(sorted(place_key(d) for d in destinations)),
+        str(int(depart_ts // _DEPARTURE_BUCKET_S)),
+        repr(options),
+    ]
+    return hashlib.sha1('\n'.join(parts).encode('utf-8')).hexdigest()
+
+
+class RouteResultCache:
+    """Thread-safe LRU + TTL map of fingerprint → cached route entry.
+
+    An entry is a dict with at least ``result`` (the response minus weather)
+    and ``weather_info``; ``get`` adds ``age_s`` and ``weather_stale``.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = _CACHE_MAX_ENTRIES,
+        ttl_s: float = _CACHE_TTL_S,
+        weather_ttl_s: float = _WEATHER_TTL_S,
+    ) -> None:
+        self._max_entries = max_entries
+        self._ttl_s = ttl_s
+        self._weather_ttl_s = weather_ttl_s
+        # key → (stored_at, weather_at, entry)
+        self._entries: OrderedDict[str, tuple[float, float, dict[str, Any]]] = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.weather_refreshes = 0
+
+    def get(self, key: str) -> Optional[dict[str, Any]]:
+        now = time.monotonic()
+        with self._lock:
+            item = self._entries.get(key)
+            if item is None or now - item[0] > self._ttl_s:
+                if item is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            stored_at, weather_at, entry = item
+            return {
+                **entry,
+                'age_s': round(now - stored_at, 1),
+                'weather_stale': now - weather_at > self._weather_ttl_s,
+            }
+
+    def put(self, key: str, entry: dict[str, Any]) -> None:
+        now = time.monotonic()
+        with self._lock:
+            self._entries[key] = (now, now, entry)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self._max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def update_weather(self, key: str, weather_info: list[dict[str, Any]]) -> None:
+        """Replace an entry's weather block, keeping its route TTL."""
+        with self._lock:
+            item = self._entries.get(key)
+            if item is None:
+                return
+            stored_at, _, entry = item
+            self._entries[key] = (stored_at, time.monotonic(), {**entry, 'weather_info': weather_info})
+            self.weather_refreshes += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = self.evictions = self.weather_refreshes = 0
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'max_entries': self._max_entries,
+                'ttl_s': self._ttl_s,
+                'weather_ttl_s': self._weather_ttl_s,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'weather_refreshes': self.weather_refreshes,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+
+# Module-level singleton shared across all FastAPI requests
+route_cache = RouteResultCache()
@@ -5,32 +5,90 @@ Road-aware route optimizer for SeyGo trip planning.
 
 Pipeline
 --------
-1. Fetch live weather for every location via Open-Meteo (free, no API key).
-2. Build a pairwise travel-time/distance matrix via Google Distance Matrix API.
+The pipeline is asyncio-native (``optimize_route_async``): HTTP calls go
+through one ``httpx.AsyncClient``, steps 1 and 2 run concurrently, and the
+CPU-bound steps 3-4 run in a worker thread so the event loop never blocks.
+
+1. Look up the hourly weather forecast for every location in the geohash-cell
+   cache (see weather_cache.py); cells that miss are fetched from Open-Meteo
+   (free, no API key) in one batched multi-location request.  Each stop is
+   scored with the forecast hour of its estimated arrival.  If forecasts are
+   unavailable, fall back to current weather: one batched request, then
+   per-point retries run concurrently (at most ROUTE_WEATHER_CONCURRENCY).
+   The whole stage (forecasts, current weather, retries) shares one deadline,
+   ROUTE_WEATHER_DEADLINE_S; stops without weather by then, or whose requests
+   failed, get safe defaults.
+2. Build a pairwise travel-time/distance matrix: legs priced recently come
+   from the persistent leg cache (travel_time_cache.py), legs between two
+   catalogue places from the precomputed place graph (place_graph.py); only
+   the missing cells are requested from the Google Distance Matrix API,
+   tiled into blocks within Google's per-request limits and fetched
+   concurrently.
+   Cells of failed blocks are filled with haversine estimates.
+   Above ROUTE_SPARSE_MIN_STOPS destinations the matrix is sparse: only each
+   stop's ROUTE_SPARSE_K nearest neighbours (vectorised haversine) are priced
+   by Google; other pairs get detour-scaled haversine estimates and local
+   search only tries moves that create candidate edges.
 3. Compute a composite score for each candidate next-stop:
       score = road_time_minutes
             + weather_penalty   (0-30 extra minutes based on rain/storm severity)
             - rating_bonus      (up to 10 minutes off for highly-rated places)
-4. Apply nearest-neighbour greedy TSP on the score matrix, starting from origin.
+4. Order the stops on the score matrix, starting from origin:
+     * up to ROUTE_EXACT_MAX_STOPS (default 12) destinations → exact Held-Karp DP;
+     * otherwise nearest-neighbour greedy TSP, then 2-opt / Or-opt local search
+       within a small time budget (ROUTE_LOCAL_SEARCH_BUDGET_MS, default 50 ms).
 5. Fetch the actual road polyline from Google Directions API using the computed
-   order (with intermediate waypoints).
-6. Decode the encoded polyline and return full response.
+   order (with intermediate waypoints).  Routes with more than
+   _DIRECTIONS_MAX_WAYPOINTS waypoints are split into segments that share
+   their end stops, fetched concurrently and stitched back together.
+6. Return the polyline in the requested ``polyline_format`` (see polyline.py):
+   decoded points (default), Google's encoded string passed through,
+   Douglas–Peucker simplified points, or flat parallel arrays.
+
+``optimize_route_stream`` runs the same pipeline but yields progress events
+(preliminary order → road order → route totals → polyline chunks → weather)
+for the NDJSON streaming endpoint.  Live trips (trip_session.py) reuse
+steps 1-5 and then repair the tour incrementally on each position update.
+
+Complete results are cached by a canonical request fingerprint
+(route_cache.py): a repeat skips steps 2-6 and only re-fetches the weather
+block once it is older than ROUTE_RESULT_WEATHER_TTL_S.
 
 APIs used
 ---------
 * Google Distance Matrix API  → pairwise road travel times
 * Google Directions API       → actual road polyline + confirmed distance/duration
-* Open-Meteo API (free)       → current weather at each waypoint
+* Offline road graph (road_graph.py, optional) → travel-time matrix and road
+  geometry without Google, before the haversine fallback (ROUTE_ROAD_GRAPH_MODE)
+* Open-Meteo API (free)       → hourly forecast / current weather at each waypoint
+
+Every HTTP call goes through ``outbound_guard`` (outbound_guard.py): while a
+host's circuit breaker is open the call fails immediately into the fallbacks
+above instead of waiting out its timeout.
 """
 
 from __future__ import annotations
 
+import asyncio
 import logging
 import math
 import os
-from typing import Any, Optional
+import time
+from bisect import bisect_right
+from datetime import datetime, timezone
+from typing import Any, AsyncIterator, Callable, Optional
 
 import httpx
+import numpy as np
+
+from .geo import distance_matrix_km, distance_vector_km, haversine_km, haversine_np
+from .polyline import decode_arrays, decode_polyline, format_polyline  # noqa: F401  (decode_polyline re-exported)
+from .outbound_guard import outbound_guard
+from .place_graph import PlaceGraph, get_place_graph
+from .road_graph import RoadGraph, get_road_graph
+from .route_cache import route_cache, route_fingerprint
+from .travel_time_cache import hour_of_week, place_key, travel_time_cache
+from .weather_cache import geohash_center, geohash_encode, weather_cache
 
 logger = logging.getLogger(__name__)
 
@@ -77,65 +135,126 @@ _WEATHER_CODES: dict[int, tuple[str, int]] = {
 
 _REQUEST_TIMEOUT = 12.0  # seconds per HTTP call
 
+# Google Distance Matrix per-request limits, and parallel block requests
+_MATRIX_MAX_ORIGINS = 25
+_MATRIX_MAX_DESTINATIONS = 25
+_MATRIX_MAX_ELEMENTS = 100
+_MATRIX_CONCURRENCY = int(os.getenv('ROUTE_MATRIX_CONCURRENCY', '4'))
+
+# Sparse matrix mode for large itineraries: k nearest candidates per stop
+_SPARSE_MIN_STOPS = int(os.getenv('ROUTE_SPARSE_MIN_STOPS', '20'))
+_SPARSE_K = int(os.getenv('ROUTE_SPARSE_K', '6'))
+# Road distance ≈ straight-line distance × this factor for non-candidate pairs
+_SPARSE_DETOUR_FACTOR = 1.3
+
+# Weather stage: parallel Open-Meteo calls and the deadline for the whole stage
+_WEATHER_CONCURRENCY = int(os.getenv('ROUTE_WEATHER_CONCURRENCY', '8'))
+_WEATHER_DEADLINE_S = float(os.getenv('ROUTE_WEATHER_DEADLINE_S', '4.0'))
+# Max coordinates per batched Open-Meteo request
+_WEATHER_BATCH_SIZE = 100
+# Days of hourly forecast fetched per geohash cell
+_FORECAST_DAYS = 2
+# Average road speed used for ETA estimates without a distance matrix
+_FALLBACK_SPEED_KMH = 50.0
+
+# Offline road graph (road_graph.py): 'fallback' when Google is unavailable,
+# 'primary' to use it instead of Google, 'off' to disable
+_ROAD_GRAPH_MODE = os.getenv('ROUTE_ROAD_GRAPH_MODE', 'fallback').strip().lower()
+
+# Google Directions per-request waypoint limit, and parallel segment requests
+_DIRECTIONS_MAX_WAYPOINTS = 25
+_DIRECTIONS_CONCURRENCY = int(os.getenv('ROUTE_DIRECTIONS_CONCURRENCY', '4'))
+
+# Streaming responses: polyline points per 'polyline' event
+_STREAM_POLYLINE_CHUNK = int(os.getenv('ROUTE_STREAM_POLYLINE_CHUNK', '500'))
+
+# Time budget for the 2-opt / Or-opt improvement stage
+_LOCAL_SEARCH_BUDGET_MS = float(os.getenv('ROUTE_LOCAL_SEARCH_BUDGET_MS', '50'))
+# Routes up to this many destinations are solved exactly (Held-Karp)
+_EXACT_MAX_STOPS = int(os.getenv('ROUTE_EXACT_MAX_STOPS', '12'))
+# Held-Karp gives up and falls back to the heuristic after this long
+_EXACT_BUDGET_MS = float(os.getenv('ROUTE_EXACT_BUDGET_MS', '100'))
+# Ignore score improvements smaller than this (float noise)
+_IMPROVEMENT_EPS = 1e-6
+# Added to every leg leaving a forced final stop (minutes)
+_FIXED_END_PENALTY = 1e7
+
 
 # ---------------------------------------------------------------------------
 # Helpers
 # ---------------------------------------------------------------------------
 
-def _haversine_km(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
-    r = 6371.0
-    p1, p2 = math.radians(lat1), math.radians(lat2)
-    dp = math.radians(lat2 - lat1)
-    dl = math.radians(lon2 - lon1)
-    a = math.sin(dp / 2) ** 2 + math.cos(p1) * math.cos(p2) * math.sin(dl / 2) ** 2
-    return r * 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
+def _haversine_matrix_km(locations: list[dict[str, Any]]) -> np.ndarray:
+    """All-pairs great-circle distance (km) between location dicts."""
+    return distance_matrix_km(
+        [float(loc['latitude']) for loc in locations],
+        [float(loc['longitude']) for loc in locations],
+    )
 
 
-def _latlng(lat: float, lon: float) -> str:
-    return f'{lat},{lon}'
+def _candidate_neighbours(dist_km: np.ndarray, k: int) -> list[list[int]]:
+    """k nearest other locations per location, made symmetric
+    (j is a candidate of i whenever i is one of j's k nearest)."""
+    n = dist_km.shape[0]
+    k = min(k, n - 1)
+    if k <= 0:
+        return [[] for _ in range(n)]
+    masked = dist_km + np.diag(np.full(n, np.inf))
+    nearest = np.argpartition(masked, k - 1, axis=1)[:, :k]
+    sets: list[set[int]] = [set() for _ in range(n)]
+    for i in range(n):
+        for j in nearest[i]:
+            sets[i].add(int(j))
+            sets[int(j)].add(i)
+    return [sorted(c) for c in sets]
 
 
-def decode_polyline(encoded: str) -> list[dict[str, float]]:
-    """Decode a Google Maps encoded polyline string into a list of
-    {latitude, longitude} dicts.
-    """
-    points: list[dict[str, float]] = []
-    index = 0
-    lat = 0
-    lng = 0
-    while index < len(encoded):
-        # latitude
-        result, shift = 0, 0
-        while True:
-            b = ord(encoded[index]) - 63
-            index += 1
-            result |= (b & 0x1F) << shift
-            shift += 5
-            if b < 0x20:
-                break
-        lat += (~result >> 1) if result & 1 else (result >> 1)
-        # longitude
-        result, shift = 0, 0
-        while True:
-            b = ord(encoded[index]) - 63
-            index += 1
-            result |= (b & 0x1F) << shift
-            shift += 5
-            if b < 0x20:
-                break
-        lng += (~result >> 1) if result & 1 else (result >> 1)
-        points.append({'latitude': lat / 1e5, 'longitude': lng / 1e5})
-    return points
+def _latlng(lat: float, lon: float) -> str:
+    return f'{lat},{lon}'
 
 
 # ---------------------------------------------------------------------------
 # Weather (Open-Meteo — free, no API key)
 # ---------------------------------------------------------------------------
 
-def _fetch_weather(lat: float, lon: float, client: httpx.Client) -> dict[str, Any]:
+def _default_weather() -> dict[str, Any]:
+    """Safe defaults used whenever live weather is unavailable."""
+    return {
+        'temperature_c': None,
+        'wind_kmh': None,
+        'condition': 'Unknown',
+        'weather_code': -1,
+        'penalty_minutes': 0,
+        'is_safe': True,
+    }
+
+
+def _parse_current_weather(cw: dict[str, Any]) -> dict[str, Any]:
+    """Turn an Open-Meteo ``current_weather`` block into a per-stop weather dict."""
+    code = int(cw.get('weathercode', 0))
+    label, penalty = _WEATHER_CODES.get(code, ('Unknown', 0))
+    temp = cw.get('temperature', 0)
+    wind = cw.get('windspeed', 0)
+    # Extra wind penalty: >50 km/h add 10 min, >80 km/h add 20 min
+    if wind > 80:
+        penalty += 20
+    elif wind > 50:
+        penalty += 10
+    return {
+        'temperature_c': temp,
+        'wind_kmh': wind,
+        'condition': label,
+        'weather_code': code,
+        'penalty_minutes': penalty,
+        'is_safe': penalty < 25,
+    }
+
+
+async def _fetch_weather(lat: float, lon: float, client: httpx.AsyncClient) -> dict[str, Any]:
     """Return weather info for a coordinate.  Never raises — returns safe defaults."""
     try:
-        resp = client.get(
+        resp = await outbound_guard.get_async(
+            client,
             _OPEN_METEO_URL,
             params={
                 'latitude': lat,
@@ -147,49 +266,354 @@ def _fetch_weather(lat: float, lon: float, client: httpx.Client) -> dict[str, An
         )
         resp.raise_for_status()
         data = resp.json()
-        cw = data.get('current_weather', {})
-        code = int(cw.get('weathercode', 0))
-        label, penalty = _WEATHER_CODES.get(code, ('Unknown', 0))
-        temp = cw.get('temperature', 0)
-        wind = cw.get('windspeed', 0)
-        # Extra wind penalty: >50 km/h add 10 min, >80 km/h add 20 min
-        if wind > 80:
-            penalty += 20
-        elif wind > 50:
-            penalty += 10
-        return {
-            'temperature_c': temp,
-            'wind_kmh': wind,
-            'condition': label,
-            'weather_code': code,
-            'penalty_minutes': penalty,
-            'is_safe': penalty < 25,
-        }
+        return _parse_current_weather(data.get('current_weather', {}))
     except Exception as exc:
         logger.debug('Weather fetch failed for %.4f,%.4f: %s', lat, lon, exc)
-        return {
-            'temperature_c': None,
-            'wind_kmh': None,
-            'condition': 'Unknown',
-            'weather_code': -1,
-            'penalty_minutes': 0,
-            'is_safe': True,
-        }
+        return _default_weather()
+
+
+async def _fetch_weather_batch(
+    coords: list[tuple[float, float]],
+    client: httpx.AsyncClient,
+) -> Optional[list[dict[str, Any]]]:
+    """Current weather for many coordinates in one Open-Meteo request.
+
+    Open-Meteo accepts comma-separated latitude/longitude lists and then
+    returns a JSON list with one object per location, in request order.
+    Returns None on any failure so the caller can fall back to per-point calls.
+    """
+    try:
+        resp = await outbound_guard.get_async(
+            client,
+            _OPEN_METEO_URL,
+            params={
+                'latitude': ','.join(f'{lat:.4f}' for lat, _ in coords),
+                'longitude': ','.join(f'{lon:.4f}' for _, lon in coords),
+                'current_weather': 'true',
+                'wind_speed_unit': 'kmh',
+            },
+            timeout=_REQUEST_TIMEOUT,
+        )
+        resp.raise_for_status()
+        data = resp.json()
+        if isinstance(data, dict):
+            data = [data]   # single-location responses are a bare object
+        if not isinstance(data, list) or len(data) != len(coords):
+            raise ValueError(f'expected {len(coords)} locations, got {len(data)}')
+        return [_parse_current_weather(item.get('current_weather', {})) for item in data]
+    except Exception as exc:
+        logger.warning('Batched weather fetch failed for %d stops: %s', len(coords), exc)
+        return None
+
+
+async def _fetch_forecast_batch(
+    coords: list[tuple[float, float]],
+    client: httpx.AsyncClient,
+) -> Optional[list[dict[str, Any]]]:
+    """Hourly forecasts for many coordinates in one Open-Meteo request.
+
+    Returns one forecast dict per coordinate (see WeatherForecastCache), or
+    None on any failure.
+    """
+    try:
+        resp = await outbound_guard.get_async(
+            client,
+            _OPEN_METEO_URL,
+            params={
+                'latitude': ','.join(f'{lat:.4f}' for lat, _ in coords),
+                'longitude': ','.join(f'{lon:.4f}' for _, lon in coords),
+                'hourly': 'weathercode,temperature_2m,windspeed_10m',
+                'forecast_days': _FORECAST_DAYS,
+                'timeformat': 'unixtime',
+                'wind_speed_unit': 'kmh',
+            },
+            timeout=_REQUEST_TIMEOUT,
+        )
+        resp.raise_for_status()
+        data = resp.json()
+        if isinstance(data, dict):
+            data = [data]   # single-location responses are a bare object
+        if not isinstance(data, list) or len(data) != len(coords):
+            raise ValueError(f'expected {len(coords)} locations, got {len(data)}')
+        forecasts = []
+        for item in data:
+            hourly = item.get('hourly') or {}
+            forecasts.append({
+                'time': [int(t) for t in hourly.get('time', [])],
+                'weathercode': hourly.get('weathercode') or hourly.get('weather_code') or [],
+                'temperature': hourly.get('temperature_2m') or [],
+                'windspeed': hourly.get('windspeed_10m') or hourly.get('wind_speed_10m') or [],
+            })
+        return forecasts
+    except Exception as exc:
+        logger.warning('Forecast fetch failed for %d cells: %s', len(coords), exc)
+        return None
+
+
+async def _get_forecasts(
+    coords: list[tuple[float, float]],
+    client: httpx.AsyncClient,
+) -> list[Optional[dict[str, Any]]]:
+    """Hourly forecast per coordinate via the geohash-cell cache.
+
+    Only cells missing from the cache are fetched at the cell centre, in
+    batches of _WEATHER_BATCH_SIZE requested concurrently.  Entries are None
+    where no forecast could be obtained.
+    """
+    cells = [geohash_encode(lat, lon) for lat, lon in coords]
+    by_cell: dict[str, Optional[dict[str, Any]]] = {}
+    for cell in cells:
+        if cell not in by_cell:
+            by_cell[cell] = weather_cache.get(cell)
+
+    missing = [cell for cell, forecast in by_cell.items() if forecast is None]
+    chunks = [
+        missing[start:start + _WEATHER_BATCH_SIZE]
+        for start in range(0, len(missing), _WEATHER_BATCH_SIZE)
+    ]
+    batches = await asyncio.gather(*(
+        _fetch_forecast_batch([geohash_center(c) for c in chunk], client) for chunk in chunks
+    ))
+    for chunk, fetched in zip(chunks, batches):
+        if fetched is None:
+            continue
+        for cell, forecast in zip(chunk, fetched):
+            if forecast['time']:
+                weather_cache.put(cell, forecast)
+                by_cell[cell] = forecast
+    return [by_cell[cell] for cell in cells]
+
+
+def _forecast_at(forecast: Optional[dict[str, Any]], ts: float) -> Optional[dict[str, Any]]:
+    """Weather dict for the forecast hour containing unix time ``ts``.
+
+    Returns None when the forecast does not cover ``ts``.
+    """
+    if not forecast or not forecast['time']:
+        return None
+    times = forecast['time']
+    if ts < times[0] - 3600 or ts >= times[-1] + 3600:
+        return None
+    idx = min(max(bisect_right(times, ts) - 1, 0), len(times) - 1)
+    try:
+        weather = _parse_current_weather({
+            'weathercode': forecast['weathercode'][idx],
+            'temperature': forecast['temperature'][idx],
+            'windspeed': forecast['windspeed'][idx],
+        })
+    except (IndexError, TypeError, ValueError):
+        return None
+    weather['forecast_time'] = datetime.fromtimestamp(times[idx], tz=timezone.utc).isoformat()
+    return weather
+
+
+# Receives (index into the coords being fetched, weather) as results land
+_Settle = Callable[[int, dict[str, Any]], None]
+
+
+async def _weather_stage(
+    coords: list[tuple[float, float]],
+    etas: list[float],
+    client: httpx.AsyncClient,
+) -> tuple[list[Optional[dict[str, Any]]], list[dict[str, Any]]]:
+    """(hourly forecasts, weather at each ETA) for every coordinate.
+
+    Forecast lookup, current weather and the per-point retries all run under
+    one ROUTE_WEATHER_DEADLINE_S; stops still without weather when it expires
+    get the safe defaults.  Never raises.
+    """
+    forecasts: list[Optional[dict[str, Any]]] = [None] * len(coords)
+    weather: list[Optional[dict[str, Any]]] = [None] * len(coords)
+
+    async def _run() -> None:
+        forecasts[:] = await _get_forecasts(coords, client)
+        await _weather_for_stops(coords, forecasts, etas, client, weather)
+
+    try:
+        await asyncio.wait_for(_run(), _WEATHER_DEADLINE_S)
+    except asyncio.TimeoutError:
+        logger.warning(
+            'Weather stage deadline (%.1fs) hit: %d/%d stops use defaults',
+            _WEATHER_DEADLINE_S, sum(w is None for w in weather), len(coords),
+        )
+    return forecasts, [w if w is not None else _default_weather() for w in weather]
+
+
+async def _weather_for_stops(
+    coords: list[tuple[float, float]],
+    forecasts: list[Optional[dict[str, Any]]],
+    etas: list[float],
+    client: httpx.AsyncClient,
+    results: Optional[list[Optional[dict[str, Any]]]] = None,
+) -> list[Optional[dict[str, Any]]]:
+    """Forecast weather at each stop's ETA; current weather where no forecast.
+
+    Fills ``results`` (one slot per stop) in place as answers arrive, so a
+    caller that gives up early keeps whatever already landed.
+    """
+    if results is None:
+        results = [None] * len(coords)
+    for i, (forecast, eta) in enumerate(zip(forecasts, etas)):
+        results[i] = _forecast_at(forecast, eta)
+    missing = [i for i, w in enumerate(results) if w is None]
+
+    def _settle(k: int, w: dict[str, Any]) -> None:
+        results[missing[k]] = w
+
+    if missing:
+        await _fetch_current_weather([coords[i] for i in missing], client, _settle)
+    return results
+
+
+async def _fetch_weather_all(
+    coords: list[tuple[float, float]],
+    client: httpx.AsyncClient,
+    etas: Optional[list[float]] = None,
+) -> list[dict[str, Any]]:
+    """Weather for every coordinate at its ETA (unix seconds, default now).
+
+    Uses cached / batched hourly forecasts first, then current weather, all
+    within the stage deadline.  Never raises.
+    """
+    if etas is None:
+        etas = [time.time()] * len(coords)
+    _, weather = await _weather_stage(coords, etas, client)
+    return weather
+
+
+async def _fetch_current_weather(
+    coords: list[tuple[float, float]],
+    client: httpx.AsyncClient,
+    settle: Optional[_Settle] = None,
+) -> list[dict[str, Any]]:
+    """Current weather for every coordinate.
+
+    One batched request per _WEATHER_BATCH_SIZE stops, all concurrent; the
+    stops of failed batches are then retried point by point, all at once.
+    Never raises.
+    """
+    results: list[Optional[dict[str, Any]]] = [None] * len(coords)
+
+    def _store(k: int, w: dict[str, Any]) -> None:
+        results[k] = w
+        if settle is not None:
+            settle(k, w)
+
+    starts = range(0, len(coords), _WEATHER_BATCH_SIZE)
+    batches = await asyncio.gather(*(
+        _fetch_weather_batch(coords[start:start + _WEATHER_BATCH_SIZE], client) for start in starts
+    ))
+    retry: list[int] = []
+    for start, batch in zip(starts, batches):
+        if batch is None:
+            retry.extend(range(start, min(start + _WEATHER_BATCH_SIZE, len(coords))))
+            continue
+        for k, w in enumerate(batch, start):
+            _store(k, w)
+    if retry:
+        await _fetch_weather_each(
+            [coords[i] for i in retry], client, lambda k, w: _store(retry[k], w)
+        )
+    return results
+
+
+async def _fetch_weather_each(
+    coords: list[tuple[float, float]],
+    client: httpx.AsyncClient,
+    settle: Optional[_Settle] = None,
+) -> list[dict[str, Any]]:
+    """Fetch weather for every coordinate concurrently, one request per stop.
+
+    At most ROUTE_WEATHER_CONCURRENCY requests run at once; ``settle`` hears
+    about each result as soon as it lands.  The time bound is the caller's
+    (``_weather_stage``).  Never raises.
+    """
+    results: list[dict[str, Any]] = [_default_weather() for _ in coords]
+    semaphore = asyncio.Semaphore(max(1, _WEATHER_CONCURRENCY))
+
+    async def _one(k: int, lat: float, lon: float) -> None:
+        async with semaphore:
+            results[k] = await _fetch_weather(lat, lon, client)
+        if settle is not None:
+            settle(k, results[k])
+
+    await asyncio.gather(*(_one(k, lat, lon) for k, (lat, lon) in enumerate(coords)))
+    return results
+
+
+# ---------------------------------------------------------------------------
+# Arrival-time estimates (for forecast lookup)
+# ---------------------------------------------------------------------------
+
+def _leg_minutes(
+    locations: list[dict[str, Any]],
+    matrix: list[list[dict]],
+    i: int,
+    j: int,
+) -> float:
+    """Travel minutes from locations[i] to locations[j]: matrix or haversine."""
+    if matrix:
+        return matrix[i][j]['duration_sec'] / 60.0
+    km = haversine_km(
+        float(locations[i]['latitude']), float(locations[i]['longitude']),
+        float(locations[j]['latitude']), float(locations[j]['longitude']),
+    )
+    return km / _FALLBACK_SPEED_KMH * 60.0
+
+
+def _visit_minutes(place: dict[str, Any]) -> float:
+    try:
+        return max(float(place.get('visit_duration_minutes') or 0.0), 0.0)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def _direct_etas(locations: list[dict[str, Any]], depart_ts: float) -> list[float]:
+    """Lower-bound ETA per location: straight from the origin (index 0)."""
+    km = distance_vector_km(
+        float(locations[0]['latitude']),
+        float(locations[0]['longitude']),
+        [float(loc['latitude']) for loc in locations],
+        [float(loc['longitude']) for loc in locations],
+    )
+    return (depart_ts + km / _FALLBACK_SPEED_KMH * 3600.0).tolist()
+
+
+def _arrival_times(
+    locations: list[dict[str, Any]],
+    matrix: list[list[dict]],
+    order: list[int],
+    depart_ts: float,
+) -> list[float]:
+    """ETA (unix seconds) at each destination when visited in ``order``,
+    including ``visit_duration_minutes`` spent at the previous stops.
+    """
+    etas: list[float] = []
+    t = depart_ts
+    prev = 0
+    for dest_i in order:
+        loc_idx = dest_i + 1
+        t += _leg_minutes(locations, matrix, prev, loc_idx) * 60.0
+        etas.append(t)
+        t += _visit_minutes(locations[loc_idx]) * 60.0
+        prev = loc_idx
+    return etas
 
 
 # ---------------------------------------------------------------------------
 # Google Distance Matrix
 # ---------------------------------------------------------------------------
 
-def _fetch_distance_matrix(
+async def _fetch_distance_matrix(
     origins: list[str],
     destinations: list[str],
     api_key: str,
-    client: httpx.Client,
+    client: httpx.AsyncClient,
 ) -> list[list[dict[str, Any]]]:
     """Return a matrix[i][j] = {duration_sec, distance_m} or fallback haversine."""
     try:
-        resp = client.get(
+        resp = await outbound_guard.get_async(
+            client,
             _GOOGLE_DISTANCE_MATRIX_URL,
             params={
                 'origins': '|'.join(origins),
@@ -224,24 +648,295 @@ def _fetch_distance_matrix(
         return []   # caller will use haversine
 
 
+def _tile_block(rows: list[int], cols: list[int]) -> list[tuple[list[int], list[int]]]:
+    """Split rows × cols into blocks that respect the Distance Matrix limits
+    (≤25 origins, ≤25 destinations, ≤100 elements per request)."""
+    n_col_chunks = math.ceil(len(cols) / _MATRIX_MAX_DESTINATIONS)
+    col_size = math.ceil(len(cols) / n_col_chunks)
+    row_size = max(1, min(_MATRIX_MAX_ORIGINS, _MATRIX_MAX_ELEMENTS // col_size))
+    return [
+        (rows[r:r + row_size], cols[c:c + col_size])
+        for r in range(0, len(rows), row_size)
+        for c in range(0, len(cols), col_size)
+    ]
+
+
+def _pack_rows(missing: dict[int, tuple[int, ...]]) -> list[tuple[list[int], list[int]]]:
+    """Pack rows with different (overlapping) missing-column sets into shared
+    origin × destination blocks within the Distance Matrix limits.
+
+    Greedy: a block grows by the row that adds the fewest new columns, among
+    rows sharing a column with it, while rows × union of columns fits one
+    request.  Sparse neighbour sets of nearby stops overlap heavily, so this
+    needs a handful of requests where one request per row would need N.
+    """
+    by_col: dict[int, set[int]] = {}
+    for i, cols in missing.items():
+        for j in cols:
+            by_col.setdefault(j, set()).add(i)
+    remaining = dict(missing)
+    blocks: list[tuple[list[int], list[int]]] = []
+    while remaining:
+        seed, seed_cols = next(iter(remaining.items()))
+        del remaining[seed]
+        if len(seed_cols) > min(_MATRIX_MAX_DESTINATIONS, _MATRIX_MAX_ELEMENTS):
+            blocks.extend(_tile_block([seed], list(seed_cols)))
+            continue
+        rows, cols = [seed], set(seed_cols)
+        while len(rows) < _MATRIX_MAX_ORIGINS:
+            nearby = {i for j in cols for i in by_col.get(j, ())} | cols
+            best: Optional[int] = None
+            best_cols: set[int] = set()
+            for i in nearby:
+                if i not in remaining:
+                    continue
+                union = cols.union(remaining[i])
+                if len(union) > _MATRIX_MAX_DESTINATIONS or (len(rows) + 1) * len(union) > _MATRIX_MAX_ELEMENTS:
+                    continue
+                if best is None or len(union) < len(best_cols) or (len(union) == len(best_cols) and i < best):
+                    best, best_cols = i, union
+            if best is None:
+                break
+            rows.append(best)
+            cols = best_cols
+            del remaining[best]
+        blocks.append((rows, sorted(cols)))
+    return blocks
+
+
+def _estimated_leg(a: dict[str, Any], b: dict[str, Any], detour: float = 1.0) -> dict[str, Any]:
+    """Haversine stand-in for a matrix cell Google did not price."""
+    km = detour * haversine_km(
+        float(a['latitude']), float(a['longitude']),
+        float(b['latitude']), float(b['longitude']),
+    )
+    return {
+        'duration_sec': int(km / _FALLBACK_SPEED_KMH * 3600),
+        'distance_m': int(km * 1000),
+        'estimated': True,
+    }
+
+
+async def _build_distance_matrix(
+    locations: list[dict[str, Any]],
+    api_key: str,
+    client: httpx.AsyncClient,
+    depart_ts: Optional[float] = None,
+    neighbours: Optional[list[list[int]]] = None,
+    place_graph: Optional[PlaceGraph] = None,
+    max_blocks: Optional[int] = None,
+) -> list[list[dict[str, Any]]]:
+    """Full N×N travel matrix, merging cached legs with fresh API cells.
+
+    Rows are grouped by their set of missing columns so a typical
+    "one new stop" request costs two small API calls (its row and its
+    column) instead of N×N elements.  Each group is tiled into compliant
+    blocks (in sparse mode, where every row has its own neighbour set, rows
+    are packed into shared blocks instead — see ``_pack_rows``) fetched
+    concurrently (at most ROUTE_MATRIX_CONCURRENCY in flight;
+    the SQLite cache is read and written off the event loop); only cells of
+    blocks that fail get haversine estimates (marked ``'estimated': True``).
+    Returns [] when no cell at all could be priced — the caller then uses
+    the haversine fallback.
+
+    With ``neighbours`` (sparse mode) only the candidate pairs i → j for
+    j in neighbours[i] are priced; every other cell is a detour-scaled
+    haversine estimate.
+
+    Legs between two catalogue places that ``place_graph`` stores are read
+    from it after the leg cache, before any API call.  Without an
+    ``api_key`` the remaining cells are haversine estimates; with
+    ``max_blocks`` only that many API blocks are fetched (the first ones,
+    which hold row 0) and the cells of the rest are detour-scaled estimates.
+    """
+    n = len(locations)
+    keys = [place_key(loc) for loc in locations]
+    coords = [_latlng(float(loc['latitude']), float(loc['longitude'])) for loc in locations]
+    bucket = hour_of_week(depart_ts)
+
+    if neighbours is None:
+        wanted = [[j for j in range(n) if j != i] for i in range(n)]
+    else:
+        wanted = neighbours
+    cached = await asyncio.to_thread(
+        travel_time_cache.get_many,
+        [(keys[i], keys[j]) for i in range(n) for j in wanted[i]],
+        bucket,
+    )
+    matrix: list[list[Optional[dict[str, Any]]]] = [[None] * n for _ in range(n)]
+    for i in range(n):
+        matrix[i][i] = {'duration_sec': 0, 'distance_m': 0}
+        for j in wanted[i]:
+            matrix[i][j] = cached.get((keys[i], keys[j]))
+    from_graph = 0
+    if place_graph is not None:
+        nodes = place_graph.nodes_of(
+            [float(loc['latitude']) for loc in locations],
+            [float(loc['longitude']) for loc in locations],
+        )
+        pairs = [
+            (i, j) for i in range(n) for j in wanted[i]
+            if matrix[i][j] is None and nodes[i] >= 0 and nodes[j] >= 0
+        ]
+        if pairs:
+            durations, distances = place_graph.legs(
+                [nodes[i] for i, _ in pairs], [nodes[j] for _, j in pairs]
+            )
+            for (i, j), dur, dist in zip(pairs, durations.tolist(), distances.tolist()):
+                if not math.isnan(dur):
+                    matrix[i][j] = {'duration_sec': int(dur), 'distance_m': int(dist)}
+                    from_graph += 1
+    if neighbours is not None:
+        for i in range(n):
+            candidates = set(neighbours[i])
+            for j in range(n):
+                if j != i and j not in candidates:
+                    matrix[i][j] = _estimated_leg(locations[i], locations[j], _SPARSE_DETOUR_FACTOR)
+
+    groups: dict[tuple[int, ...], list[int]] = {}
+    for i in range(n):
+        cols = tuple(j for j in range(n) if matrix[i][j] is None)
+        if neighbours is None and len(cols) == n - 1:
+            cols = tuple(range(n))  # whole row missing: share one request, diagonal included
+        if cols:
+            groups.setdefault(cols, []).append(i)
+
+    if not api_key:
+        for cols, rows in groups.items():
+            for i in rows:
+                for j in cols:
+                    if i != j:
+                        matrix[i][j] = _estimated_leg(locations[i], locations[j])
+        groups = {}
+
+    if neighbours is None:
+        blocks = [
+            block
+            for cols, rows in groups.items()
+            for block in _tile_block(rows, list(cols))
+        ]
+    else:
+        blocks = _pack_rows({i: cols for cols, rows in groups.items() for i in rows})
+    if max_blocks is not None and len(blocks) > max_blocks:
+        for rows, cols in blocks[max_blocks:]:
+            for i in rows:
+                for j in cols:
+                    if i != j and matrix[i][j] is None:
+                        matrix[i][j] = _estimated_leg(locations[i], locations[j], _SPARSE_DETOUR_FACTOR)
+        blocks = blocks[:max_blocks]
+
+    semaphore = asyncio.Semaphore(max(1, _MATRIX_CONCURRENCY))
+
+    async def _fetch_block(block: tuple[list[int], list[int]]) -> list[list[dict[str, Any]]]:
+        rows, cols = block
+        async with semaphore:
+            return await _fetch_distance_matrix(
+                [coords[i] for i in rows], [coords[j] for j in cols], api_key, client
+            )
+
+    results = await asyncio.gather(*(_fetch_block(block) for block in blocks))
+
+    fresh: dict[tuple[str, str], dict[str, Any]] = {}
+    failed_blocks = 0
+    for (rows, cols), result in zip(blocks, results):
+        ok = len(result) == len(rows) and all(len(row) == len(cols) for row in result)
+        if not ok:
+            failed_blocks += 1
+        for r, i in enumerate(rows):
+            for c, j in enumerate(cols):
+                if i == j:
+                    continue
+                if not ok:
+                    # Packed blocks span cells that already hold estimates
+                    if matrix[i][j] is None:
+                        matrix[i][j] = _estimated_leg(locations[i], locations[j])
+                    continue
+                cell = result[r][c]
+                matrix[i][j] = cell
+                if cell['duration_sec'] < 9999999:
+                    fresh[(keys[i], keys[j])] = cell
+    await asyncio.to_thread(travel_time_cache.put_many, fresh, bucket)
+
+    logger.info(
+        'Distance matrix: %d/%d legs from cache, %d from place graph, %d fetched in %d block(s), '
+        '%d block(s) failed',
+        len(cached), sum(len(w) for w in wanted), from_graph, len(fresh), len(blocks), failed_blocks,
+    )
+    if not cached and not from_graph and (not blocks or failed_blocks == len(blocks)):
+        return []
+    return matrix  # type: ignore[return-value]
+
+
+def _road_graph_matrix(road: RoadGraph, locations: list[dict[str, Any]]) -> list[list[dict[str, Any]]]:
+    """Full N×N matrix from the offline road graph.
+
+    Pairs the graph cannot route (stop off the network, unreachable) get
+    detour-scaled haversine estimates.  Returns [] when no pair is routable.
+    """
+    matrix = road.matrix(
+        [float(loc['latitude']) for loc in locations],
+        [float(loc['longitude']) for loc in locations],
+    )
+    routable = 0
+    for i, row in enumerate(matrix):
+        for j, cell in enumerate(row):
+            if cell is None:
+                row[j] = _estimated_leg(locations[i], locations[j], _SPARSE_DETOUR_FACTOR)
+            elif i != j:
+                routable += 1
+    return matrix if routable else []  # type: ignore[return-value]
+
+
 # ---------------------------------------------------------------------------
-# Nearest-neighbour TSP on composite score matrix
+# Composite score matrix + nearest-neighbour TSP
 # ---------------------------------------------------------------------------
 
-def _nearest_neighbour_tsp(
+def _build_score_matrix(
     locations: list[dict[str, Any]],   # [origin, dest0, dest1, ...]
     matrix: list[list[dict]],          # pairwise travel data (may be empty)
     weather: list[dict],               # per-location weather (index matches locations)
-) -> list[int]:
-    """Return indices into locations[1:] (destination indices) in visit order.
+) -> np.ndarray:
+    """Return scores[i][j] = cost of travelling from locations[i] to locations[j].
 
-    Scoring per candidate next stop:
+    Scoring per leg:
       score = road_duration_minutes
-            + weather_penalty
-            - min(rating * 2, 10)   (max 10-minute bonus for a 5-star place)
-    Lower is better.
+            + weather_penalty at j
+            - min(rating_j * 2, 10)   (max 10-minute bonus for a 5-star place)
+    Lower is better.  The diagonal is zero and never used.
+    """
+    # Travel time
+    if matrix:
+        dur_min = np.array(
+            [[cell['duration_sec'] for cell in row] for row in matrix], dtype=np.float64
+        ) / 60.0
+    else:
+        # Haversine fallback at the same average road speed as every other estimate
+        dur_min = _haversine_matrix_km(locations) / _FALLBACK_SPEED_KMH * 60.0
+    scores = dur_min + _arrival_adjustment(locations, weather)[None, :]
+    np.fill_diagonal(scores, 0.0)
+    return scores
+
+
+def _arrival_adjustment(locations: list[dict[str, Any]], weather: list[dict]) -> np.ndarray:
+    """Per-location score added to every leg arriving there: weather penalty
+    minus rating bonus (minutes)."""
+    w_penalty = np.array(
+        [w['penalty_minutes'] for w in weather] if weather else [0.0] * len(locations),
+        dtype=np.float64,
+    )
+    # Rating bonus (higher rating → deduct from score)
+    rating_bonus = np.minimum(
+        np.array([float(loc.get('rating') or 0.0) for loc in locations]) * 2.0, 10.0
+    )
+    return w_penalty - rating_bonus
+
+
+def _greedy_order(scores: np.ndarray) -> list[int]:
+    """Nearest-neighbour walk over a score matrix starting at index 0.
+
+    Returns indices into locations[1:] (destination indices) in visit order.
     """
-    n_dest = len(locations) - 1  # number of destinations (exclude origin)
+    n_dest = scores.shape[0] - 1  # number of destinations (exclude origin)
     unvisited = list(range(n_dest))   # indices into destinations list
     order: list[int] = []
     current_idx = 0  # start at origin (index 0 in locations)
@@ -250,30 +945,7 @@ def _nearest_neighbour_tsp(
         best_i = -1
         best_score = float('inf')
         for dest_i in unvisited:
-            loc_idx = dest_i + 1  # offset because locations[0] = origin
-            # Travel time
-            if matrix:
-                dur_sec = matrix[current_idx][loc_idx]['duration_sec']
-                dur_min = dur_sec / 60.0
-            else:
-                # Haversine fallback (assume ~60 km/h avg speed)
-                km = _haversine_km(
-                    locations[current_idx]['latitude'],
-                    locations[current_idx]['longitude'],
-                    locations[loc_idx]['latitude'],
-                    locations[loc_idx]['longitude'],
-                )
-                dur_min = (km / 60.0) * 60  # km ÷ speed × 60
-
-            # Weather penalty at destination
-            w_penalty = weather[loc_idx]['penalty_minutes'] if weather else 0
-
-            # Rating bonus (higher rating → deduct from score)
-            rating = float(locations[loc_idx].get('rating') or 0.0)
-            rating_bonus = min(rating * 2.0, 10.0)
-
-            score = dur_min + w_penalty - rating_bonus
-
+            score = scores[current_idx, dest_i + 1]  # offset: locations[0] = origin
             if score < best_score:
                 best_score = score
                 best_i = dest_i
@@ -285,16 +957,352 @@ def _nearest_neighbour_tsp(
     return order
 
 
+def _nearest_neighbour_tsp(
+    locations: list[dict[str, Any]],   # [origin, dest0, dest1, ...]
+    matrix: list[list[dict]],          # pairwise travel data (may be empty)
+    weather: list[dict],               # per-location weather (index matches locations)
+) -> list[int]:
+    """Return indices into locations[1:] (destination indices) in visit order.
+
+    Greedy nearest-neighbour on the composite score matrix
+    (see ``_build_score_matrix``).
+    """
+    return _greedy_order(_build_score_matrix(locations, matrix, weather))
+
+
+# ---------------------------------------------------------------------------
+# Exact Held-Karp DP for small routes
+# ---------------------------------------------------------------------------
+
+def _held_karp_order(
+    scores: np.ndarray,
+    budget_ms: Optional[float] = None,
+) -> Optional[list[int]]:
+    """Exact optimal open path from index 0 through every destination.
+
+    Bitmask DP, vectorised per (subset size, end stop):
+      dp[mask, j] = min_k dp[mask without j, k] + scores[k, j]
+    Memory and time are O(2^n · n) and O(2^n · n^2), so this is only used for
+    small routes.  Returns None when the time budget runs out, so the caller
+    can fall back to the heuristic.
+    """
+    if budget_ms is None:
+        budget_ms = _EXACT_BUDGET_MS
+    deadline = time.perf_counter() + budget_ms / 1000.0
+
+    n = scores.shape[0] - 1
+    if n <= 0:
+        return []
+    full = 1 << n
+    legs = scores[1:, 1:]
+    dest_idx = np.arange(n)
+
+    dp = np.full((full, n), np.inf)
+    parent = np.full((full, n), -1, dtype=np.int8)
+    dp[1 << dest_idx, dest_idx] = scores[0, 1:]
+
+    masks = np.arange(full)
+    popcount = np.zeros(full, dtype=np.int8)
+    for b in range(n):
+        popcount += (masks >> b) & 1
+
+    for size in range(2, n + 1):
+        if time.perf_counter() > deadline:
+            logger.info('Held-Karp exceeded %.0f ms budget at n=%d', budget_ms, n)
+            return None
+        layer = masks[popcount == size]
+        for j in range(n):
+            sel = layer[((layer >> j) & 1) == 1]
+            cand = dp[sel ^ (1 << j)] + legs[:, j]   # (len(sel), n)
+            best = cand.argmin(axis=1)
+            dp[sel, j] = cand[np.arange(len(sel)), best]
+            parent[sel, j] = best
+
+    # Walk parents back from the cheapest end stop
+    mask = full - 1
+    j = int(dp[mask].argmin())
+    order: list[int] = []
+    while j >= 0:
+        order.append(j)
+        prev = int(parent[mask, j])
+        mask ^= 1 << j
+        j = prev
+    order.reverse()
+    return order
+
+
+def _solve_order(
+    scores: np.ndarray,
+    neighbours: Optional[list[list[int]]] = None,
+    end_at: Optional[int] = None,
+) -> tuple[list[int], str, dict[str, Any]]:
+    """Pick the ordering strategy for a score matrix.
+
+    Routes with at most ROUTE_EXACT_MAX_STOPS destinations are solved exactly
+    with Held-Karp; larger routes (or a Held-Karp timeout) use
+    nearest-neighbour + local search, restricted to candidate edges when
+    ``neighbours`` is given.  ``end_at`` (a destination index) forces the
+    route to finish there.  Returns (order, solver, stats).
+    """
+    if end_at is not None and scores.shape[0] > 2:
+        return _solve_order_ending_at(scores, neighbours, end_at)
+    start = time.perf_counter()
+    greedy = _greedy_order(scores)
+    n_dest = len(greedy)
+
+    if n_dest <= _EXACT_MAX_STOPS:
+        exact = _held_karp_order(scores)
+        if exact is not None:
+            cost = scores.tolist()
+            initial = _path_cost(cost, [0] + [i + 1 for i in greedy])
+            final = _path_cost(cost, [0] + [i + 1 for i in exact])
+            return exact, 'held_karp', {
+                'initial_score': round(initial, 2),
+                'final_score': round(final, 2),
+                'improvement_pct': (
+                    round((initial - final) / abs(initial) * 100.0, 2) if initial else 0.0
+                ),
+                'moves': 0,
+                'elapsed_ms': round((time.perf_counter() - start) * 1000.0, 2),
+            }
+
+    order, stats = _improve_order(scores, greedy, neighbours=neighbours)
+    return order, 'local_search', stats
+
+
+def _solve_order_ending_at(
+    scores: np.ndarray,
+    neighbours: Optional[list[list[int]]],
+    end_at: int,
+) -> tuple[list[int], str, dict[str, Any]]:
+    """``_solve_order`` with destination ``end_at`` visited last: every leg
+    leaving it is penalised so any order that continues past it loses."""
+    penalised = scores.copy()
+    penalised[end_at + 1, :] += _FIXED_END_PENALTY
+    np.fill_diagonal(penalised, 0.0)
+    order, solver, stats = _solve_order(penalised, neighbours)
+    order = [i for i in order if i != end_at] + [end_at]
+
+    # Report scores without the penalty
+    greedy = _greedy_order(penalised)
+    greedy = [i for i in greedy if i != end_at] + [end_at]
+    cost = scores.tolist()
+    initial = _path_cost(cost, [0] + [i + 1 for i in greedy])
+    final = _path_cost(cost, [0] + [i + 1 for i in order])
+    return order, solver, {
+        **stats,
+        'initial_score': round(initial, 2),
+        'final_score': round(final, 2),
+        'improvement_pct': (
+            round((initial - final) / abs(initial) * 100.0, 2) if initial else 0.0
+        ),
+    }
+
+
+# ---------------------------------------------------------------------------
+# Local search (2-opt + Or-opt) on the composite score matrix
+# ---------------------------------------------------------------------------
+
+def _path_cost(cost: list[list[float]], path: list[int]) -> float:
+    return sum(cost[path[k]][path[k + 1]] for k in range(len(path) - 1))
+
+
+def _two_opt_pass(cost: list[list[float]], path: list[int], deadline: float) -> bool:
+    """Apply the first improving segment reversal.  Returns True if one was applied.
+
+    The path is open (no return leg) and the matrix may be asymmetric, so the
+    reversed segment's internal cost is accumulated incrementally.
+    """
+    n = len(path) - 1
+    for i in range(1, n):
+        if time.perf_counter() > deadline:
+            return False
+        a = path[i - 1]
+        internal = 0.0  # reversed-minus-forward cost of path[i..j]
+        for j in range(i + 1, n + 1):
+            internal += cost[path[j]][path[j - 1]] - cost[path[j - 1]][path[j]]
+            delta = cost[a][path[j]] - cost[a][path[i]] + internal
+            if j < n:
+                nxt = path[j + 1]
+                delta += cost[path[i]][nxt] - cost[path[j]][nxt]
+            if delta < -_IMPROVEMENT_EPS:
+                path[i:j + 1] = path[i:j + 1][::-1]
+                return True
+    return False
+
+
+def _or_opt_pass(cost: list[list[float]], path: list[int], deadline: float) -> bool:
+    """Move a chain of 1-3 consecutive stops to a better position.
+
+    Returns True if an improving move was applied.
+    """
+    n = len(path) - 1
+    for seg_len in (1, 2, 3):
+        for i in range(1, n - seg_len + 2):
+            if time.perf_counter() > deadline:
+                return False
+            first, last = path[i], path[i + seg_len - 1]
+            prev = path[i - 1]
+            nxt = path[i + seg_len] if i + seg_len <= n else None
+            removed_gain = cost[prev][first]
+            if nxt is not None:
+                removed_gain += cost[last][nxt] - cost[prev][nxt]
+
+            rest = path[:i] + path[i + seg_len:]
+            for k in range(len(rest)):
+                if k == i - 1:
+                    continue  # original position
+                a = rest[k]
+                b = rest[k + 1] if k + 1 < len(rest) else None
+                added = cost[a][first]
+                if b is not None:
+                    added += cost[last][b] - cost[a][b]
+                if added - removed_gain < -_IMPROVEMENT_EPS:
+                    path[:] = rest[:k + 1] + path[i:i + seg_len] + rest[k + 1:]
+                    return True
+    return False
+
+
+def _two_opt_pass_sparse(
+    cost: list[list[float]],
+    path: list[int],
+    neighbours: list[list[int]],
+    deadline: float,
+) -> bool:
+    """2-opt restricted to reversals that create at least one candidate edge.
+
+    Prefix sums of forward / backward leg costs give each reversal's internal
+    delta in O(1), so a pass is O(n·k) instead of O(n²).
+    """
+    n = len(path) - 1
+    pos = {node: idx for idx, node in enumerate(path)}
+    fwd = [0.0] * (n + 1)
+    rev = [0.0] * (n + 1)
+    for m in range(n):
+        fwd[m + 1] = fwd[m] + cost[path[m]][path[m + 1]]
+        rev[m + 1] = rev[m] + cost[path[m + 1]][path[m]]
+
+    for i in range(1, n):
+        if time.perf_counter() > deadline:
+            return False
+        a = path[i - 1]
+        ends = {pos[c] for c in neighbours[a]}              # new edge a → path[j]
+        ends.update(pos[c] - 1 for c in neighbours[path[i]])  # new edge path[i] → path[j+1]
+        for j in ends:
+            if j <= i or j > n:
+                continue
+            internal = (rev[j] - rev[i]) - (fwd[j] - fwd[i])
+            delta = cost[a][path[j]] - cost[a][path[i]] + internal
+            if j < n:
+                nxt = path[j + 1]
+                delta += cost[path[i]][nxt] - cost[path[j]][nxt]
+            if delta < -_IMPROVEMENT_EPS:
+                path[i:j + 1] = path[i:j + 1][::-1]
+                return True
+    return False
+
+
+def _or_opt_pass_sparse(
+    cost: list[list[float]],
+    path: list[int],
+    neighbours: list[list[int]],
+    deadline: float,
+) -> bool:
+    """Or-opt restricted to insertions right after a candidate of the
+    chain's first stop."""
+    n = len(path) - 1
+    for seg_len in (1, 2, 3):
+        for i in range(1, n - seg_len + 2):
+            if time.perf_counter() > deadline:
+                return False
+            segment = path[i:i + seg_len]
+            first, last = segment[0], segment[-1]
+            prev = path[i - 1]
+            nxt = path[i + seg_len] if i + seg_len <= n else None
+            removed_gain = cost[prev][first]
+            if nxt is not None:
+                removed_gain += cost[last][nxt] - cost[prev][nxt]
+
+            rest = path[:i] + path[i + seg_len:]
+            rest_pos = {node: idx for idx, node in enumerate(rest)}
+            for c in neighbours[first]:
+                k = rest_pos.get(c)
+                if k is None or k == i - 1:
+                    continue  # inside the chain, or its original position
+                b = rest[k + 1] if k + 1 < len(rest) else None
+                added = cost[c][first]
+                if b is not None:
+                    added += cost[last][b] - cost[c][b]
+                if added - removed_gain < -_IMPROVEMENT_EPS:
+                    path[:] = rest[:k + 1] + segment + rest[k + 1:]
+                    return True
+    return False
+
+
+def _improve_order(
+    scores: np.ndarray,
+    order: list[int],
+    budget_ms: Optional[float] = None,
+    neighbours: Optional[list[list[int]]] = None,
+) -> tuple[list[int], dict[str, Any]]:
+    """Run 2-opt and Or-opt moves on a destination order until no move
+    improves the total score or the time budget runs out.
+
+    ``neighbours`` (candidate lists over location indices, origin = 0)
+    restricts the moves to those creating candidate edges.
+
+    Returns the improved order (destination indices) plus a stats dict.
+    """
+    if budget_ms is None:
+        budget_ms = _LOCAL_SEARCH_BUDGET_MS
+    start = time.perf_counter()
+    deadline = start + budget_ms / 1000.0
+
+    cost = scores.tolist()
+    path = [0] + [i + 1 for i in order]
+    initial = _path_cost(cost, path)
+    moves = 0
+
+    def _apply_move() -> bool:
+        if neighbours is None:
+            return _two_opt_pass(cost, path, deadline) or _or_opt_pass(cost, path, deadline)
+        return (
+            _two_opt_pass_sparse(cost, path, neighbours, deadline)
+            or _or_opt_pass_sparse(cost, path, neighbours, deadline)
+        )
+
+    if len(order) > 2:
+        while time.perf_counter() < deadline:
+            if _apply_move():
+                moves += 1
+                continue
+            break
+    final = _path_cost(cost, path)
+
+    stats = {
+        'initial_score': round(initial, 2),
+        'final_score': round(final, 2),
+        'improvement_pct': (
+            round((initial - final) / abs(initial) * 100.0, 2) if initial else 0.0
+        ),
+        'moves': moves,
+        'elapsed_ms': round((time.perf_counter() - start) * 1000.0, 2),
+    }
+    if neighbours is not None:
+        stats['candidate_edges'] = sum(len(c) for c in neighbours)
+    return [p - 1 for p in path[1:]], stats
+
+
 # ---------------------------------------------------------------------------
 # Google Directions API → road polyline + confirmed distance/duration
 # ---------------------------------------------------------------------------
 
-def _fetch_directions(
+async def _fetch_directions(
     origin_ll: str,
     destination_ll: str,
     waypoints: list[str],
     api_key: str,
-    client: httpx.Client,
+    client: httpx.AsyncClient,
 ) -> dict[str, Any]:
     """Call Directions API with ordered waypoints.  Returns raw API response."""
     params: dict[str, Any] = {
@@ -307,20 +1315,105 @@ def _fetch_directions(
     if waypoints:
         params['waypoints'] = '|'.join(waypoints)
 
-    resp = client.get(_GOOGLE_DIRECTIONS_URL, params=params, timeout=_REQUEST_TIMEOUT)
+    resp = await outbound_guard.get_async(client, _GOOGLE_DIRECTIONS_URL, params=params, timeout=_REQUEST_TIMEOUT)
     resp.raise_for_status()
     return resp.json()
 
 
-def _parse_directions(directions_data: dict) -> tuple[list[dict], float, float]:
-    """Extract polyline points, total distance (km) and duration (min)."""
+def _directions_segments(n_points: int) -> list[tuple[int, int]]:
+    """(start, end) index pairs covering a path of ``n_points`` stops with at
+    most _DIRECTIONS_MAX_WAYPOINTS waypoints in between; consecutive segments
+    share their boundary stop."""
+    step = _DIRECTIONS_MAX_WAYPOINTS + 1
+    return [(start, min(start + step, n_points - 1)) for start in range(0, n_points - 1, step)]
+
+
+async def _fetch_directions_segments(
+    points_ll: list[str],
+    api_key: str,
+    client: httpx.AsyncClient,
+) -> Optional[list[dict[str, Any]]]:
+    """Raw Directions responses covering ``points_ll`` in order, one per
+    waypoint-limited segment, fetched concurrently.  None if any segment
+    fails, so the caller falls back for the whole route."""
+    segments = _directions_segments(len(points_ll))
+    semaphore = asyncio.Semaphore(max(1, _DIRECTIONS_CONCURRENCY))
+
+    async def _segment(start: int, end: int) -> dict[str, Any]:
+        async with semaphore:
+            data = await _fetch_directions(
+                points_ll[start], points_ll[end], points_ll[start + 1:end], api_key, client
+            )
+        if data.get('status') != 'OK':
+            raise ValueError(f"Directions API status: {data.get('status')}")
+        if not _parse_directions(data)[0]:
+            raise ValueError('Directions API returned no polyline')
+        return data
+
+    results = await asyncio.gather(
+        *(_segment(start, end) for start, end in segments), return_exceptions=True
+    )
+    failed = [res for res in results if isinstance(res, BaseException)]
+    if failed:
+        logger.warning(
+            'Directions: %d/%d segment(s) failed (%s)', len(failed), len(segments), failed[0]
+        )
+        return None
+    return results
+
+
+async def _fetch_directions_route(
+    points_ll: list[str],
+    api_key: str,
+    client: httpx.AsyncClient,
+) -> Optional[dict[str, Any]]:
+    """Road route through ``points_ll`` in order, any number of stops.
+
+    Returns {'encoded', 'lats', 'lngs', 'distance_km', 'duration_min'} —
+    a single-segment route keeps Google's encoded polyline (lats/lngs None),
+    a multi-segment one is decoded and stitched (encoded None).  Returns None
+    if any segment fails, so the caller falls back for the whole route.
+    """
+    responses = await _fetch_directions_segments(points_ll, api_key, client)
+    if responses is None:
+        return None
+    results = [_parse_directions(data) for data in responses]
+
+    distance_km = sum(res[1] for res in results)
+    duration_min = sum(res[2] for res in results)
+    if len(results) == 1:
+        return {
+            'encoded': results[0][0], 'lats': None, 'lngs': None,
+            'distance_km': distance_km, 'duration_min': duration_min,
+        }
+    lat_parts: list[np.ndarray] = []
+    lng_parts: list[np.ndarray] = []
+    for k, (encoded, _, _) in enumerate(results):
+        seg_lats, seg_lngs = decode_arrays(encoded)
+        skip = 1 if k else 0   # boundary stop already ends the previous segment
+        lat_parts.append(seg_lats[skip:])
+        lng_parts.append(seg_lngs[skip:])
+    return {
+        'encoded': None,
+        'lats': np.concatenate(lat_parts),
+        'lngs': np.concatenate(lng_parts),
+        'distance_km': distance_km,
+        'duration_min': duration_min,
+    }
+
+
+def _parse_directions(directions_data: dict) -> tuple[str, float, float]:
+    """Extract the encoded overview polyline, total distance (km) and duration (min).
+
+    The polyline is left encoded; it is only decoded if the requested
+    ``polyline_format`` needs coordinates.
+    """
     routes = directions_data.get('routes', [])
     if not routes:
-        return [], 0.0, 0.0
+        return '', 0.0, 0.0
 
     route = routes[0]
     overview_polyline = route.get('overview_polyline', {}).get('points', '')
-    polyline_points = decode_polyline(overview_polyline) if overview_polyline else []
 
     total_dist_m = 0.0
     total_dur_sec = 0.0
@@ -329,33 +1422,151 @@ def _parse_directions(directions_data: dict) -> tuple[list[dict], float, float]:
         dur = leg.get('duration_in_traffic') or leg.get('duration', {})
         total_dur_sec += dur.get('value', 0)
 
-    return polyline_points, total_dist_m / 1000.0, total_dur_sec / 60.0
+    return overview_polyline, total_dist_m / 1000.0, total_dur_sec / 60.0
+
+
+async def _fetch_directions_legs(
+    points_ll: list[str],
+    api_key: str,
+    client: httpx.AsyncClient,
+) -> Optional[list[dict[str, Any]]]:
+    """Per-leg road geometry for ``points_ll`` in order: len(points_ll) - 1
+    dicts {'lats', 'lngs', 'distance_km', 'duration_min'}, or None if any
+    segment fails."""
+    responses = await _fetch_directions_segments(points_ll, api_key, client)
+    if responses is None:
+        return None
+    legs = [leg for data in responses for leg in _parse_directions_legs(data)]
+    if len(legs) != len(points_ll) - 1:
+        logger.warning('Directions: expected %d legs, got %d', len(points_ll) - 1, len(legs))
+        return None
+    return legs
+
+
+def _parse_directions_legs(directions_data: dict) -> list[dict[str, Any]]:
+    """Split a Directions response into legs, each with the geometry of its
+    steps decoded and joined."""
+    routes = directions_data.get('routes', [])
+    if not routes:
+        return []
+    legs: list[dict[str, Any]] = []
+    for leg in routes[0].get('legs', []):
+        lat_parts: list[np.ndarray] = []
+        lng_parts: list[np.ndarray] = []
+        for k, step in enumerate(leg.get('steps', [])):
+            step_lats, step_lngs = decode_arrays(step.get('polyline', {}).get('points', ''))
+            skip = 1 if k and len(step_lats) else 0   # steps share their end points
+            lat_parts.append(step_lats[skip:])
+            lng_parts.append(step_lngs[skip:])
+        dur = leg.get('duration_in_traffic') or leg.get('duration', {})
+        legs.append({
+            'lats': np.concatenate(lat_parts) if lat_parts else np.empty(0),
+            'lngs': np.concatenate(lng_parts) if lng_parts else np.empty(0),
+            'distance_km': leg.get('distance', {}).get('value', 0) / 1000.0,
+            'duration_min': dur.get('value', 0) / 60.0,
+        })
+    return legs
+
+
+# ---------------------------------------------------------------------------
+# Pipeline stages (shared with trip_session.py)
+# ---------------------------------------------------------------------------
+
+async def _stop_weather(
+    locations: list[dict[str, Any]],
+    depart_ts: float,
+    client: httpx.AsyncClient,
+) -> tuple[list[Optional[dict[str, Any]]], list[dict[str, Any]]]:
+    """(hourly forecasts, scoring weather) per location, the latter at each
+    location's estimated direct arrival from locations[0]."""
+    coords = [(float(loc['latitude']), float(loc['longitude'])) for loc in locations]
+    return await _weather_stage(coords, _direct_etas(locations, depart_ts), client)
+
+
+async def _travel_matrix(
+    locations: list[dict[str, Any]],
+    api_key: str,
+    client: httpx.AsyncClient,
+    depart_ts: float,
+    road: Optional[RoadGraph],
+    places: Optional[PlaceGraph],
+) -> tuple[list[list[dict]], Optional[list[list[int]]]]:
+    """(travel matrix, sparse candidate lists or None) for ``locations``,
+    from the road graph / leg cache / place graph / Distance Matrix API per
+    ROUTE_ROAD_GRAPH_MODE; the matrix is [] when nothing could be priced."""
+    neighbours: Optional[list[list[int]]] = None
+    if len(locations) - 1 > _SPARSE_MIN_STOPS:
+        neighbours = _candidate_neighbours(_haversine_matrix_km(locations), _SPARSE_K)
+    matrix: list[list[dict]] = []
+    if road is not None and _ROAD_GRAPH_MODE == 'primary':
+        matrix = await asyncio.to_thread(_road_graph_matrix, road, locations)
+    if not matrix and (api_key or places is not None):
+        matrix = await _build_distance_matrix(
+            locations, api_key, client, depart_ts, neighbours, places
+        )
+    if not matrix and road is not None and _ROAD_GRAPH_MODE == 'fallback':
+        matrix = await asyncio.to_thread(_road_graph_matrix, road, locations)
+    return matrix, neighbours
 
 
 # ---------------------------------------------------------------------------
 # Public API
 # ---------------------------------------------------------------------------
 
-def optimize_route(
+async def optimize_route_async(
     origin: dict[str, Any],
     destinations: list[dict[str, Any]],
+    polyline_format: str = 'points',
+    polyline_tolerance_m: Optional[float] = None,
+    polyline_zoom: Optional[float] = None,
+    on_event: Optional[Callable[[dict[str, Any]], None]] = None,
+    end_at: Optional[int] = None,
+    depart_ts: Optional[float] = None,
 ) -> dict[str, Any]:
-    """Full route optimization pipeline.
+    """Full route optimization pipeline, non-blocking.
+
+    All HTTP calls share one ``httpx.AsyncClient``; the weather and distance
+    matrix stages run concurrently (both only need the input stops), and the
+    CPU-bound scoring / ordering and the SQLite leg cache run in worker
+    threads, so the event loop stays free for other requests throughout.
 
     Parameters
     ----------
     origin : {'latitude': float, 'longitude': float, ...}
     destinations : list of place dicts (must have latitude, longitude)
+    polyline_format : 'points' | 'encoded' | 'simplified' | 'flat'
+    polyline_tolerance_m : Douglas–Peucker tolerance for 'simplified'
+    polyline_zoom : map zoom level for 'simplified' (≈1 px tolerance) when
+                    no explicit tolerance is given
+    on_event : optional callback for ordering progress (used for streaming):
+               a preliminary 'order' event from cached legs / haversine as soon
+               as it is solved, then the final 'order' on road travel times
+    end_at : index into ``destinations`` of a stop that must be visited last
+    depart_ts : departure time (unix seconds) for forecasts and traffic;
+                defaults to now
 
     Returns
     -------
     {
       'optimized_stops':  list of destination dicts in visit order,
-      'polyline_points':  [{'latitude': float, 'longitude': float}, ...],
+      'polyline_points':  [{'latitude': float, 'longitude': float}, ...]
+                          ('points' / 'simplified', otherwise []),
+      'polyline_encoded': Google encoded polyline ('encoded', otherwise None),
+      'polyline_flat':    {'latitude': [...], 'longitude': [...]}
+                          ('flat', otherwise None),
       'total_distance_km': float,
       'total_duration_min': float,
       'weather_info':     list of per-stop weather dicts,
-      'optimization_method': 'google_directions' | 'haversine_fallback',
+      'optimization_method': '<source>+<solver>', where source is
+                             'google_directions' | 'road_graph' |
+                             'haversine_fallback' and
+                             solver is 'nearest_neighbour' | 'held_karp' |
+                             'local_search',
+      'route_improvement': {initial_score, final_score, improvement_pct,
+                            moves, elapsed_ms} or None,
+      'stage_timings_ms': {weather, distance_matrix, ordering, directions, total};
+                          weather and distance_matrix overlap in time,
+      'cache': {hit, age_s, weather_refreshed},
     }
     """
     api_key = os.getenv('GOOGLE_MAPS_API_KEY', '').strip()
@@ -363,116 +1574,356 @@ def optimize_route(
     if not destinations:
         return {
             'optimized_stops': [],
-            'polyline_points': [],
+            **format_polyline(polyline_format, encoded=''),
             'total_distance_km': 0.0,
             'total_duration_min': 0.0,
             'weather_info': [],
             'optimization_method': 'no_destinations',
+            'route_improvement': None,
+            'stage_timings_ms': {},
         }
 
-    with httpx.Client(follow_redirects=True, timeout=20.0) as client:
-        # ---- Step 1: Fetch weather for all locations ----
-        all_locations = [origin] + list(destinations)
-        weather_data: list[dict] = []
-        for loc in all_locations:
-            w = _fetch_weather(
-                float(loc['latitude']),
-                float(loc['longitude']),
-                client,
-            )
-            weather_data.append(w)
-
-        # ---- Step 2: Distance matrix (if API key available) ----
-        distance_matrix: list[list[dict]] = []
-        if api_key:
-            coord_strings = [
-                _latlng(float(loc['latitude']), float(loc['longitude']))
-                for loc in all_locations
-            ]
-            distance_matrix = _fetch_distance_matrix(
-                coord_strings, coord_strings, api_key, client
-            )
+    timings: dict[str, float] = {}
+    started = time.perf_counter()
 
-        # ---- Step 3: TSP nearest-neighbour on composite scores ----
+    async def _timed(name: str, coro):
+        stage_start = time.perf_counter()
+        try:
+            return await coro
+        finally:
+            timings[name] = round((time.perf_counter() - stage_start) * 1000.0, 1)
+
+    if depart_ts is None:
+        depart_ts = time.time()
+    # The fingerprint ignores destination order, so name the fixed last stop
+    # by its place key rather than its index
+    end_key = place_key(destinations[end_at]) if end_at is not None else None
+    cache_key = route_fingerprint(
+        origin, destinations, depart_ts, (polyline_format, polyline_tolerance_m, polyline_zoom, end_key)
+    )
+    cached = route_cache.get(cache_key)
+    if cached is not None:
+        return await _serve_cached_route(cache_key, cached, destinations, started)
+
+    all_locations = [origin] + list(destinations)
+
+    def _order_stops() -> tuple[list[int], str, Optional[dict[str, Any]]]:
         if len(destinations) == 1:
-            ordered_dest_indices = [0]
-        else:
-            ordered_dest_indices = _nearest_neighbour_tsp(
-                all_locations, distance_matrix, weather_data
-            )
+            return [0], 'nearest_neighbour', None
+        scores = _build_score_matrix(all_locations, distance_matrix, weather_data)
+        order, solver, stats = _solve_order(scores, neighbours, end_at)
+        logger.info(
+            'Route ordering (%s): %.2f%% better than greedy in %.1f ms',
+            solver, stats['improvement_pct'], stats['elapsed_ms'],
+        )
+        return order, solver, stats
 
+    road: Optional[RoadGraph] = None
+    if _ROAD_GRAPH_MODE in ('primary', 'fallback'):
+        road = await asyncio.to_thread(get_road_graph)
+    places: Optional[PlaceGraph] = await asyncio.to_thread(get_place_graph)
+
+    async def _preview_stage() -> None:
+        order = await asyncio.to_thread(_preliminary_order, all_locations, depart_ts)
+        on_event({'event': 'order', 'stage': 'preliminary', 'order': order})
+
+    async with httpx.AsyncClient(follow_redirects=True, timeout=20.0) as client:
+        # ---- Steps 1 + 2: Weather and distance matrix, concurrently ----
+        stages = [
+            _timed('weather', _stop_weather(all_locations, depart_ts, client)),
+            _timed('distance_matrix', _travel_matrix(all_locations, api_key, client, depart_ts, road, places)),
+        ]
+        if on_event is not None:
+            stages.append(_timed('preview', _preview_stage()))
+        (forecasts, weather_data), (distance_matrix, neighbours), *_ = await asyncio.gather(*stages)
+
+        # ---- Step 3: Order stops on composite scores (exact or heuristic) ----
+        ordered_dest_indices, solver, route_improvement = await _timed(
+            'ordering', asyncio.to_thread(_order_stops)
+        )
         ordered_destinations = [destinations[i] for i in ordered_dest_indices]
-        ordered_weather = [weather_data[i + 1] for i in ordered_dest_indices]
+        if on_event is not None:
+            on_event({
+                'event': 'order',
+                'stage': 'final',
+                'order': ordered_dest_indices,
+                'solver': solver,
+                'route_improvement': route_improvement,
+            })
+        # Report weather for the forecast hour of the actual arrival in this order
+        arrivals = _arrival_times(
+            all_locations, distance_matrix, ordered_dest_indices, depart_ts
+        )
+        ordered_weather = [
+            _forecast_at(forecasts[i + 1], eta) or weather_data[i + 1]
+            for i, eta in zip(ordered_dest_indices, arrivals)
+        ]
 
-        # ---- Step 4: Fetch actual road polyline from Directions API ----
-        polyline_points: list[dict] = []
-        total_distance_km = 0.0
-        total_duration_min = 0.0
+        # ---- Step 4: Road polyline from Directions API (or the road graph) ----
+        directions_start = time.perf_counter()
         method = 'haversine_fallback'
+        path = [origin] + ordered_destinations
+        lats = np.array([float(p['latitude']) for p in path])
+        lngs = np.array([float(p['longitude']) for p in path])
 
-        if api_key:
-            try:
-                origin_ll = _latlng(
-                    float(origin['latitude']), float(origin['longitude'])
-                )
-                dest_ll = _latlng(
-                    float(ordered_destinations[-1]['latitude']),
-                    float(ordered_destinations[-1]['longitude']),
-                )
-                waypoint_lls = [
-                    _latlng(float(d['latitude']), float(d['longitude']))
-                    for d in ordered_destinations[:-1]
-                ]
+        # routed: {'encoded' (optional), 'lats', 'lngs', 'distance_km', 'duration_min'}
+        routed: Optional[dict[str, Any]] = None
+        if road is not None and _ROAD_GRAPH_MODE == 'primary':
+            routed = await asyncio.to_thread(road.route, lats, lngs)
+            method = 'road_graph' if routed is not None else method
 
-                directions = _fetch_directions(
-                    origin_ll, dest_ll, waypoint_lls, api_key, client
+        if routed is None and api_key:
+            try:
+                routed = await _fetch_directions_route(
+                    [_latlng(lat, lng) for lat, lng in zip(lats.tolist(), lngs.tolist())],
+                    api_key,
+                    client,
                 )
-                if directions.get('status') == 'OK':
-                    polyline_points, total_distance_km, total_duration_min = (
-                        _parse_directions(directions)
-                    )
-                    method = 'google_directions'
-                else:
-                    logger.warning(
-                        'Directions API returned status: %s',
-                        directions.get('status'),
-                    )
+                method = 'google_directions' if routed is not None else method
             except Exception as exc:
                 logger.warning('Directions API call failed: %s', exc)
 
-        # Haversine fallback for distance/polyline when Directions API fails
-        if not polyline_points:
-            polyline_points = [
-                {'latitude': float(origin['latitude']), 'longitude': float(origin['longitude'])}
-            ]
-            for d in ordered_destinations:
-                polyline_points.append({
-                    'latitude': float(d['latitude']),
-                    'longitude': float(d['longitude']),
-                })
-            # Estimate distance + time (~50 km/h average road speed in Sri Lanka)
-            total_distance_km = sum(
-                _haversine_km(
-                    float(polyline_points[i]['latitude']),
-                    float(polyline_points[i]['longitude']),
-                    float(polyline_points[i + 1]['latitude']),
-                    float(polyline_points[i + 1]['longitude']),
-                )
-                for i in range(len(polyline_points) - 1)
-            )
-            total_duration_min = (total_distance_km / 50.0) * 60.0
+        if routed is None and road is not None and _ROAD_GRAPH_MODE == 'fallback':
+            routed = await asyncio.to_thread(road.route, lats, lngs)
+            method = 'road_graph' if routed is not None else method
 
-        return {
-            'optimized_stops': ordered_destinations,
-            'polyline_points': polyline_points,
-            'total_distance_km': round(total_distance_km, 2),
-            'total_duration_min': round(total_duration_min, 1),
-            'weather_info': [
-                {
-                    'stop_name': ordered_destinations[i].get('name', ''),
-                    **ordered_weather[i],
-                }
-                for i in range(len(ordered_destinations))
-            ],
-            'optimization_method': method,
+    # Haversine fallback for distance/polyline when neither source routed
+    if routed is not None:
+        total_distance_km = routed['distance_km']
+        total_duration_min = routed['duration_min']
+        polyline = format_polyline(
+            polyline_format, encoded=routed.get('encoded'),
+            lats=routed['lats'], lngs=routed['lngs'],
+            tolerance_m=polyline_tolerance_m, zoom=polyline_zoom,
+        )
+    else:
+        # Estimate distance + time at the average road speed in Sri Lanka
+        total_distance_km = float(
+            haversine_np(lats[:-1], lngs[:-1], lats[1:], lngs[1:]).sum()
+        )
+        total_duration_min = (total_distance_km / _FALLBACK_SPEED_KMH) * 60.0
+        polyline = format_polyline(
+            polyline_format, lats=lats, lngs=lngs,
+            tolerance_m=polyline_tolerance_m, zoom=polyline_zoom,
+        )
+    timings['directions'] = round((time.perf_counter() - directions_start) * 1000.0, 1)
+
+    timings['total'] = round((time.perf_counter() - started) * 1000.0, 1)
+    logger.info('Route optimize stage timings (ms): %s', timings)
+
+    result = {
+        'optimized_stops': ordered_destinations,
+        **polyline,
+        'total_distance_km': round(total_distance_km, 2),
+        'total_duration_min': round(total_duration_min, 1),
+        'weather_info': [
+            {
+                'stop_name': ordered_destinations[i].get('name', ''),
+                **ordered_weather[i],
+            }
+            for i in range(len(ordered_destinations))
+        ],
+        'optimization_method': f'{method}+{solver}',
+        'route_improvement': route_improvement,
+        'stage_timings_ms': timings,
+        'cache': {'hit': False, 'age_s': 0.0, 'weather_refreshed': False},
+    }
+    # Don't pin a degraded answer caused by a transient Google failure
+    if not (api_key and method == 'haversine_fallback'):
+        route_cache.put(cache_key, {
+            'result': {
+                k: v for k, v in result.items()
+                if k not in ('optimized_stops', 'weather_info', 'stage_timings_ms', 'cache')
+            },
+            'order_keys': [place_key(d) for d in ordered_destinations],
+            'eta_offsets': [eta - depart_ts for eta in arrivals],
+            'weather_info': result['weather_info'],
+        })
+    return result
+
+
+async def _serve_cached_route(
+    cache_key: str,
+    entry: dict[str, Any],
+    destinations: list[dict[str, Any]],
+    started: float,
+) -> dict[str, Any]:
+    """Response for a cached route; the weather block is re-fetched at the
+    stored arrival offsets when it is older than the weather TTL."""
+    # Map the stored order back onto this request's place dicts
+    by_key: dict[str, list[dict[str, Any]]] = {}
+    for dest in destinations:
+        by_key.setdefault(place_key(dest), []).append(dest)
+    ordered = [by_key[k].pop(0) for k in entry['order_keys']]
+
+    timings: dict[str, float] = {}
+    weather_info = entry['weather_info']
+    if entry['weather_stale']:
+        coords = [(float(d['latitude']), float(d['longitude'])) for d in ordered]
+        now = time.time()
+        etas = [now + offset for offset in entry['eta_offsets']]
+        async with httpx.AsyncClient(follow_redirects=True, timeout=20.0) as client:
+            weather = await _fetch_weather_all(coords, client, etas)
+        weather_info = [
+            {'stop_name': d.get('name', ''), **w} for d, w in zip(ordered, weather)
+        ]
+        route_cache.update_weather(cache_key, weather_info)
+        timings['weather'] = round((time.perf_counter() - started) * 1000.0, 1)
+    timings['total'] = round((time.perf_counter() - started) * 1000.0, 1)
+
+    return {
+        **entry['result'],
+        'optimized_stops': ordered,
+        'weather_info': weather_info,
+        'stage_timings_ms': timings,
+        'cache': {
+            'hit': True,
+            'age_s': entry['age_s'],
+            'weather_refreshed': entry['weather_stale'],
+        },
+    }
+
+
+def _preliminary_order(locations: list[dict[str, Any]], depart_ts: float) -> list[int]:
+    """Quick visit order for the first streamed paint: persistent-cache legs
+    where known, straight-line estimates elsewhere, no weather."""
+    n = len(locations)
+    if n <= 2:
+        return list(range(n - 1))
+    keys = [place_key(loc) for loc in locations]
+    cached = travel_time_cache.get_many(
+        [(keys[i], keys[j]) for i in range(n) for j in range(n) if i != j],
+        hour_of_week(depart_ts),
+    )
+    dist_km = _haversine_matrix_km(locations)
+    matrix = [
+        [
+            cached.get((keys[i], keys[j])) or {
+                'duration_sec': int(dist_km[i, j] / _FALLBACK_SPEED_KMH * 3600),
+                'distance_m': int(dist_km[i, j] * 1000),
+            }
+            for j in range(n)
+        ]
+        for i in range(n)
+    ]
+    scores = _build_score_matrix(locations, matrix, [_default_weather()] * n)
+    neighbours = _candidate_neighbours(dist_km, _SPARSE_K) if n - 1 > _SPARSE_MIN_STOPS else None
+    order, _, _ = _solve_order(scores, neighbours)
+    return order
+
+
+def _polyline_chunks(result: dict[str, Any]) -> list[dict[str, Any]]:
+    """Split a result's polyline into streamable 'polyline' events."""
+    size = max(1, _STREAM_POLYLINE_CHUNK)
+    if result.get('polyline_encoded') is not None:
+        chunks = [{'encoded': result['polyline_encoded']}]
+    elif result.get('polyline_flat') is not None:
+        lats = result['polyline_flat']['latitude']
+        lngs = result['polyline_flat']['longitude']
+        chunks = [
+            {'latitude': lats[k:k + size], 'longitude': lngs[k:k + size]}
+            for k in range(0, len(lats), size)
+        ]
+    else:
+        points = result['polyline_points']
+        chunks = [{'points': points[k:k + size]} for k in range(0, len(points), size)]
+    return [
+        {'event': 'polyline', 'index': k, 'last': k == len(chunks) - 1, **chunk}
+        for k, chunk in enumerate(chunks)
+    ]
+
+
+async def optimize_route_stream(
+    origin: dict[str, Any],
+    destinations: list[dict[str, Any]],
+    polyline_format: str = 'points',
+    polyline_tolerance_m: Optional[float] = None,
+    polyline_zoom: Optional[float] = None,
+) -> AsyncIterator[dict[str, Any]]:
+    """Run the pipeline and yield progress events as they become available.
+
+    Events (``order`` holds indices into ``destinations``):
+      {'event': 'order', 'stage': 'preliminary', 'order'}   cached legs / haversine
+      {'event': 'order', 'stage': 'final', 'order', 'solver', 'route_improvement'}
+      {'event': 'route', 'total_distance_km', 'total_duration_min',
+                         'optimization_method', 'polyline_format', 'polyline_chunks'}
+      {'event': 'polyline', 'index', 'last', 'points' | 'latitude'+'longitude' | 'encoded'}
+      {'event': 'weather', 'weather_info'}
+      {'event': 'done', 'stage_timings_ms', 'cache'}
+    A cache hit skips the preliminary order.
+    """
+    queue: asyncio.Queue = asyncio.Queue()
+    task = asyncio.create_task(optimize_route_async(
+        origin,
+        destinations,
+        polyline_format=polyline_format,
+        polyline_tolerance_m=polyline_tolerance_m,
+        polyline_zoom=polyline_zoom,
+        on_event=queue.put_nowait,
+    ))
+    final_sent = False
+    try:
+        while True:
+            getter = asyncio.ensure_future(queue.get())
+            done, _ = await asyncio.wait({getter, task}, return_when=asyncio.FIRST_COMPLETED)
+            if getter not in done:
+                getter.cancel()
+                break
+            event = getter.result()
+            final_sent = final_sent or event.get('stage') == 'final'
+            yield event
+        while not queue.empty():
+            event = queue.get_nowait()
+            final_sent = final_sent or event.get('stage') == 'final'
+            yield event
+        result = task.result()
+    finally:
+        if not task.done():
+            task.cancel()
+
+    if not final_sent:
+        index_of = {id(d): i for i, d in enumerate(destinations)}
+        yield {
+            'event': 'order',
+            'stage': 'final',
+            'order': [index_of[id(d)] for d in result['optimized_stops']],
+            'solver': result['optimization_method'].partition('+')[2] or None,
+            'route_improvement': result['route_improvement'],
         }
+    chunks = _polyline_chunks(result)
+    yield {
+        'event': 'route',
+        'total_distance_km': result['total_distance_km'],
+        'total_duration_min': result['total_duration_min'],
+        'optimization_method': result['optimization_method'],
+        'polyline_format': polyline_format,
+        'polyline_chunks': len(chunks),
+    }
+    for chunk in chunks:
+        yield chunk
+    yield {'event': 'weather', 'weather_info': result['weather_info']}
+    yield {
+        'event': 'done',
+        'stage_timings_ms': result['stage_timings_ms'],
+        'cache': result.get('cache'),
+    }
+
+
+def optimize_route(
+    origin: dict[str, Any],
+    destinations: list[dict[str, Any]],
+    polyline_format: str = 'points',
+    polyline_tolerance_m: Optional[float] = None,
+    polyline_zoom: Optional[float] = None,
+) -> dict[str, Any]:
+    """Blocking wrapper around :func:`optimize_route_async` for scripts and
+    tests.  Must not be called from inside a running event loop — FastAPI
+    handlers await ``optimize_route_async`` directly.
+    """
+    return asyncio.run(optimize_route_async(
+        origin,
+        destinations,
+        polyline_format=polyline_format,
+        polyline_tolerance_m=polyline_tolerance_m,
+        polyline_zoom=polyline_zoom,
+    ))
@@ -21,10 +21,36 @@ Architecture:
         final = (semantic × 0.55) + (distance_weight × 0.25) + (rating × 0.10)
                 × category_boost (×1.4 if detected category matches)
 
+      computed as array ops over columnar place data (_PlaceColumns:
+      lat / lng, precomputed rating score, category codes); only the
+      top_n rows are turned into result dicts
+
+  • Spatial prefilter
+      - a KD-tree over the places' unit-sphere coordinates, built with the
+        index, returns the places inside the radius; similarity is computed
+        for those rows only, so radius queries stay near-constant as the
+        catalogue grows
+
+  • Query embedding cache (query_embedding_cache.py)
+      - the normalised query text is encoded once per model and reused
+        (LRU + TTL in memory, optional SQLite tier)
+
+  • Vector storage (vector_store.py)
+      - vectors are memory-mapped read-only (shared by all workers through
+        the OS page cache); by default as int8 codes + per-vector scales,
+        with the best top_n × SEMANTIC_RESCORE_FACTOR (default 4) candidates
+        re-scored against the float32 vectors
+
   • Fallback chain:
         1. radius filter → 2. expand radius ×3 → 3. pure semantic (no radius)
 
-  • Auto-persists index to disk (ml_models/semantic_*.npy / .json).
+  • Approximate search (ann_index.py)
+      - queries without a centre rank only the IVF candidates
+        (max(top_n × 10, 200) most similar vectors) instead of every place;
+        radius queries stay exact.  Catalogues below SEMANTIC_ANN_MIN_SIZE
+        get an ExactIndex and every place is scored, as without an index.
+
+  • Auto-persists index to disk (ml_models/semantic_*.npy / .json / .npz).
     Rebuilds in background when place count drifts >10 %.
 """
 
@@ -36,10 +62,17 @@ import math
 import os
 import re
 import threading
+from dataclasses import dataclass
 from pathlib import Path
 from typing import Optional
 
 import numpy as np
+from scipy.spatial import cKDTree
+
+from .ann_index import ExactIndex, build_ann_index, load_ann_index
+from .geo import EARTH_RADIUS_KM, distance_vector_km, unit_vectors
+from .query_embedding_cache import QueryEmbeddingCache, normalise_query
+from .vector_store import VECTOR_FORMAT, QuantizedVectors, load_vectors, save_vectors, vector_info
 
 logger = logging.getLogger(__name__)
 
@@ -52,6 +85,7 @@ _MODELS_DIR.mkdir(exist_ok=True)
 
 _VECTORS_PATH = _MODELS_DIR / 'semantic_vectors.npy'
 _PLACES_PATH  = _MODELS_DIR / 'semantic_places.json'
+_ANN_PATH     = _MODELS_DIR / 'semantic_ivf.npz'
 
 # Model — multilingual MiniLM handles EN/Sinhala/Tamil
 # Override via SEMANTIC_MODEL env var to swap in a higher-accuracy model without code changes
@@ -60,6 +94,18 @@ _MODEL_NAME = os.getenv('SEMANTIC_MODEL', 'paraphrase-multilingual-MiniLM-L12-v2
 # Minimum number of places that must change before a background rebuild is triggered
 _REBUILD_DRIFT_THRESHOLD_PCT = 0.10  # 10% of index size
 
+# A radius query hitting more than this share of the catalogue scores all
+# vectors in one matmul instead of gathering the candidate rows
+_SPATIAL_GATHER_MAX_FRACTION = 0.5
+
+# Candidates (× top_n) re-scored in float32 when searching int8 vectors
+_RESCORE_FACTOR = int(os.getenv('SEMANTIC_RESCORE_FACTOR', '4'))
+
+# ANN candidates ranked per unfiltered query: rating and category boost can
+# lift a place above more similar ones, so rank well beyond top_n
+_ANN_OVERSAMPLE = 10
+_ANN_MIN_CANDIDATES = 200
+
 # ---------------------------------------------------------------------------
 # Intent keywords  (English + Sinhala romanised + Tamil romanised)
 # ---------------------------------------------------------------------------
@@ -203,9 +249,9 @@ def geocode_location(location: str) -> Optional[tuple[float, float]]:
 
 
 def _geocode_google(location: str, api_key: str) -> Optional[tuple[float, float]]:
-    import httpx
+    from .outbound_guard import outbound_guard
     try:
-        resp = httpx.get(
+        resp = outbound_guard.get(
             'https://maps.googleapis.com/maps/api/geocode/json',
             params={
                 'address': f'{location}, Sri Lanka',
@@ -225,9 +271,9 @@ def _geocode_google(location: str, api_key: str) -> Optional[tuple[float, float]
 
 
 def _geocode_nominatim(location: str) -> Optional[tuple[float, float]]:
-    import httpx
+    from .outbound_guard import outbound_guard
     try:
-        resp = httpx.get(
+        resp = outbound_guard.get(
             'https://nominatim.openstreetmap.org/search',
             params={'q': f'{location}, Sri Lanka', 'format': 'json', 'limit': 1},
             headers={'User-Agent': 'SeyGoTravelApp/1.0'},
@@ -245,16 +291,6 @@ def _geocode_nominatim(location: str) -> Optional[tuple[float, float]]:
 # Helpers
 # ---------------------------------------------------------------------------
 
-def _haversine_km(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
-    R = 6371.0
-    dlat = math.radians(lat2 - lat1)
-    dlon = math.radians(lon2 - lon1)
-    a = (math.sin(dlat / 2) ** 2
-         + math.cos(math.radians(lat1)) * math.cos(math.radians(lat2))
-         * math.sin(dlon / 2) ** 2)
-    return R * 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
-
-
 def _build_place_text(place: dict) -> str:
     """Combine all textual fields into one string for embedding."""
     fields = [
@@ -280,6 +316,85 @@ def _safe_float(value, default: float = 0.0) -> float:
         return default
 
 
+def _final_score(semantic, dist_weight, rating_score, boost) -> np.ndarray:
+    return (semantic * 0.55 + dist_weight * 0.25 + rating_score * 0.10) * boost
+
+
+def _encode_strings(values: list[str]) -> tuple[list[str], np.ndarray]:
+    """(distinct values, per-row code into them)."""
+    names, codes = np.unique(np.array(values, dtype=object), return_inverse=True)
+    return [str(n) for n in names], codes.astype(np.int32).reshape(-1)
+
+
+@dataclass
+class _PlaceColumns:
+    """Per-place ranking inputs as arrays aligned with the place list."""
+    lat: np.ndarray              # (N,) float64, NaN when unknown
+    lng: np.ndarray              # (N,) float64, NaN when unknown
+    rating_score: np.ndarray     # (N,) float64, Bayesian-style rating in 0-1
+    primary_names: list[str]     # distinct lowercased primary categories
+    primary_codes: np.ndarray    # (N,) int32 into primary_names
+    taxonomy_names: list[str]
+    taxonomy_codes: np.ndarray
+    group_names: list[str]
+    group_codes: np.ndarray
+    located: np.ndarray          # rows with coordinates, ascending
+    tree: Optional[cKDTree]      # over unit_vectors of the located rows
+
+    @classmethod
+    def from_places(cls, places: list[dict]) -> '_PlaceColumns':
+        lat = np.array([np.nan if p.get('_lat') is None else p['_lat'] for p in places], dtype=np.float64)
+        lng = np.array([np.nan if p.get('_lng') is None else p['_lng'] for p in places], dtype=np.float64)
+        rating = np.array(
+            [_safe_float(p.get('avg_rating') or p.get('rating'), 3.0) for p in places], dtype=np.float64,
+        )
+        reviews = np.array(
+            [int(_safe_float(p.get('review_count') or p.get('reviews'), 0)) for p in places], dtype=np.float64,
+        )
+        rating_score = (np.minimum(rating, 5.0) / 5.0) * np.log1p(reviews + 1) / math.log1p(1001)
+        primary_names, primary_codes = _encode_strings(
+            [(p.get('primary_category') or p.get('category') or '').lower() for p in places]
+        )
+        taxonomy_names, taxonomy_codes = _encode_strings([(p.get('taxonomy_category') or '').lower() for p in places])
+        group_names, group_codes = _encode_strings([(p.get('taxonomy_group') or '').lower() for p in places])
+        located = np.flatnonzero(~(np.isnan(lat) | np.isnan(lng)))
+        tree = cKDTree(unit_vectors(lat[located], lng[located])) if len(located) else None
+        return cls(
+            lat, lng, rating_score,
+            primary_names, primary_codes,
+            taxonomy_names, taxonomy_codes,
+            group_names, group_codes,
+            located, tree,
+        )
+
+    def __len__(self) -> int:
+        return len(self.lat)
+
+    def within(self, lat: float, lng: float, radius_km: float) -> tuple[np.ndarray, np.ndarray]:
+        """(ascending rows, distance km) of the places within ``radius_km``
+        great-circle distance of (lat, lng); coord-less places never match."""
+        if self.tree is None or not radius_km >= 0:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float64)
+        # Great-circle radius → chord on the unit sphere, padded for rounding;
+        # the exact haversine test below decides membership
+        chord = 2.0 * math.sin(min(math.pi, radius_km / EARTH_RADIUS_KM) / 2.0) + 1e-9
+        hits = self.tree.query_ball_point(unit_vectors([lat], [lng])[0], chord)
+        rows = self.located[np.sort(np.asarray(hits, dtype=np.int64))]
+        dist_km = distance_vector_km(lat, lng, self.lat[rows], self.lng[rows])
+        inside = dist_km <= radius_km
+        return rows[inside], dist_km[inside]
+
+    def category_match(self, detected_category: str) -> np.ndarray:
+        """(N,) bool: the detected category is in the primary category,
+        taxonomy category or group, or the primary category is in it.  The
+        substring tests run once per distinct value, not once per place."""
+        det = detected_category.lower()
+        primary = np.array([det in n or n in det for n in self.primary_names], dtype=bool)
+        taxonomy = np.array([det in n for n in self.taxonomy_names], dtype=bool)
+        group = np.array([det in n for n in self.group_names], dtype=bool)
+        return primary[self.primary_codes] | taxonomy[self.taxonomy_codes] | group[self.group_codes]
+
+
 # ---------------------------------------------------------------------------
 # Core engine
 # ---------------------------------------------------------------------------
@@ -296,8 +411,11 @@ class SemanticRecommender:
 
     def __init__(self) -> None:
         self._model = None                   # SentenceTransformer (lazy)
-        self._vectors: Optional[np.ndarray] = None  # (N, 384) float32, L2-normed
+        self._vectors = None                 # (N, 384) L2-normed; memmap or QuantizedVectors
         self._places: list[dict] = []
+        self._ann = None                     # ExactIndex / IVFIndex over _vectors
+        self._cols: Optional[_PlaceColumns] = None
+        self._query_cache = QueryEmbeddingCache()
         self._lock = threading.RLock()
         self._ready = False
         self._num_at_build = 0
@@ -339,11 +457,14 @@ class SemanticRecommender:
         radius_km: float = 10.0,
         top_n: int = 20,
         detected_category: Optional[str] = None,
+        ann_nprobe: Optional[int] = None,
     ) -> list[dict]:
         """
         Full search pipeline:
-          1. Encode query → 384-dim vector
-          2. Cosine similarity against all place vectors
+          1. Encode normalised query → 384-dim vector (cached)
+          2. Cosine similarity against all place vectors (without a centre:
+             only the ANN candidates; ``ann_nprobe`` overrides
+             SEMANTIC_ANN_NPROBE)
           3. Radius filter (haversine)
           4. Score = semantic×0.55 + distance×0.25 + rating×0.10 × category_boost
           5. Sort + return top_n
@@ -366,71 +487,74 @@ class SemanticRecommender:
                 detected_category=detected_category,
             )
 
-        query_vec = model.encode(
-            [query],
-            convert_to_numpy=True,
-            normalize_embeddings=True,
-        )  # (1, 384)
+        query_vec = self._encode_query(model, query)  # (1, 384)
 
         # Cosine similarity: vectors are L2-normed → dot product = cosine sim
-        sims = np.dot(self._vectors, query_vec.T).flatten()  # (N,)
-
-        results: list[dict] = []
-        for i, place in enumerate(self._places):
-            lat = place.get('_lat')
-            lng = place.get('_lng')
-
-            # ── Geographic filter ──────────────────────────────────────
-            if center_lat is not None and center_lng is not None:
-                # Need coords to do radius filtering — skip coord-less places
-                if lat is None or lng is None:
-                    continue
-                dist_km = _haversine_km(center_lat, center_lng, lat, lng)
-                if dist_km > radius_km:
-                    continue
-            else:
-                dist_km = None
-
-            semantic = float(sims[i])
-
-            # ── Distance weight: 1.0 at center → 0.6 at edge ──────────
-            if dist_km is not None and radius_km > 0:
-                dist_weight = 1.0 - (dist_km / radius_km) * 0.4
+        cols = self._columns()
+        dist_km = None
+        if center_lat is not None and center_lng is not None:
+            # ── Geographic filter: only places inside the radius are scored
+            rows, dist_km = cols.within(center_lat, center_lng, radius_km)
+            if len(rows) > _SPATIAL_GATHER_MAX_FRACTION * len(cols):
+                semantic = (self._vectors @ query_vec[0])[rows]
             else:
-                dist_weight = 1.0
-
-            # ── Category boost ×1.4 ────────────────────────────────────
-            boost = 1.0
-            if detected_category:
-                pc  = (place.get('primary_category') or place.get('category') or '').lower()
-                tc  = (place.get('taxonomy_category') or '').lower()
-                tg  = (place.get('taxonomy_group') or '').lower()
-                det = detected_category.lower()
-                if det in pc or det in tc or det in tg or pc in det:
-                    boost = 1.4
-
-            # ── Rating score (Bayesian-style, normalised to 0-1) ───────
-            rating   = _safe_float(place.get('avg_rating') or place.get('rating'), 3.0)
-            reviews  = int(_safe_float(place.get('review_count') or place.get('reviews'), 0))
-            rating_s = (min(rating, 5.0) / 5.0) * math.log1p(reviews + 1) / math.log1p(1001)
-
-            # ── Final score ────────────────────────────────────────────
-            final = (semantic * 0.55 + dist_weight * 0.25 + rating_s * 0.10) * boost
+                semantic = self._vectors[rows] @ query_vec[0]
+        elif self._ann is not None and not isinstance(self._ann, ExactIndex):
+            k = max(top_n * _ANN_OVERSAMPLE, _ANN_MIN_CANDIDATES)
+            rows, semantic = self._ann.search(self._vectors, query_vec[0], k, ann_nprobe)
+        else:
+            rows = np.arange(len(self._places))
+            semantic = self._vectors @ query_vec[0]  # (N,)
+
+        # ── Distance weight: 1.0 at center → 0.6 at edge ──────────────
+        if dist_km is not None and radius_km > 0:
+            dist_weight = 1.0 - (dist_km / radius_km) * 0.4
+        else:
+            dist_weight = np.ones(len(rows))
+
+        # ── Category boost ×1.4 ────────────────────────────────────────
+        if detected_category:
+            boosted = cols.category_match(detected_category)[rows]
+        else:
+            boosted = np.zeros(len(rows), dtype=bool)
+        boost = np.where(boosted, 1.4, 1.0)
+
+        # ── Final score (rating score is precomputed per place) ────────
+        final = _final_score(semantic, dist_weight, cols.rating_score[rows], boost)
+
+        # ── int8 vectors: re-score the best candidates in float32 ─────
+        if isinstance(self._vectors, QuantizedVectors) and _RESCORE_FACTOR > 0:
+            pool_size = top_n * _RESCORE_FACTOR
+            if pool_size < len(final):
+                pool = np.sort(np.argpartition(-final, pool_size - 1)[:pool_size])
+                rows, dist_weight, boosted, boost = rows[pool], dist_weight[pool], boosted[pool], boost[pool]
+                if dist_km is not None:
+                    dist_km = dist_km[pool]
+            semantic = self._vectors.rescore(rows, query_vec[0])
+            final = _final_score(semantic, dist_weight, cols.rating_score[rows], boost)
+
+        # ── Top-n by rounded score, ties in catalogue order ───────────
+        score = np.round(final, 4)
+        if top_n < len(score):
+            keep = np.argpartition(-score, top_n - 1)[:top_n]
+        else:
+            keep = np.arange(len(score))
+        keep = keep[np.lexsort((rows[keep], -score[keep]))]
 
+        results: list[dict] = []
+        for j in keep.tolist():
             results.append({
-                **place,
-                '_score':            round(final, 4),
-                '_semantic':         round(semantic, 4),
-                '_dist_km':          round(dist_km, 2) if dist_km is not None else None,
-                '_category_boosted': boost > 1.0,
+                **self._places[int(rows[j])],
+                '_score':            round(float(final[j]), 4),
+                '_semantic':         round(float(semantic[j]), 4),
+                '_dist_km':          round(float(dist_km[j]), 2) if dist_km is not None else None,
+                '_category_boosted': bool(boosted[j]),
             })
 
-        results.sort(key=lambda x: x['_score'], reverse=True)
-
         # Trigger background rebuild if catalogue has drifted
         self._maybe_rebuild_async(supabase)
 
-        return results[:top_n]
+        return results
 
     def index_info(self) -> dict:
         return {
@@ -439,13 +563,17 @@ class SemanticRecommender:
             'model':      _MODEL_NAME,
             'vector_dim': int(self._vectors.shape[1]) if self._vectors is not None else 0,
             'index_path': str(_VECTORS_PATH),
+            'ann':        self._ann.info() if self._ann is not None else None,
+            'query_cache': self._query_cache.stats(),
+            'vectors':    vector_info(self._vectors),
         }
 
     def _keyword_search(self, *, query, center_lat, center_lng, radius_km, top_n, detected_category):
         """Keyword-based fallback when sentence_transformers is not installed."""
         keywords = [w.lower() for w in query.split() if len(w) > 2]
+        dists = self._distances_from(center_lat, center_lng)
         results = []
-        for place in self._places:
+        for i, place in enumerate(self._places):
             text = ' '.join(filter(None, [
                 place.get('name', ''),
                 place.get('primary_category', ''),
@@ -453,14 +581,9 @@ class SemanticRecommender:
                 place.get('seed_area', ''),
             ])).lower()
 
-            lat = place.get('_lat')
-            lng = place.get('_lng')
-
-            if center_lat is not None and center_lng is not None:
-                if lat is None or lng is None:
-                    continue
-                dist_km = _haversine_km(center_lat, center_lng, lat, lng)
-                if dist_km > radius_km:
+            if dists is not None:
+                dist_km = float(dists[i])
+                if not dist_km <= radius_km:
                     continue
             else:
                 dist_km = None
@@ -486,6 +609,35 @@ class SemanticRecommender:
     # Internals
     # ------------------------------------------------------------------
 
+    def _distances_from(self, center_lat: Optional[float], center_lng: Optional[float]) -> Optional[np.ndarray]:
+        """Distance (km) from the centre to every indexed place; NaN where a
+        place has no coordinates.  None when no centre is given."""
+        if center_lat is None or center_lng is None:
+            return None
+        cols = self._columns()
+        return distance_vector_km(center_lat, center_lng, cols.lat, cols.lng)
+
+    def _columns(self) -> _PlaceColumns:
+        """Columnar view of ``_places``; rebuilt whenever the list changes."""
+        cols = self._cols
+        if cols is None or len(cols) != len(self._places):
+            cols = self._cols = _PlaceColumns.from_places(self._places)
+        return cols
+
+    def _encode_query(self, model, query: str) -> np.ndarray:
+        """(1, dim) embedding of the normalised query, from the cache when
+        this model has encoded it before."""
+        text = normalise_query(query)
+        vec = self._query_cache.get(_MODEL_NAME, text)
+        if vec is None:
+            encoded = model.encode(
+                [text],
+                convert_to_numpy=True,
+                normalize_embeddings=True,
+            )
+            vec = self._query_cache.put(_MODEL_NAME, text, encoded[0])
+        return vec[None, :]
+
     def _get_model(self):
         if self._model is None:
             try:
@@ -589,32 +741,46 @@ class SemanticRecommender:
             normalize_embeddings=True,
         ).astype(np.float32)
 
-        self._places        = places
-        self._vectors       = vectors
-        self._num_at_build  = len(places)
-
-        # Persist
+        # Persist, then serve from the memory-mapped files
         try:
-            np.save(str(_VECTORS_PATH), vectors)
+            save_vectors(_VECTORS_PATH, vectors)
             with open(str(_PLACES_PATH), 'w', encoding='utf-8') as f:
                 json.dump(places, f, ensure_ascii=False, default=str)
             logger.info(
                 'Semantic index saved: %d places, vectors %s.',
                 len(places), vectors.shape,
             )
+            vectors = load_vectors(_VECTORS_PATH)
         except Exception as exc:
             logger.warning('Could not save semantic index to disk: %s', exc)
+            if VECTOR_FORMAT == 'int8':
+                vectors = QuantizedVectors.from_array(vectors)
+
+        ann = build_ann_index(vectors)
+        if hasattr(ann, 'save'):
+            try:
+                ann.save(_ANN_PATH)
+            except Exception as exc:
+                logger.warning('Could not save ANN index to disk: %s', exc)
+
+        self._places        = places
+        self._vectors       = vectors
+        self._num_at_build  = len(places)
+        self._cols          = _PlaceColumns.from_places(places)
+        self._ann           = ann
 
     def _load_from_disk(self) -> bool:
         try:
             if not (_VECTORS_PATH.exists() and _PLACES_PATH.exists()):
                 return False
-            vectors = np.load(str(_VECTORS_PATH)).astype(np.float32)
+            vectors = load_vectors(_VECTORS_PATH)
             with open(str(_PLACES_PATH), 'r', encoding='utf-8') as f:
                 places = json.load(f)
             self._vectors      = vectors
             self._places       = places
             self._num_at_build = len(places)
+            self._cols         = _PlaceColumns.from_places(places)
+            self._ann          = load_ann_index(_ANN_PATH, vectors)
             return True
         except Exception as exc:
             logger.warning('Failed to load semantic index from disk: %s', exc)
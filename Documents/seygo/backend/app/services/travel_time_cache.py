@@ -0,0 +1,181 @@
+"""
+travel_time_cache.py
+====================
+Persistent pairwise travel-time cache for the route optimizer's Distance
+Matrix stage.
+
+Each leg is stored in a local SQLite file keyed by
+    (origin place, destination place, hour-of-week bucket)
+so a playlist priced a few minutes (or days) ago only needs the legs that
+are missing or expired.  Traffic differs by time of day and weekday, hence
+the hour-of-week bucket (0-167, Sri Lanka local time).
+
+  • File    ROUTE_LEG_CACHE_PATH (default ml_models/travel_times.sqlite3)
+  • Expiry  ROUTE_LEG_CACHE_TTL_S (default 7 days) per leg
+  • Place   'id:<place_id>' when the place dict has one, otherwise its
+            coordinates rounded to 4 decimals (~11 m)
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Any, Iterable, Optional
+
+logger = logging.getLogger(__name__)
+
+_BACKEND_DIR = Path(__file__).resolve().parent.parent.parent
+_DEFAULT_PATH = _BACKEND_DIR / 'ml_models' / 'travel_times.sqlite3'
+
+_CACHE_PATH = Path(os.getenv('ROUTE_LEG_CACHE_PATH', str(_DEFAULT_PATH)))
+_CACHE_TTL_S = float(os.getenv('ROUTE_LEG_CACHE_TTL_S', str(7 * 24 * 3600)))
+
+_SRI_LANKA_TZ = timezone(timedelta(hours=5, minutes=30))
+
+# SQLite caps bound parameters per statement; stay well below it
+_QUERY_CHUNK = 400
+
+
+def place_key(place: dict[str, Any]) -> str:
+    """Stable cache key for a place dict (origin or destination)."""
+    for k in ('place_id', 'id'):
+        v = place.get(k)
+        if v not in (None, ''):
+            return f'id:{v}'
+    return f"ll:{float(place['latitude']):.4f},{float(place['longitude']):.4f}"
+
+
+def hour_of_week(ts: Optional[float] = None) -> int:
+    """Hour-of-week bucket (0 = Monday 00:00 … 167) in Sri Lanka local time."""
+    dt = datetime.fromtimestamp(time.time() if ts is None else ts, tz=_SRI_LANKA_TZ)
+    return dt.weekday() * 24 + dt.hour
+
+
+class TravelTimeCache:
+    """Thread-safe SQLite store of leg → {duration_sec, distance_m}."""
+
+    def __init__(self, path: Path = _CACHE_PATH, ttl_s: float = _CACHE_TTL_S) -> None:
+        self._path = Path(path)
+        self._ttl_s = ttl_s
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self.hits = 0
+        self.misses = 0
+
+    # ------------------------------------------------------------------
+    # Public
+    # ------------------------------------------------------------------
+
+    def get_many(
+        self,
+        pairs: Iterable[tuple[str, str]],
+        bucket: int,
+    ) -> dict[tuple[str, str], dict[str, Any]]:
+        """Return the fresh cached legs among ``pairs``.  Never raises."""
+        pairs = list(dict.fromkeys(pairs))
+        found: dict[tuple[str, str], dict[str, Any]] = {}
+        if not pairs:
+            return found
+        min_ts = time.time() - self._ttl_s
+        try:
+            with self._lock:
+                conn = self._connect()
+                for start in range(0, len(pairs), _QUERY_CHUNK):
+                    chunk = pairs[start:start + _QUERY_CHUNK]
+                    placeholders = ','.join('(?, ?)' for _ in chunk)
+                    rows = conn.execute(
+                        'SELECT origin, destination, duration_sec, distance_m FROM legs '
+                        f'WHERE bucket = ? AND fetched_at >= ? AND (origin, destination) IN (VALUES {placeholders})',
+                        [bucket, min_ts] + [k for pair in chunk for k in pair],
+                    ).fetchall()
+                    for origin, destination, duration_sec, distance_m in rows:
+                        found[(origin, destination)] = {
+                            'duration_sec': duration_sec,
+                            'distance_m': distance_m,
+                        }
+                self.hits += len(found)
+                self.misses += len(pairs) - len(found)
+        except Exception as exc:
+            logger.warning('Travel-time cache read failed: %s', exc)
+        return found
+
+    def put_many(
+        self,
+        legs: dict[tuple[str, str], dict[str, Any]],
+        bucket: int,
+    ) -> None:
+        """Store legs for ``bucket``, replacing older values.  Never raises."""
+        if not legs:
+            return
+        now = time.time()
+        try:
+            with self._lock:
+                conn = self._connect()
+                conn.executemany(
+                    'INSERT OR REPLACE INTO legs '
+                    '(origin, destination, bucket, duration_sec, distance_m, fetched_at) '
+                    'VALUES (?, ?, ?, ?, ?, ?)',
+                    [
+                        (o, d, bucket, int(v['duration_sec']), int(v['distance_m']), now)
+                        for (o, d), v in legs.items()
+                    ],
+                )
+                conn.commit()
+        except Exception as exc:
+            logger.warning('Travel-time cache write failed: %s', exc)
+
+    def purge_expired(self) -> int:
+        """Delete expired legs.  Returns the number of rows removed."""
+        try:
+            with self._lock:
+                conn = self._connect()
+                cur = conn.execute(
+                    'DELETE FROM legs WHERE fetched_at < ?', (time.time() - self._ttl_s,)
+                )
+                conn.commit()
+                return cur.rowcount
+        except Exception as exc:
+            logger.warning('Travel-time cache purge failed: %s', exc)
+            return 0
+
+    def stats(self) -> dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            'path': str(self._path),
+            'ttl_s': self._ttl_s,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+    # ------------------------------------------------------------------
+    # Internals
+    # ------------------------------------------------------------------
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self._path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(str(self._path), check_same_thread=False)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS legs ('
+                ' origin TEXT NOT NULL,'
+                ' destination TEXT NOT NULL,'
+                ' bucket INTEGER NOT NULL,'
+                ' duration_sec INTEGER NOT NULL,'
+                ' distance_m INTEGER NOT NULL,'
+                ' fetched_at REAL NOT NULL,'
+                ' PRIMARY KEY (origin, destination, bucket))'
+            )
+            conn.commit()
+            self._conn = conn
+        return self._conn
+
+
+# Module-level singleton shared across all FastAPI requests
+travel_time_cache = TravelTimeCache()
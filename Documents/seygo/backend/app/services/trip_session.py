@@ -0,0 +1,475 @@
+"""
+trip_session.py
+===============
+Incremental re-optimization for trips in progress.
+
+/route/optimize recomputes everything (matrix, weather, order, Directions)
+on every call, which is far too slow to run on each GPS fix.  A trip session
+keeps that work and only repairs what an update invalidates:
+
+  • Create     same pipeline stages as route_optimizer (weather, travel
+               matrix, exact / heuristic order); the score matrix, per-stop
+               weather and the road geometry of every leg are kept
+  • Position   the tour of remaining stops is re-checked from the traveller's
+               position (straight-line estimates for the position row) with a
+               TRIP_SESSION_REPAIR_BUDGET_MS (default 10 ms) 2-opt / Or-opt
+               pass; if the next stop is unchanged and the traveller is within
+               TRIP_SESSION_ON_ROUTE_M (default 150 m) of the current leg, that
+               leg is trimmed in place and no road call is made
+  • Events     ``visited`` / ``skipped`` drop stops from the tour;
+               ``add_stops`` prices the new stops (leg cache first, see
+               travel_time_cache.py), inserts each one where it is cheapest,
+               then runs the same local search
+  • Geometry   legs are cached per (from, to) stop pair; only legs missing
+               from the new tour are fetched, contiguous runs in one
+               Directions request each (road graph / straight line fallback)
+  • Store      TRIP_SESSION_TTL_S (default 6 h) idle expiry,
+               TRIP_SESSION_MAX_ENTRIES (default 1024), LRU eviction;
+               counters via ``stats()``
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Optional
+
+import httpx
+import numpy as np
+
+from . import route_optimizer as ro
+from .geo import haversine_np
+from .place_graph import get_place_graph
+from .polyline import format_polyline
+from .road_graph import RoadGraph, get_road_graph
+
+logger = logging.getLogger(__name__)
+
+_SESSION_TTL_S = float(os.getenv('TRIP_SESSION_TTL_S', '21600'))
+_SESSION_MAX_ENTRIES = int(os.getenv('TRIP_SESSION_MAX_ENTRIES', '1024'))
+_REPAIR_BUDGET_MS = float(os.getenv('TRIP_SESSION_REPAIR_BUDGET_MS', '10'))
+_ON_ROUTE_M = float(os.getenv('TRIP_SESSION_ON_ROUTE_M', '150'))
+
+# Path node standing for the traveller's live position
+_POSITION = -1
+
+
+def _straight_leg(lat0: float, lng0: float, lat1: float, lng1: float) -> dict[str, Any]:
+    km = float(haversine_np(lat0, lng0, lat1, lng1))
+    return {
+        'lats': np.array([lat0, lat1]),
+        'lngs': np.array([lng0, lng1]),
+        'distance_km': km,
+        'duration_min': km / ro._FALLBACK_SPEED_KMH * 60.0,
+        'source': 'haversine_fallback',
+    }
+
+
+def _trim_leg(leg: dict[str, Any], lat: float, lng: float) -> Optional[dict[str, Any]]:
+    """The rest of ``leg`` from the point nearest (lat, lng), with distance and
+    duration scaled by the remaining length; None if the point is off the leg."""
+    lats, lngs = leg['lats'], leg['lngs']
+    if len(lats) < 2:
+        return None
+    off_km = haversine_np(lat, lng, lats, lngs)
+    k = int(np.argmin(off_km))
+    if off_km[k] * 1000.0 > _ON_ROUTE_M:
+        return None
+    seg_km = haversine_np(lats[:-1], lngs[:-1], lats[1:], lngs[1:])
+    total = float(seg_km.sum())
+    share = float(seg_km[k:].sum()) / total if total > 0 else 0.0
+    return {
+        'lats': np.concatenate(([lat], lats[k:])),
+        'lngs': np.concatenate(([lng], lngs[k:])),
+        'distance_km': leg['distance_km'] * share,
+        'duration_min': leg['duration_min'] * share,
+        'source': leg['source'],
+    }
+
+
+def _cheapest_insertion(cost: np.ndarray, path: list[int], node: int) -> int:
+    """Position in ``path`` (never before path[0]) where inserting ``node``
+    adds the least cost; the path is open, so appending is allowed."""
+    prev = np.array(path)
+    delta = cost[prev, node].copy()
+    delta[:-1] += cost[node, prev[1:]] - cost[prev[:-1], prev[1:]]
+    return int(np.argmin(delta)) + 1
+
+
+class TripSession:
+    """One traveller's trip: stops, scores, current tour and leg geometry.
+
+    Stops are addressed by ``stop_index`` (their position in the creation
+    request, added stops numbered after them).  Location index i + 1 in the
+    score matrix is stop i; location 0 is the trip origin.
+    """
+
+    def __init__(
+        self,
+        origin: dict[str, Any],
+        polyline_format: str = 'points',
+        polyline_tolerance_m: Optional[float] = None,
+        polyline_zoom: Optional[float] = None,
+    ) -> None:
+        self.session_id = uuid.uuid4().hex
+        self.origin = origin
+        self.stops: list[dict[str, Any]] = []
+        self.weather: list[dict[str, Any]] = []      # per location, origin first
+        self.scores = np.zeros((1, 1))
+        self.tour: list[int] = []                    # remaining stop indices, in order
+        self.visited: list[int] = []
+        self.skipped: list[int] = []
+        self.position: Optional[tuple[float, float]] = None
+        # Location the traveller last left (origin or a visited stop)
+        self._anchor = 0
+        self._legs: dict[tuple[int, int], dict[str, Any]] = {}
+        # (target location, leg from the live position to it)
+        self._approach: Optional[tuple[int, dict[str, Any]]] = None
+        self._polyline_options = (polyline_format, polyline_tolerance_m, polyline_zoom)
+        self._last_update: dict[str, Any] = {}
+        self.lock = asyncio.Lock()
+
+    # -- geometry helpers -----------------------------------------------------
+
+    def _locations(self) -> list[dict[str, Any]]:
+        return [self.origin] + self.stops
+
+    def _coords(self, node: int) -> tuple[float, float]:
+        if node == _POSITION:
+            return self.position
+        loc = self._locations()[node]
+        return float(loc['latitude']), float(loc['longitude'])
+
+    def _start(self) -> int:
+        return _POSITION if self.position is not None else self._anchor
+
+    def _first_leg(self) -> Optional[dict[str, Any]]:
+        """Geometry currently leading to the next stop, if known."""
+        if not self.tour:
+            return None
+        target = self.tour[0] + 1
+        if self.position is None:
+            return self._legs.get((self._anchor, target))
+        if self._approach is not None and self._approach[0] == target:
+            return self._approach[1]
+        return None
+
+    # -- ordering -------------------------------------------------------------
+
+    def _start_costs(self) -> np.ndarray:
+        """Score from the current start to every location."""
+        if self.position is None:
+            return self.scores[self._anchor]
+        lat, lng = self.position
+        locations = self._locations()
+        km = haversine_np(
+            lat, lng,
+            np.array([float(loc['latitude']) for loc in locations]),
+            np.array([float(loc['longitude']) for loc in locations]),
+        )
+        minutes = km * ro._SPARSE_DETOUR_FACTOR / ro._FALLBACK_SPEED_KMH * 60.0
+        return minutes + ro._arrival_adjustment(locations, self.weather)
+
+    def _tour_scores(self, stops: list[int]) -> np.ndarray:
+        """Score matrix over [start] + ``stops`` (index k + 1 is stops[k])."""
+        idx = np.array([0] + [s + 1 for s in stops])
+        sub = self.scores[np.ix_(idx, idx)].copy()
+        sub[0, 1:] = self._start_costs()[idx[1:]]
+        sub[:, 0] = 0.0
+        return sub
+
+    def _repair(self, added: Optional[list[int]] = None) -> dict[str, Any]:
+        """Insert ``added`` stops, then improve the tour with local search."""
+        tour, added = list(self.tour), added or []
+        cost = self._tour_scores(tour + added)
+        path = list(range(len(tour) + 1))
+        for k in range(len(added)):
+            node = len(tour) + 1 + k
+            path.insert(_cheapest_insertion(cost, path, node), node)
+        order, stats = ro._improve_order(cost, [p - 1 for p in path[1:]], _REPAIR_BUDGET_MS)
+        candidates = tour + added
+        self.tour = [candidates[k] for k in order]
+        return stats
+
+    # -- road geometry --------------------------------------------------------
+
+    async def _fetch_run(
+        self,
+        nodes: list[int],
+        api_key: str,
+        client: httpx.AsyncClient,
+        road: Optional[RoadGraph],
+    ) -> list[dict[str, Any]]:
+        """Leg geometry for consecutive ``nodes``: road graph / Directions /
+        straight line, in the order route_optimizer uses them."""
+        points = [self._coords(node) for node in nodes]
+
+        async def _road_legs() -> Optional[list[dict[str, Any]]]:
+            legs = []
+            for a, b in zip(points, points[1:]):
+                routed = await asyncio.to_thread(road.route, [a[0], b[0]], [a[1], b[1]])
+                if routed is None:
+                    return None
+                legs.append({**routed, 'source': 'road_graph'})
+            return legs
+
+        legs: Optional[list[dict[str, Any]]] = None
+        if road is not None and ro._ROAD_GRAPH_MODE == 'primary':
+            legs = await _road_legs()
+        if legs is None and api_key:
+            try:
+                fetched = await ro._fetch_directions_legs(
+                    [ro._latlng(lat, lng) for lat, lng in points], api_key, client
+                )
+            except Exception as exc:
+                logger.warning('Trip session Directions call failed: %s', exc)
+                fetched = None
+            if fetched is not None:
+                legs = [{**leg, 'source': 'google_directions'} for leg in fetched]
+        if legs is None and road is not None and ro._ROAD_GRAPH_MODE == 'fallback':
+            legs = await _road_legs()
+        if legs is None:
+            legs = [_straight_leg(*a, *b) for a, b in zip(points, points[1:])]
+        return legs
+
+    async def _route(
+        self,
+        api_key: str,
+        road: Optional[RoadGraph],
+        client: Optional[httpx.AsyncClient] = None,
+    ) -> dict[str, int]:
+        """Fetch the legs of the current tour that are not cached yet; a
+        client is only opened when something is missing."""
+        nodes = [self._start()] + [s + 1 for s in self.tour]
+        missing = [
+            k for k in range(len(nodes) - 1)
+            if (self._first_leg() is None if nodes[k] == _POSITION else (nodes[k], nodes[k + 1]) not in self._legs)
+        ]
+        runs: list[list[int]] = []
+        for k in missing:
+            if runs and runs[-1][-1] == k - 1:
+                runs[-1].append(k)
+            else:
+                runs.append([k])
+        if runs and client is None:
+            async with httpx.AsyncClient(follow_redirects=True, timeout=20.0) as own_client:
+                return await self._route(api_key, road, own_client)
+        fetched = await asyncio.gather(*(
+            self._fetch_run(nodes[run[0]:run[-1] + 2], api_key, client, road) for run in runs
+        ))
+        for run, legs in zip(runs, fetched):
+            for k, leg in zip(run, legs):
+                if nodes[k] == _POSITION:
+                    self._approach = (nodes[k + 1], leg)
+                else:
+                    self._legs[(nodes[k], nodes[k + 1])] = leg
+        return {'legs_fetched': len(missing), 'legs_reused': len(nodes) - 1 - len(missing)}
+
+    def _tour_legs(self) -> list[dict[str, Any]]:
+        legs = []
+        if self.tour:
+            legs.append(self._first_leg())
+        legs.extend(self._legs[(a + 1, b + 1)] for a, b in zip(self.tour, self.tour[1:]))
+        return legs
+
+    # -- public API -----------------------------------------------------------
+
+    async def start(self, destinations: list[dict[str, Any]]) -> dict[str, Any]:
+        """Order ``destinations`` and fetch the road geometry of the tour."""
+        started = time.perf_counter()
+        api_key = os.getenv('GOOGLE_MAPS_API_KEY', '').strip()
+        self.stops = [dict(d) for d in destinations]
+        locations = self._locations()
+        road = await asyncio.to_thread(get_road_graph) if ro._ROAD_GRAPH_MODE in ('primary', 'fallback') else None
+        places = await asyncio.to_thread(get_place_graph)
+        async with httpx.AsyncClient(follow_redirects=True, timeout=20.0) as client:
+            (_, self.weather), (matrix, neighbours) = await asyncio.gather(
+                ro._stop_weather(locations, time.time(), client),
+                ro._travel_matrix(locations, api_key, client, time.time(), road, places),
+            )
+            self.scores = await asyncio.to_thread(ro._build_score_matrix, locations, matrix, self.weather)
+            if len(self.stops) == 1:
+                self.tour, stats = [0], None
+            else:
+                self.tour, _, stats = await asyncio.to_thread(ro._solve_order, self.scores, neighbours)
+            routing = await self._route(api_key, road, client)
+        self._last_update = {
+            **routing,
+            'repair': stats,
+            'elapsed_ms': round((time.perf_counter() - started) * 1000.0, 1),
+        }
+        return self.snapshot()
+
+    async def update(
+        self,
+        position: Optional[tuple[float, float]] = None,
+        visited: Optional[list[int]] = None,
+        skipped: Optional[list[int]] = None,
+        add_stops: Optional[list[dict[str, Any]]] = None,
+    ) -> dict[str, Any]:
+        """Apply stop events and/or a position fix, repair the tour and fetch
+        only the legs it no longer has.  Raises ValueError for unknown stops."""
+        started = time.perf_counter()
+        visited, skipped = visited or [], skipped or []
+        for idx in visited + skipped:
+            if not 0 <= idx < len(self.stops):
+                raise ValueError(f'Unknown stop_index: {idx}')
+        api_key = os.getenv('GOOGLE_MAPS_API_KEY', '').strip()
+
+        for idx in visited:
+            if idx in self.tour:
+                self.tour.remove(idx)
+                self.visited.append(idx)
+                self._anchor = idx + 1
+                self.position = None
+                self._approach = None
+        for idx in skipped:
+            if idx in self.tour:
+                self.tour.remove(idx)
+                self.skipped.append(idx)
+
+        previous_leg = self._first_leg()
+        previous_target = self.tour[0] if self.tour else None
+        if position is not None:
+            self.position = (float(position[0]), float(position[1]))
+
+        road = await asyncio.to_thread(get_road_graph) if ro._ROAD_GRAPH_MODE in ('primary', 'fallback') else None
+        added: list[int] = []
+        if add_stops:
+            async with httpx.AsyncClient(follow_redirects=True, timeout=20.0) as client:
+                added = await self._add_stops(add_stops, api_key, client, road)
+        # Repair is a few milliseconds: run it inline rather than in a thread
+        stats = self._repair(added) if self.tour or added else None
+
+        if self.tour and self.position is not None and position is not None:
+            trimmed = None
+            if previous_leg is not None and self.tour[0] == previous_target:
+                trimmed = _trim_leg(previous_leg, *self.position)
+            self._approach = (self.tour[0] + 1, trimmed) if trimmed is not None else None
+        routing = await self._route(api_key, road)
+
+        self._last_update = {
+            **routing,
+            'repair': stats,
+            'elapsed_ms': round((time.perf_counter() - started) * 1000.0, 1),
+        }
+        return self.snapshot()
+
+    async def _add_stops(
+        self,
+        new_stops: list[dict[str, Any]],
+        api_key: str,
+        client: httpx.AsyncClient,
+        road: Optional[RoadGraph],
+    ) -> list[int]:
+        """Append stops and re-price the matrix; repeat legs come from the
+        leg cache, so only pairs touching the new stops reach Google."""
+        first = len(self.stops)
+        self.stops.extend(dict(s) for s in new_stops)
+        locations = self._locations()
+        places = await asyncio.to_thread(get_place_graph)
+        start_loc = {'latitude': self._coords(self._start())[0], 'longitude': self._coords(self._start())[1]}
+        (_, new_weather), (matrix, _) = await asyncio.gather(
+            ro._stop_weather([start_loc] + list(new_stops), time.time(), client),
+            ro._travel_matrix(locations, api_key, client, time.time(), road, places),
+        )
+        self.weather = self.weather + new_weather[1:]
+        self.scores = await asyncio.to_thread(ro._build_score_matrix, locations, matrix, self.weather)
+        return list(range(first, len(self.stops)))
+
+    def snapshot(self) -> dict[str, Any]:
+        """Current state of the trip in the response shape of the endpoints."""
+        polyline_format, tolerance_m, zoom = self._polyline_options
+        legs = self._tour_legs()
+        if legs:
+            lats = np.concatenate([legs[0]['lats']] + [leg['lats'][1:] for leg in legs[1:]])
+            lngs = np.concatenate([legs[0]['lngs']] + [leg['lngs'][1:] for leg in legs[1:]])
+        else:
+            lats = lngs = np.empty(0)
+
+        def _stop(i: int) -> dict[str, Any]:
+            return {**self.stops[i], 'stop_index': i}
+
+        return {
+            'session_id': self.session_id,
+            'remaining_stops': [_stop(i) for i in self.tour],
+            'visited_stops': [_stop(i) for i in self.visited],
+            'skipped_stops': [_stop(i) for i in self.skipped],
+            'position': (
+                {'latitude': self.position[0], 'longitude': self.position[1]}
+                if self.position is not None else None
+            ),
+            **format_polyline(polyline_format, lats=lats, lngs=lngs, tolerance_m=tolerance_m, zoom=zoom),
+            'total_distance_km': round(sum(leg['distance_km'] for leg in legs), 2),
+            'total_duration_min': round(sum(leg['duration_min'] for leg in legs), 1),
+            'weather_info': [
+                {'stop_name': self.stops[i].get('name', ''), **self.weather[i + 1]} for i in self.tour
+            ],
+            'route_sources': sorted({leg['source'] for leg in legs}),
+            'last_update': self._last_update,
+        }
+
+
+class TripSessionStore:
+    """Thread-safe LRU + TTL map of session id → TripSession."""
+
+    def __init__(self, max_entries: int = _SESSION_MAX_ENTRIES, ttl_s: float = _SESSION_TTL_S) -> None:
+        self._max_entries = max_entries
+        self._ttl_s = ttl_s
+        # id → (last_used, session)
+        self._sessions: OrderedDict[str, tuple[float, TripSession]] = OrderedDict()
+        self._lock = threading.Lock()
+        self.created = 0
+        self.expired = 0
+        self.evictions = 0
+
+    def add(self, session: TripSession) -> None:
+        with self._lock:
+            self._sessions[session.session_id] = (time.monotonic(), session)
+            self.created += 1
+            while len(self._sessions) > self._max_entries:
+                self._sessions.popitem(last=False)
+                self.evictions += 1
+
+    def get(self, session_id: str) -> Optional[TripSession]:
+        now = time.monotonic()
+        with self._lock:
+            item = self._sessions.get(session_id)
+            if item is None:
+                return None
+            if now - item[0] > self._ttl_s:
+                del self._sessions[session_id]
+                self.expired += 1
+                return None
+            self._sessions[session_id] = (now, item[1])
+            self._sessions.move_to_end(session_id)
+            return item[1]
+
+    def remove(self, session_id: str) -> bool:
+        with self._lock:
+            return self._sessions.pop(session_id, None) is not None
+
+    def clear(self) -> None:
+        with self._lock:
+            self._sessions.clear()
+            self.created = self.expired = self.evictions = 0
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            return {
+                'active': len(self._sessions),
+                'max_entries': self._max_entries,
+                'ttl_s': self._ttl_s,
+                'created': self.created,
+                'expired': self.expired,
+                'evictions': self.evictions,
+            }
+
+
+# Module-level singleton shared across all FastAPI requests
+trip_sessions = TripSessionStore()
@@ -0,0 +1,170 @@
+"""
+vector_store.py
+===============
+On-disk formats for the semantic index vectors (semantic_recommender.py).
+
+Every uvicorn worker used to read semantic_vectors.npy fully into RAM (and
+copy it again with ``.astype``).  Vectors are now memory-mapped read-only,
+so workers share one copy of the pages through the OS cache:
+
+  • float32  semantic_vectors.npy mapped as is
+  • int8     (default) symmetric per-vector quantisation, q = round(v / s)
+             with s = max|v| / 127, stored as semantic_vectors_q8.npy +
+             semantic_vectors_scale.npy (¼ of the float32 size); the
+             float32 file stays mapped for ``rescore``, which only touches
+             the pages of the rows asked for
+  • Format   SEMANTIC_VECTOR_FORMAT = int8 | float32; quantised files older
+             than semantic_vectors.npy (or of another length) are rebuilt
+
+``QuantizedVectors`` behaves like a read-only (N, dim) float32 array for the
+operations the search path uses: ``len``, ``shape``, row indexing (returns
+dequantised float32) and ``vectors @ query`` (dequantised in row blocks, so
+no full float32 copy is ever materialised).
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+from pathlib import Path
+from typing import Optional, Union
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+VECTOR_FORMAT = os.getenv('SEMANTIC_VECTOR_FORMAT', 'int8').strip().lower()
+# Rows dequantised per block in full scans (bounds the float32 temporary)
+_BLOCK_ROWS = 16384
+
+
+def quantize_int8(vectors: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """(int8 codes (N, dim), float32 scales (N,)) for ``vectors``, in blocks."""
+    n = len(vectors)
+    codes = np.empty(vectors.shape, dtype=np.int8)
+    scales = np.empty(n, dtype=np.float32)
+    for start in range(0, n, _BLOCK_ROWS):
+        block = np.asarray(vectors[start:start + _BLOCK_ROWS], dtype=np.float32)
+        peak = np.abs(block).max(axis=1)
+        scale = np.where(peak > 0, peak / 127.0, 1.0).astype(np.float32)
+        codes[start:start + len(block)] = np.clip(np.rint(block / scale[:, None]), -127, 127)
+        scales[start:start + len(block)] = scale
+    return codes, scales
+
+
+class QuantizedVectors:
+    """int8 codes + per-row scales, optionally with the float32 originals."""
+
+    kind = 'int8'
+
+    def __init__(self, codes: np.ndarray, scales: np.ndarray, exact: Optional[np.ndarray] = None) -> None:
+        self.codes = codes          # (N, dim) int8, usually a read-only memmap
+        self.scales = scales        # (N,) float32
+        self.exact = exact          # (N, dim) float32 memmap for rescore, or None
+
+    @classmethod
+    def from_array(cls, vectors: np.ndarray, keep_exact: bool = True) -> 'QuantizedVectors':
+        codes, scales = quantize_int8(vectors)
+        return cls(codes, scales, vectors if keep_exact else None)
+
+    @property
+    def shape(self) -> tuple[int, int]:
+        return self.codes.shape
+
+    def __len__(self) -> int:
+        return len(self.codes)
+
+    def __getitem__(self, idx) -> np.ndarray:
+        """Dequantised float32 row(s)."""
+        codes = np.asarray(self.codes[idx], dtype=np.float32)
+        scales = np.asarray(self.scales[idx], dtype=np.float32)
+        return codes * scales[..., None] if codes.ndim == 2 else codes * scales
+
+    def __matmul__(self, query: np.ndarray) -> np.ndarray:
+        """Approximate dot product of every row with a 1-D ``query``."""
+        query = np.asarray(query, dtype=np.float32)
+        out = np.empty(len(self), dtype=np.float32)
+        for start in range(0, len(self), _BLOCK_ROWS):
+            stop = start + _BLOCK_ROWS
+            out[start:stop] = (np.asarray(self.codes[start:stop], dtype=np.float32) @ query) * self.scales[start:stop]
+        return out
+
+    def rescore(self, rows: np.ndarray, query: np.ndarray) -> np.ndarray:
+        """Dot product of ``rows`` with ``query`` at full precision when the
+        float32 vectors are available, otherwise from the codes."""
+        if self.exact is None:
+            return self[rows] @ query
+        return np.asarray(self.exact[rows], dtype=np.float32) @ query
+
+
+Vectors = Union[np.ndarray, QuantizedVectors]
+
+
+def _save_npy(path: Path, array: np.ndarray) -> None:
+    tmp = path.with_name(path.name + '.tmp')
+    with open(tmp, 'wb') as f:
+        np.save(f, array)
+    os.replace(tmp, path)
+
+
+def _quantized_paths(vectors_path: Path) -> tuple[Path, Path]:
+    return (
+        vectors_path.with_name(vectors_path.stem + '_q8.npy'),
+        vectors_path.with_name(vectors_path.stem + '_scale.npy'),
+    )
+
+
+def save_vectors(vectors_path: Path, vectors: np.ndarray, fmt: str = VECTOR_FORMAT) -> None:
+    """Write the float32 vectors and, for int8, their quantised form."""
+    _save_npy(vectors_path, np.asarray(vectors, dtype=np.float32))
+    if fmt == 'int8':
+        codes, scales = quantize_int8(vectors)
+        codes_path, scales_path = _quantized_paths(vectors_path)
+        _save_npy(codes_path, codes)
+        _save_npy(scales_path, scales)
+
+
+def load_vectors(vectors_path: Path, fmt: str = VECTOR_FORMAT) -> Vectors:
+    """Memory-map the saved vectors in ``fmt``, (re)building the int8 files
+    when they are missing or stale."""
+    exact = np.load(str(vectors_path), mmap_mode='r')
+    if exact.dtype != np.float32:
+        exact = exact.astype(np.float32)
+    if fmt != 'int8':
+        return exact
+
+    codes_path, scales_path = _quantized_paths(vectors_path)
+    try:
+        fresh = (
+            codes_path.exists() and scales_path.exists()
+            and codes_path.stat().st_mtime >= vectors_path.stat().st_mtime
+        )
+        if fresh:
+            codes = np.load(str(codes_path), mmap_mode='r')
+            scales = np.load(str(scales_path), mmap_mode='r')
+            if codes.shape == exact.shape and scales.shape == (len(exact),):
+                return QuantizedVectors(codes, scales, exact)
+        logger.info('Quantising %d semantic vectors to int8 ...', len(exact))
+        codes, scales = quantize_int8(exact)
+        _save_npy(codes_path, codes)
+        _save_npy(scales_path, scales)
+        return QuantizedVectors(
+            np.load(str(codes_path), mmap_mode='r'), np.load(str(scales_path), mmap_mode='r'), exact,
+        )
+    except Exception as exc:
+        logger.warning('int8 vectors unavailable, using float32: %s', exc)
+        return exact
+
+
+def vector_info(vectors: Optional[Vectors]) -> dict:
+    """Format and resident-size summary for /health."""
+    if vectors is None:
+        return {'format': None}
+    if isinstance(vectors, QuantizedVectors):
+        return {
+            'format': vectors.kind,
+            'mmap': isinstance(vectors.codes, np.memmap),
+            'bytes': int(vectors.codes.nbytes + vectors.scales.nbytes),
+            'rescore': vectors.exact is not None,
+        }
+    return {'format': 'float32', 'mmap': isinstance(vectors, np.memmap), 'bytes': int(vectors.nbytes)}
@@ -0,0 +1,151 @@
+"""
+weather_cache.py
+================
+In-process cache of hourly weather forecasts keyed by geohash cell.
+
+Nearby stops (and repeated trips over the same area) share one forecast per
+~5 km × 5 km geohash cell, so most route requests need no Open-Meteo call.
+
+  • Key        geohash of the stop at ROUTE_WEATHER_GEOHASH_PRECISION (default 5)
+  • Value      hourly forecast arrays (unix times, weather code, temperature, wind)
+  • Expiry     ROUTE_WEATHER_CACHE_TTL_S (default 30 min) per cell
+  • Bound      ROUTE_WEATHER_CACHE_MAX_CELLS (default 2048), LRU eviction
+  • Metrics    hits / misses / evictions via ``stats()``
+"""
+
+from __future__ import annotations
+
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Optional
+
+_GEOHASH_BASE32 = '0123456789bcdefghjkmnpqrstuvwxyz'
+
+GEOHASH_PRECISION = int(os.getenv('ROUTE_WEATHER_GEOHASH_PRECISION', '5'))
+_CACHE_TTL_S = float(os.getenv('ROUTE_WEATHER_CACHE_TTL_S', '1800'))
+_CACHE_MAX_CELLS = int(os.getenv('ROUTE_WEATHER_CACHE_MAX_CELLS', '2048'))
+
+
+# ---------------------------------------------------------------------------
+# Geohash
+# ---------------------------------------------------------------------------
+
+def geohash_encode(lat: float, lon: float, precision: int = GEOHASH_PRECISION) -> str:
+    """Standard base32 geohash of a coordinate."""
+    lat_lo, lat_hi = -90.0, 90.0
+    lon_lo, lon_hi = -180.0, 180.0
+    chars: list[str] = []
+    bits, ch, even = 0, 0, True
+    while len(chars) < precision:
+        if even:
+            mid = (lon_lo + lon_hi) / 2
+            if lon >= mid:
+                ch = (ch << 1) | 1
+                lon_lo = mid
+            else:
+                ch <<= 1
+                lon_hi = mid
+        else:
+            mid = (lat_lo + lat_hi) / 2
+            if lat >= mid:
+                ch = (ch << 1) | 1
+                lat_lo = mid
+            else:
+                ch <<= 1
+                lat_hi = mid
+        even = not even
+        bits += 1
+        if bits == 5:
+            chars.append(_GEOHASH_BASE32[ch])
+            bits, ch = 0, 0
+    return ''.join(chars)
+
+
+def geohash_center(cell: str) -> tuple[float, float]:
+    """Centre (lat, lon) of a geohash cell."""
+    lat_lo, lat_hi = -90.0, 90.0
+    lon_lo, lon_hi = -180.0, 180.0
+    even = True
+    for c in cell:
+        idx = _GEOHASH_BASE32.index(c)
+        for shift in range(4, -1, -1):
+            bit = (idx >> shift) & 1
+            if even:
+                mid = (lon_lo + lon_hi) / 2
+                if bit:
+                    lon_lo = mid
+                else:
+                    lon_hi = mid
+            else:
+                mid = (lat_lo + lat_hi) / 2
+                if bit:
+                    lat_lo = mid
+                else:
+                    lat_hi = mid
+            even = not even
+    return (lat_lo + lat_hi) / 2, (lon_lo + lon_hi) / 2
+
+
+# ---------------------------------------------------------------------------
+# Cache
+# ---------------------------------------------------------------------------
+
+class WeatherForecastCache:
+    """Thread-safe LRU + TTL map of geohash cell → hourly forecast dict.
+
+    A forecast dict holds parallel lists:
+      {'time': [unix_s, ...], 'weathercode': [...], 'temperature': [...], 'windspeed': [...]}
+    """
+
+    def __init__(self, max_cells: int = _CACHE_MAX_CELLS, ttl_s: float = _CACHE_TTL_S) -> None:
+        self._max_cells = max_cells
+        self._ttl_s = ttl_s
+        self._entries: OrderedDict[str, tuple[float, dict[str, Any]]] = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, cell: str) -> Optional[dict[str, Any]]:
+        with self._lock:
+            entry = self._entries.get(cell)
+            if entry is None or time.monotonic() - entry[0] > self._ttl_s:
+                if entry is not None:
+                    del self._entries[cell]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(cell)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, cell: str, forecast: dict[str, Any]) -> None:
+        with self._lock:
+            self._entries[cell] = (time.monotonic(), forecast)
+            self._entries.move_to_end(cell)
+            while len(self._entries) > self._max_cells:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = self.evictions = 0
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'cells': len(self._entries),
+                'max_cells': self._max_cells,
+                'ttl_s': self._ttl_s,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+
+# Module-level singleton shared across all FastAPI requests
+weather_cache = WeatherForecastCache()
@@ -0,0 +1,108 @@
+"""
+Benchmark: route ordering solvers on synthetic Sri Lanka trips.
+
+Compares solve time and total composite score of
+  * _nearest_neighbour_tsp   (greedy baseline)
+  * nearest neighbour + 2-opt / Or-opt local search
+  * Held-Karp exact DP       (up to ROUTE_EXACT_MAX_STOPS stops)
+  * sparse local search      (k nearest candidates per stop, large trips)
+
+No API calls are made — travel times use the haversine fallback.
+
+Run from the backend folder:
+    python benchmark_route_solvers.py [trials]
+"""
+
+import random
+import statistics
+import sys
+import time
+
+from app.services.route_optimizer import (
+    _SPARSE_K,
+    _build_score_matrix,
+    _candidate_neighbours,
+    _greedy_order,
+    _haversine_matrix_km,
+    _held_karp_order,
+    _improve_order,
+    _nearest_neighbour_tsp,
+    _path_cost,
+)
+
+# Rough Sri Lanka bounding box
+LAT_RANGE = (5.95, 9.80)
+LNG_RANGE = (79.70, 81.85)
+STOP_COUNTS = [4, 6, 8, 10, 12, 15, 20, 25, 50, 100]
+
+
+def random_trip(n_dest: int, rng: random.Random) -> list[dict]:
+    return [
+        {
+            'latitude': rng.uniform(*LAT_RANGE),
+            'longitude': rng.uniform(*LNG_RANGE),
+            'rating': round(rng.uniform(3.0, 5.0), 1),
+        }
+        for _ in range(n_dest + 1)
+    ]
+
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return result, (time.perf_counter() - start) * 1000.0
+
+
+def order_cost(scores, order: list[int]) -> float:
+    return _path_cost(scores.tolist(), [0] + [i + 1 for i in order])
+
+
+def main() -> None:
+    trials = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    rng = random.Random(42)
+
+    print(f'{"stops":>5} | {"solver":<14} | {"ms (median)":>11} | {"ms (max)":>9} | {"score vs NN":>11}')
+    print('-' * 62)
+    for n_dest in STOP_COUNTS:
+        rows: dict[str, tuple[list[float], list[float]]] = {}
+        for _ in range(trials):
+            locations = random_trip(n_dest, rng)
+            weather = [{'penalty_minutes': 0}] * len(locations)
+            scores = _build_score_matrix(locations, [], weather)
+
+            nn_order, nn_ms = timed(lambda: _nearest_neighbour_tsp(locations, [], weather))
+            nn_cost = order_cost(scores, nn_order)
+            results = {'nearest_nb': (nn_order, nn_ms)}
+
+            (ls_order, _), ls_ms = timed(
+                lambda: _improve_order(scores, _greedy_order(scores), budget_ms=50)
+            )
+            results['local_search'] = (ls_order, ls_ms)
+
+            if n_dest > 20:
+                neighbours = _candidate_neighbours(_haversine_matrix_km(locations), _SPARSE_K)
+                (sp_order, _), sp_ms = timed(
+                    lambda: _improve_order(
+                        scores, _greedy_order(scores), budget_ms=50, neighbours=neighbours
+                    )
+                )
+                results['sparse_ls'] = (sp_order, sp_ms)
+
+            if n_dest <= 12:
+                hk_order, hk_ms = timed(lambda: _held_karp_order(scores, budget_ms=5000))
+                results['held_karp'] = (hk_order, hk_ms)
+
+            for name, (order, ms) in results.items():
+                times, ratios = rows.setdefault(name, ([], []))
+                times.append(ms)
+                ratios.append(order_cost(scores, order) / nn_cost if nn_cost else 1.0)
+
+        for name, (times, ratios) in rows.items():
+            print(
+                f'{n_dest:>5} | {name:<14} | {statistics.median(times):>11.2f} | '
+                f'{max(times):>9.2f} | {statistics.mean(ratios) * 100 - 100:>+10.1f}%'
+            )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,80 @@
+"""
+Build or refresh the precomputed place-to-place travel-time graph.
+
+Fetches every place with coordinates from Supabase, links each one to its
+PLACE_GRAPH_K nearest neighbours and prices those legs on the offline road
+graph (build it first with build_road_graph.py).  When a previous graph
+exists at PLACE_GRAPH_PATH (default ml_models/place_graph/) and was priced
+on the same road graph, only rows affected by added, moved or removed places
+are re-priced; a rebuilt road graph, or --full, re-prices everything.  The running API picks up the new files automatically.
+
+Run from the backend folder:
+    python build_place_graph.py [--full]
+"""
+
+import os
+import sys
+
+from dotenv import load_dotenv
+from supabase import create_client
+
+from app.services.place_graph import _GRAPH_PATH, PlaceGraph, build_place_graph
+from app.services.road_graph import _GRAPH_PATH as _ROAD_GRAPH_PATH, RoadGraph
+
+load_dotenv()
+
+PLACES_TABLE = os.getenv('SUPABASE_PLACES_TABLE', 'tourist_places')
+
+
+def fetch_places() -> list[dict]:
+    supabase = create_client(os.environ['SUPABASE_URL'], os.environ['SUPABASE_SERVICE_ROLE_KEY'])
+    rows: list[dict] = []
+    start = 0
+    step = 1000
+    while True:
+        result = supabase.table(PLACES_TABLE).select('*').range(start, start + step - 1).execute()
+        batch = result.data or []
+        rows.extend(batch)
+        if len(batch) < step:
+            break
+        start += step
+    return rows
+
+
+def main() -> None:
+    full = '--full' in sys.argv[1:]
+    if not _ROAD_GRAPH_PATH.exists():
+        print(f'Road graph not found at {_ROAD_GRAPH_PATH} — run build_road_graph.py first.')
+        sys.exit(1)
+    road = RoadGraph.load(_ROAD_GRAPH_PATH)
+    road_stamp = RoadGraph.file_stamp(_ROAD_GRAPH_PATH)
+    print(f'Road graph: {road.node_count:,} nodes (stamp {road_stamp})')
+
+    rows = fetch_places()
+    print(f'Places: {len(rows):,}')
+
+    previous = None
+    if not full and (_GRAPH_PATH / 'meta.json').exists():
+        previous = PlaceGraph.load(_GRAPH_PATH)
+        print(f'Previous graph: {previous.node_count:,} places, {previous.edge_count:,} legs')
+        if previous.meta.get('road_graph_stamp') != road_stamp:
+            print('Road graph changed since the previous build — re-pricing every row')
+
+    graph, stats = build_place_graph(
+        [row.get('latitude', row.get('lat')) for row in rows],
+        [row.get('longitude', row.get('lng')) for row in rows],
+        [row.get('id') for row in rows],
+        road,
+        previous=previous,
+        road_stamp=road_stamp,
+    )
+    print(f"Built {stats['nodes']:,} places / {stats['edges']:,} legs: "
+          f"{stats['rows_priced']:,} rows priced, {stats['rows_reused']:,} reused "
+          f"in {stats['elapsed_s']}s")
+
+    graph.save(_GRAPH_PATH)
+    print(f'Saved → {_GRAPH_PATH}')
+
+
+if __name__ == '__main__':
+    main()
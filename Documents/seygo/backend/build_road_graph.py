@@ -0,0 +1,43 @@
+"""
+One-time script: build the offline road graph used by the route optimizer.
+
+Parses a drivable road network from an OpenStreetMap XML extract of Sri
+Lanka (e.g. an .osm.bz2 from a Geofabrik / BBBike export converted with
+osmium), contracts it (contraction hierarchies) and saves the result to
+ROUTE_ROAD_GRAPH_PATH (default ml_models/road_graph.npz).  Contraction is
+pure Python and takes a while for the full island; the API only loads the
+prepared file.
+
+Run from the backend folder:
+    python build_road_graph.py path/to/sri-lanka.osm.bz2
+"""
+
+import sys
+import time
+from pathlib import Path
+
+from app.services.road_graph import _GRAPH_PATH, RoadGraph, load_osm_graph
+
+
+def main() -> None:
+    if len(sys.argv) < 2:
+        print(__doc__)
+        sys.exit(1)
+    osm_path = Path(sys.argv[1])
+    out_path = Path(sys.argv[2]) if len(sys.argv) > 2 else _GRAPH_PATH
+
+    start = time.perf_counter()
+    graph = load_osm_graph(osm_path)
+    print(f'Parsed {graph.number_of_nodes():,} nodes / {graph.number_of_edges():,} edges '
+          f'in {time.perf_counter() - start:.1f}s')
+
+    start = time.perf_counter()
+    road = RoadGraph.from_networkx(graph)
+    print(f'Contracted {road.node_count:,} nodes in {time.perf_counter() - start:.1f}s')
+
+    road.save(out_path)
+    print(f'Saved → {out_path}')
+
+
+if __name__ == '__main__':
+    main()
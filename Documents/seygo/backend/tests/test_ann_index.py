@@ -0,0 +1,96 @@
+"""
+Tests for app/services/ann_index.py and its use by the semantic recommender.
+"""
+
+import numpy as np
+
+
+def _clustered(n=6000, dim=64, clusters=60, seed=0):
+    rng = np.random.default_rng(seed)
+    centres = rng.normal(size=(clusters, dim)).astype(np.float32)
+    x = centres[rng.integers(clusters, size=n)] + 0.5 * rng.normal(size=(n, dim)).astype(np.float32)
+    x /= np.linalg.norm(x, axis=1, keepdims=True)
+    q = x[rng.integers(n, size=20)] + 0.3 * rng.normal(size=(20, dim)).astype(np.float32)
+    q /= np.linalg.norm(q, axis=1, keepdims=True)
+    return x, q
+
+
+class TestIVFIndex:
+    def test_recall_against_exact_search(self):
+        from app.services.ann_index import ExactIndex, IVFIndex
+
+        x, queries = _clustered()
+        index = IVFIndex.build(x, nlist=64)
+        exact = ExactIndex()
+        recall = []
+        for q in queries:
+            want, want_sims = exact.search(x, q, 20)
+            got, got_sims = index.search(x, q, 20, nprobe=8)
+            recall.append(len(set(want) & set(got)) / 20)
+            assert np.all(np.diff(got_sims) <= 0)
+            assert np.allclose(got_sims, x[got] @ q, atol=1e-5)
+        assert np.mean(recall) >= 0.9
+        assert sorted(index.ids.tolist()) == list(range(len(x)))
+
+    def test_probing_every_cell_is_exact(self):
+        from app.services.ann_index import ExactIndex, IVFIndex
+
+        x, queries = _clustered(n=1500)
+        index = IVFIndex.build(x, nlist=16)
+        rows, _ = index.search(x, queries[0], 25, nprobe=16)
+        assert rows.tolist() == ExactIndex().search(x, queries[0], 25)[0].tolist()
+
+    def test_save_load_and_stale_rebuild(self, tmp_path):
+        from app.services.ann_index import IVFIndex, load_ann_index
+
+        x, queries = _clustered(n=2000)
+        path = tmp_path / 'ivf.npz'
+        built = load_ann_index(path, x, min_size=100)
+        assert isinstance(built, IVFIndex) and path.exists()
+
+        loaded = load_ann_index(path, x, min_size=100)
+        assert np.array_equal(loaded.ids, built.ids)
+        assert np.array_equal(loaded.centroids, built.centroids)
+
+        grown = np.vstack([x, x[:300]])
+        rebuilt = load_ann_index(path, grown, min_size=100)
+        assert rebuilt.size == len(grown)
+        assert IVFIndex.load(path).size == len(grown)
+
+    def test_small_sets_use_exact_search(self, tmp_path):
+        from app.services.ann_index import ExactIndex, load_ann_index
+
+        x, _ = _clustered(n=500)
+        index = load_ann_index(tmp_path / 'ivf.npz', x, min_size=1000)
+        assert isinstance(index, ExactIndex)
+        assert not (tmp_path / 'ivf.npz').exists()
+
+
+class _FakeModel:
+    def __init__(self, vec):
+        self.vec = vec
+
+    def encode(self, texts, **kwargs):
+        return self.vec[None, :]
+
+
+class TestSemanticSearchWithANN:
+    def test_unfiltered_search_ranks_only_candidates(self):
+        from app.services.ann_index import IVFIndex
+        from app.services.semantic_recommender import SemanticRecommender
+
+        x, queries = _clustered(n=3000)
+        rec = SemanticRecommender()
+        rec._vectors = x
+        rec._places = [{'id': i, 'name': f'p{i}', '_lat': 7.0, '_lng': 80.0} for i in range(len(x))]
+        rec._ready = True
+        rec._num_at_build = len(x)
+        rec._model = _FakeModel(queries[0])
+        rec._ann = IVFIndex.build(x, nlist=32)
+
+        approx = rec.search(None, query='q', top_n=10, ann_nprobe=32)
+        rec._ann = None
+        exact = rec.search(None, query='q', top_n=10)
+
+        assert [p['id'] for p in approx] == [p['id'] for p in exact]
+        assert rec.index_info()['ann'] is None
@@ -0,0 +1,116 @@
+"""
+Tests for app/services/day_planner.py
+
+Days are routed offline: weather is stubbed and no Google key is set, so every
+day falls back to straight-line estimates.
+"""
+
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+ORIGIN = {"latitude": 6.9271, "longitude": 79.8612}
+
+
+def _island_stops(n, visit=60, seed=0):
+    from test_route_optimizer import _random_locations
+
+    return [
+        {"name": f"stop{i}", "visit_duration_minutes": visit, **loc}
+        for i, loc in enumerate(_random_locations(n, seed=seed))
+    ]
+
+
+class TestPartitionDays:
+    def test_days_fit_budget_and_chain(self):
+        from app.services.day_planner import _partition_days
+
+        stops = _island_stops(60)
+        days = _partition_days(ORIGIN, stops, 480.0)
+
+        assert sorted(i for day in days for i in day["stops"]) == list(range(60))
+        assert all(day["estimated_minutes"] <= 480.0 for day in days)
+        assert days[0]["start"] is None and days[-1]["end"] is None
+        for prev, day in zip(days, days[1:]):
+            assert day["start"] == prev["end"] and prev["end"] in prev["stops"]
+
+    def test_max_days_caps_the_partition(self):
+        from app.services.day_planner import _partition_days
+
+        days = _partition_days(ORIGIN, _island_stops(40), 240.0, max_days=3)
+
+        assert len(days) == 3
+        assert max(day["estimated_minutes"] for day in days) > 240.0
+
+    def test_duplicate_coordinates_never_leave_a_day_empty(self):
+        import numpy as np
+
+        from app.services.day_planner import _kmeans, _partition_days
+
+        galle = {"latitude": 6.0535, "longitude": 80.2210, "visit_duration_minutes": 180}
+        kandy = {"latitude": 7.2906, "longitude": 80.6337, "visit_duration_minutes": 180}
+        stops = [dict(galle) for _ in range(3)] + [dict(kandy) for _ in range(3)]
+
+        days = _partition_days(ORIGIN, stops, 480.0)
+
+        assert sorted(i for day in days for i in day["stops"]) == list(range(6))
+        assert all(day["stops"] for day in days)
+        xy = np.array([[0.0, 0.0]] * 3 + [[50.0, 80.0]] * 3)
+        for k in range(1, 6):
+            assert np.all(np.bincount(_kmeans(xy, k), minlength=k) > 0)
+
+    def test_kmeans_is_deterministic_and_never_empty(self):
+        import numpy as np
+
+        from app.services.day_planner import _kmeans
+
+        rng = np.random.default_rng(1)
+        xy = np.vstack([rng.normal(0, 1, (30, 2)), rng.normal(50, 1, (30, 2))])
+        labels = _kmeans(xy, 5)
+
+        assert np.array_equal(labels, _kmeans(xy, 5))
+        assert np.all(np.bincount(labels, minlength=5) > 0)
+        assert len(set(labels[:30]) & set(labels[30:])) == 0
+
+    def test_later_days_depart_at_the_start_hour_in_sri_lanka(self, monkeypatch):
+        from datetime import datetime, timezone
+
+        from app.services import day_planner
+
+        monkeypatch.setattr(day_planner, "_DAY_START_HOUR", 8)
+        # 2026-03-02 20:00 UTC is already 01:30 on 03-03 in Sri Lanka
+        now = datetime(2026, 3, 2, 20, 0, tzinfo=timezone.utc).timestamp()
+
+        assert day_planner._day_departure(0, now) == now
+        assert day_planner._day_departure(1, now) == datetime(2026, 3, 4, 2, 30, tzinfo=timezone.utc).timestamp()
+        assert day_planner._day_departure(2, now) == datetime(2026, 3, 5, 2, 30, tzinfo=timezone.utc).timestamp()
+
+
+class TestPlanTripDays:
+    @pytest.mark.asyncio
+    async def test_days_are_routed_and_chained(self, monkeypatch):
+        from app.services import route_optimizer
+        from app.services.day_planner import plan_trip_days_async
+        from app.services.route_cache import RouteResultCache
+        from test_route_optimizer import _offline_weather
+
+        monkeypatch.delenv("GOOGLE_MAPS_API_KEY", raising=False)
+        monkeypatch.setattr(route_optimizer, "_ROAD_GRAPH_MODE", "off")
+        monkeypatch.setattr(route_optimizer, "route_cache", RouteResultCache())
+        _offline_weather(monkeypatch)
+        stops = _island_stops(30, visit=90)
+
+        plan = await plan_trip_days_async(ORIGIN, stops, day_budget_minutes=480.0, polyline_format="flat")
+
+        days = plan["days"]
+        assert len(days) >= 6
+        assert sorted(s["name"] for s in plan["optimized_stops"]) == sorted(s["name"] for s in stops)
+        assert days[0]["start"] is ORIGIN
+        for prev, day in zip(days, days[1:]):
+            assert day["start"] is prev["optimized_stops"][-1]
+        assert plan["total_distance_km"] == pytest.approx(sum(d["total_distance_km"] for d in days), abs=0.1)
+        assert all(d["polyline_flat"]["latitude"] for d in days)
+        assert plan["optimization_method"] == f"multi_day+{len(days)}_days"
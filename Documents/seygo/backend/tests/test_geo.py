@@ -0,0 +1,32 @@
+import math
+
+
+class TestGeoKernel:
+    def test_vector_matches_scalar(self):
+        import numpy as np
+        from app.services.geo import distance_vector_km, haversine_km
+
+        lats = np.array([6.9271, 7.2906, 6.0535, 9.6615])
+        lons = np.array([79.8612, 80.6337, 80.2210, 80.0255])
+        got = distance_vector_km(6.9271, 79.8612, lats, lons)
+        for i in range(len(lats)):
+            assert math.isclose(got[i], haversine_km(6.9271, 79.8612, lats[i], lons[i]), rel_tol=1e-9, abs_tol=1e-9)
+
+    def test_matrix_is_symmetric_with_zero_diagonal(self):
+        import numpy as np
+        from app.services.geo import distance_matrix_km
+
+        lats = [6.9271, 7.2906, 6.0535]
+        lons = [79.8612, 80.6337, 80.2210]
+        m = distance_matrix_km(lats, lons)
+        assert m.shape == (3, 3)
+        assert np.allclose(m, m.T)
+        assert np.allclose(np.diag(m), 0.0)
+
+    def test_nan_coordinates_give_nan(self):
+        import numpy as np
+        from app.services.geo import distance_vector_km
+
+        got = distance_vector_km(6.9, 79.8, [7.0, np.nan], [80.0, 80.0])
+        assert not np.isnan(got[0])
+        assert np.isnan(got[1])
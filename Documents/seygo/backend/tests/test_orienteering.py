@@ -0,0 +1,134 @@
+"""
+Tests for app/services/orienteering.py
+"""
+
+import itertools
+import random
+
+import numpy as np
+import pytest
+
+
+def _instance(n, seed=0, visit=20.0):
+    rng = random.Random(seed)
+    pts = np.array([(rng.uniform(0, 60), rng.uniform(0, 60)) for _ in range(n + 1)])
+    travel = np.hypot(*(pts[:, None, :] - pts[None, :, :]).transpose(2, 0, 1))
+    visits = np.array([0.0] + [visit] * n)
+    value = np.array([0.0] + [rng.uniform(1, 5) for _ in range(n)])
+    return travel, visits, value
+
+
+def _brute_force(travel, visit, value, budget, closed):
+    from app.services.orienteering import _route_minutes
+
+    n = len(value) - 1
+    best = 0.0
+    for k in range(n + 1):
+        for perm in itertools.permutations(range(1, n + 1), k):
+            if _route_minutes(travel, visit, [0, *perm], closed) <= budget:
+                best = max(best, float(value[list(perm)].sum()))
+    return best
+
+
+class TestSolveOrienteering:
+    @pytest.mark.parametrize("closed", [False, True])
+    def test_matches_brute_force_on_small_instances(self, closed):
+        from app.services.orienteering import _route_minutes, _solve_orienteering
+
+        for seed in range(4):
+            travel, visit, value = _instance(7, seed)
+            order, stats = _solve_orienteering(travel, visit, value, 150.0, closed)
+
+            assert _route_minutes(travel, visit, [0, *order], closed) <= 150.0 + 1e-6
+            assert stats["final_score"] == pytest.approx(_brute_force(travel, visit, value, 150.0, closed), abs=1e-3)
+
+    def test_local_search_never_loses_score(self):
+        from app.services.orienteering import _route_minutes, _solve_orienteering
+
+        travel, visit, value = _instance(120, seed=3, visit=30.0)
+        order, stats = _solve_orienteering(travel, visit, value, 300.0, closed=True)
+
+        assert len(set(order)) == len(order) and 0 not in order
+        assert stats["final_score"] >= stats["constructed_score"]
+        assert _route_minutes(travel, visit, [0, *order], True) <= 300.0 + 1e-6
+
+    def test_zero_budget_visits_nothing(self):
+        from app.services.orienteering import _solve_orienteering
+
+        travel, visit, value = _instance(10)
+        assert _solve_orienteering(travel, visit, value, 5.0)[0] == []
+
+
+class TestPlanOrienteering:
+    @pytest.mark.asyncio
+    async def test_200_candidates_within_latency_target(self, monkeypatch):
+        import time
+
+        from app.services import orienteering, route_optimizer
+
+        monkeypatch.delenv("GOOGLE_MAPS_API_KEY", raising=False)
+        monkeypatch.setattr(route_optimizer, "_ROAD_GRAPH_MODE", "off")
+        monkeypatch.setattr(orienteering, "get_place_graph", lambda: None)
+        rng = random.Random(0)
+        start = {"latitude": 7.2906, "longitude": 80.6337}
+        candidates = [
+            {
+                "name": f"p{i}",
+                "latitude": rng.uniform(6.9, 7.7),
+                "longitude": rng.uniform(80.3, 81.0),
+                "score": rng.uniform(0.1, 1.0),
+                "visit_duration_minutes": rng.choice([20, 30, 45, 60]),
+            }
+            for i in range(200)
+        ]
+        candidates.append({"name": "far", "latitude": 9.66, "longitude": 80.02, "score": 100.0})   # Jaffna
+
+        begin = time.perf_counter()
+        plan = await orienteering.plan_orienteering_async(start, candidates, 180.0)
+        elapsed_ms = (time.perf_counter() - begin) * 1000.0
+
+        assert elapsed_ms < 300
+        assert plan["candidates"] == {"total": 201, "reachable": 200}
+        assert plan["total_minutes"] <= 180.0 and plan["stops"]
+        assert "far" not in {s["name"] for s in plan["stops"]}
+        arrivals = [s["arrival_min"] for s in plan["stops"]]
+        assert arrivals == sorted(arrivals)
+        assert plan["total_score"] == pytest.approx(sum(s["score"] for s in plan["stops"]), abs=1e-2)
+        assert plan["travel_source"] == "haversine_estimate"
+
+    @pytest.mark.asyncio
+    async def test_google_pricing_is_bounded_end_to_end(self, tmp_path, monkeypatch):
+        import asyncio
+        import time
+
+        from app.services import orienteering, route_optimizer
+        from app.services.travel_time_cache import TravelTimeCache
+
+        monkeypatch.setenv("GOOGLE_MAPS_API_KEY", "test-key")
+        monkeypatch.setattr(route_optimizer, "_ROAD_GRAPH_MODE", "off")
+        monkeypatch.setattr(orienteering, "get_place_graph", lambda: None)
+        monkeypatch.setattr(route_optimizer, "travel_time_cache", TravelTimeCache(path=tmp_path / "legs.sqlite3"))
+        requests = []
+
+        async def _slow_matrix(origins, destinations, api_key, client):
+            requests.append(len(origins) * len(destinations))
+            await asyncio.sleep(0.1)                     # upstream latency
+            return [[{"duration_sec": 900, "distance_m": 12000} for _ in destinations] for _ in origins]
+
+        monkeypatch.setattr(route_optimizer, "_fetch_distance_matrix", _slow_matrix)
+        rng = random.Random(1)
+        start = {"latitude": 7.2906, "longitude": 80.6337}
+        candidates = [
+            {"name": f"p{i}", "latitude": rng.uniform(6.9, 7.7), "longitude": rng.uniform(80.3, 81.0),
+             "score": rng.uniform(0.1, 1.0)}
+            for i in range(200)
+        ]
+
+        begin = time.perf_counter()
+        plan = await orienteering.plan_orienteering_async(start, candidates, 240.0)
+        elapsed_ms = (time.perf_counter() - begin) * 1000.0
+
+        assert len(requests) <= orienteering._MAX_MATRIX_BLOCKS
+        assert elapsed_ms < 300
+        assert plan["travel_source"] == "travel_matrix" and plan["stops"]
+        assert plan["total_minutes"] <= 240.0
@@ -0,0 +1,198 @@
+"""
+Tests for app/services/outbound_guard.py
+"""
+
+import httpx
+import pytest
+
+
+def _client(handler):
+    return httpx.Client(transport=httpx.MockTransport(handler))
+
+
+def _failing(calls):
+    def handler(request):
+        calls.append(request.url.host)
+        raise httpx.ConnectTimeout("timed out", request=request)
+
+    return handler
+
+
+class TestHostCircuit:
+    def test_trips_after_consecutive_failures_and_fails_fast(self):
+        from app.services.outbound_guard import CircuitOpenError, OutboundGuard
+
+        guard = OutboundGuard(failure_threshold=3)
+        calls = []
+        with _client(_failing(calls)) as client:
+            for _ in range(3):
+                with pytest.raises(httpx.ConnectTimeout):
+                    guard.get("https://api.test/x", client=client)
+            with pytest.raises(CircuitOpenError):
+                guard.get("https://api.test/x", client=client)
+
+        assert len(calls) == 3
+        stats = guard.circuit("https://api.test/x").stats()
+        assert (stats["state"], stats["trips"], stats["short_circuits"]) == ("open", 1, 1)
+
+    def test_half_open_probe_closes_or_reopens(self, monkeypatch):
+        from app.services import outbound_guard as og
+
+        circuit = og.HostCircuit("api.test", failure_threshold=1, open_s=10)
+        clock = [100.0]
+        monkeypatch.setattr(og.time, "monotonic", lambda: clock[0])
+
+        circuit.acquire()
+        circuit.record_failure()
+        assert circuit.state == og.OPEN
+        clock[0] += 10
+        circuit.acquire()                      # the single half-open probe
+        with pytest.raises(og.CircuitOpenError):
+            circuit.acquire()                  # concurrent callers still fail fast
+        circuit.record_failure()
+        assert (circuit.state, circuit.trips) == (og.OPEN, 2)
+
+        clock[0] += 10
+        circuit.acquire()
+        circuit.record_success(0.05)
+        assert circuit.state == og.CLOSED
+        circuit.acquire()
+
+    def test_server_errors_count_but_client_errors_do_not(self):
+        from app.services.outbound_guard import OutboundGuard
+
+        guard = OutboundGuard()
+        statuses = iter([404, 503, 200, 429])
+        with _client(lambda request: httpx.Response(next(statuses))) as client:
+            for _ in range(4):
+                guard.get("https://api.test/x", client=client)
+
+        stats = guard.stats()["hosts"]["api.test"]
+        assert (stats["successes"], stats["failures"], stats["consecutive_failures"]) == (2, 2, 1)
+
+    def test_timeout_adapts_to_latency_percentile(self, monkeypatch):
+        from app.services import outbound_guard as og
+
+        monkeypatch.setattr(og, "_TIMEOUT_FACTOR", 3.0)
+        monkeypatch.setattr(og, "_TIMEOUT_MIN_S", 0.5)
+        circuit = og.HostCircuit("api.test", min_samples=10)
+        for _ in range(9):
+            circuit.record_success(0.4)
+        assert circuit.timeout(8.0) == 8.0     # too few samples: caller's timeout
+        circuit.record_success(0.4)
+        assert circuit.timeout(8.0) == pytest.approx(1.2)
+        assert circuit.timeout(1.0) == 1.0     # never above the caller's ceiling
+        for _ in range(10):
+            circuit.record_success(0.01)
+        assert circuit.timeout(8.0) >= 0.5
+
+    def test_half_open_probe_gets_the_full_timeout(self, monkeypatch):
+        from app.services import outbound_guard as og
+
+        monkeypatch.setattr(og, "_TIMEOUT_MIN_S", 0.1)
+        clock = [100.0]
+        monkeypatch.setattr(og.time, "monotonic", lambda: clock[0])
+        guard = og.OutboundGuard(failure_threshold=1, open_s=10, min_samples=5)
+        circuit = guard.circuit("https://api.test/x")
+        for _ in range(5):
+            circuit.record_success(0.05, "/x")
+        timeouts = []
+
+        def handler(request):
+            timeouts.append(request.extensions["timeout"]["read"])
+            return httpx.Response(503 if len(timeouts) == 1 else 200)
+
+        with _client(handler) as client:
+            guard.get("https://api.test/x", client=client, timeout=8.0)   # trips
+            clock[0] += 10
+            guard.get("https://api.test/x", client=client, timeout=8.0)   # probe
+            guard.get("https://api.test/x", client=client, timeout=8.0)
+
+        assert timeouts[0] == pytest.approx(0.15)
+        assert timeouts[1] == 8.0
+        assert timeouts[2] < 8.0
+
+    def test_timeouts_are_recorded_at_the_applied_timeout(self, monkeypatch):
+        from app.services import outbound_guard as og
+
+        monkeypatch.setattr(og, "_TIMEOUT_FACTOR", 3.0)
+        monkeypatch.setattr(og, "_TIMEOUT_MIN_S", 0.1)
+        guard = og.OutboundGuard(failure_threshold=100, min_samples=10)
+        circuit = guard.circuit("https://api.test/x")
+        for _ in range(10):
+            circuit.record_success(0.1, "/x")
+        assert circuit.timeout(8.0, "/x") == pytest.approx(0.3)
+
+        def handler(request):
+            raise httpx.ReadTimeout("slow", request=request)
+
+        with _client(handler) as client:
+            with pytest.raises(httpx.ReadTimeout):
+                guard.get("https://api.test/x", client=client, timeout=8.0)
+
+        stats = circuit.stats()
+        assert stats["failures"] == 1
+        assert stats["paths"]["/x"]["latency_samples"] == 11
+        assert circuit.timeout(8.0, "/x") == pytest.approx(0.9)   # 3 × the 0.3 s timeout
+
+    def test_latencies_are_kept_per_path(self):
+        from app.services.outbound_guard import OutboundGuard
+
+        guard = OutboundGuard(min_samples=3)
+        with _client(lambda request: httpx.Response(200)) as client:
+            for _ in range(3):
+                guard.get("https://maps.test/distancematrix/json", client=client)
+        circuit = guard.circuit("https://maps.test/directions/json")
+
+        assert circuit is guard.circuit("https://maps.test/distancematrix/json")
+        assert circuit.timeout(8.0, "/directions/json") == 8.0
+        assert circuit.timeout(8.0, "/distancematrix/json") < 8.0
+        assert set(circuit.stats()["paths"]) == {"/distancematrix/json"}
+
+
+class TestAsyncGuard:
+    @pytest.mark.asyncio
+    async def test_async_calls_share_host_state(self):
+        from app.services.outbound_guard import CircuitOpenError, OutboundGuard
+
+        guard = OutboundGuard()
+        calls = []
+
+        async def handler(request):
+            calls.append(request.url.host)
+            raise httpx.ReadTimeout("slow", request=request)
+
+        async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+            for _ in range(5):
+                with pytest.raises(httpx.ReadTimeout):
+                    await guard.get_async(client, "https://weather.test/v1")
+            with pytest.raises(CircuitOpenError):
+                await guard.get_async(client, "https://weather.test/v1")
+            # Other hosts are unaffected
+            with pytest.raises(httpx.ReadTimeout):
+                await guard.get_async(client, "https://maps.test/v1")
+
+        stats = guard.stats()
+        assert stats["open"] == ["weather.test"] and stats["trips"] == 1
+        assert len(calls) == 6
+
+    @pytest.mark.asyncio
+    async def test_route_optimizer_fails_fast_into_fallback(self, monkeypatch):
+        from app.services import route_optimizer
+        from app.services.outbound_guard import OutboundGuard
+
+        guard = OutboundGuard()
+        monkeypatch.setattr(route_optimizer, "outbound_guard", guard)
+        calls = []
+
+        async def handler(request):
+            calls.append(request.url.host)
+            raise httpx.ConnectError("down", request=request)
+
+        async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+            for _ in range(8):
+                matrix = await route_optimizer._fetch_distance_matrix(["6.9,79.8"], ["7.2,80.6"], "key", client)
+                assert matrix == []
+
+        assert len(calls) == 5
+        assert guard.stats()["hosts"]["maps.googleapis.com"]["short_circuits"] == 3
@@ -0,0 +1,147 @@
+"""
+Tests for app/services/place_graph.py
+
+Graphs are priced on the small synthetic road network from test_road_graph.
+"""
+
+import random
+import sys
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+
+@pytest.fixture(scope="module")
+def road():
+    from app.services.road_graph import RoadGraph
+    from test_road_graph import _grid_graph
+
+    return RoadGraph.from_networkx(_grid_graph(seed=3, oneway_share=0.0))
+
+
+def _places(n, seed=0):
+    rng = random.Random(seed)
+    lats = [round(rng.uniform(7.252, 7.318), 5) for _ in range(n)]
+    lngs = [round(rng.uniform(80.602, 80.668), 5) for _ in range(n)]
+    return lats, lngs, [str(1000 + i) for i in range(n)]
+
+
+class TestBuildPlaceGraph:
+    def test_edges_match_road_graph(self, road):
+        from app.services.place_graph import build_place_graph
+
+        lats, lngs, ids = _places(30)
+        graph, stats = build_place_graph(lats, lngs, ids, road, k=4)
+
+        assert stats["nodes"] == 30 and stats["rows_priced"] == 30 and stats["rows_reused"] == 0
+        assert graph.edge_count == stats["edges"] >= 30 * 4
+        for i in range(graph.node_count):
+            row = graph.indices[graph.indptr[i]:graph.indptr[i + 1]]
+            assert list(row) == sorted(row) and i not in row
+        src = np.repeat(np.arange(graph.node_count), np.diff(graph.indptr))
+        expected, _ = road.pair_matrix(graph.coords[:, 0], graph.coords[:, 1], graph.coords[:, 0], graph.coords[:, 1])
+        np.testing.assert_allclose(graph.duration_s, expected[src, graph.indices], rtol=1e-5)
+
+    def test_legs_lookup(self, road):
+        from app.services.place_graph import build_place_graph
+
+        lats, lngs, ids = _places(20)
+        graph, _ = build_place_graph(lats, lngs, ids, road, k=3)
+        i = 0
+        j = int(graph.indices[graph.indptr[i]])
+        missing = next(m for m in range(graph.node_count)
+                       if m != i and m not in graph.indices[graph.indptr[i]:graph.indptr[i + 1]])
+
+        duration, distance = graph.legs([i, i, i, -1], [j, i, missing, j])
+
+        assert duration[0] == pytest.approx(graph.duration_s[graph.indptr[i]])
+        assert distance[1] == 0.0
+        assert np.isnan(duration[2]) and np.isnan(duration[3])
+        assert graph.node_of_place_id(ids[0]) == graph.nodes_of(lats[:1], lngs[:1])[0]
+
+    def test_incremental_refresh_reprices_only_affected_rows(self, road, tmp_path):
+        from app.services.place_graph import PlaceGraph, build_place_graph
+
+        lats, lngs, ids = _places(40)
+        first, _ = build_place_graph(lats, lngs, ids, road, k=4, road_stamp="r1")
+        first.save(tmp_path / "graph")
+        previous = PlaceGraph.load(tmp_path / "graph")
+        assert isinstance(previous.duration_s, np.memmap)
+
+        lats2, lngs2, ids2 = lats + [7.2855], lngs + [80.6355], ids + ["new"]
+        second, stats = build_place_graph(lats2, lngs2, ids2, road, k=4, previous=previous, road_stamp="r1")
+        full, _ = build_place_graph(lats2, lngs2, ids2, road, k=4)
+
+        assert 0 < stats["rows_priced"] < 15
+        assert stats["rows_reused"] == 41 - stats["rows_priced"]
+        np.testing.assert_array_equal(second.indptr, full.indptr)
+        np.testing.assert_array_equal(second.indices, full.indices)
+        np.testing.assert_allclose(second.duration_s, full.duration_s, rtol=1e-6)
+
+    def test_road_graph_rebuild_reprices_every_row(self, road, tmp_path):
+        from app.services.place_graph import PlaceGraph, build_place_graph
+        from app.services.road_graph import RoadGraph
+        from test_road_graph import _grid_graph
+
+        road.save(tmp_path / "road.npz")
+        stamp = RoadGraph.file_stamp(tmp_path / "road.npz")
+        lats, lngs, ids = _places(30)
+        first, _ = build_place_graph(lats, lngs, ids, road, k=4, road_stamp=stamp)
+        first.save(tmp_path / "graph")
+        previous = PlaceGraph.load(tmp_path / "graph")
+        assert previous.meta["road_graph_stamp"] == stamp
+
+        _, same = build_place_graph(lats, lngs, ids, road, k=4, previous=previous, road_stamp=stamp)
+        assert (same["rows_priced"], same["rows_reused"]) == (0, 30)
+
+        rebuilt_road = RoadGraph.from_networkx(_grid_graph(seed=4, oneway_share=0.0))
+        rebuilt_road.save(tmp_path / "road.npz")
+        new_stamp = RoadGraph.file_stamp(tmp_path / "road.npz")
+        assert new_stamp != stamp
+        rebuilt, stats = build_place_graph(lats, lngs, ids, rebuilt_road, k=4, previous=previous, road_stamp=new_stamp)
+        fresh, _ = build_place_graph(lats, lngs, ids, rebuilt_road, k=4)
+
+        assert (stats["rows_priced"], stats["rows_reused"]) == (30, 0)
+        np.testing.assert_allclose(rebuilt.duration_s, fresh.duration_s, rtol=1e-6)
+
+    def test_reachable_is_sorted_and_bounded(self, road):
+        from app.services.place_graph import build_place_graph
+
+        lats, lngs, ids = _places(40)
+        graph, _ = build_place_graph(lats, lngs, ids, road, k=4)
+
+        nodes, times = graph.reachable(0, 300.0)
+
+        assert 0 not in nodes
+        assert np.all(np.diff(times) >= 0) and np.all(times <= 300.0)
+        direct = graph.indices[graph.indptr[0]:graph.indptr[1]]
+        direct_times = graph.duration_s[graph.indptr[0]:graph.indptr[1]]
+        assert set(direct[direct_times <= 300.0]) <= set(nodes.tolist())
+
+
+class TestPlaceGraphConsumers:
+    def test_distance_matrix_reads_place_graph_without_api(self, road, monkeypatch, tmp_path):
+        import asyncio
+
+        from app.services import route_optimizer
+        from app.services.place_graph import build_place_graph
+        from app.services.travel_time_cache import TravelTimeCache
+
+        monkeypatch.setattr(route_optimizer, "travel_time_cache", TravelTimeCache(path=tmp_path / "legs.sqlite3"))
+        lats, lngs, ids = _places(12)
+        graph, _ = build_place_graph(lats, lngs, ids, road, k=11)
+        origin = {"latitude": 7.30, "longitude": 80.61}
+        stops = [{"id": pid, "latitude": lat, "longitude": lng} for lat, lng, pid in zip(lats, lngs, ids)][:5]
+
+        matrix = asyncio.run(route_optimizer._build_distance_matrix(
+            [origin] + stops, "", None, place_graph=graph
+        ))
+
+        nodes = graph.nodes_of(lats[:5], lngs[:5])
+        duration, _ = graph.legs([nodes[0]], [nodes[1]])
+        assert matrix[1][2]["duration_sec"] == int(duration[0])
+        assert "estimated" not in matrix[1][2]
+        assert matrix[0][1]["estimated"] is True      # origin is not a catalogue place
@@ -0,0 +1,142 @@
+import math
+import random
+
+
+def _reference_decode(encoded):
+    """The original scalar decoder, kept as an oracle."""
+    points = []
+    index = lat = lng = 0
+    while index < len(encoded):
+        values = []
+        for _ in range(2):
+            result, shift = 0, 0
+            while True:
+                b = ord(encoded[index]) - 63
+                index += 1
+                result |= (b & 0x1F) << shift
+                shift += 5
+                if b < 0x20:
+                    break
+            values.append((~result >> 1) if result & 1 else (result >> 1))
+        lat += values[0]
+        lng += values[1]
+        points.append({'latitude': lat / 1e5, 'longitude': lng / 1e5})
+    return points
+
+
+def _random_track(n, seed=0):
+    rng = random.Random(seed)
+    lat, lng = 7.0, 80.5
+    lats, lngs = [], []
+    for _ in range(n):
+        lat += rng.uniform(-0.01, 0.01)
+        lng += rng.uniform(-0.01, 0.01)
+        lats.append(round(lat, 5))
+        lngs.append(round(lng, 5))
+    return lats, lngs
+
+
+class TestDecodeEncode:
+    def test_google_reference_string(self):
+        from app.services.polyline import decode_polyline
+
+        points = decode_polyline('_p~iF~ps|U_ulLnnqC_mqNvxq`@')
+        assert points == [
+            {'latitude': 38.5, 'longitude': -120.2},
+            {'latitude': 40.7, 'longitude': -120.95},
+            {'latitude': 43.252, 'longitude': -126.453},
+        ]
+
+    def test_encode_matches_google_reference(self):
+        from app.services.polyline import encode_polyline
+
+        assert encode_polyline([38.5, 40.7, 43.252], [-120.2, -120.95, -126.453]) == '_p~iF~ps|U_ulLnnqC_mqNvxq`@'
+
+    def test_round_trip_matches_scalar_decoder(self):
+        from app.services.polyline import decode_polyline, encode_polyline
+
+        lats, lngs = _random_track(500)
+        encoded = encode_polyline(lats, lngs)
+        got = decode_polyline(encoded)
+        assert len(got) == 500
+        for a, b in zip(got, _reference_decode(encoded)):
+            assert math.isclose(a['latitude'], b['latitude'], abs_tol=1e-9)
+            assert math.isclose(a['longitude'], b['longitude'], abs_tol=1e-9)
+
+    def test_empty(self):
+        from app.services.polyline import decode_polyline, encode_polyline
+
+        assert decode_polyline('') == []
+        assert encode_polyline([], []) == ''
+
+
+class TestSimplify:
+    def test_collinear_points_collapse_to_endpoints(self):
+        import numpy as np
+        from app.services.polyline import simplify_mask
+
+        lats = np.linspace(6.9, 7.9, 50)
+        lngs = np.full(50, 80.0)
+        keep = simplify_mask(lats, lngs, 1.0)
+        assert keep.sum() == 2 and keep[0] and keep[-1]
+
+    def test_points_stay_within_tolerance(self):
+        import numpy as np
+        from app.services.geo import haversine_km
+        from app.services.polyline import simplify_mask
+
+        lats, lngs = (np.array(a) for a in _random_track(300, seed=3))
+        tol = 200.0
+        keep = simplify_mask(lats, lngs, tol)
+        assert 2 < keep.sum() < 300
+        kept = np.flatnonzero(keep)
+        # every dropped point lies close to the kept chord around it
+        for a, b in zip(kept[:-1], kept[1:]):
+            for i in range(a + 1, b):
+                t = (i - a) / (b - a)
+                lat = lats[a] + t * (lats[b] - lats[a])
+                lng = lngs[a] + t * (lngs[b] - lngs[a])
+                nearest = min(
+                    haversine_km(lats[i], lngs[i], lat, lng),
+                    haversine_km(lats[i], lngs[i], lats[a], lngs[a]),
+                    haversine_km(lats[i], lngs[i], lats[b], lngs[b]),
+                )
+                assert nearest * 1000 < tol * 3
+
+
+class TestFormatPolyline:
+    def test_formats(self):
+        from app.services.polyline import encode_polyline, format_polyline
+
+        lats, lngs = _random_track(40)
+        encoded = encode_polyline(lats, lngs)
+
+        out = format_polyline('encoded', encoded=encoded)
+        assert out['polyline_encoded'] == encoded and out['polyline_points'] == []
+
+        out = format_polyline('flat', encoded=encoded)
+        assert len(out['polyline_flat']['latitude']) == 40
+        assert out['polyline_points'] == []
+
+        out = format_polyline('points', encoded=encoded)
+        assert len(out['polyline_points']) == 40
+
+        out = format_polyline('simplified', encoded=encoded, zoom=8)
+        assert 2 <= len(out['polyline_points']) < 40
+
+    def test_encoded_from_arrays(self):
+        import numpy as np
+        from app.services.polyline import decode_polyline, format_polyline
+
+        out = format_polyline('encoded', lats=np.array([6.9, 7.3]), lngs=np.array([79.86, 80.63]))
+        assert decode_polyline(out['polyline_encoded']) == [
+            {'latitude': 6.9, 'longitude': 79.86},
+            {'latitude': 7.3, 'longitude': 80.63},
+        ]
+
+    def test_unknown_format(self):
+        import pytest
+        from app.services.polyline import format_polyline
+
+        with pytest.raises(ValueError):
+            format_polyline('svg', encoded='')
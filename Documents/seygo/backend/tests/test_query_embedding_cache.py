@@ -0,0 +1,64 @@
+"""
+Tests for app/services/query_embedding_cache.py
+"""
+
+import sys
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+
+class TestQueryEmbeddingCache:
+    def test_normalise_query(self):
+        from app.services.query_embedding_cache import normalise_query
+
+        assert normalise_query('  Beach\tGALLE \n') == 'beach galle'
+        assert normalise_query('ｃａｆｅ  Kandy') == 'cafe kandy'
+
+    def test_lru_ttl_and_model_key(self, monkeypatch):
+        from app.services import query_embedding_cache as qc
+
+        clock = [0.0]
+        monkeypatch.setattr(qc.time, 'monotonic', lambda: clock[0])
+        cache = qc.QueryEmbeddingCache(max_entries=2, ttl_s=60, path=None)
+        cache.put('m1', 'beach galle', np.ones(4))
+        cache.put('m1', 'temples in kandy', np.zeros(4))
+
+        assert cache.get('m2', 'beach galle') is None              # other model
+        hit = cache.get('m1', 'beach galle')
+        assert hit.dtype == np.float32 and not hit.flags.writeable
+        cache.put('m1', 'cafe', np.ones(4))                          # evicts 'temples in kandy'
+        assert cache.get('m1', 'temples in kandy') is None
+
+        clock[0] = 61
+        assert cache.get('m1', 'beach galle') is None                # expired
+        stats = cache.stats()
+        assert (stats['memory_hits'], stats['misses'], stats['evictions']) == (1, 3, 1)
+        assert stats['hit_rate'] == 0.25
+
+    def test_disk_tier_survives_restart(self, tmp_path):
+        from app.services.query_embedding_cache import QueryEmbeddingCache
+
+        path = tmp_path / 'queries.sqlite3'
+        QueryEmbeddingCache(path=path).put('m1', 'beach galle', np.arange(4))
+
+        fresh = QueryEmbeddingCache(path=path)
+        assert fresh.get('m1', 'beach galle').tolist() == [0.0, 1.0, 2.0, 3.0]
+        assert fresh.get('m1', 'beach galle') is not None           # promoted to memory
+        assert fresh.get('m2', 'beach galle') is None
+        assert fresh.stats()['disk_hits'] == 1 and fresh.stats()['memory_hits'] == 1
+
+    def test_recommender_encodes_each_normalised_query_once(self):
+        from test_semantic_recommender import _catalogue, _recommender
+
+        vectors, places = _catalogue(n=50)
+        rec = _recommender(vectors, places, vectors[2])
+
+        first = rec.search(None, query='Beach  Galle', top_n=3)
+        again = rec.search(None, query='beach galle', top_n=3)
+
+        assert rec._model.calls == 1
+        assert [p['id'] for p in first] == [p['id'] for p in again]
+        assert rec.index_info()['query_cache']['memory_hits'] == 1
@@ -0,0 +1,223 @@
+"""
+Tests for app/services/road_graph.py
+
+Contraction-hierarchy answers are checked against plain networkx Dijkstra on
+small synthetic road graphs; no OSM download or network access is needed.
+"""
+
+import random
+
+import pytest
+
+
+def _grid_graph(size=8, seed=0, oneway_share=0.2):
+    """Jittered grid of roads around Kandy with random speeds and some one-ways."""
+    import networkx as nx
+
+    from app.services.geo import haversine_km
+
+    rng = random.Random(seed)
+    graph = nx.DiGraph()
+    for r in range(size):
+        for c in range(size):
+            graph.add_node(
+                r * size + c,
+                lat=7.25 + r * 0.01 + rng.uniform(-0.002, 0.002),
+                lon=80.60 + c * 0.01 + rng.uniform(-0.002, 0.002),
+            )
+    for r in range(size):
+        for c in range(size):
+            a = r * size + c
+            for b in ((a + 1) if c + 1 < size else None, (a + size) if r + 1 < size else None):
+                if b is None:
+                    continue
+                na, nb = graph.nodes[a], graph.nodes[b]
+                length_m = haversine_km(na["lat"], na["lon"], nb["lat"], nb["lon"]) * 1000
+                speed = rng.choice([20, 30, 50, 70]) / 3.6
+                graph.add_edge(a, b, time_s=length_m / speed, length_m=length_m)
+                if rng.random() > oneway_share:
+                    graph.add_edge(b, a, time_s=length_m / speed * rng.uniform(0.9, 1.1), length_m=length_m)
+    return graph
+
+
+def _build(graph):
+    from app.services.road_graph import RoadGraph
+
+    return RoadGraph.from_networkx(graph)
+
+
+def _index_map(graph):
+    import networkx as nx
+
+    nodes = sorted(max(nx.strongly_connected_components(graph), key=len))
+    return nodes
+
+
+class TestContractionHierarchy:
+    @pytest.mark.parametrize("seed", [0, 1, 2])
+    def test_matrix_matches_dijkstra(self, seed):
+        import networkx as nx
+
+        graph = _grid_graph(seed=seed)
+        road = _build(graph)
+        nodes = _index_map(graph)
+        rng = random.Random(seed)
+        sample = rng.sample(range(len(nodes)), 10)
+
+        times, lengths = road.node_matrix(sample, sample)
+
+        for i, s in enumerate(sample):
+            expected = nx.single_source_dijkstra_path_length(graph, nodes[s], weight="time_s")
+            for j, t in enumerate(sample):
+                assert times[i, j] == pytest.approx(expected[nodes[t]], rel=1e-9, abs=1e-6)
+
+    def test_paths_unpack_to_original_edges(self):
+        import networkx as nx
+
+        graph = _grid_graph(seed=4)
+        road = _build(graph)
+        nodes = _index_map(graph)
+        rng = random.Random(4)
+
+        for _ in range(20):
+            s, t = rng.sample(range(len(nodes)), 2)
+            path = road.node_path(s, t)
+            assert path[0] == s and path[-1] == t
+            ids = [nodes[k] for k in path]
+            assert all(graph.has_edge(a, b) for a, b in zip(ids[:-1], ids[1:]))
+            cost = sum(graph[a][b]["time_s"] for a, b in zip(ids[:-1], ids[1:]))
+            assert cost == pytest.approx(nx.dijkstra_path_length(graph, nodes[s], nodes[t], weight="time_s"))
+
+    def test_keeps_largest_strongly_connected_component(self):
+        graph = _grid_graph(size=4, seed=1, oneway_share=0.0)
+        graph.add_node("island", lat=7.0, lon=80.0)
+        graph.add_edge("island", 0, time_s=10.0, length_m=100.0)
+
+        assert _build(graph).node_count == 16
+
+    def test_save_and_load_round_trip(self, tmp_path):
+        import numpy as np
+
+        from app.services.road_graph import RoadGraph
+
+        road = _build(_grid_graph(seed=5))
+        road.save(tmp_path / "graph.npz")
+        loaded = RoadGraph.load(tmp_path / "graph.npz")
+
+        a, _ = road.node_matrix([0, 5, 9], [1, 30, 60])
+        b, _ = loaded.node_matrix([0, 5, 9], [1, 30, 60])
+        assert np.allclose(a, b)
+
+
+class TestCoordinateQueries:
+    def test_matrix_cells_and_far_stops(self):
+        road = _build(_grid_graph(seed=6, oneway_share=0.0))
+        lats = [7.255, 7.30, 7.10]   # last stop is ~17 km off the grid
+        lons = [80.605, 80.65, 80.60]
+
+        matrix = road.matrix(lats, lons)
+
+        assert matrix[0][0] == {"duration_sec": 0, "distance_m": 0}
+        assert matrix[0][1]["duration_sec"] > 0 and matrix[0][1]["distance_m"] > 5000
+        assert matrix[0][2] is None and matrix[2][1] is None
+
+    def test_route_geometry_starts_and_ends_at_stops(self):
+        road = _build(_grid_graph(seed=7, oneway_share=0.0))
+
+        result = road.route([7.251, 7.31, 7.27], [80.601, 80.66, 80.62])
+
+        assert result["lats"][0] == 7.251 and result["lngs"][-1] == 80.62
+        assert len(result["lats"]) > 3
+        assert result["distance_km"] > 0 and result["duration_min"] > 0
+
+
+OSM_XML = """<?xml version="1.0" encoding="UTF-8"?>
+<osm version="0.6">
+  <node id="1" lat="7.2900" lon="80.6300"/>
+  <node id="2" lat="7.2950" lon="80.6300"/>
+  <node id="3" lat="7.2950" lon="80.6350"/>
+  <node id="4" lat="7.2900" lon="80.6350"/>
+  <node id="5" lat="7.3000" lon="80.7000"/>
+  <way id="10">
+    <nd ref="1"/><nd ref="2"/><nd ref="3"/>
+    <tag k="highway" v="primary"/>
+  </way>
+  <way id="11">
+    <nd ref="3"/><nd ref="4"/><nd ref="1"/>
+    <tag k="highway" v="residential"/><tag k="maxspeed" v="20"/>
+  </way>
+  <way id="12">
+    <nd ref="4"/><nd ref="5"/>
+    <tag k="highway" v="footway"/>
+  </way>
+  <way id="13">
+    <nd ref="2"/><nd ref="4"/>
+    <tag k="highway" v="tertiary"/><tag k="oneway" v="yes"/>
+  </way>
+</osm>
+"""
+
+
+class TestOsmLoader:
+    def test_parses_drivable_ways(self, tmp_path):
+        from app.services.road_graph import load_osm_graph
+
+        path = tmp_path / "tiny.osm"
+        path.write_text(OSM_XML)
+
+        graph = load_osm_graph(path)
+
+        assert set(graph.nodes) == {1, 2, 3, 4}   # footway-only node dropped
+        assert graph.has_edge(2, 4) and not graph.has_edge(4, 2)
+        assert graph.has_edge(1, 2) and graph.has_edge(2, 1)
+        # 20 km/h residential is slower per metre than 50 km/h primary
+        assert graph[3][4]["time_s"] / graph[3][4]["length_m"] > graph[1][2]["time_s"] / graph[1][2]["length_m"]
+
+    def test_gzip_extract_builds_road_graph(self, tmp_path):
+        import gzip
+
+        from app.services.road_graph import RoadGraph
+
+        path = tmp_path / "tiny.osm.gz"
+        with gzip.open(path, "wt") as fh:
+            fh.write(OSM_XML)
+
+        road = RoadGraph.from_osm(path)
+
+        assert road.node_count == 4
+        assert road.node_path(0, 3) is not None
+
+
+class TestSharedGraph:
+    @pytest.fixture
+    def fresh(self, tmp_path, monkeypatch):
+        from app.services import road_graph
+
+        monkeypatch.setattr(road_graph, "_graph", None)
+        monkeypatch.setattr(road_graph, "_graph_loaded", False)
+        monkeypatch.setattr(road_graph, "_GRAPH_PATH", tmp_path / "graph.npz")
+        osm = tmp_path / "tiny.osm"
+        osm.write_text(OSM_XML)
+        monkeypatch.setattr(road_graph, "_OSM_PATH", str(osm))
+        return road_graph
+
+    def test_missing_graph_is_never_built_at_runtime(self, fresh, monkeypatch):
+        def _no_build(*args, **kwargs):
+            raise AssertionError("the API must not contract a road graph")
+
+        monkeypatch.setattr(fresh.RoadGraph, "from_osm", _no_build)
+        monkeypatch.setattr(fresh.RoadGraph, "from_networkx", _no_build)
+
+        assert fresh.get_road_graph() is None
+        assert not fresh._GRAPH_PATH.exists()
+
+    def test_stale_graph_is_loaded_as_is(self, fresh):
+        import os
+
+        fresh.RoadGraph.from_osm(fresh._OSM_PATH).save(fresh._GRAPH_PATH)
+        os.utime(fresh._GRAPH_PATH, (0, 0))                 # older than the OSM file
+
+        road = fresh.get_road_graph()
+
+        assert road is not None and road.node_count == 4
+        assert fresh._GRAPH_PATH.stat().st_mtime == 0
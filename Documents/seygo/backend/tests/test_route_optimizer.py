@@ -0,0 +1,1002 @@
+"""
+Tests for app/services/route_optimizer.py
+
+Covers the ordering stage, which runs entirely on the composite score matrix
+and needs no network access.
+"""
+
+import itertools
+import random
+
+import numpy as np
+import pytest
+
+
+def _random_scores(n_dest, seed=0):
+    """Symmetric-ish random travel scores between origin + n_dest stops."""
+    rng = random.Random(seed)
+    pts = [(rng.uniform(0, 100), rng.uniform(0, 100)) for _ in range(n_dest + 1)]
+    n = len(pts)
+    scores = np.zeros((n, n))
+    for i in range(n):
+        for j in range(n):
+            if i != j:
+                dx, dy = pts[i][0] - pts[j][0], pts[i][1] - pts[j][1]
+                scores[i, j] = (dx * dx + dy * dy) ** 0.5
+    return scores
+
+
+def _order_cost(scores, order):
+    path = [0] + [i + 1 for i in order]
+    return sum(scores[path[k], path[k + 1]] for k in range(len(path) - 1))
+
+
+def _brute_force_cost(scores):
+    n_dest = scores.shape[0] - 1
+    return min(_order_cost(scores, list(p)) for p in itertools.permutations(range(n_dest)))
+
+
+# ---------------------------------------------------------------------------
+# Local search
+# ---------------------------------------------------------------------------
+
+
+class TestImproveOrder:
+    def test_never_worse_than_greedy(self):
+        """Local search must not increase the score of the greedy order."""
+        from app.services.route_optimizer import _greedy_order, _improve_order
+
+        for seed in range(20):
+            scores = _random_scores(15, seed)
+            greedy = _greedy_order(scores)
+            improved, stats = _improve_order(scores, greedy, budget_ms=200)
+            assert sorted(improved) == list(range(15))
+            assert _order_cost(scores, improved) <= _order_cost(scores, greedy) + 1e-9
+            assert stats['final_score'] <= stats['initial_score']
+
+    def test_reaches_optimum_on_small_instances(self):
+        """On 7-stop instances 2-opt + Or-opt should usually hit the optimum."""
+        from app.services.route_optimizer import _greedy_order, _improve_order
+
+        hits = 0
+        for seed in range(10):
+            scores = _random_scores(7, seed)
+            improved, _ = _improve_order(scores, _greedy_order(scores), budget_ms=200)
+            if _order_cost(scores, improved) <= _brute_force_cost(scores) + 1e-9:
+                hits += 1
+        assert hits >= 8
+
+    def test_zero_budget_returns_greedy_order(self):
+        from app.services.route_optimizer import _greedy_order, _improve_order
+
+        scores = _random_scores(12, 3)
+        greedy = _greedy_order(scores)
+        improved, stats = _improve_order(scores, greedy, budget_ms=0)
+        assert improved == greedy
+        assert stats['moves'] == 0
+
+    def test_asymmetric_matrix(self):
+        """Segment reversal deltas must be exact when i→j != j→i."""
+        from app.services.route_optimizer import _greedy_order, _improve_order
+
+        scores = _random_scores(9, 5)
+        rng = np.random.default_rng(5)
+        scores = scores * rng.uniform(0.7, 1.3, size=scores.shape)
+        improved, stats = _improve_order(scores, _greedy_order(scores), budget_ms=200)
+        assert stats['final_score'] == pytest.approx(_order_cost(scores, improved), abs=0.01)
+
+    def test_haversine_scores_use_the_fallback_speed(self):
+        from app.services.route_optimizer import _build_score_matrix, _leg_minutes
+
+        locs = [
+            {"latitude": 6.9271, "longitude": 79.8612},
+            {"latitude": 7.2906, "longitude": 80.6337},
+            {"latitude": 6.0535, "longitude": 80.2210},
+        ]
+        scores = _build_score_matrix(locs, [], [])
+
+        for i in range(3):
+            for j in range(3):
+                if i != j:
+                    assert scores[i, j] == pytest.approx(_leg_minutes(locs, [], i, j))
+
+
+# ---------------------------------------------------------------------------
+# Sparse candidate mode
+# ---------------------------------------------------------------------------
+
+
+def _random_locations(n, seed=0):
+    rng = random.Random(seed)
+    return [
+        {"latitude": rng.uniform(5.95, 9.8), "longitude": rng.uniform(79.7, 81.85)}
+        for _ in range(n)
+    ]
+
+
+class TestSparseMode:
+    def test_haversine_matrix_matches_scalar(self):
+        from app.services.geo import haversine_km as _haversine_km
+        from app.services.route_optimizer import _haversine_matrix_km
+
+        locs = _random_locations(6, 1)
+        dist = _haversine_matrix_km(locs)
+        for i in range(6):
+            for j in range(6):
+                expected = _haversine_km(
+                    locs[i]["latitude"], locs[i]["longitude"], locs[j]["latitude"], locs[j]["longitude"]
+                )
+                assert dist[i, j] == pytest.approx(expected, abs=1e-6)
+
+    def test_candidates_are_symmetric_and_include_k_nearest(self):
+        from app.services.route_optimizer import _candidate_neighbours, _haversine_matrix_km
+
+        dist = _haversine_matrix_km(_random_locations(40, 2))
+        neighbours = _candidate_neighbours(dist, 5)
+        for i, cands in enumerate(neighbours):
+            assert i not in cands
+            nearest = set(np.argsort(dist[i])[1:6].tolist())
+            assert nearest <= set(cands)
+            for j in cands:
+                assert i in neighbours[j]
+
+    def test_sparse_local_search_improves_large_routes(self):
+        from app.services.route_optimizer import (
+            _build_score_matrix,
+            _candidate_neighbours,
+            _greedy_order,
+            _haversine_matrix_km,
+            _improve_order,
+        )
+
+        locs = _random_locations(101, 3)
+        scores = _build_score_matrix(locs, [], [])
+        neighbours = _candidate_neighbours(_haversine_matrix_km(locs), 6)
+        greedy = _greedy_order(scores)
+
+        improved, stats = _improve_order(scores, greedy, budget_ms=500, neighbours=neighbours)
+
+        assert sorted(improved) == list(range(100))
+        assert _order_cost(scores, improved) < _order_cost(scores, greedy)
+        assert stats["final_score"] == pytest.approx(_order_cost(scores, improved), abs=0.01)
+
+    @pytest.mark.asyncio
+    async def test_only_candidate_pairs_are_requested(self, tmp_path, monkeypatch):
+        from app.services import route_optimizer
+        from app.services.travel_time_cache import TravelTimeCache
+
+        monkeypatch.setattr(
+            route_optimizer, "travel_time_cache", TravelTimeCache(path=tmp_path / "legs.sqlite3")
+        )
+        calls = []
+
+        async def _fetch(origins, destinations, api_key, client):
+            assert len(origins) <= 25 and len(destinations) <= 25 and len(origins) * len(destinations) <= 100
+            calls.append(len(origins) * len(destinations))
+            return [[{"duration_sec": 60, "distance_m": 1000} for _ in destinations] for _ in origins]
+
+        monkeypatch.setattr(route_optimizer, "_fetch_distance_matrix", _fetch)
+        locs = _random_locations(60, 4)
+        neighbours = route_optimizer._candidate_neighbours(route_optimizer._haversine_matrix_km(locs), 6)
+
+        matrix = await route_optimizer._build_distance_matrix(locs, "key", None, 0, neighbours)
+
+        # Rows share packed blocks: far fewer round trips than rows, and far
+        # fewer elements than the dense matrix
+        assert len(calls) <= 15
+        assert sum(calls) < 60 * 59 / 3
+        assert all("estimated" not in matrix[i][j] for i in range(60) for j in neighbours[i])
+        far = max(range(1, 60), key=lambda j: route_optimizer._haversine_matrix_km(locs)[0, j])
+        assert matrix[0][far].get("estimated") is True
+
+
+# ---------------------------------------------------------------------------
+# Held-Karp
+# ---------------------------------------------------------------------------
+
+
+class TestHeldKarp:
+    @pytest.mark.parametrize("n_dest", [1, 2, 3, 5, 8])
+    def test_matches_brute_force(self, n_dest):
+        from app.services.route_optimizer import _held_karp_order
+
+        for seed in range(5):
+            scores = _random_scores(n_dest, seed)
+            order = _held_karp_order(scores, budget_ms=1000)
+            assert sorted(order) == list(range(n_dest))
+            assert _order_cost(scores, order) == pytest.approx(_brute_force_cost(scores))
+
+    def test_returns_none_when_budget_exhausted(self):
+        from app.services.route_optimizer import _held_karp_order
+
+        assert _held_karp_order(_random_scores(10, 1), budget_ms=0) is None
+
+    def test_solve_order_falls_back_above_size_threshold(self, monkeypatch):
+        from app.services import route_optimizer
+
+        monkeypatch.setattr(route_optimizer, "_EXACT_MAX_STOPS", 5)
+        _, solver, _ = route_optimizer._solve_order(_random_scores(5, 0))
+        assert solver == "held_karp"
+        _, solver, _ = route_optimizer._solve_order(_random_scores(6, 0))
+        assert solver == "local_search"
+
+    @pytest.mark.parametrize("n_dest", [4, 8, 25])
+    def test_fixed_end_is_visited_last(self, n_dest):
+        from app.services.route_optimizer import _solve_order
+
+        for end_at in (0, n_dest - 1):
+            scores = _random_scores(n_dest, end_at)
+            order, _, stats = _solve_order(scores, end_at=end_at)
+            assert sorted(order) == list(range(n_dest)) and order[-1] == end_at
+            assert stats["final_score"] == pytest.approx(_order_cost(scores, order), abs=0.01)
+            if n_dest <= 8:
+                best = min(
+                    _order_cost(scores, list(p) + [end_at])
+                    for p in itertools.permutations([i for i in range(n_dest) if i != end_at])
+                )
+                assert _order_cost(scores, order) == pytest.approx(best)
+
+
+# ---------------------------------------------------------------------------
+# Weather stage
+# ---------------------------------------------------------------------------
+
+
+def _clear_weather():
+    return {
+        "temperature_c": 28,
+        "wind_kmh": 5,
+        "condition": "Clear sky",
+        "weather_code": 0,
+        "penalty_minutes": 0,
+        "is_safe": True,
+    }
+
+
+class _FakeResponse:
+    def __init__(self, payload, status_code=200):
+        self._payload = payload
+        self.status_code = status_code
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise RuntimeError(f"HTTP {self.status_code}")
+
+    def json(self):
+        return self._payload
+
+
+class _FakeClient:
+    def __init__(self, payload, status_code=200):
+        self.payload = payload
+        self.status_code = status_code
+        self.calls = []
+
+    async def request(self, method, url, params=None, timeout=None):
+        self.calls.append(params)
+        return _FakeResponse(self.payload, self.status_code)
+
+
+class TestFetchWeatherBatch:
+    @pytest.mark.asyncio
+    async def test_parses_multi_location_payload(self):
+        from app.services import route_optimizer
+
+        client = _FakeClient([
+            {"current_weather": {"weathercode": 0, "temperature": 30, "windspeed": 10}},
+            {"current_weather": {"weathercode": 65, "temperature": 24, "windspeed": 60}},
+        ])
+        result = await route_optimizer._fetch_weather_batch([(6.9, 79.8), (7.3, 80.6)], client)
+
+        assert len(client.calls) == 1
+        assert client.calls[0]["latitude"] == "6.9000,7.3000"
+        assert result[0]["condition"] == "Clear sky" and result[0]["is_safe"]
+        assert result[1]["penalty_minutes"] == 35 and not result[1]["is_safe"]
+
+    @pytest.mark.asyncio
+    async def test_falls_back_to_per_point_on_failure(self, monkeypatch):
+        from app.services import route_optimizer
+
+        per_point = []
+
+        async def _fetch(lat, lon, client):
+            per_point.append(lat)
+            return _clear_weather()
+
+        monkeypatch.setattr(route_optimizer, "_fetch_weather", _fetch)
+        client = _FakeClient({"error": True}, status_code=400)
+
+        result = await route_optimizer._fetch_weather_all([(6.9, 79.8), (7.3, 80.6)], client)
+
+        assert sorted(per_point) == [6.9, 7.3]
+        assert [w["condition"] for w in result] == ["Clear sky", "Clear sky"]
+
+
+def _hourly_payload(start_ts, codes):
+    return {
+        "hourly": {
+            "time": [start_ts + 3600 * h for h in range(len(codes))],
+            "weathercode": codes,
+            "temperature_2m": [27.0] * len(codes),
+            "windspeed_10m": [8.0] * len(codes),
+        }
+    }
+
+
+class TestForecastWeather:
+    @pytest.mark.asyncio
+    async def test_nearby_stops_share_one_cached_cell(self, monkeypatch):
+        import time
+
+        from app.services import route_optimizer
+        from app.services.weather_cache import WeatherForecastCache
+
+        cache = WeatherForecastCache(max_cells=16, ttl_s=600)
+        monkeypatch.setattr(route_optimizer, "weather_cache", cache)
+        now = int(time.time()) // 3600 * 3600
+        client = _FakeClient(_hourly_payload(now, [0, 0, 0, 0]))
+        # Two stops ~100 m apart fall in the same ~5 km geohash cell
+        coords = [(6.9271, 79.8612), (6.9280, 79.8620)]
+
+        first = await route_optimizer._fetch_weather_all(coords, client)
+        second = await route_optimizer._fetch_weather_all(coords, client)
+
+        assert len(client.calls) == 1
+        assert client.calls[0]["latitude"].count(",") == 0
+        assert first == second
+        assert first[0]["condition"] == "Clear sky"
+        assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 1
+
+    @pytest.mark.asyncio
+    async def test_uses_forecast_hour_of_eta(self, monkeypatch):
+        import time
+
+        from app.services import route_optimizer
+        from app.services.weather_cache import WeatherForecastCache
+
+        monkeypatch.setattr(route_optimizer, "weather_cache", WeatherForecastCache())
+        now = int(time.time()) // 3600 * 3600
+        client = _FakeClient(_hourly_payload(now, [0, 0, 63, 63]))
+
+        result = await route_optimizer._fetch_weather_all(
+            [(7.29, 80.63), (7.29, 80.63)], client, etas=[now + 60, now + 2 * 3600 + 60]
+        )
+
+        assert result[0]["condition"] == "Clear sky"
+        assert result[1]["condition"] == "Moderate rain"
+        assert result[1]["penalty_minutes"] == 15
+
+    def test_arrival_times_include_visit_duration(self):
+        from app.services.route_optimizer import _arrival_times
+
+        locations = [
+            {"latitude": 0.0, "longitude": 0.0},
+            {"latitude": 0.0, "longitude": 0.0, "visit_duration_minutes": 30},
+            {"latitude": 0.0, "longitude": 0.0},
+        ]
+        matrix = [[{"duration_sec": 600}] * 3 for _ in range(3)]
+
+        etas = _arrival_times(locations, matrix, [0, 1], depart_ts=0.0)
+
+        assert etas == [600.0, 600.0 + 1800.0 + 600.0]
+
+
+class TestFetchWeatherEach:
+    @pytest.mark.asyncio
+    async def test_runs_concurrently_and_keeps_order(self, monkeypatch):
+        import asyncio
+        import time
+
+        from app.services import route_optimizer
+
+        async def _slow(lat, lon, client):
+            await asyncio.sleep(0.2)
+            return {**_clear_weather(), "temperature_c": lat}
+
+        monkeypatch.setattr(route_optimizer, "_fetch_weather", _slow)
+        monkeypatch.setattr(route_optimizer, "_WEATHER_CONCURRENCY", 8)
+        coords = [(float(i), 80.0) for i in range(8)]
+
+        start = time.perf_counter()
+        result = await route_optimizer._fetch_weather_each(coords, client=None)
+        elapsed = time.perf_counter() - start
+
+        assert [w["temperature_c"] for w in result] == [float(i) for i in range(8)]
+        assert elapsed < 1.0
+
+    @pytest.mark.asyncio
+    async def test_deadline_covers_the_whole_stage(self, monkeypatch):
+        import asyncio
+        import time
+
+        from app.services import route_optimizer
+        from app.services.weather_cache import WeatherForecastCache
+
+        async def _slow_forecasts(coords, client):
+            await asyncio.sleep(0.15)
+            return None
+
+        async def _no_batch(coords, client):
+            return None
+
+        async def _fetch(lat, lon, client):
+            await asyncio.sleep(0.1 if lat < 2.0 else 1.0)
+            return _clear_weather()
+
+        monkeypatch.setattr(route_optimizer, "weather_cache", WeatherForecastCache())
+        monkeypatch.setattr(route_optimizer, "_fetch_forecast_batch", _slow_forecasts)
+        monkeypatch.setattr(route_optimizer, "_fetch_weather_batch", _no_batch)
+        monkeypatch.setattr(route_optimizer, "_fetch_weather", _fetch)
+        monkeypatch.setattr(route_optimizer, "_WEATHER_DEADLINE_S", 0.4)
+        coords = [(float(i), 80.0) for i in range(4)]
+
+        start = time.perf_counter()
+        forecasts, weather = await route_optimizer._weather_stage(coords, [time.time()] * 4, client=None)
+        elapsed = time.perf_counter() - start
+
+        # Forecasts (0.15 s) + concurrent retries (0.1 s) fit the budget for
+        # the fast stops; the slow ones are cut off at the stage deadline
+        assert elapsed < 0.6
+        assert forecasts == [None] * 4
+        assert [w["condition"] for w in weather[:2]] == ["Clear sky"] * 2
+        assert weather[2:] == [route_optimizer._default_weather()] * 2
+
+    @pytest.mark.asyncio
+    async def test_slow_forecasts_alone_are_bounded(self, monkeypatch):
+        import asyncio
+        import time
+
+        from app.services import route_optimizer
+        from app.services.weather_cache import WeatherForecastCache
+
+        async def _hung(coords, client):
+            await asyncio.sleep(5.0)
+
+        monkeypatch.setattr(route_optimizer, "weather_cache", WeatherForecastCache())
+        monkeypatch.setattr(route_optimizer, "_fetch_forecast_batch", _hung)
+        monkeypatch.setattr(route_optimizer, "_WEATHER_DEADLINE_S", 0.2)
+
+        start = time.perf_counter()
+        result = await route_optimizer._fetch_weather_all([(6.9, 79.8), (7.3, 80.6)], client=None)
+
+        assert time.perf_counter() - start < 0.5
+        assert result == [route_optimizer._default_weather()] * 2
+
+
+# ---------------------------------------------------------------------------
+# Distance matrix + persistent leg cache
+# ---------------------------------------------------------------------------
+
+
+def _fake_matrix_api(calls):
+    """Stand-in for _fetch_distance_matrix: 60 s per 'unit' of index difference."""
+
+    async def _fetch(origins, destinations, api_key, client):
+        calls.append((list(origins), list(destinations)))
+        return [
+            [{"duration_sec": 60 * abs(int(o) - int(d)), "distance_m": 1000} for d in destinations]
+            for o in origins
+        ]
+
+    return _fetch
+
+
+def _stops(n):
+    # _latlng(lat, lon) yields "lat,lon"; encode the index in the latitude
+    return [{"place_id": f"p{i}", "latitude": float(i), "longitude": 0.0} for i in range(n)]
+
+
+class TestBuildDistanceMatrix:
+    @pytest.fixture
+    def leg_cache(self, tmp_path, monkeypatch):
+        from app.services import route_optimizer
+        from app.services.travel_time_cache import TravelTimeCache
+
+        cache = TravelTimeCache(path=tmp_path / "legs.sqlite3", ttl_s=3600)
+        monkeypatch.setattr(route_optimizer, "travel_time_cache", cache)
+        monkeypatch.setattr(route_optimizer, "_latlng", lambda lat, lon: str(int(lat)))
+        return cache
+
+    @pytest.mark.asyncio
+    async def test_second_call_is_served_from_cache(self, leg_cache, monkeypatch):
+        from app.services import route_optimizer
+
+        calls = []
+        monkeypatch.setattr(route_optimizer, "_fetch_distance_matrix", _fake_matrix_api(calls))
+
+        first = await route_optimizer._build_distance_matrix(_stops(4), "key", None, depart_ts=0)
+        second = await route_optimizer._build_distance_matrix(_stops(4), "key", None, depart_ts=0)
+
+        assert len(calls) == 1
+        assert first == second
+        assert first[1][3]["duration_sec"] == 120
+        assert first[2][2]["duration_sec"] == 0
+
+    @pytest.mark.asyncio
+    async def test_only_missing_cells_are_requested(self, leg_cache, monkeypatch):
+        from app.services import route_optimizer
+
+        calls = []
+        monkeypatch.setattr(route_optimizer, "_fetch_distance_matrix", _fake_matrix_api(calls))
+        await route_optimizer._build_distance_matrix(_stops(4), "key", None, depart_ts=0)
+        calls.clear()
+
+        matrix = await route_optimizer._build_distance_matrix(_stops(5), "key", None, depart_ts=0)
+
+        assert len(calls) == 2  # new stop's row, then its column
+        requested = sum(len(o) * len(d) for o, d in calls)
+        assert requested == 5 + 4
+        assert matrix[4][0]["duration_sec"] == 240
+
+    @pytest.mark.asyncio
+    async def test_different_hour_bucket_misses(self, leg_cache, monkeypatch):
+        from app.services import route_optimizer
+
+        calls = []
+        monkeypatch.setattr(route_optimizer, "_fetch_distance_matrix", _fake_matrix_api(calls))
+        await route_optimizer._build_distance_matrix(_stops(3), "key", None, depart_ts=0)
+        await route_optimizer._build_distance_matrix(_stops(3), "key", None, depart_ts=3 * 3600)
+
+        assert len(calls) == 2
+
+    @pytest.mark.asyncio
+    async def test_api_failure_returns_empty_matrix(self, leg_cache, monkeypatch):
+        from app.services import route_optimizer
+
+        async def _fail(*args):
+            return []
+
+        monkeypatch.setattr(route_optimizer, "_fetch_distance_matrix", _fail)
+
+        assert await route_optimizer._build_distance_matrix(_stops(3), "key", None, depart_ts=0) == []
+
+
+class TestMatrixTiling:
+    @pytest.mark.parametrize("n_rows,n_cols", [(1, 1), (4, 4), (10, 10), (31, 31), (60, 60), (3, 70)])
+    def test_blocks_respect_limits_and_cover_everything(self, n_rows, n_cols):
+        from app.services.route_optimizer import _tile_block
+
+        blocks = _tile_block(list(range(n_rows)), list(range(n_cols)))
+
+        covered = set()
+        for rows, cols in blocks:
+            assert len(rows) <= 25 and len(cols) <= 25 and len(rows) * len(cols) <= 100
+            covered.update((r, c) for r in rows for c in cols)
+        assert covered == {(r, c) for r in range(n_rows) for c in range(n_cols)}
+
+    @pytest.mark.asyncio
+    async def test_failed_blocks_get_haversine_only(self, tmp_path, monkeypatch):
+        from app.services import route_optimizer
+        from app.services.travel_time_cache import TravelTimeCache
+
+        monkeypatch.setattr(
+            route_optimizer, "travel_time_cache", TravelTimeCache(path=tmp_path / "legs.sqlite3")
+        )
+        monkeypatch.setattr(route_optimizer, "_latlng", lambda lat, lon: str(int(lat)))
+        good = _fake_matrix_api([])
+
+        async def _flaky(origins, destinations, api_key, client):
+            if "0" in origins:
+                return []  # the block containing origin row 0 fails
+            return await good(origins, destinations, api_key, client)
+
+        monkeypatch.setattr(route_optimizer, "_fetch_distance_matrix", _flaky)
+        stops = _stops(30)
+
+        matrix = await route_optimizer._build_distance_matrix(stops, "key", None, depart_ts=0)
+
+        assert len(matrix) == 30 and all(len(row) == 30 for row in matrix)
+        assert matrix[0][5].get("estimated") is True
+        assert matrix[29][5] == {"duration_sec": 60 * 24, "distance_m": 1000}
+
+
+# ---------------------------------------------------------------------------
+# Segmented Directions requests
+# ---------------------------------------------------------------------------
+
+
+def _fake_directions(calls, fail_segment=None):
+    """Straight-line Directions stand-in: encodes origin → waypoints → destination."""
+    import asyncio
+
+    from app.services.polyline import encode_polyline
+
+    async def _fetch(origin_ll, dest_ll, waypoint_lls, api_key, client):
+        segment = len(calls)
+        calls.append(len(waypoint_lls))
+        await asyncio.sleep(0.05)
+        if segment == fail_segment:
+            return {"status": "OVER_QUERY_LIMIT"}
+        pts = [tuple(map(float, ll.split(","))) for ll in [origin_ll, *waypoint_lls, dest_ll]]
+        legs = [
+            {
+                "distance": {"value": 1000},
+                "duration": {"value": 60},
+                "steps": [{"polyline": {"points": encode_polyline([p[0], q[0]], [p[1], q[1]])}}],
+            }
+            for p, q in zip(pts, pts[1:])
+        ]
+        return {
+            "status": "OK",
+            "routes": [{
+                "overview_polyline": {"points": encode_polyline([p[0] for p in pts], [p[1] for p in pts])},
+                "legs": legs,
+            }],
+        }
+
+    return _fetch
+
+
+def _path_lls(n, seed=0):
+    return [f"{loc['latitude']:.5f},{loc['longitude']:.5f}" for loc in _random_locations(n, seed=seed)]
+
+
+class TestDirectionsSegments:
+    @pytest.mark.parametrize("n_points", [2, 26, 27, 28, 53, 54, 80])
+    def test_segments_share_endpoints_and_respect_limit(self, n_points):
+        from app.services import route_optimizer
+
+        segments = route_optimizer._directions_segments(n_points)
+
+        assert segments[0][0] == 0 and segments[-1][1] == n_points - 1
+        assert all(a[1] == b[0] for a, b in zip(segments, segments[1:]))
+        assert all(end - start - 1 <= route_optimizer._DIRECTIONS_MAX_WAYPOINTS for start, end in segments)
+
+    @pytest.mark.asyncio
+    async def test_long_route_is_fetched_concurrently_and_stitched(self, monkeypatch):
+        import time
+
+        from app.services import route_optimizer
+
+        calls = []
+        monkeypatch.setattr(route_optimizer, "_fetch_directions", _fake_directions(calls))
+        points = _path_lls(41)
+
+        start = time.perf_counter()
+        route = await route_optimizer._fetch_directions_route(points, "key", None)
+        elapsed = time.perf_counter() - start
+
+        assert len(calls) == 2 and max(calls) <= route_optimizer._DIRECTIONS_MAX_WAYPOINTS
+        assert elapsed < 2 * 0.05
+        assert route["encoded"] is None
+        assert len(route["lats"]) == len(points)
+        assert [f"{a:.5f},{b:.5f}" for a, b in zip(route["lats"], route["lngs"])] == points
+        assert route["distance_km"] == pytest.approx(40.0)
+        assert route["duration_min"] == pytest.approx(40.0)
+
+    @pytest.mark.asyncio
+    async def test_per_leg_geometry_across_segments(self, monkeypatch):
+        from app.services import route_optimizer
+
+        calls = []
+        monkeypatch.setattr(route_optimizer, "_fetch_directions", _fake_directions(calls))
+        points = _path_lls(30)
+
+        legs = await route_optimizer._fetch_directions_legs(points, "key", None)
+
+        assert len(calls) == 2 and len(legs) == 29
+        for leg, a, b in zip(legs, points, points[1:]):
+            assert f"{leg['lats'][0]:.5f},{leg['lngs'][0]:.5f}" == a
+            assert f"{leg['lats'][-1]:.5f},{leg['lngs'][-1]:.5f}" == b
+            assert (leg["distance_km"], leg["duration_min"]) == (1.0, 1.0)
+
+    @pytest.mark.asyncio
+    async def test_short_route_keeps_encoded_polyline(self, monkeypatch):
+        from app.services import route_optimizer
+
+        calls = []
+        monkeypatch.setattr(route_optimizer, "_fetch_directions", _fake_directions(calls))
+
+        route = await route_optimizer._fetch_directions_route(_path_lls(5), "key", None)
+
+        assert calls == [3]
+        assert route["encoded"] and route["lats"] is None
+
+    @pytest.mark.asyncio
+    async def test_failed_segment_drops_whole_route(self, monkeypatch):
+        from app.services import route_optimizer
+
+        monkeypatch.setattr(route_optimizer, "_fetch_directions", _fake_directions([], fail_segment=1))
+
+        assert await route_optimizer._fetch_directions_route(_path_lls(60), "key", None) is None
+
+
+# ---------------------------------------------------------------------------
+# Full pipeline without API keys
+# ---------------------------------------------------------------------------
+
+
+def _offline_weather(monkeypatch):
+    from app.services import route_optimizer
+
+    async def _no_forecast(coords, client):
+        return None
+
+    async def _current(coords, client):
+        return [_clear_weather() for _ in coords]
+
+    monkeypatch.setattr(route_optimizer, "_fetch_forecast_batch", _no_forecast)
+    monkeypatch.setattr(route_optimizer, "_fetch_weather_batch", _current)
+
+
+class TestOptimizeRouteOffline:
+    @pytest.fixture(autouse=True)
+    def _fresh_route_cache(self, monkeypatch):
+        from app.services import route_optimizer
+        from app.services.route_cache import RouteResultCache
+
+        monkeypatch.setattr(route_optimizer, "route_cache", RouteResultCache())
+
+    def test_reports_solver_and_improvement(self, monkeypatch):
+        from app.services import route_optimizer
+
+        monkeypatch.delenv("GOOGLE_MAPS_API_KEY", raising=False)
+        _offline_weather(monkeypatch)
+        origin = {"latitude": 6.9271, "longitude": 79.8612}
+        destinations = [
+            {"name": "Kandy", "latitude": 7.2906, "longitude": 80.6337},
+            {"name": "Galle", "latitude": 6.0535, "longitude": 80.2210},
+            {"name": "Negombo", "latitude": 7.2083, "longitude": 79.8358},
+            {"name": "Ella", "latitude": 6.8667, "longitude": 81.0466},
+        ]
+
+        result = route_optimizer.optimize_route(origin, destinations)
+
+        assert result["optimization_method"] == "haversine_fallback+held_karp"
+        assert result["route_improvement"]["final_score"] <= result["route_improvement"]["initial_score"]
+        assert sorted(s["name"] for s in result["optimized_stops"]) == sorted(d["name"] for d in destinations)
+        assert {"weather", "distance_matrix", "ordering", "directions", "total"} <= set(result["stage_timings_ms"])
+
+    def test_polyline_formats(self, monkeypatch):
+        from app.services import route_optimizer
+        from app.services.polyline import decode_polyline
+
+        monkeypatch.delenv("GOOGLE_MAPS_API_KEY", raising=False)
+        _offline_weather(monkeypatch)
+        origin = {"latitude": 6.9271, "longitude": 79.8612}
+        destinations = [
+            {"name": "Kandy", "latitude": 7.2906, "longitude": 80.6337},
+            {"name": "Galle", "latitude": 6.0535, "longitude": 80.2210},
+        ]
+
+        points = route_optimizer.optimize_route(origin, destinations)["polyline_points"]
+        encoded = route_optimizer.optimize_route(origin, destinations, polyline_format="encoded")
+        flat = route_optimizer.optimize_route(origin, destinations, polyline_format="flat")
+
+        assert encoded["polyline_points"] == []
+        assert decode_polyline(encoded["polyline_encoded"]) == points
+        assert flat["polyline_flat"]["latitude"] == [p["latitude"] for p in points]
+
+    @pytest.mark.asyncio
+    async def test_async_requests_overlap(self, monkeypatch):
+        """Concurrent route requests share the event loop instead of queueing."""
+        import asyncio
+        import time
+
+        from app.services import route_optimizer
+
+        monkeypatch.delenv("GOOGLE_MAPS_API_KEY", raising=False)
+
+        async def _slow_forecast(coords, client):
+            await asyncio.sleep(0.3)
+            return None
+
+        async def _current(coords, client):
+            return [_clear_weather() for _ in coords]
+
+        monkeypatch.setattr(route_optimizer, "_fetch_forecast_batch", _slow_forecast)
+        monkeypatch.setattr(route_optimizer, "_fetch_weather_batch", _current)
+        origin = {"latitude": 6.9271, "longitude": 79.8612}
+        destinations = [
+            {"name": "Kandy", "latitude": 7.2906, "longitude": 80.6337},
+            {"name": "Galle", "latitude": 6.0535, "longitude": 80.2210},
+        ]
+
+        start = time.perf_counter()
+        results = await asyncio.gather(*(
+            route_optimizer.optimize_route_async(origin, destinations) for _ in range(5)
+        ))
+        elapsed = time.perf_counter() - start
+
+        assert all(r["optimization_method"].startswith("haversine_fallback") for r in results)
+        assert elapsed < 5 * 0.3
+
+    def test_road_graph_fallback_without_google(self, monkeypatch):
+        import sys
+        from pathlib import Path
+
+        from app.services import route_optimizer
+        from app.services.road_graph import RoadGraph
+
+        sys.path.insert(0, str(Path(__file__).parent))
+        from test_road_graph import _grid_graph
+
+        road = RoadGraph.from_networkx(_grid_graph(seed=3, oneway_share=0.0))
+        monkeypatch.delenv("GOOGLE_MAPS_API_KEY", raising=False)
+        monkeypatch.setattr(route_optimizer, "get_road_graph", lambda: road)
+        monkeypatch.setattr(route_optimizer, "_ROAD_GRAPH_MODE", "fallback")
+        _offline_weather(monkeypatch)
+        origin = {"latitude": 7.251, "longitude": 80.601}
+        destinations = [
+            {"name": "A", "latitude": 7.31, "longitude": 80.66},
+            {"name": "B", "latitude": 7.27, "longitude": 80.62},
+            {"name": "C", "latitude": 7.29, "longitude": 80.64},
+        ]
+
+        result = route_optimizer.optimize_route(origin, destinations, polyline_format="flat")
+
+        assert result["optimization_method"].startswith("road_graph+")
+        assert len(result["polyline_flat"]["latitude"]) > len(destinations) + 1
+        assert result["total_duration_min"] > 0
+
+    @pytest.mark.asyncio
+    async def test_stream_emits_preliminary_order_first(self, monkeypatch, tmp_path):
+        import asyncio
+        import time
+
+        from app.services import route_optimizer
+        from app.services.travel_time_cache import TravelTimeCache
+
+        monkeypatch.delenv("GOOGLE_MAPS_API_KEY", raising=False)
+        monkeypatch.setattr(route_optimizer, "travel_time_cache", TravelTimeCache(path=tmp_path / "legs.sqlite3"))
+        monkeypatch.setattr(route_optimizer, "_STREAM_POLYLINE_CHUNK", 2)
+
+        async def _slow_forecast(coords, client):
+            await asyncio.sleep(0.5)
+            return None
+
+        async def _current(coords, client):
+            return [_clear_weather() for _ in coords]
+
+        monkeypatch.setattr(route_optimizer, "_fetch_forecast_batch", _slow_forecast)
+        monkeypatch.setattr(route_optimizer, "_fetch_weather_batch", _current)
+        origin = {"latitude": 6.9271, "longitude": 79.8612}
+        destinations = [
+            {"name": "Kandy", "latitude": 7.2906, "longitude": 80.6337},
+            {"name": "Galle", "latitude": 6.0535, "longitude": 80.2210},
+            {"name": "Negombo", "latitude": 7.2083, "longitude": 79.8358},
+        ]
+
+        start = time.perf_counter()
+        events = []
+        first_at = None
+        async for event in route_optimizer.optimize_route_stream(origin, destinations):
+            first_at = first_at or time.perf_counter() - start
+            events.append(event)
+
+        kinds = [(e["event"], e.get("stage")) for e in events]
+        assert kinds[:2] == [("order", "preliminary"), ("order", "final")]
+        assert first_at < 0.4
+        assert sorted(events[0]["order"]) == [0, 1, 2]
+        assert kinds[2] == ("route", None)
+        polyline = [e for e in events if e["event"] == "polyline"]
+        assert len(polyline) == events[2]["polyline_chunks"] == 2 and polyline[-1]["last"]
+        assert sum(len(e["points"]) for e in polyline) == 4
+        assert [k for k, _ in kinds[-2:]] == ["weather", "done"]
+
+    @pytest.mark.asyncio
+    async def test_stream_cache_hit_sends_stored_order(self, monkeypatch):
+        from app.services import route_optimizer
+
+        monkeypatch.delenv("GOOGLE_MAPS_API_KEY", raising=False)
+        _offline_weather(monkeypatch)
+        origin = {"latitude": 6.9271, "longitude": 79.8612}
+        destinations = [
+            {"id": 1, "latitude": 7.2906, "longitude": 80.6337},
+            {"id": 2, "latitude": 6.0535, "longitude": 80.2210},
+        ]
+        first = await route_optimizer.optimize_route_async(origin, destinations)
+
+        events = [e async for e in route_optimizer.optimize_route_stream(origin, destinations, "encoded")]
+        events = [e async for e in route_optimizer.optimize_route_stream(origin, destinations, "encoded")]
+
+        assert events[0]["event"] == "order" and events[0]["stage"] == "final"
+        assert [destinations[i]["id"] for i in events[0]["order"]] == [d["id"] for d in first["optimized_stops"]]
+        assert events[-1]["cache"]["hit"] is True
+        assert "encoded" in next(e for e in events if e["event"] == "polyline")
+
+
+# ---------------------------------------------------------------------------
+# Route result cache
+# ---------------------------------------------------------------------------
+
+
+class TestRouteResultCache:
+    ORIGIN = {"latitude": 6.9271, "longitude": 79.8612}
+    DESTINATIONS = [
+        {"id": 1, "name": "Kandy", "latitude": 7.2906, "longitude": 80.6337},
+        {"id": 2, "name": "Galle", "latitude": 6.0535, "longitude": 80.2210},
+        {"id": 3, "name": "Ella", "latitude": 6.8667, "longitude": 81.0466},
+    ]
+
+    @pytest.fixture
+    def cache(self, monkeypatch):
+        from app.services import route_optimizer
+        from app.services.route_cache import RouteResultCache
+
+        cache = RouteResultCache(max_entries=8, ttl_s=600, weather_ttl_s=600)
+        monkeypatch.setattr(route_optimizer, "route_cache", cache)
+        monkeypatch.delenv("GOOGLE_MAPS_API_KEY", raising=False)
+        _offline_weather(monkeypatch)
+        return cache
+
+    def test_repeat_request_is_served_from_cache(self, cache, monkeypatch):
+        from app.services import route_optimizer
+
+        first = route_optimizer.optimize_route(self.ORIGIN, self.DESTINATIONS)
+
+        def _boom(*args, **kwargs):
+            raise AssertionError("solver must not run on a cache hit")
+
+        monkeypatch.setattr(route_optimizer, "_solve_order", _boom)
+        reordered = list(reversed(self.DESTINATIONS))
+        second = route_optimizer.optimize_route(self.ORIGIN, reordered)
+
+        assert first["cache"]["hit"] is False
+        assert second["cache"]["hit"] is True and second["cache"]["weather_refreshed"] is False
+        assert [d["id"] for d in second["optimized_stops"]] == [d["id"] for d in first["optimized_stops"]]
+        assert second["polyline_points"] == first["polyline_points"]
+        assert second["total_distance_km"] == first["total_distance_km"]
+        assert cache.stats()["hits"] == 1
+
+    @pytest.mark.asyncio
+    async def test_fixed_end_is_keyed_by_stop_not_index(self, cache):
+        from app.services import route_optimizer
+
+        first = await route_optimizer.optimize_route_async(self.ORIGIN, self.DESTINATIONS, end_at=0)
+        permuted = [self.DESTINATIONS[1], self.DESTINATIONS[0], self.DESTINATIONS[2]]
+        second = await route_optimizer.optimize_route_async(self.ORIGIN, permuted, end_at=0)
+        repeat = await route_optimizer.optimize_route_async(self.ORIGIN, permuted[::-1], end_at=2)
+
+        assert first["optimized_stops"][-1]["id"] == 1
+        assert second["cache"]["hit"] is False
+        assert second["optimized_stops"][-1]["id"] == 2
+        assert repeat["cache"]["hit"] is True and repeat["optimized_stops"][-1]["id"] == 2
+
+    def test_stale_weather_is_refreshed_only(self, cache, monkeypatch):
+        from app.services import route_optimizer
+
+        route_optimizer.optimize_route(self.ORIGIN, self.DESTINATIONS)
+        cache._weather_ttl_s = 0.0
+
+        async def _rainy(coords, client):
+            return [{**_clear_weather(), "condition": "Heavy rain"} for _ in coords]
+
+        monkeypatch.setattr(route_optimizer, "_fetch_weather_batch", _rainy)
+        refreshed = route_optimizer.optimize_route(self.ORIGIN, self.DESTINATIONS)
+
+        assert refreshed["cache"] == {"hit": True, "age_s": refreshed["cache"]["age_s"], "weather_refreshed": True}
+        assert {w["condition"] for w in refreshed["weather_info"]} == {"Heavy rain"}
+        assert [w["stop_name"] for w in refreshed["weather_info"]] == [d["name"] for d in refreshed["optimized_stops"]]
+        assert cache.stats()["weather_refreshes"] == 1
+
+    def test_fingerprint_is_canonical(self):
+        from app.services.route_cache import route_fingerprint
+
+        base = route_fingerprint(self.ORIGIN, self.DESTINATIONS, 1_000_000)
+        shuffled = route_fingerprint(
+            {"latitude": 6.92712, "longitude": 79.86118}, self.DESTINATIONS[::-1], 1_000_000 + 60
+        )
+        other_day = route_fingerprint(self.ORIGIN, self.DESTINATIONS, 1_000_000 + 86400)
+        fewer = route_fingerprint(self.ORIGIN, self.DESTINATIONS[:2], 1_000_000)
+        encoded = route_fingerprint(self.ORIGIN, self.DESTINATIONS, 1_000_000, ("encoded", None, None))
+
+        assert base == shuffled
+        assert len({base, other_day, fewer, encoded}) == 4
+
+    def test_lru_eviction_and_ttl(self):
+        import time
+
+        from app.services.route_cache import RouteResultCache
+
+        cache = RouteResultCache(max_entries=2, ttl_s=0.2)
+        for key in ("a", "b"):
+            cache.put(key, {"result": {}, "weather_info": []})
+        cache.get("a")
+        cache.put("c", {"result": {}, "weather_info": []})
+
+        assert cache.get("b") is None          # least recently used
+        assert cache.get("a") is not None
+        assert cache.stats()["evictions"] == 1
+        time.sleep(0.25)
+        assert cache.get("c") is None
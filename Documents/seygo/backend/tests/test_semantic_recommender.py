@@ -0,0 +1,196 @@
+"""
+Tests for app/services/semantic_recommender.py
+
+The sentence-transformer is replaced by a fake encoder that returns a fixed
+query vector, so ranking runs offline on synthetic vectors.
+"""
+
+import math
+
+import numpy as np
+
+CATEGORIES = ['Temple', 'Beach', 'Cafe', 'Restaurant', '', 'Historical']
+
+
+class _FakeModel:
+    def __init__(self, vec):
+        self.vec = np.asarray(vec, dtype=np.float32)
+        self.calls = 0
+
+    def encode(self, texts, **kwargs):
+        self.calls += 1
+        return self.vec[None, :]
+
+
+def _catalogue(n=400, dim=32, seed=0):
+    rng = np.random.default_rng(seed)
+    vectors = rng.normal(size=(n, dim)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    places = []
+    for i in range(n):
+        places.append({
+            'id': i,
+            'name': f'place {i}',
+            'primary_category': CATEGORIES[i % len(CATEGORIES)],
+            'taxonomy_category': 'Religious Sites' if i % 7 == 0 else 'Other',
+            'taxonomy_group': 'temple' if i % 11 == 0 else '',
+            'avg_rating': None if i % 13 == 0 else 3.0 + (i % 20) / 10,
+            'review_count': i % 300,
+            '_lat': None if i % 17 == 0 else 6.5 + rng.random() * 1.5,
+            '_lng': None if i % 17 == 0 else 79.9 + rng.random() * 1.0,
+        })
+    return vectors, places
+
+
+def _recommender(vectors, places, query):
+    from app.services.semantic_recommender import SemanticRecommender
+
+    rec = SemanticRecommender()
+    rec._vectors = vectors
+    rec._places = places
+    rec._ready = True
+    rec._num_at_build = len(places)
+    rec._model = _FakeModel(query)
+    return rec
+
+
+def _reference(vectors, places, query, center, radius_km, detected_category, top_n):
+    """The per-place scoring loop the vectorised ranking replaces."""
+    from app.services.geo import haversine_km
+    from app.services.semantic_recommender import _safe_float
+
+    sims = vectors @ query
+    results = []
+    for i, place in enumerate(places):
+        dist_km = None
+        if center is not None:
+            if place['_lat'] is None:
+                continue
+            dist_km = haversine_km(center[0], center[1], place['_lat'], place['_lng'])
+            if not dist_km <= radius_km:
+                continue
+        dist_weight = 1.0 - (dist_km / radius_km) * 0.4 if dist_km is not None and radius_km > 0 else 1.0
+        boost = 1.0
+        if detected_category:
+            pc = (place.get('primary_category') or '').lower()
+            tc = (place.get('taxonomy_category') or '').lower()
+            tg = (place.get('taxonomy_group') or '').lower()
+            det = detected_category.lower()
+            if det in pc or det in tc or det in tg or pc in det:
+                boost = 1.4
+        rating = _safe_float(place.get('avg_rating'), 3.0)
+        reviews = int(_safe_float(place.get('review_count'), 0))
+        rating_s = (min(rating, 5.0) / 5.0) * math.log1p(reviews + 1) / math.log1p(1001)
+        final = (float(sims[i]) * 0.55 + dist_weight * 0.25 + rating_s * 0.10) * boost
+        results.append((round(final, 4), i, boost > 1.0, dist_km))
+    results.sort(key=lambda r: r[0], reverse=True)
+    return results[:top_n]
+
+
+class TestVectorisedRanking:
+    def test_matches_per_place_scoring(self):
+        vectors, places = _catalogue()
+        query = vectors[5]
+        rec = _recommender(vectors, places, query)
+
+        cases = [
+            ((7.2, 80.4), 25.0, 'Temple'),
+            ((7.2, 80.4), 300.0, None),
+            (None, 10.0, 'cafe'),
+            (None, 10.0, None),
+        ]
+        for center, radius_km, category in cases:
+            got = rec.search(
+                None, query='q',
+                center_lat=center[0] if center else None,
+                center_lng=center[1] if center else None,
+                radius_km=radius_km, top_n=15, detected_category=category,
+            )
+            want = _reference(vectors, places, query, center, radius_km, category, 15)
+
+            assert [p['_score'] for p in got] == [w[0] for w in want]
+            assert {p['id'] for p in got} == {w[1] for w in want}
+            want_by_id = {w[1]: w for w in want}
+            for p in got:
+                _, _, boosted, dist_km = want_by_id[p['id']]
+                assert p['_category_boosted'] == boosted
+                assert p['_dist_km'] == (None if dist_km is None else round(dist_km, 2))
+
+    def test_category_match_uses_substrings_both_ways(self):
+        from app.services.semantic_recommender import _PlaceColumns
+
+        cols = _PlaceColumns.from_places([
+            {'primary_category': 'Hindu Temple'},
+            {'primary_category': 'Cafe'},
+            {'category': 'cafe', 'taxonomy_group': 'Food'},
+            {'primary_category': 'Beach', 'taxonomy_category': 'Temple Beach'},
+            {},
+        ])
+        assert cols.category_match('temple').tolist() == [True, False, False, True, True]
+        assert cols.category_match('Cafe & Bakery').tolist() == [False, True, True, False, True]
+
+    def test_result_dicts_only_for_top_n(self):
+        vectors, places = _catalogue(n=1000)
+        rec = _recommender(vectors, places, vectors[1])
+
+        results = rec.search(None, query='q', center_lat=7.2, center_lng=80.4, radius_km=500.0, top_n=5)
+
+        assert len(results) == 5
+        assert results[0]['id'] == 1
+        assert [p['_score'] for p in results] == sorted((p['_score'] for p in results), reverse=True)
+        assert rec.search(None, query='q', center_lat=0.0, center_lng=0.0, radius_km=5.0) == []
+
+
+class TestSpatialPrefilter:
+    def test_within_matches_haversine_scan(self):
+        from app.services.geo import distance_vector_km
+        from app.services.semantic_recommender import _PlaceColumns
+
+        _, places = _catalogue(n=800)
+        cols = _PlaceColumns.from_places(places)
+        rng = np.random.default_rng(1)
+        for radius_km in (0.0, 2.0, 15.0, 60.0, 1000.0):
+            lat, lng = 6.5 + rng.random() * 1.5, 79.9 + rng.random()
+            rows, dist_km = cols.within(lat, lng, radius_km)
+            want = np.flatnonzero(distance_vector_km(lat, lng, cols.lat, cols.lng) <= radius_km)
+            assert rows.tolist() == want.tolist()
+            assert np.all(dist_km <= radius_km)
+        assert len(cols.within(7.0, 80.0, -1.0)[0]) == 0
+
+    def test_radius_query_scores_only_nearby_vectors(self):
+        from app.services.geo import distance_vector_km
+
+        vectors, places = _catalogue()
+        rec = _recommender(vectors.copy(), places, vectors[3])
+        cols = rec._columns()
+        far = ~(distance_vector_km(7.2, 80.4, cols.lat, cols.lng) <= 20.0)
+        rec._vectors[far] = np.nan          # any read of a far vector poisons the score
+
+        results = rec.search(None, query='q', center_lat=7.2, center_lng=80.4, radius_km=20.0, top_n=50)
+
+        assert results
+        assert all(np.isfinite(p['_score']) and p['_dist_km'] <= 20.0 for p in results)
+
+
+class TestSmallCatalogueIndex:
+    def test_exact_index_scores_every_place(self):
+        from app.services.ann_index import ExactIndex, build_ann_index
+
+        # High-dimensional random vectors: similarities are close together, so
+        # rating and category boost decide the ranking, as in the catalogue
+        vectors, places = _catalogue(n=4900, dim=384)
+        rec = _recommender(vectors, places, vectors[0])
+        rec._ann = build_ann_index(vectors)
+        assert isinstance(rec._ann, ExactIndex)
+
+        rng = np.random.default_rng(7)
+        for seed in range(5):
+            query = rng.normal(size=384).astype(np.float32)
+            query /= np.linalg.norm(query)
+            rec._model = _FakeModel(query)
+            for category in ('Temple', None):
+                got = rec.search(None, query=f'q{seed}', top_n=20, detected_category=category)
+                want = _reference(vectors, places, query, None, 10.0, category, 20)
+                assert [p['_score'] for p in got] == [w[0] for w in want]
+                cutoff = want[-1][0]            # ties at the cut may break either way
+                assert {p['id'] for p in got if p['_score'] > cutoff} == {w[1] for w in want if w[0] > cutoff}
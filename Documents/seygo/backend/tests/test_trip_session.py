@@ -0,0 +1,147 @@
+"""
+Tests for app/services/trip_session.py
+
+Sessions run offline: weather is stubbed, the road graph is off and road
+geometry comes from a fake Directions source that records every request.
+"""
+
+import sys
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+ORIGIN = {"latitude": 6.9271, "longitude": 79.8612}
+STOPS = [
+    {"name": "Negombo", "latitude": 7.2083, "longitude": 79.8358},
+    {"name": "Kandy", "latitude": 7.2906, "longitude": 80.6337},
+    {"name": "Ella", "latitude": 6.8667, "longitude": 81.0466},
+    {"name": "Galle", "latitude": 6.0535, "longitude": 80.2210},
+]
+
+
+@pytest.fixture
+def offline(monkeypatch):
+    """Stub weather and Directions; returns the list of Directions requests."""
+    from app.services import route_optimizer
+    from test_route_optimizer import _offline_weather
+
+    _offline_weather(monkeypatch)
+    monkeypatch.setattr(route_optimizer, "_ROAD_GRAPH_MODE", "off")
+    monkeypatch.setenv("GOOGLE_MAPS_API_KEY", "test-key")
+    requests = []
+
+    async def _fake_legs(points_ll, api_key, client):
+        requests.append(list(points_ll))
+        legs = []
+        for a, b in zip(points_ll, points_ll[1:]):
+            (lat0, lng0), (lat1, lng1) = (map(float, a.split(",")), map(float, b.split(",")))
+            legs.append({
+                "lats": np.linspace(lat0, lat1, 200),
+                "lngs": np.linspace(lng0, lng1, 200),
+                "distance_km": 100.0,
+                "duration_min": 120.0,
+            })
+        return legs
+
+    async def _no_matrix(locations, api_key, client, depart_ts, road, places):
+        return [], None
+
+    monkeypatch.setattr(route_optimizer, "_fetch_directions_legs", _fake_legs)
+    monkeypatch.setattr(route_optimizer, "_travel_matrix", _no_matrix)
+    return requests
+
+
+async def _session(stops=STOPS):
+    from app.services.trip_session import TripSession
+
+    session = TripSession(ORIGIN, polyline_format="flat")
+    result = await session.start(stops)
+    return session, result
+
+
+class TestTripSession:
+    @pytest.mark.asyncio
+    async def test_start_orders_and_routes_every_leg(self, offline):
+        session, result = await _session()
+
+        assert sorted(s["stop_index"] for s in result["remaining_stops"]) == [0, 1, 2, 3]
+        assert result["last_update"]["legs_fetched"] == 4
+        assert len(offline) == 1 and len(offline[0]) == 5      # one Directions run
+        assert result["total_distance_km"] == 400.0
+        assert result["route_sources"] == ["google_directions"]
+
+    @pytest.mark.asyncio
+    async def test_position_on_current_leg_needs_no_road_call(self, offline):
+        session, result = await _session()
+        first = result["remaining_stops"][0]
+        lat = ORIGIN["latitude"] + 0.5 * (first["latitude"] - ORIGIN["latitude"])
+        lng = ORIGIN["longitude"] + 0.5 * (first["longitude"] - ORIGIN["longitude"])
+
+        updated = await session.update(position=(lat, lng))
+
+        assert len(offline) == 1
+        assert updated["last_update"]["legs_fetched"] == 0
+        assert updated["remaining_stops"] == result["remaining_stops"]
+        assert updated["total_distance_km"] == pytest.approx(350.0, abs=1.0)
+        assert updated["polyline_flat"]["latitude"][0] == pytest.approx(lat)
+        assert updated["last_update"]["elapsed_ms"] < 100
+
+    @pytest.mark.asyncio
+    async def test_off_route_position_refetches_only_the_first_leg(self, offline):
+        session, result = await _session()
+
+        updated = await session.update(position=(7.07, 79.95))    # ~11 km off the first leg
+
+        assert len(offline) == 2 and len(offline[1]) == 2
+        assert updated["last_update"]["legs_fetched"] == 1
+        assert updated["last_update"]["legs_reused"] == 3
+
+    @pytest.mark.asyncio
+    async def test_visited_and_skipped_reuse_cached_legs(self, offline):
+        session, result = await _session()
+        order = [s["stop_index"] for s in result["remaining_stops"]]
+
+        updated = await session.update(visited=[order[0]], skipped=[order[-1]])
+
+        assert [s["stop_index"] for s in updated["visited_stops"]] == [order[0]]
+        assert [s["stop_index"] for s in updated["skipped_stops"]] == [order[-1]]
+        assert sorted(s["stop_index"] for s in updated["remaining_stops"]) == sorted(order[1:-1])
+        assert updated["last_update"]["legs_fetched"] in (0, 1)
+        with pytest.raises(ValueError):
+            await session.update(visited=[99])
+
+    @pytest.mark.asyncio
+    async def test_added_stop_is_inserted_and_priced(self, offline):
+        session, result = await _session()
+
+        updated = await session.update(add_stops=[{"name": "Matale", "latitude": 7.4675, "longitude": 80.6234}])
+
+        remaining = [s["stop_index"] for s in updated["remaining_stops"]]
+        assert sorted(remaining) == [0, 1, 2, 3, 4]
+        assert 1 <= updated["last_update"]["legs_fetched"] <= 2
+        assert len(updated["weather_info"]) == 5
+
+
+class TestTripSessionStore:
+    def test_expiry_and_eviction(self, monkeypatch):
+        from app.services import trip_session as ts
+
+        clock = [0.0]
+        monkeypatch.setattr(ts.time, "monotonic", lambda: clock[0])
+        store = ts.TripSessionStore(max_entries=2, ttl_s=60)
+        sessions = [ts.TripSession(ORIGIN) for _ in range(3)]
+        for session in sessions[:2]:
+            store.add(session)
+
+        clock[0] = 30
+        assert store.get(sessions[0].session_id) is sessions[0]      # refreshed
+        store.add(sessions[2])                                         # evicts sessions[1]
+        assert store.get(sessions[1].session_id) is None
+
+        clock[0] = 100
+        assert store.get(sessions[2].session_id) is None               # idle > ttl
+        assert store.stats()["evictions"] == 1 and store.stats()["expired"] == 1
+        assert store.remove(sessions[0].session_id)
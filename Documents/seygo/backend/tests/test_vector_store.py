@@ -0,0 +1,79 @@
+"""
+Tests for app/services/vector_store.py
+"""
+
+import os
+import sys
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+
+def _vectors(n=300, dim=48, seed=0):
+    rng = np.random.default_rng(seed)
+    x = rng.normal(size=(n, dim)).astype(np.float32)
+    return x / np.linalg.norm(x, axis=1, keepdims=True)
+
+
+class TestQuantizedVectors:
+    def test_int8_round_trip_and_dot_product(self):
+        from app.services.vector_store import QuantizedVectors, quantize_int8
+
+        x = _vectors()
+        x[7] = 0.0
+        codes, scales = quantize_int8(x)
+        assert codes.dtype == np.int8 and scales.dtype == np.float32
+        assert np.all(np.abs(QuantizedVectors(codes, scales)[:] - x) <= scales[:, None] / 2 + 1e-7)
+
+        q = QuantizedVectors(codes, scales, x)
+        query = x[3]
+        assert np.allclose(q @ query, x @ query, atol=2e-2)
+        assert q[5].shape == (48,) and q[[1, 2]].shape == (2, 48)
+        assert np.allclose(q.rescore(np.array([3, 9]), query), x[[3, 9]] @ query, atol=1e-6)
+
+    def test_saved_vectors_are_memory_mapped(self, tmp_path):
+        from app.services.vector_store import QuantizedVectors, load_vectors, save_vectors, vector_info
+
+        path = tmp_path / 'semantic_vectors.npy'
+        x = _vectors()
+        save_vectors(path, x, fmt='int8')
+
+        q = load_vectors(path, fmt='int8')
+        assert isinstance(q, QuantizedVectors)
+        assert isinstance(q.codes, np.memmap) and isinstance(q.exact, np.memmap)
+        assert vector_info(q) == {'format': 'int8', 'mmap': True, 'bytes': 300 * 48 + 300 * 4, 'rescore': True}
+
+        f32 = load_vectors(path, fmt='float32')
+        assert isinstance(f32, np.memmap) and np.array_equal(f32, x)
+
+    def test_stale_quantised_files_are_rebuilt(self, tmp_path):
+        from app.services.vector_store import load_vectors, save_vectors
+
+        path = tmp_path / 'semantic_vectors.npy'
+        save_vectors(path, _vectors(n=100), fmt='int8')
+        save_vectors(path, _vectors(n=150, seed=1), fmt='float32')      # newer float32, old q8
+        codes_path = tmp_path / 'semantic_vectors_q8.npy'
+        os.utime(codes_path, (0, 0))
+
+        q = load_vectors(path, fmt='int8')
+
+        assert len(q) == 150 and len(np.load(codes_path, mmap_mode='r')) == 150
+        assert np.allclose(q[:], _vectors(n=150, seed=1), atol=1e-2)
+
+
+class TestQuantizedSearch:
+    def test_radius_search_matches_float32_and_rescores(self):
+        from app.services.vector_store import QuantizedVectors
+        from test_semantic_recommender import _catalogue, _recommender
+
+        vectors, places = _catalogue()
+        exact = _recommender(vectors, places, vectors[5])
+        quantised = _recommender(QuantizedVectors.from_array(vectors), places, vectors[5])
+
+        for kwargs in ({'center_lat': 7.2, 'center_lng': 80.4, 'radius_km': 40.0}, {}):
+            want = exact.search(None, query='q', top_n=10, detected_category='Temple', **kwargs)
+            got = quantised.search(None, query='q', top_n=10, detected_category='Temple', **kwargs)
+            assert [p['id'] for p in got] == [p['id'] for p in want]
+            assert [p['_semantic'] for p in got] == [p['_semantic'] for p in want]
@@ -0,0 +1,57 @@
+"""
+Tests for app/services/weather_cache.py
+"""
+
+import pytest
+
+
+class TestGeohash:
+    def test_known_value(self):
+        from app.services.weather_cache import geohash_encode
+
+        # Reference value from the original geohash.org implementation
+        assert geohash_encode(57.64911, 10.40744, precision=11) == "u4pruydqqvj"
+
+    def test_center_round_trips(self):
+        from app.services.weather_cache import geohash_center, geohash_encode
+
+        cell = geohash_encode(6.9271, 79.8612)
+        lat, lon = geohash_center(cell)
+        assert geohash_encode(lat, lon) == cell
+        assert lat == pytest.approx(6.9271, abs=0.03)
+        assert lon == pytest.approx(79.8612, abs=0.03)
+
+
+class TestWeatherForecastCache:
+    def test_hit_miss_counters(self):
+        from app.services.weather_cache import WeatherForecastCache
+
+        cache = WeatherForecastCache(max_cells=4, ttl_s=60)
+        assert cache.get("tc1") is None
+        cache.put("tc1", {"time": [1]})
+        assert cache.get("tc1") == {"time": [1]}
+        stats = cache.stats()
+        assert (stats["hits"], stats["misses"], stats["hit_rate"]) == (1, 1, 0.5)
+
+    def test_lru_eviction(self):
+        from app.services.weather_cache import WeatherForecastCache
+
+        cache = WeatherForecastCache(max_cells=2, ttl_s=60)
+        cache.put("a", {})
+        cache.put("b", {})
+        cache.get("a")          # "b" is now least recently used
+        cache.put("c", {})
+        assert cache.get("b") is None
+        assert cache.get("a") is not None
+        assert cache.stats()["evictions"] == 1
+
+    def test_ttl_expiry(self, monkeypatch):
+        from app.services import weather_cache as module
+
+        clock = {"t": 1000.0}
+        monkeypatch.setattr(module.time, "monotonic", lambda: clock["t"])
+        cache = module.WeatherForecastCache(max_cells=2, ttl_s=60)
+        cache.put("a", {})
+        clock["t"] += 61
+        assert cache.get("a") is None
+        assert cache.stats()["cells"] == 0